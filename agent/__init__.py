@@ -3,6 +3,7 @@
 from .voice_agent import ArvalVoiceAgent
 from .tools import (
     book_appointment,
+    find_next_available,
     capture_lead,
     get_business_hours,
     check_after_hours,
@@ -14,6 +15,7 @@ from .tools import (
 __all__ = [
     "ArvalVoiceAgent",
     "book_appointment",
+    "find_next_available",
     "capture_lead",
     "get_business_hours",
     "check_after_hours",
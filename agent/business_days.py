@@ -0,0 +1,226 @@
+"""
+UK business-day calendar for the Driver Desk and workshops.
+
+Business days are Monday to Friday except England and Wales bank
+holidays. The holidays follow the statutory rules: New Year's Day, Good
+Friday, Easter Monday, the early May, spring and summer Mondays,
+Christmas Day and Boxing Day, with a substitute weekday when a fixed-date
+holiday falls on a weekend. One-off changes are listed in
+`MOVED_HOLIDAYS` and `EXTRA_HOLIDAYS`, e.g. coronations and jubilees.
+
+`BusinessCalendar` works all of this out once for a range of years. It
+stores the business days as a bitset with one bit per day, plus a rank
+table (how many business days come before each day) and the ordered list
+of business days. Every query is then a table lookup:
+
+- `is_business_day(day)` and `is_open(now)`
+- `next_business_day(day)` and `next_open_after(dt)`
+- `add_business_days(day, n)`
+"""
+
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+UK_TZ = ZoneInfo("Europe/London")
+
+# Driver Desk and workshop hours on business days
+OPENING_TIME = time(9, 0)
+CLOSING_TIME = time(17, 0)
+
+FIRST_YEAR = 2020
+LAST_YEAR = 2045
+
+# Regular holidays moved for a one-off occasion: {regular date: date observed}
+MOVED_HOLIDAYS: Dict[date, date] = {
+    date(2020, 5, 4): date(2020, 5, 8),  # Early May moved for VE Day 75
+    date(2022, 5, 30): date(2022, 6, 2),  # Spring moved for the Platinum Jubilee
+}
+# One-off bank holidays
+EXTRA_HOLIDAYS: Dict[date, str] = {
+    date(2022, 6, 3): "Platinum Jubilee bank holiday",
+    date(2022, 9, 19): "State Funeral of Queen Elizabeth II",
+    date(2023, 5, 8): "Coronation of King Charles III",
+}
+
+
+def easter_sunday(year: int) -> date:
+    """Easter Sunday in the Gregorian calendar (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _first_monday(year: int, month: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(7 - first.weekday()) % 7)
+
+
+def _last_monday(year: int, month: int) -> date:
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=last.weekday())
+
+
+def bank_holidays(year: int) -> Dict[date, str]:
+    """England and Wales bank holidays in a year, with their names."""
+    easter = easter_sunday(year)
+    holidays = {
+        easter - timedelta(days=2): "Good Friday",
+        easter + timedelta(days=1): "Easter Monday",
+        _first_monday(year, 5): "Early May bank holiday",
+        _last_monday(year, 5): "Spring bank holiday",
+        _last_monday(year, 8): "Summer bank holiday",
+    }
+    # Fixed dates on a weekday stay put; the rest move to the next weekday
+    # that isn't already a holiday
+    fixed = [(date(year, 1, 1), "New Year's Day"), (date(year, 12, 25), "Christmas Day"),
+             (date(year, 12, 26), "Boxing Day")]
+    for day, name in fixed:
+        if day.weekday() < 5:
+            holidays[day] = name
+    for day, name in fixed:
+        if day.weekday() >= 5:
+            while day.weekday() >= 5 or day in holidays:
+                day += timedelta(days=1)
+            holidays[day] = f"{name} (substitute day)"
+
+    for regular, observed in MOVED_HOLIDAYS.items():
+        if regular in holidays:
+            holidays[observed] = holidays.pop(regular)
+    holidays.update(
+        {day: name for day, name in EXTRA_HOLIDAYS.items() if day.year == year}
+    )
+    return dict(sorted(holidays.items()))
+
+
+class BusinessCalendar:
+    """Business days over a range of years, precomputed for constant-time queries."""
+
+    def __init__(self, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR):
+        """
+        Args:
+            first_year: First year covered
+            last_year: Last year covered (inclusive)
+        """
+        self.first_day = date(first_year, 1, 1)
+        self.last_day = date(last_year, 12, 31)
+        self.holidays: Dict[date, str] = {}
+        for year in range(first_year, last_year + 1):
+            self.holidays.update(bank_holidays(year))
+
+        self._origin = self.first_day.toordinal()
+        days = self.last_day.toordinal() - self._origin + 1
+        # One bit per day, set on business days
+        self.bits = bytearray((days + 7) // 8)
+        # Ordinals of every business day, and how many come before each day
+        self._business: List[int] = []
+        self._rank: List[int] = []
+        for offset in range(days):
+            day = date.fromordinal(self._origin + offset)
+            self._rank.append(len(self._business))
+            if day.weekday() < 5 and day not in self.holidays:
+                self.bits[offset >> 3] |= 1 << (offset & 7)
+                self._business.append(self._origin + offset)
+        self._rank.append(len(self._business))
+        self._holiday_days = sorted(self.holidays)
+
+    def _offset(self, day: date) -> int:
+        offset = day.toordinal() - self._origin
+        if not 0 <= offset < len(self._rank) - 1:
+            raise ValueError(
+                f"{day} is outside the calendar ({self.first_day} to {self.last_day})"
+            )
+        return offset
+
+    def is_business_day(self, day: date) -> bool:
+        """Whether the desk and workshops open on a day."""
+        offset = self._offset(day)
+        return bool(self.bits[offset >> 3] >> (offset & 7) & 1)
+
+    def holiday_name(self, day: date) -> Optional[str]:
+        """The bank holiday on a day, if any."""
+        return self.holidays.get(day)
+
+    def next_business_day(self, day: date, include: bool = False) -> date:
+        """
+        The first business day after `day` (or on it, with `include`).
+
+        Raises:
+            ValueError: If the calendar ends first
+        """
+        rank = self._rank[self._offset(day) + (0 if include else 1)]
+        if rank >= len(self._business):
+            raise ValueError(f"No business days after {day} in the calendar")
+        return date.fromordinal(self._business[rank])
+
+    def business_days_between(self, start: date, end: date) -> int:
+        """Business days in [start, end)."""
+        return self._rank[self._offset(end)] - self._rank[self._offset(start)]
+
+    def add_business_days(self, day: date, n: int) -> date:
+        """
+        The business day `n` business days after `day` (before it, for negative `n`).
+
+        `day` itself needn't be a business day; adding 0 returns it unchanged.
+
+        Raises:
+            ValueError: If the result falls outside the calendar
+        """
+        if n == 0:
+            return day
+        offset = self._offset(day)
+        # Business days up to and including `day`, or strictly before it
+        rank = self._rank[offset + 1] + n - 1 if n > 0 else self._rank[offset] + n
+        if not 0 <= rank < len(self._business):
+            raise ValueError(f"{day} plus {n} business days is outside the calendar")
+        return date.fromordinal(self._business[rank])
+
+    def is_open(self, now: datetime) -> bool:
+        """Whether the desk is open at a moment (naive times are UK time)."""
+        local = _uk_time(now)
+        # The clock check is cheaper, so it goes first
+        return OPENING_TIME <= local.time() < CLOSING_TIME and self.is_business_day(local.date())
+
+    def next_open_after(self, now: datetime) -> datetime:
+        """
+        When the desk is next open: `now` itself if it is open, otherwise
+        the next opening time, in UK time.
+        """
+        local = _uk_time(now)
+        clock = local.time()
+        if clock < OPENING_TIME:
+            day = self.next_business_day(local.date(), include=True)
+        elif clock < CLOSING_TIME and self.is_business_day(local.date()):
+            return local
+        else:
+            day = self.next_business_day(local.date())
+        return datetime.combine(day, OPENING_TIME, tzinfo=UK_TZ)
+
+    def holidays_between(self, start: date, end: date) -> Dict[date, str]:
+        """Bank holidays in [start, end), in date order."""
+        days = self._holiday_days
+        return {day: self.holidays[day]
+                for day in days[bisect_left(days, start):bisect_left(days, end)]}
+
+
+def _uk_time(moment: datetime) -> datetime:
+    if moment.tzinfo is UK_TZ:
+        return moment
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=UK_TZ)
+    return moment.astimezone(UK_TZ)
+
+
+@lru_cache(maxsize=1)
+def default_calendar() -> BusinessCalendar:
+    """The calendar shared by the agent's tools (built on first use)."""
+    return BusinessCalendar()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Callback dispatch for the Driver Desk.
+
+`schedule_callback` stores callbacks in `callbacks.json` with a scheduled
+date, a preferred time and an urgency flag. `CallbackQueue` orders the
+pending ones with two heaps:
+
+- waiting: keyed on when each callback falls due, i.e. its scheduled date
+  at the preferred time, moved into opening hours by the business calendar
+- ready: callbacks already due, keyed on urgency, then scheduled date,
+  then preferred time, so urgent calls go first and older ones don't starve
+
+`CallbackDispatcher` places ready callbacks through `VapiClient.make_call`
+while the desk is open. It spreads them across agents (a Vapi phone number
+and assistant each), caps the calls in flight and spaces out call starts.
+A backlog of tens of thousands due at 9:00 on a Monday is worked through
+in priority order at a steady rate rather than all at once. Failed calls
+are retried after a jittered backoff, so an outage doesn't bring them all
+back at the same moment.
+
+Outcomes are written back to the callback file in batches, merged by
+reference so callbacks the tool server appends meanwhile are kept. Run one
+dispatcher per callback file.
+
+Usage:
+    python -m agent.callbacks [--data-dir data] [--once]
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import random
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import tools
+from .business_days import OPENING_TIME, UK_TZ, BusinessCalendar, default_calendar
+from .dedup import file_signature, normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# "phone_number_id:assistant_id" pairs, comma-separated, that place callbacks
+CALLBACK_AGENTS = os.getenv("CALLBACK_AGENTS", "")
+# Calls in progress at once, across all agents and per agent
+MAX_IN_FLIGHT = int(os.getenv("CALLBACK_MAX_IN_FLIGHT", "20"))
+CALLS_PER_AGENT = int(os.getenv("CALLBACK_CALLS_PER_AGENT", "5"))
+# Most calls started per second (0 for no pacing)
+CALLS_PER_SECOND = float(os.getenv("CALLBACK_CALLS_PER_SECOND", "2"))
+# Calls attempted before a callback is marked failed, and the first retry delay
+MAX_CALL_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "3"))
+RETRY_DELAY = timedelta(minutes=float(os.getenv("CALLBACK_RETRY_MINUTES", "15")))
+
+# Seconds between writing outcomes back while dispatching
+FLUSH_SECONDS = 5.0
+# Attempts to write outcomes when another process keeps writing the file
+WRITE_ATTEMPTS = 3
+
+PENDING = "Pending"
+CALLED = "Called"
+FAILED = "Failed"
+
+# Time of day each named preference asks for
+PREFERRED_TIMES = {"asap": OPENING_TIME, "morning": time(9, 0), "afternoon": time(12, 0)}
+_CLOCK_TIME = re.compile(r"\b(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\b")
+
+
+def preferred_time(preference: Optional[str]) -> time:
+    """
+    The time of day a callback preference asks for.
+
+    Understands "Morning", "Afternoon", "ASAP" and clock times such as
+    "14:30", "2pm" or "3" (read as 3 PM). Anything else means opening time.
+    """
+    text = str(preference or "").strip().lower()
+    for name, at in PREFERRED_TIMES.items():
+        if name in text:
+            return at
+    match = _CLOCK_TIME.search(text)
+    if not match:
+        return OPENING_TIME
+    hour, minute, meridiem = int(match[1]), int(match[2] or 0), match[3]
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    elif meridiem is None and 1 <= hour < 8:
+        # Nobody asks for a call at 3 in the morning
+        hour += 12
+    if hour > 23 or minute > 59:
+        return OPENING_TIME
+    return time(hour, minute)
+
+
+def due_at(callback: Dict[str, Any], calendar: BusinessCalendar) -> datetime:
+    """
+    When a callback may first be placed.
+
+    A retry is due at its `next_attempt_at`; otherwise the callback is due on
+    its scheduled date at the preferred time. Either way it is moved to the
+    next time the desk is open.
+
+    Raises:
+        ValueError: If the date is missing, malformed or outside the calendar
+    """
+    try:
+        if callback.get("next_attempt_at"):
+            moment = datetime.fromisoformat(callback["next_attempt_at"])
+        else:
+            day = date.fromisoformat(callback["scheduled_date"])
+            moment = datetime.combine(
+                day, preferred_time(callback.get("preferred_time")), tzinfo=UK_TZ
+            )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"No usable scheduled date: {e!r}") from None
+    return calendar.next_open_after(moment)
+
+
+def priority(callback: Dict[str, Any]) -> Tuple[int, str, int, str]:
+    """Sort key among due callbacks: urgent first, then oldest scheduled date and time."""
+    at = preferred_time(callback.get("preferred_time"))
+    return (
+        0 if callback.get("is_urgent") else 1,
+        str(callback.get("scheduled_date") or ""),
+        at.hour * 60 + at.minute,
+        str(callback["id"]),
+    )
+
+
+class CallbackQueue:
+    """Pending callbacks, waiting until due and then ready in priority order."""
+
+    def __init__(self, calendar: Optional[BusinessCalendar] = None):
+        """
+        Args:
+            calendar: When the desk is open (default: the shared UK calendar)
+        """
+        self.calendar = calendar or default_calendar()
+        self._waiting: List[Tuple[float, str]] = []
+        self._ready: List[Tuple[Tuple[int, str, int, str], str]] = []
+        self._callbacks: Dict[str, Dict[str, Any]] = {}
+        # Every callback ever queued, so rereading the file doesn't queue it twice
+        self._seen: Set[str] = set()
+        # Callbacks that couldn't be queued because their dates don't parse
+        self.rejected: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._waiting) + len(self._ready)
+
+    @property
+    def ready(self) -> int:
+        """Callbacks due and waiting for a free line."""
+        return len(self._ready)
+
+    def _due(self, callback: Dict[str, Any]) -> Optional[float]:
+        """When a callback falls due, or None (and rejected) if that can't be worked out."""
+        try:
+            return due_at(callback, self.calendar).timestamp()
+        except ValueError as e:
+            logger.warning(f"Not calling back {callback['id']}: {e}")
+            self.rejected.append(callback)
+            return None
+
+    def extend(self, callbacks: Iterable[Any]) -> int:
+        """
+        Queue stored callbacks that are pending and not yet seen.
+
+        Returns:
+            How many were queued
+        """
+        added = 0
+        for callback in callbacks:
+            if not isinstance(callback, dict) or callback.get("status", PENDING) != PENDING:
+                continue
+            if not callback.get("id") or callback["id"] in self._seen:
+                continue
+            self._seen.add(callback["id"])
+            due = self._due(callback)
+            if due is None:
+                continue
+            self._callbacks[callback["id"]] = callback
+            self._waiting.append((due, callback["id"]))
+            added += 1
+        if added:
+            heapq.heapify(self._waiting)
+        return added
+
+    def requeue(self, callback: Dict[str, Any]) -> None:
+        """Queue a callback again, e.g. to retry at its `next_attempt_at`."""
+        due = self._due(callback)
+        if due is not None:
+            self._callbacks[callback["id"]] = callback
+            heapq.heappush(self._waiting, (due, callback["id"]))
+
+    def release(self, now: datetime) -> int:
+        """
+        Move callbacks due by `now` to the ready heap.
+
+        Returns:
+            How many were released
+        """
+        cutoff = now.timestamp()
+        released = 0
+        while self._waiting and self._waiting[0][0] <= cutoff:
+            _, callback_id = heapq.heappop(self._waiting)
+            heapq.heappush(self._ready, (priority(self._callbacks[callback_id]), callback_id))
+            released += 1
+        return released
+
+    def pop(self) -> Optional[Dict[str, Any]]:
+        """Take the highest-priority ready callback, if any."""
+        if not self._ready:
+            return None
+        _, callback_id = heapq.heappop(self._ready)
+        return self._callbacks.pop(callback_id)
+
+    def next_due(self) -> Optional[datetime]:
+        """When the next waiting callback falls due."""
+        if not self._waiting:
+            return None
+        return datetime.fromtimestamp(self._waiting[0][0], tz=UK_TZ)
+
+
+@dataclass(frozen=True)
+class CallAgent:
+    """A Vapi phone number and assistant that places callbacks."""
+    phone_number_id: str
+    assistant_id: str
+
+
+def agents_from_env() -> List[CallAgent]:
+    """Agents from CALLBACK_AGENTS, or VAPI_PHONE_NUMBER_ID with VAPI_ASSISTANT_ID."""
+    agents = []
+    for pair in CALLBACK_AGENTS.split(","):
+        phone_number_id, _, assistant_id = pair.strip().partition(":")
+        if phone_number_id and assistant_id:
+            agents.append(CallAgent(phone_number_id, assistant_id))
+    phone_number_id = os.getenv("VAPI_PHONE_NUMBER_ID")
+    assistant_id = os.getenv("VAPI_ASSISTANT_ID")
+    if not agents and phone_number_id and assistant_id:
+        agents.append(CallAgent(phone_number_id, assistant_id))
+    return agents
+
+
+@dataclass
+class DispatchResult:
+    """Outcome of one dispatch run."""
+    called: int = 0
+    retrying: int = 0
+    failed: int = 0
+    peak_in_flight: int = 0
+
+
+def write_outcomes(file_path: Path, updates: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Apply field updates to stored callbacks by reference.
+
+    Like `agent.rescore`, the file is only replaced if it is unchanged since
+    it was read.
+
+    Raises:
+        RuntimeError: If the file kept changing underneath every attempt
+    """
+    for _ in range(WRITE_ATTEMPTS):
+        with tools._DATA_LOCK:
+            signature = file_signature(file_path)
+            callbacks = tools._load_json(file_path)
+            for callback in callbacks:
+                if isinstance(callback, dict) and callback.get("id") in updates:
+                    callback.update(updates[callback["id"]])
+            if file_signature(file_path) == signature:
+                tools._save_json(file_path, callbacks)
+                return
+        logger.info(f"{file_path} changed while writing callback outcomes; retrying")
+    raise RuntimeError(f"{file_path} kept changing; callback outcomes not written")
+
+
+def _uk_now() -> datetime:
+    return datetime.now(UK_TZ)
+
+
+class CallbackDispatcher:
+    """Places due callbacks through Vapi, paced and spread across agents."""
+
+    def __init__(
+        self,
+        client: Any,
+        agents: List[CallAgent],
+        file_path: Path = tools.CALLBACKS_FILE,
+        calendar: Optional[BusinessCalendar] = None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        calls_per_agent: int = CALLS_PER_AGENT,
+        calls_per_second: float = CALLS_PER_SECOND,
+        max_attempts: int = MAX_CALL_ATTEMPTS,
+        retry_delay: timedelta = RETRY_DELAY,
+        clock: Callable[[], datetime] = _uk_now,
+    ):
+        """
+        Args:
+            client: A `VapiClient`, or anything with the same `make_call`
+            agents: Phone numbers and assistants to call from
+            file_path: Callback file to dispatch from and record outcomes in
+            calendar: When the desk is open (default: the shared UK calendar)
+            max_in_flight: Calls in progress at once across all agents
+            calls_per_agent: Calls in progress at once per agent
+            calls_per_second: Most calls started per second (0 for no pacing)
+            max_attempts: Calls attempted before a callback is marked failed
+            retry_delay: Wait before the first retry; doubles with each attempt
+            clock: Current time
+        """
+        if not agents:
+            raise ValueError("At least one agent is needed to place callbacks")
+        self.client = client
+        self.agents = agents
+        self.file_path = file_path
+        self.calendar = calendar or default_calendar()
+        self.max_in_flight = min(max_in_flight, calls_per_agent * len(agents))
+        self.calls_per_agent = calls_per_agent
+        self.calls_per_second = calls_per_second
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.queue = CallbackQueue(self.calendar)
+        self._in_flight = [0] * len(agents)
+        self._placed = [0] * len(agents)
+        self._updates: Dict[str, Dict[str, Any]] = {}
+        self._source = None
+
+    def refresh(self) -> int:
+        """
+        Queue callbacks added to the file since it was last read.
+
+        Callbacks whose dates can't be read are marked failed rather than
+        called at a guessed time.
+
+        Returns:
+            How many were queued
+        """
+        signature = file_signature(self.file_path)
+        if signature is None or signature == self._source:
+            return 0
+        with tools._DATA_LOCK:
+            self._source = file_signature(self.file_path)
+            callbacks = tools._load_json(self.file_path)
+        added = self.queue.extend(callbacks)
+        if self._reject_unschedulable():
+            self.flush()
+        return added
+
+    def _reject_unschedulable(self) -> int:
+        """Record the queue's rejected callbacks as failed; returns how many."""
+        rejected = self.queue.rejected
+        for callback in rejected:
+            self._record(callback, status=FAILED, last_error="Invalid scheduled date")
+        self.queue.rejected = []
+        return len(rejected)
+
+    def flush(self) -> None:
+        """Write recorded outcomes back to the callback file."""
+        updates, self._updates = self._updates, {}
+        if not updates:
+            return
+        try:
+            write_outcomes(self.file_path, updates)
+        except RuntimeError:
+            # Keep them for the next flush, under any newer outcome
+            for callback_id, fields in updates.items():
+                self._updates[callback_id] = {**fields, **self._updates.get(callback_id, {})}
+            raise
+
+    def _record(self, callback: Dict[str, Any], **fields: Any) -> None:
+        callback.update(fields)
+        self._updates.setdefault(callback["id"], {}).update(fields)
+
+    def _pick_agent(self) -> int:
+        """The free agent with the fewest calls in progress, then the fewest placed."""
+        free = [i for i, active in enumerate(self._in_flight) if active < self.calls_per_agent]
+        return min(free, key=lambda i: (self._in_flight[i], self._placed[i]))
+
+    async def _place(self, callback: Dict[str, Any], agent: int, result: DispatchResult) -> None:
+        attempts = callback.get("attempts", 0) + 1
+        number = normalize_phone(callback.get("contact_phone"))
+        if number is None:
+            self._record(callback, status=FAILED, attempts=attempts,
+                         last_error="Invalid phone number")
+            result.failed += 1
+            return
+
+        self._in_flight[agent] += 1
+        self._placed[agent] += 1
+        result.peak_in_flight = max(result.peak_in_flight, sum(self._in_flight))
+        caller = self.agents[agent]
+        try:
+            call = await self.client.make_call(
+                caller.phone_number_id, caller.assistant_id, customer_number=number,
+                name=f"Callback {callback['id']}",
+            )
+        except Exception as e:
+            logger.warning(f"Callback {callback['id']} failed (attempt {attempts}): {e}")
+            if attempts >= self.max_attempts:
+                self._record(callback, status=FAILED, attempts=attempts, last_error=str(e))
+                result.failed += 1
+            else:
+                # Back off exponentially, with jitter so retries don't arrive together
+                delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+                self._record(callback, attempts=attempts, last_error=str(e),
+                             next_attempt_at=(self.clock() + delay).isoformat())
+                self.queue.requeue(callback)
+                self._reject_unschedulable()
+                result.retrying += 1
+        else:
+            self._record(
+                callback, status=CALLED, attempts=attempts, call_id=call.get("id"),
+                called_at=self.clock().isoformat(), assistant_id=caller.assistant_id,
+            )
+            result.called += 1
+        finally:
+            self._in_flight[agent] -= 1
+
+    async def dispatch_due(self) -> DispatchResult:
+        """
+        Place every callback that is due, for as long as the desk is open.
+
+        Call starts are spaced `1 / calls_per_second` apart and at most
+        `max_in_flight` calls run at once. Callbacks left when the desk
+        closes stay queued for the next opening.
+        """
+        result = DispatchResult()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        interval = 1 / self.calls_per_second if self.calls_per_second > 0 else 0.0
+        next_start = last_flush = loop.time()
+        tasks: Set[asyncio.Task] = set()
+
+        def finished(task: asyncio.Task) -> None:
+            tasks.discard(task)
+            semaphore.release()
+
+        while True:
+            await semaphore.acquire()
+            wait = next_start - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            now = self.clock()
+            callback = None
+            if self.calendar.is_open(now):
+                self.queue.release(now)
+                callback = self.queue.pop()
+            if callback is None:
+                semaphore.release()
+                break
+            next_start = max(next_start, loop.time()) + interval
+            task = asyncio.create_task(self._place(callback, self._pick_agent(), result))
+            task.add_done_callback(finished)
+            tasks.add(task)
+            if loop.time() - last_flush >= FLUSH_SECONDS:
+                await asyncio.to_thread(self.flush)
+                last_flush = loop.time()
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        await asyncio.to_thread(self.flush)
+        return result
+
+    async def run(self, poll_seconds: float = 60) -> None:
+        """Dispatch callbacks as they fall due, until cancelled."""
+        while True:
+            await asyncio.to_thread(self.refresh)
+            now = self.clock()
+            if self.calendar.is_open(now):
+                result = await self.dispatch_due()
+                if result.called or result.retrying or result.failed:
+                    logger.info(
+                        f"Callbacks: {result.called} called, {result.retrying} to retry, "
+                        f"{result.failed} failed; {len(self.queue)} queued"
+                    )
+                wait = poll_seconds
+            else:
+                wait = (self.calendar.next_open_after(now) - now).total_seconds()
+            await asyncio.sleep(max(wait, 1))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from vapi_ai.client import VapiClient
+
+    parser = argparse.ArgumentParser(description="Place pending callbacks through Vapi")
+    parser.add_argument("--data-dir", help="Agent data directory (default: the tools' data dir)")
+    parser.add_argument(
+        "--once", action="store_true", help="Place the callbacks due now, then exit"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    agents = agents_from_env()
+    if not agents:
+        parser.error("Set CALLBACK_AGENTS, or VAPI_PHONE_NUMBER_ID and VAPI_ASSISTANT_ID")
+    path = (
+        Path(args.data_dir) / tools.CALLBACKS_FILE.name if args.data_dir
+        else tools.CALLBACKS_FILE
+    )
+    dispatcher = CallbackDispatcher(VapiClient(), agents, path)
+    if args.once:
+        dispatcher.refresh()
+        outcome = asyncio.run(dispatcher.dispatch_due())
+        print(f"Called {outcome.called}, {outcome.retrying} to retry, {outcome.failed} failed; "
+              f"{len(dispatcher.queue)} still queued in {path}")
+    else:
+        asyncio.run(dispatcher.run())
@@ -0,0 +1,304 @@
+"""
+Lead deduplication for the agent's lead store.
+
+Two leads are the same enquiry when they share a contact (the same
+E.164 phone number or the same email address) and don't name different
+companies. `LeadIndex` maps normalized phones and emails to stored leads,
+so `capture_lead` finds a caller's earlier lead with a dictionary lookup
+and merges the new details into it instead of appending a duplicate.
+
+For data captured before the index existed, `dedupe_leads` blocks leads
+by contact key, splits each block by company and joins everything that
+matches with union-find. It never compares leads pairwise. To run it over
+the store, use `python -m agent.rescore --dedupe`.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models.scoring import score_records
+
+logger = logging.getLogger(__name__)
+
+# Fields that always keep the surviving (earliest) lead's value
+KEEP_ORIGINAL = ("id", "created_at", "status", "source")
+# Free-text fields where both leads' text is kept
+CONCATENATE = ("inquiry_notes",)
+
+_COMPANY_SUFFIXES = re.compile(r"\b(?:ltd|limited|plc|llp|llc|inc|uk|group|co)\b")
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+# A trunk 0 written after the country code, as in "+44 (0)7700 900123"
+_BRACKETED_TRUNK = re.compile(r"(?<=\d)\s*\(0\)")
+# Longest national number (without its trunk 0) for the default country
+_NATIONAL_DIGITS = 10
+
+
+def normalize_phone(phone: Optional[str], country_code: str = "44") -> Optional[str]:
+    """
+    Normalize a phone number to E.164, assuming UK numbers when no country is given.
+
+    Digits without a leading "+", "00" or "0" are taken to include their
+    country code when they are longer than a UK national number, e.g.
+    "14087312213". Returns None for anything too short or too long to be
+    a full number.
+    """
+    if not phone:
+        return None
+    phone = _BRACKETED_TRUNK.sub("", str(phone).strip())
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif len(digits) <= _NATIONAL_DIGITS:
+        # Local number missing its trunk 0, e.g. "7700 900123"
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercase and trim an email address; None unless it looks like one."""
+    if not email:
+        return None
+    email = str(email).strip().lower()
+    return email if "@" in email else None
+
+
+def normalize_company(name: Optional[str]) -> Optional[str]:
+    """Reduce a company name to a comparable key ("ABC Transport Ltd." -> "abc transport")."""
+    if not name:
+        return None
+    key = _NON_ALPHANUMERIC.sub(" ", str(name).lower())
+    key = " ".join(_COMPANY_SUFFIXES.sub(" ", key).split())
+    return key or None
+
+
+def contact_keys(lead: Dict[str, Any]) -> List[str]:
+    """The phone and email keys a lead can be found by."""
+    keys = []
+    phone = normalize_phone(lead.get("contact_phone"))
+    if phone:
+        keys.append(f"phone:{phone}")
+    email = normalize_email(lead.get("contact_email"))
+    if email:
+        keys.append(f"email:{email}")
+    return keys
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """A file's modification time and size, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _informative(value: Any) -> bool:
+    return value is not None and value != "" and value != []
+
+
+def merge_leads(original: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge a later capture of the same enquiry into the original lead.
+
+    The original keeps its ID, creation time, pipeline status and source.
+    Other fields take the update's value when it adds information: it is
+    set, and isn't just a shorter form of what the original already says
+    (so "Acme" doesn't overwrite "Acme Fleet Services"). Notes from both
+    captures are kept. Score and priority are left for the caller to
+    recompute.
+    """
+    merged = dict(original)
+    for key, value in update.items():
+        current = merged.get(key)
+        if key in KEEP_ORIGINAL and _informative(current):
+            continue
+        if key in CONCATENATE:
+            parts = [part for part in (current, value) if _informative(part)]
+            merged[key] = "\n".join(dict.fromkeys(parts)) if parts else current
+        elif not _informative(current):
+            merged[key] = value
+        elif not _informative(value):
+            continue
+        elif isinstance(current, str) and isinstance(value, str):
+            if value.strip().lower() not in current.lower():
+                merged[key] = value
+        elif key != "ev_interest" or value:
+            # Flags only ever turn on; everything else takes the newer answer
+            merged[key] = value
+
+    merged_ids = list(original.get("merged_ids") or [])
+    update_id = update.get("id")
+    if update_id and update_id != merged.get("id") and update_id not in merged_ids:
+        merged_ids.append(update_id)
+    merged_ids += [i for i in update.get("merged_ids") or [] if i not in merged_ids]
+    if merged_ids:
+        merged["merged_ids"] = merged_ids
+    merged["contact_count"] = original.get("contact_count", 1) + update.get("contact_count", 1)
+    if update.get("created_at"):
+        merged["updated_at"] = max(
+            str(update["created_at"]), str(original.get("updated_at") or "")
+        )
+    return merged
+
+
+def rescore(leads: Iterable[Dict[str, Any]]) -> None:
+    """Recompute score and priority in place, e.g. after merging."""
+    leads = list(leads)
+    if not leads:
+        return
+    scores, priorities = score_records(leads)
+    for lead, score, priority in zip(leads, scores.tolist(), priorities):
+        lead["score"] = score
+        lead["priority"] = priority
+
+
+class LeadIndex:
+    """Positions of stored leads by contact key, for lookups at capture time."""
+
+    def __init__(self, leads: List[Dict[str, Any]]):
+        """Index a lead list; positions refer to that list."""
+        self._positions: Dict[str, List[int]] = {}
+        self._companies: List[Optional[str]] = []
+        self.size = 0
+        for position, lead in enumerate(leads):
+            self.add(position, lead)
+
+    def add(self, position: int, lead: Dict[str, Any]) -> None:
+        """Index (or re-index, after a merge) the lead at a position."""
+        company = normalize_company(lead.get("company_name"))
+        if position == len(self._companies):
+            self._companies.append(company)
+            self.size += 1
+        else:
+            self._companies[position] = company
+        for key in contact_keys(lead):
+            positions = self._positions.setdefault(key, [])
+            if position not in positions:
+                positions.append(position)
+
+    def find(self, lead: Dict[str, Any]) -> Optional[int]:
+        """Position of the earliest stored lead for the same enquiry, if any."""
+        company = normalize_company(lead.get("company_name"))
+        matches = [
+            position
+            for key in contact_keys(lead)
+            for position in self._positions.get(key, ())
+            if company is None
+            or self._companies[position] is None
+            or self._companies[position] == company
+        ]
+        return min(matches) if matches else None
+
+
+class CachedLeadIndex:
+    """A lead file's index, kept between captures while the file is unchanged."""
+
+    def __init__(self):
+        self._path: Optional[Path] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._index: Optional[LeadIndex] = None
+
+    def get(self, path: Path, leads: List[Dict[str, Any]]) -> LeadIndex:
+        """The index for `leads`, just loaded from `path`; rebuilt if the file changed."""
+        if (
+            self._index is None
+            or path != self._path
+            or file_signature(path) != self._signature
+            or self._index.size != len(leads)
+        ):
+            self._index = LeadIndex(leads)
+            self._path = path
+        return self._index
+
+    def saved(self, path: Path) -> None:
+        """Record that this process just wrote `path` with the index's contents."""
+        self._path = path
+        self._signature = file_signature(path)
+
+
+def _find(parents: List[int], item: int) -> int:
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def _union(parents: List[int], companies: List[Optional[str]], a: int, b: int) -> None:
+    """Join two groups unless they name different companies."""
+    a, b = _find(parents, a), _find(parents, b)
+    if a == b:
+        return
+    if companies[a] is not None and companies[b] is not None and companies[a] != companies[b]:
+        return
+    # The earlier position stays the root, and keeps the group's company
+    root, child = min(a, b), max(a, b)
+    parents[child] = root
+    companies[root] = companies[root] or companies[child]
+
+
+@dataclass
+class DedupResult:
+    """Outcome of a bulk deduplication pass."""
+    leads: List[Dict[str, Any]]
+    # Surviving lead ID -> IDs merged into it
+    merged: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def dedupe_leads(leads: List[Dict[str, Any]]) -> DedupResult:
+    """
+    Merge duplicate leads in bulk.
+
+    Leads are blocked by contact key. Within a block, leads naming the
+    same company are joined, and leads naming none join the block's
+    company if it has exactly one. Groups joined through different blocks
+    never end up naming two companies: each group keeps its company, and a
+    join that would combine two is skipped. Joined leads are merged oldest
+    first into the earliest, which keeps its position.
+    """
+    parents = list(range(len(leads)))
+    companies = [normalize_company(lead.get("company_name")) for lead in leads]
+    blocks: Dict[str, List[int]] = {}
+    for position, lead in enumerate(leads):
+        for key in contact_keys(lead):
+            blocks.setdefault(key, []).append(position)
+
+    for positions in blocks.values():
+        if len(positions) < 2:
+            continue
+        by_company: Dict[Optional[str], List[int]] = {}
+        for position in positions:
+            by_company.setdefault(companies[position], []).append(position)
+        named = [company for company in by_company if company is not None]
+        if len(named) == 1 and None in by_company:
+            by_company[named[0]] += by_company.pop(None)
+        for group in by_company.values():
+            for position in group[1:]:
+                _union(parents, companies, group[0], position)
+
+    groups: Dict[int, List[int]] = {}
+    for position in range(len(leads)):
+        groups.setdefault(_find(parents, position), []).append(position)
+
+    result = DedupResult(leads=[])
+    changed = []
+    for root in sorted(groups):
+        members = sorted(groups[root], key=lambda p: (str(leads[p].get("created_at") or ""), p))
+        merged = leads[members[0]]
+        for position in members[1:]:
+            merged = merge_leads(merged, leads[position])
+        if len(members) > 1:
+            result.merged[str(merged.get("id"))] = [str(leads[p].get("id")) for p in members[1:]]
+            changed.append(merged)
+        result.leads.append(merged)
+    rescore(changed)
+    return result
@@ -0,0 +1,248 @@
+"""
+Reference IDs for appointments, leads and callbacks.
+
+An ID is 60 bits: milliseconds since 2026-01-01 UTC (40 bits, good until
+2060), a worker ID (8 bits) and a per-millisecond sequence (12 bits). It
+is written as 12 Crockford base32 characters in groups of four, after
+the record's prefix:
+
+    APT-01JC-7M2K-0G03
+
+Crockford base32 has no I, L, O or U, so a reference read out over the
+phone can't be mistaken for a similar-sounding one. `parse_id` also
+accepts lowercase and the usual misreadings (O for 0, I or L for 1).
+Because the time comes first and the digits sort in ASCII order, IDs of
+the same prefix sort by creation time as plain strings.
+
+Each process claims its own worker ID, so IDs from concurrent tool
+servers never collide. Within a process, `IdGenerator.next` takes a
+lock only when the millisecond changes. IDs made within the same
+millisecond draw from an `itertools.count`, and in CPython `next()` on
+a count is atomic.
+"""
+
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Start of the ID clock (2026-01-01T00:00:00Z), in Unix milliseconds
+EPOCH_MS = 1_767_225_600_000
+
+TIME_BITS = 40
+WORKER_BITS = 8
+SEQUENCE_BITS = 12
+MAX_WORKERS = 1 << WORKER_BITS
+SEQUENCE_LIMIT = 1 << SEQUENCE_BITS
+
+# Fixes a process's worker ID, e.g. to keep hosts sharing a data store apart
+WORKER_ID_ENV = "AGENT_WORKER_ID"
+# Where processes on one host claim worker IDs
+WORKER_LOCK_DIR = Path(
+    os.getenv("AGENT_WORKER_LOCK_DIR", Path(tempfile.gettempdir()) / "arval-ids")
+)
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = (TIME_BITS + WORKER_BITS + SEQUENCE_BITS) // 5
+
+# Every pair of digits, so encoding takes one lookup per 10 bits
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+_DECODE.update({"O": 0, "I": 1, "L": 1})
+
+
+@dataclass(frozen=True)
+class ParsedId:
+    """The parts of a reference ID."""
+    prefix: str
+    created_at: datetime
+    worker_id: int
+    sequence: int
+
+
+def encode(value: int) -> str:
+    """Write a 60-bit ID value as grouped Crockford base32."""
+    pairs = _PAIRS
+    return (
+        f"{pairs[value >> 50 & 1023]}{pairs[value >> 40 & 1023]}-"
+        f"{pairs[value >> 30 & 1023]}{pairs[value >> 20 & 1023]}-"
+        f"{pairs[value >> 10 & 1023]}{pairs[value & 1023]}"
+    )
+
+
+def decode(digits: str) -> int:
+    """
+    Read grouped or ungrouped Crockford base32 back into an ID value.
+
+    Raises:
+        ValueError: If it isn't a whole ID
+    """
+    digits = digits.replace("-", "").replace(" ", "").upper()
+    if len(digits) != ID_LENGTH:
+        raise ValueError(f"Expected {ID_LENGTH} characters, got {len(digits)}")
+    value = 0
+    for char in digits:
+        try:
+            value = value * 32 + _DECODE[char]
+        except KeyError:
+            raise ValueError(f"Invalid character in ID: {char!r}") from None
+    return value
+
+
+def parse_id(reference: str) -> ParsedId:
+    """
+    Split a reference such as "APT-01JC-7M2K-0G03" into its parts.
+
+    Raises:
+        ValueError: If the reference isn't in the ID format
+    """
+    prefix, _, digits = reference.strip().partition("-")
+    value = decode(digits)
+    millis = (value >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return ParsedId(
+        prefix=prefix.upper(),
+        created_at=datetime.fromtimestamp(millis / 1000, tz=timezone.utc),
+        worker_id=(value >> SEQUENCE_BITS) & (MAX_WORKERS - 1),
+        sequence=value & (SEQUENCE_LIMIT - 1),
+    )
+
+
+def _clock_ms() -> int:
+    return time.time_ns() // 1_000_000 - EPOCH_MS
+
+
+class _Window:
+    """One millisecond's sequence numbers."""
+    __slots__ = ("millis", "sequence")
+
+    def __init__(self, millis: int):
+        self.millis = millis
+        self.sequence = itertools.count()
+
+
+class IdGenerator:
+    """Monotonic, unique IDs for one worker."""
+
+    def __init__(self, worker_id: int, clock: Callable[[], int] = _clock_ms):
+        """
+        Args:
+            worker_id: This process's worker ID, below MAX_WORKERS
+            clock: Milliseconds since EPOCH_MS
+        """
+        if not 0 <= worker_id < MAX_WORKERS:
+            raise ValueError(f"Worker ID must be in [0, {MAX_WORKERS}), got {worker_id}")
+        self.worker_id = worker_id
+        self._clock = clock
+        self._window = _Window(-1)
+        self._lock = threading.Lock()
+
+    def next_value(self) -> int:
+        """The next ID value, greater than any this generator returned before."""
+        while True:
+            window = self._window
+            if self._clock() <= window.millis:
+                sequence = next(window.sequence)
+                if sequence < SEQUENCE_LIMIT:
+                    return (
+                        window.millis << (WORKER_BITS + SEQUENCE_BITS)
+                        | self.worker_id << SEQUENCE_BITS
+                        | sequence
+                    )
+            self._advance(window)
+
+    def _advance(self, window: _Window) -> None:
+        """Open the next millisecond, unless another thread already has."""
+        with self._lock:
+            if self._window is window:
+                # Never step back, even if the wall clock does
+                self._window = _Window(max(self._clock(), window.millis + 1))
+
+    def next(self, prefix: str) -> str:
+        """The next reference ID with a prefix, e.g. "APT"."""
+        return f"{prefix}-{encode(self.next_value())}"
+
+    def iter_values(self) -> Iterator[int]:
+        """Unbounded ID values, for bulk allocation."""
+        while True:
+            yield self.next_value()
+
+
+_worker_lock_file = None
+
+
+def claim_worker_id(lock_dir: Optional[Path] = None) -> int:
+    """
+    Claim a worker ID no other live process on this host holds.
+
+    Uses AGENT_WORKER_ID if set. Otherwise takes an exclusive lock on a
+    file per worker ID in `lock_dir` (default WORKER_LOCK_DIR), held until
+    the process exits. Without file locks
+    (e.g. on Windows), or if every ID is taken, the process ID picks one.
+    """
+    global _worker_lock_file
+    configured = os.getenv(WORKER_ID_ENV)
+    if configured:
+        return int(configured)
+    try:
+        import fcntl
+    except ImportError:
+        return os.getpid() % MAX_WORKERS
+
+    if _worker_lock_file is not None:
+        _worker_lock_file.close()
+        _worker_lock_file = None
+    lock_dir = lock_dir or WORKER_LOCK_DIR
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    start = os.getpid() % MAX_WORKERS
+    for offset in range(MAX_WORKERS):
+        worker_id = (start + offset) % MAX_WORKERS
+        lock_file = open(lock_dir / f"worker-{worker_id}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _worker_lock_file = lock_file
+        return worker_id
+    logger.warning(f"All {MAX_WORKERS} worker IDs in {lock_dir} are taken; using the PID")
+    return start
+
+
+_generator: Optional[IdGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def _default_generator() -> IdGenerator:
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = IdGenerator(claim_worker_id())
+    return _generator
+
+
+def _reset_after_fork() -> None:
+    # A forked child shares its parent's worker ID (and file lock) until it claims its own
+    global _generator, _generator_lock, _worker_lock_file
+    _generator = None
+    _generator_lock = threading.Lock()
+    if _worker_lock_file is not None:
+        _worker_lock_file.close()
+        _worker_lock_file = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def new_id(prefix: str) -> str:
+    """A new reference ID, e.g. new_id("LEAD") -> "LEAD-01JC-7M2K-0G03"."""
+    return _default_generator().next(prefix)
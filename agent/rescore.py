@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Nightly maintenance of the lead book.
+
+Scores every stored lead in one batch with `models.scoring` and writes
+back those whose score or priority changed. This brings leads captured
+under older scoring rules, or edited since, in line with the current
+ones. Run it nightly, e.g. from cron:
+
+    0 2 * * * cd /app && python -m agent.rescore
+
+With `--dedupe`, duplicate leads (see `agent.dedup`) are merged first.
+`--dry-run` reports the merges without writing anything.
+
+Usage:
+    python -m agent.rescore [--data-dir data] [--dedupe [--dry-run]]
+"""
+
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+from models.scoring import score_records
+
+from . import tools
+from .dedup import DedupResult, dedupe_leads, file_signature
+
+logger = logging.getLogger(__name__)
+
+# Attempts before giving up when another process keeps writing the file
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class RescoreResult:
+    """Outcome of a rescoring run."""
+    scored: int = 0
+    changed: int = 0
+    by_priority: Dict[str, int] = field(default_factory=dict)
+
+
+def rescore_leads(file_path: Path = tools.LEADS_FILE) -> RescoreResult:
+    """
+    Rescore every lead in a lead file.
+
+    The tool server may append leads from another process while this runs,
+    so the file is only replaced if it is unchanged since it was read;
+    otherwise the run starts over.
+
+    Args:
+        file_path: Lead file to rescore in place
+
+    Returns:
+        How many leads were scored and changed, and the resulting priorities
+
+    Raises:
+        RuntimeError: If the file kept changing underneath every attempt
+    """
+    for _ in range(MAX_ATTEMPTS):
+        with tools._DATA_LOCK:
+            signature = file_signature(file_path)
+            leads = [lead for lead in tools._load_json(file_path) if isinstance(lead, dict)]
+            scores, priorities = score_records(leads)
+
+            result = RescoreResult(scored=len(leads), by_priority=dict(Counter(priorities)))
+            for lead, score, priority in zip(leads, scores.tolist(), priorities):
+                if lead.get("score") != score or lead.get("priority") != priority:
+                    lead["score"] = score
+                    lead["priority"] = priority
+                    result.changed += 1
+
+            if not result.changed:
+                return result
+            if file_signature(file_path) == signature:
+                tools._save_json(file_path, leads)
+                return result
+        logger.info(f"{file_path} changed while rescoring; retrying")
+    raise RuntimeError(f"{file_path} kept changing; rescoring abandoned")
+
+
+def dedupe_lead_file(file_path: Path = tools.LEADS_FILE, dry_run: bool = False) -> DedupResult:
+    """
+    Merge duplicate leads in a lead file.
+
+    Like `rescore_leads`, the file is only replaced if it is unchanged
+    since it was read.
+
+    Args:
+        file_path: Lead file to deduplicate in place
+        dry_run: Work out the merges without writing them
+
+    Returns:
+        The deduplicated leads and which lead IDs were merged into which
+
+    Raises:
+        RuntimeError: If the file kept changing underneath every attempt
+    """
+    for _ in range(MAX_ATTEMPTS):
+        with tools._DATA_LOCK:
+            signature = file_signature(file_path)
+            leads = [lead for lead in tools._load_json(file_path) if isinstance(lead, dict)]
+            result = dedupe_leads(leads)
+            if dry_run or not result.merged:
+                return result
+            if file_signature(file_path) == signature:
+                tools._save_json(file_path, result.leads)
+                return result
+        logger.info(f"{file_path} changed while deduplicating; retrying")
+    raise RuntimeError(f"{file_path} kept changing; deduplication abandoned")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rescore every stored lead")
+    parser.add_argument("--data-dir", help="Agent data directory (default: the tools' data dir)")
+    parser.add_argument("--dedupe", action="store_true", help="Merge duplicate leads first")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="With --dedupe, only report what would merge"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    path = Path(args.data_dir) / tools.LEADS_FILE.name if args.data_dir else tools.LEADS_FILE
+    if args.dedupe:
+        deduped = dedupe_lead_file(path, dry_run=args.dry_run)
+        merged = sum(len(ids) for ids in deduped.merged.values())
+        verb = "Would merge" if args.dry_run else "Merged"
+        print(f"{verb} {merged} duplicate leads into {len(deduped.merged)} in {path}")
+        for survivor, ids in deduped.merged.items():
+            print(f"  {survivor} <- {', '.join(ids)}")
+        if args.dry_run:
+            raise SystemExit(0)
+    outcome = rescore_leads(path)
+    priorities = ", ".join(
+        f"{name}: {count}" for name, count in sorted(outcome.by_priority.items())
+    )
+    print(f"Rescored {outcome.scored} leads in {path}; {outcome.changed} changed ({priorities})")
@@ -0,0 +1,263 @@
+"""
+Appointment slot capacity for the agent's bookings.
+
+Every bookable day has three slots (`TimeSlot`), and each appointment
+type has a limit per slot. `SlotIndex` counts the active bookings in each
+(day, slot, type) and also keeps, per type, a bitset with one bit per slot
+over a fixed horizon. A bit is set when the slot is closed (weekends and
+bank holidays, from `agent.business_days`) or full. Finding the next free
+slots is then a few big-integer operations: mask, shift to the start
+date, then read off the lowest clear bits. It doesn't walk the calendar.
+
+The index is built from the stored appointments and updated as
+`book_appointment` reserves slots; `reserve` and `release` are atomic.
+"""
+
+import json
+import os
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from models.appointment import AppointmentStatus, AppointmentType, TimeSlot
+
+from .business_days import BusinessCalendar, default_calendar
+
+# Bookings allowed per slot and appointment type, unless configured per type
+DEFAULT_SLOT_CAPACITY = int(os.getenv("APPOINTMENT_SLOT_CAPACITY", "4"))
+# Days from the index's origin that can be searched for free slots
+HORIZON_DAYS = int(os.getenv("APPOINTMENT_HORIZON_DAYS", "731"))
+
+SLOTS: Tuple[TimeSlot, ...] = tuple(TimeSlot)
+SLOTS_PER_DAY = len(SLOTS)
+# Hours each slot starts and ends, UK time
+SLOT_START_HOURS = {TimeSlot.MORNING: 9, TimeSlot.AFTERNOON: 12, TimeSlot.LATE_AFTERNOON: 15}
+SLOT_END_HOURS = {TimeSlot.MORNING: 12, TimeSlot.AFTERNOON: 15, TimeSlot.LATE_AFTERNOON: 17}
+
+# Statuses that hold a slot
+ACTIVE_STATUSES = frozenset({
+    AppointmentStatus.PENDING.value,
+    AppointmentStatus.CONFIRMED.value,
+    AppointmentStatus.RESCHEDULED.value,
+})
+
+_SLOT_POSITIONS = {slot: position for position, slot in enumerate(SLOTS)}
+
+Capacity = Union[int, Sequence[int]]
+
+
+def parse_capacities(text: Optional[str]) -> Dict[AppointmentType, Capacity]:
+    """
+    Per-type slot limits from JSON, e.g. '{"MOT": 2, "Service": [3, 4, 2]}'.
+
+    A number limits every slot of that type; a list gives one limit per
+    slot, in `TimeSlot` order. Types left out use DEFAULT_SLOT_CAPACITY.
+
+    Raises:
+        ValueError: If the JSON, a type name or a limit is invalid
+    """
+    if not text or not text.strip():
+        return {}
+    config = json.loads(text)
+    if not isinstance(config, dict):
+        raise ValueError("Slot capacities must be a JSON object of type -> limit")
+    capacities: Dict[AppointmentType, Capacity] = {}
+    for name, limit in config.items():
+        appointment_type = AppointmentType(name)
+        if isinstance(limit, int) and not isinstance(limit, bool):
+            capacities[appointment_type] = limit
+        elif (
+            isinstance(limit, list)
+            and len(limit) == SLOTS_PER_DAY
+            and all(isinstance(value, int) and not isinstance(value, bool) for value in limit)
+        ):
+            capacities[appointment_type] = tuple(limit)
+        else:
+            raise ValueError(
+                f"{name} needs a number or {SLOTS_PER_DAY} per-slot numbers, got {limit!r}"
+            )
+    return capacities
+
+
+# Limits for particular types (and slots), over DEFAULT_SLOT_CAPACITY
+SLOT_CAPACITIES = parse_capacities(os.getenv("APPOINTMENT_SLOT_CAPACITIES"))
+
+
+def _repeat_daily(pattern: int, days: int) -> int:
+    """A per-day bit pattern repeated for every day of the horizon."""
+    # Multiplying by 0b001001...001 places a copy every SLOTS_PER_DAY bits
+    return pattern * (((1 << (SLOTS_PER_DAY * days)) - 1) // ((1 << SLOTS_PER_DAY) - 1))
+
+
+class SlotIndex:
+    """Booked and free appointment slots, by day, time slot and type."""
+
+    def __init__(
+        self,
+        origin: date,
+        days: int = HORIZON_DAYS,
+        capacity: Optional[Mapping[AppointmentType, Capacity]] = None,
+        default_capacity: int = DEFAULT_SLOT_CAPACITY,
+        calendar: Optional[BusinessCalendar] = None,
+    ):
+        """
+        Args:
+            origin: First day that can be searched for free slots
+            days: Number of days from `origin` that can be searched
+            capacity: Bookings allowed per slot for some types; either one
+                limit for every slot or one per slot, in `TimeSlot` order
+            default_capacity: Limit per slot for types not in `capacity`
+            calendar: Business days (default: the shared UK calendar)
+        """
+        self.origin = origin
+        self.days = days
+        self.calendar = calendar or default_calendar()
+        self._limits: Dict[AppointmentType, Tuple[int, ...]] = {}
+        for appointment_type in AppointmentType:
+            limit = (capacity or {}).get(appointment_type, default_capacity)
+            limits = (limit,) * SLOTS_PER_DAY if isinstance(limit, int) else tuple(limit)
+            if len(limits) != SLOTS_PER_DAY:
+                raise ValueError(f"{appointment_type.value} needs {SLOTS_PER_DAY} slot limits")
+            self._limits[appointment_type] = limits
+
+        self._counts: Dict[Tuple[int, int, AppointmentType], int] = {}
+        self._lock = threading.Lock()
+        self._horizon = (1 << (SLOTS_PER_DAY * days)) - 1
+        self._closed = self._closed_slots()
+        self._slot_masks = {
+            slot: _repeat_daily(1 << position, days) for slot, position in _SLOT_POSITIONS.items()
+        }
+        # Per type: slots closed or at capacity
+        self._unavailable: Dict[AppointmentType, int] = {}
+        for appointment_type, limits in self._limits.items():
+            zero = sum(1 << position for position, limit in enumerate(limits) if limit <= 0)
+            self._unavailable[appointment_type] = self._closed | _repeat_daily(zero, days)
+
+    def _closed_slots(self) -> int:
+        """Bits for every slot on a day the workshops are closed."""
+        closed = 0
+        day_bits = (1 << SLOTS_PER_DAY) - 1
+        for offset in range(self.days):
+            if not self._is_business_day(self.origin + timedelta(days=offset)):
+                closed |= day_bits << (offset * SLOTS_PER_DAY)
+        return closed
+
+    def _is_business_day(self, day: date) -> bool:
+        try:
+            return self.calendar.is_business_day(day)
+        except ValueError:
+            # Beyond the calendar's years only weekends are known to be closed
+            return day.weekday() < 5
+
+    @classmethod
+    def from_appointments(
+        cls, appointments: Iterable[Mapping[str, Any]], origin: date, **options: Any
+    ) -> "SlotIndex":
+        """Index stored appointments (as `book_appointment` writes them) that hold a slot."""
+        index = cls(origin, **options)
+        for appointment in appointments:
+            if appointment.get("status", AppointmentStatus.CONFIRMED.value) not in ACTIVE_STATUSES:
+                continue
+            try:
+                day = date.fromisoformat(appointment["date"])
+                slot = TimeSlot(appointment["time_slot"])
+                appointment_type = AppointmentType(appointment["type"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            index._add(day, slot, appointment_type, 1)
+        return index
+
+    def _bit(self, day: date, slot: TimeSlot) -> Optional[int]:
+        offset = day.toordinal() - self.origin.toordinal()
+        if not 0 <= offset < self.days:
+            return None
+        return offset * SLOTS_PER_DAY + _SLOT_POSITIONS[slot]
+
+    def _add(self, day: date, slot: TimeSlot, appointment_type: AppointmentType, delta: int) -> int:
+        key = (day.toordinal(), _SLOT_POSITIONS[slot], appointment_type)
+        count = max(self._counts.get(key, 0) + delta, 0)
+        self._counts[key] = count
+        bit = self._bit(day, slot)
+        if bit is not None:
+            if count >= self.limit(appointment_type, slot):
+                self._unavailable[appointment_type] |= 1 << bit
+            elif not self._closed >> bit & 1:
+                self._unavailable[appointment_type] &= ~(1 << bit)
+        return count
+
+    def limit(self, appointment_type: AppointmentType, slot: TimeSlot) -> int:
+        """Bookings allowed in one slot for an appointment type."""
+        return self._limits[appointment_type][_SLOT_POSITIONS[slot]]
+
+    def booked(self, day: date, slot: TimeSlot, appointment_type: AppointmentType) -> int:
+        """Active bookings in a slot."""
+        return self._counts.get((day.toordinal(), _SLOT_POSITIONS[slot], appointment_type), 0)
+
+    def is_open(self, day: date, slot: TimeSlot) -> bool:
+        """Whether a slot is on a working day, regardless of bookings."""
+        bit = self._bit(day, slot)
+        if bit is None:
+            return self._is_business_day(day)
+        return not self._closed >> bit & 1
+
+    def is_available(self, day: date, slot: TimeSlot, appointment_type: AppointmentType) -> bool:
+        """Whether a slot is open and has room for another booking."""
+        return self.is_open(day, slot) and (
+            self.booked(day, slot, appointment_type) < self.limit(appointment_type, slot)
+        )
+
+    def reserve(self, day: date, slot: TimeSlot, appointment_type: AppointmentType) -> bool:
+        """Take a place in a slot if it has one; returns whether it did."""
+        with self._lock:
+            if not self.is_available(day, slot, appointment_type):
+                return False
+            self._add(day, slot, appointment_type, 1)
+            return True
+
+    def release(self, day: date, slot: TimeSlot, appointment_type: AppointmentType) -> None:
+        """Give back a place, e.g. when an appointment is cancelled or moved."""
+        with self._lock:
+            self._add(day, slot, appointment_type, -1)
+
+    def find_next_available(
+        self,
+        n: int,
+        appointment_type: AppointmentType,
+        from_date: date,
+        from_slot: Optional[TimeSlot] = None,
+        time_slot: Optional[TimeSlot] = None,
+    ) -> List[Tuple[date, TimeSlot]]:
+        """
+        The first `n` slots with room for an appointment type.
+
+        Args:
+            n: Most slots to return
+            appointment_type: Type of appointment to fit
+            from_date: Earliest day to consider
+            from_slot: Earliest slot on `from_date` (default: the first)
+            time_slot: Only consider this slot of each day
+
+        Returns:
+            (day, slot) pairs in time order; fewer than `n` if the horizon
+            runs out
+        """
+        start = (from_date.toordinal() - self.origin.toordinal()) * SLOTS_PER_DAY
+        if from_slot is not None:
+            start += _SLOT_POSITIONS[from_slot]
+        free = ~self._unavailable[appointment_type] & self._horizon
+        if time_slot is not None:
+            free &= self._slot_masks[time_slot]
+        if start > 0:
+            free >>= start
+        else:
+            start = 0
+
+        found = []
+        origin = self.origin.toordinal()
+        while free and len(found) < n:
+            lowest = free & -free
+            bit = start + lowest.bit_length() - 1
+            day, position = divmod(bit, SLOTS_PER_DAY)
+            found.append((date.fromordinal(origin + day), SLOTS[position]))
+            free ^= lowest
+        return found
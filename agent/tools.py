@@ -4,14 +4,20 @@ Function tools for appointment booking, lead capture, customer support,
 Calendly integration, call transfers, and SMS notifications.
 """
 
-import json
+import asyncio
 import os
+import threading
 import aiohttp
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Annotated, Optional
+from typing import Annotated, Optional, Tuple
 from zoneinfo import ZoneInfo
 
+from models import codec, scoring
+from models.appointment import AppointmentType, TimeSlot
+
+from . import business_days, dedup, ids, slots, workshops
+
 # UK timezone
 UK_TZ = ZoneInfo("Europe/London")
 
@@ -46,6 +52,18 @@ APPOINTMENTS_FILE = DATA_DIR / "appointments.json"
 LEADS_FILE = DATA_DIR / "leads.json"
 CALLBACKS_FILE = DATA_DIR / "callbacks.json"
 
+# Serializes load-append-save cycles; tools may run concurrently on a worker pool
+_DATA_LOCK = threading.Lock()
+
+# Contact index over the lead file, so repeat callers update their existing lead
+_lead_index = dedup.CachedLeadIndex()
+
+# Slot capacity and workshop bays over the appointments file, with the
+# file signature they were built from
+_slot_index: Optional[slots.SlotIndex] = None
+_workshop_schedule: Optional[workshops.WorkshopSchedule] = None
+_appointment_source = None
+
 
 def _ensure_data_dir():
     """Ensure the data directory exists."""
@@ -55,16 +73,103 @@ def _ensure_data_dir():
 def _load_json(file_path: Path) -> list:
     """Load JSON data from file."""
     if file_path.exists():
-        with open(file_path, "r") as f:
-            return json.load(f)
+        with open(file_path, "rb") as f:
+            return codec.loads(f.read())
     return []
 
 
 def _save_json(file_path: Path, data: list):
-    """Save JSON data to file."""
+    """Save JSON data to file, replacing it atomically so readers never see a partial write."""
     _ensure_data_dir()
-    with open(file_path, "w") as f:
-        json.dump(data, f, indent=2, default=str)
+    tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(codec.dumps(data, indent=True))
+    os.replace(tmp_path, file_path)
+
+
+def _append_json(file_path: Path, record: dict):
+    """Append a record to a JSON file without losing concurrent appends."""
+    with _DATA_LOCK:
+        records = _load_json(file_path)
+        records.append(record)
+        _save_json(file_path, records)
+
+
+def _appointment_indexes(
+    appointments: Optional[list] = None,
+) -> Tuple[slots.SlotIndex, workshops.WorkshopSchedule]:
+    """
+    The slot index and workshop schedule for the appointments file, rebuilt
+    if the file changed (e.g. another process booked) or the day rolled
+    over. Call with _DATA_LOCK held.
+    """
+    global _slot_index, _workshop_schedule, _appointment_source
+    today = datetime.now(UK_TZ).date()
+    source = (APPOINTMENTS_FILE, dedup.file_signature(APPOINTMENTS_FILE))
+    if _slot_index is None or _appointment_source != source or _slot_index.origin != today:
+        if appointments is None:
+            appointments = _load_json(APPOINTMENTS_FILE)
+        _slot_index = slots.SlotIndex.from_appointments(
+            appointments, origin=today, capacity=slots.SLOT_CAPACITIES
+        )
+        _workshop_schedule = workshops.WorkshopSchedule.from_appointments(appointments)
+        _appointment_source = source
+    return _slot_index, _workshop_schedule
+
+
+def _appointments_saved():
+    """Record that the appointments file now matches the indexes. Call with _DATA_LOCK held."""
+    global _appointment_source
+    _appointment_source = (APPOINTMENTS_FILE, dedup.file_signature(APPOINTMENTS_FILE))
+
+
+def _available_slots(
+    appointment_type: AppointmentType,
+    postcode: Optional[str],
+    start,
+    count: int,
+    from_slot: Optional[TimeSlot] = None,
+    time_slot: Optional[TimeSlot] = None,
+) -> list:
+    """
+    The next slots with space and, for workshop appointments with a
+    postcode, a bay free at a site within reach. Call with _DATA_LOCK held.
+    """
+    slot_index, schedule = _appointment_indexes()
+    if not postcode or appointment_type not in workshops.WORKSHOP_TYPES:
+        return slot_index.find_next_available(
+            count, appointment_type, start, from_slot=from_slot, time_slot=time_slot
+        )
+    # Candidates from the capacity index, checked against the bays in batches
+    options, seen = [], 0
+    while len(options) < count:
+        candidates = slot_index.find_next_available(
+            seen + count * 4, appointment_type, start, from_slot=from_slot, time_slot=time_slot
+        )
+        if len(candidates) <= seen:
+            break
+        for day, slot in candidates[seen:]:
+            if schedule.find(appointment_type, postcode, day, slot) is not None:
+                options.append((day, slot))
+                if len(options) == count:
+                    break
+        seen = len(candidates)
+    return options
+
+
+def _no_workshop_in_reach(appointment_type: str, postcode: str) -> str:
+    return (
+        f"Sorry, none of our workshops that carry out {appointment_type} appointments is "
+        f"within {workshops.MAX_TRAVEL_KM:.0f} km of {postcode.strip().upper()}, so I can't "
+        "book one for you. Would you like a callback from our service team to arrange it?"
+    )
+
+
+def _format_slots(options: list) -> str:
+    return "\n".join(
+        f"{number}. {day.strftime('%A %d %B %Y')} ({day.isoformat()}), {slot.value}"
+        for number, (day, slot) in enumerate(options, 1)
+    )
 
 
 def book_appointment(
@@ -76,6 +181,7 @@ def book_appointment(
     preferred_time: Annotated[str, "Preferred time slot: 'Morning (9-12)', 'Afternoon (12-3)', or 'Late Afternoon (3-5)'"],
     vehicle_registration: Annotated[Optional[str], "Vehicle registration number (if applicable)"] = None,
     additional_notes: Annotated[Optional[str], "Any additional notes or special requirements"] = None,
+    postcode: Annotated[Optional[str], "Customer's postcode, to book the nearest workshop for an MOT, Service or Inspection"] = None,
 ) -> str:
     """
     Book an appointment for a customer. Use this tool when a customer wants to schedule
@@ -95,16 +201,25 @@ def book_appointment(
         if appointment_date.date() < today:
             return "Cannot book appointments in the past. Please provide a future date."
         
-        # Check if date is a weekend
+        # Check the workshops are open that day
         if appointment_date.weekday() >= 5:
             return "We're closed on weekends. Please choose a Monday to Friday date."
+        holiday = business_days.default_calendar().holiday_name(appointment_date.date())
+        if holiday:
+            return f"We're closed on {holiday}. Please choose another Monday to Friday date."
             
     except ValueError:
         return "Invalid date format. Please use YYYY-MM-DD format (e.g., 2026-01-15)."
     
+    try:
+        time_slot = TimeSlot(preferred_time)
+    except ValueError:
+        return f"Invalid time slot. Please choose from: {', '.join(slot.value for slot in TimeSlot)}"
+    slot_type = AppointmentType(appointment_type)
+    
     # Create appointment record
     appointment = {
-        "id": f"APT-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "id": ids.new_id("APT"),
         "customer_name": customer_name,
         "contact_phone": contact_phone,
         "contact_email": contact_email,
@@ -117,18 +232,56 @@ def book_appointment(
         "created_at": datetime.now(UK_TZ).isoformat(),
     }
     
-    # Save appointment
-    appointments = _load_json(APPOINTMENTS_FILE)
-    appointments.append(appointment)
-    _save_json(APPOINTMENTS_FILE, appointments)
+    # Reserve a place in the slot (and a workshop bay near the customer) and
+    # save, or offer the next free slots
+    day = appointment_date.date()
+    with _DATA_LOCK:
+        appointments = _load_json(APPOINTMENTS_FILE)
+        slot_index, schedule = _appointment_indexes(appointments)
+        needs_bay = bool(postcode) and slot_type in workshops.WORKSHOP_TYPES
+        if needs_bay and not schedule.in_reach(slot_type, postcode):
+            return _no_workshop_in_reach(appointment_type, postcode)
+        booked = slot_index.reserve(day, time_slot, slot_type)
+        allocation = None
+        if booked and needs_bay:
+            allocation = schedule.allocate(slot_type, postcode, day, time_slot)
+            if allocation is None:
+                slot_index.release(day, time_slot, slot_type)
+                booked = False
+        if booked:
+            if allocation is not None:
+                appointment.update(allocation.to_record())
+            appointments.append(appointment)
+            try:
+                _save_json(APPOINTMENTS_FILE, appointments)
+            except Exception:
+                slot_index.release(day, time_slot, slot_type)
+                if allocation is not None:
+                    schedule.release(allocation)
+                raise
+            _appointments_saved()
+        else:
+            options = _available_slots(slot_type, postcode, day, 3)
+    
+    if not booked:
+        where = " at workshops near you" if needs_bay else ""
+        if not options:
+            return f"Sorry, {preferred_time} on {preferred_date} is fully booked{where} and there are no {appointment_type} slots free after it. Would you like a callback instead?"
+        return f"""Sorry, {preferred_time} on {preferred_date} is fully booked for {appointment_type} appointments{where}.
+
+**The next available slots are:**
+{_format_slots(options)}
+
+Would any of these suit you?"""
     
+    location = f"\n- Location: {workshops.describe(allocation)}" if allocation else ""
     return f"""✅ Appointment Successfully Booked!
 
 **Appointment Details:**
 - Reference: {appointment['id']}
 - Type: {appointment_type}
 - Date: {preferred_date}
-- Time: {preferred_time}
+- Time: {preferred_time}{location}
 - Customer: {customer_name}
 
 A confirmation email will be sent to {contact_email}.
@@ -137,6 +290,64 @@ If you need to reschedule, please call us or reference your booking ID: {appoint
 Is there anything else I can help you with?"""
 
 
+def find_next_available(
+    appointment_type: Annotated[str, "Type of appointment: 'MOT', 'Service', 'Inspection', 'Fleet Consultation', or 'Sales Demo'"],
+    from_date: Annotated[Optional[str], "Earliest date to offer in YYYY-MM-DD format (default: today)"] = None,
+    preferred_time: Annotated[Optional[str], "Only offer this time slot: 'Morning (9-12)', 'Afternoon (12-3)', or 'Late Afternoon (3-5)'"] = None,
+    count: Annotated[int, "How many options to offer"] = 3,
+    postcode: Annotated[Optional[str], "Customer's postcode, to only offer slots with a workshop bay nearby (MOT, Service, Inspection)"] = None,
+) -> str:
+    """
+    Find the next appointment slots with space. Use this to offer a customer real
+    options before booking, or when their preferred slot is full.
+    """
+    valid_types = ["MOT", "Service", "Inspection", "Fleet Consultation", "Sales Demo"]
+    if appointment_type not in valid_types:
+        return f"Invalid appointment type. Please choose from: {', '.join(valid_types)}"
+    try:
+        time_slot = TimeSlot(preferred_time) if preferred_time else None
+    except ValueError:
+        return f"Invalid time slot. Please choose from: {', '.join(slot.value for slot in TimeSlot)}"
+    
+    now = datetime.now(UK_TZ)
+    try:
+        start = datetime.strptime(from_date, "%Y-%m-%d").date() if from_date else now.date()
+    except ValueError:
+        return "Invalid date format. Please use YYYY-MM-DD format (e.g., 2026-01-15)."
+    
+    # Today's slots that have already started can't be offered
+    from_slot = None
+    if start <= now.date():
+        start = now.date()
+        later = [slot for slot in slots.SLOTS if slots.SLOT_START_HOURS[slot] > now.hour]
+        if later:
+            from_slot = later[0]
+        else:
+            start += timedelta(days=1)
+    
+    slot_type = AppointmentType(appointment_type)
+    with _DATA_LOCK:
+        _, schedule = _appointment_indexes()
+        if (
+            postcode
+            and slot_type in workshops.WORKSHOP_TYPES
+            and not schedule.in_reach(slot_type, postcode)
+        ):
+            return _no_workshop_in_reach(appointment_type, postcode)
+        options = _available_slots(
+            slot_type, postcode, start, max(1, min(count, 10)),
+            from_slot=from_slot, time_slot=time_slot,
+        )
+    
+    if not options:
+        return f"There are no {appointment_type} slots free in the booking window. Would you like a callback instead?"
+    
+    return f"""**Next available {appointment_type} slots:**
+{_format_slots(options)}
+
+Which of these would suit you best?"""
+
+
 def capture_lead(
     contact_name: Annotated[str, "Full name of the prospective customer"],
     contact_email: Annotated[str, "Email address for follow-up"],
@@ -157,7 +368,7 @@ def capture_lead(
     """
     # Create lead record
     lead = {
-        "id": f"LEAD-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "id": ids.new_id("LEAD"),
         "contact_name": contact_name,
         "contact_email": contact_email,
         "contact_phone": contact_phone,
@@ -166,6 +377,7 @@ def capture_lead(
         "projected_fleet_size": projected_fleet_size,
         "current_provider": current_provider,
         "vehicle_interests": vehicle_interests,
+        "ev_interest": scoring.mentions_ev(vehicle_interests),
         "timeline": timeline,
         "budget_range": budget_range,
         "preferred_contact_method": preferred_contact_method,
@@ -175,26 +387,33 @@ def capture_lead(
         "created_at": datetime.now(UK_TZ).isoformat(),
     }
     
-    # Calculate lead score (simple scoring)
-    score = 0
-    if company_name:
-        score += 10
-    if current_fleet_size and current_fleet_size > 10:
-        score += 20
-    if projected_fleet_size and projected_fleet_size > 20:
-        score += 15
-    if timeline in ["Within 1 month", "1-3 months"]:
-        score += 25
-    if budget_range:
-        score += 10
-    
-    lead["score"] = score
-    lead["priority"] = "High" if score >= 50 else "Medium" if score >= 25 else "Standard"
-    
-    # Save lead
-    leads = _load_json(LEADS_FILE)
-    leads.append(lead)
-    _save_json(LEADS_FILE, leads)
+    # A repeat caller (same phone or email, no conflicting company) updates their
+    # existing lead; scored with the same rules as the nightly rescoring
+    with _DATA_LOCK:
+        leads = _load_json(LEADS_FILE)
+        index = _lead_index.get(LEADS_FILE, leads)
+        position = index.find(lead)
+        existing = position is not None
+        if existing:
+            lead = dedup.merge_leads(leads[position], lead)
+            leads[position] = lead
+        else:
+            position = len(leads)
+            leads.append(lead)
+        dedup.rescore([lead])
+        index.add(position, lead)
+        _save_json(LEADS_FILE, leads)
+        _lead_index.saved(LEADS_FILE)
+    
+    if existing:
+        return f"""✅ Thank you for getting back in touch with Arval!
+
+I've added these details to your existing enquiry, so the same fleet solutions team will pick it up.
+
+**Your Reference:** {lead['id']}
+**Preferred Contact:** {lead.get('preferred_contact_method') or preferred_contact_method}
+
+Our team typically responds within 1 business day. In the meantime, is there anything else I can help you with or any other questions about our services?"""
     
     return f"""✅ Thank you for your interest in Arval!
 
@@ -211,7 +430,15 @@ def get_business_hours() -> str:
     Get the current business hours for Arval Driver Desk.
     Use this when a customer asks about operating hours.
     """
-    return """**Arval Driver Desk Business Hours:**
+    today = datetime.now(UK_TZ).date()
+    upcoming = business_days.default_calendar().holidays_between(
+        today, today + timedelta(days=366)
+    )
+    next_holiday = ""
+    if upcoming:
+        day, name = next(iter(upcoming.items()))
+        next_holiday = f"\n**Next Bank Holiday:** {name}, {day.strftime('%A, %B %d, %Y')}\n"
+    return f"""**Arval Driver Desk Business Hours:**
 
 🕘 **Standard Hours:** Monday to Friday, 9:00 AM - 5:00 PM GMT
 
@@ -223,7 +450,7 @@ def get_business_hours() -> str:
 🚗 Emergency Roadside Assistance is available around the clock.
 
 **Location:** Swindon, Wiltshire, UK
-
+{next_holiday}
 **Note:** We're closed on weekends and UK bank holidays. For urgent matters outside business hours, please contact our 24/7 roadside assistance line."""
 
 
@@ -233,34 +460,35 @@ def check_after_hours() -> str:
     Use this tool to determine if the caller is reaching out during or outside business hours.
     """
     now = datetime.now(UK_TZ)
-    current_hour = now.hour
-    current_weekday = now.weekday()  # 0 = Monday, 6 = Sunday
+    calendar = business_days.default_calendar()
+    today = now.date()
+    reopens = calendar.next_open_after(now)
     
-    is_weekend = current_weekday >= 5
-    is_before_hours = current_hour < 9
-    is_after_hours = current_hour >= 17
-    
-    if is_weekend:
-        next_monday = now + timedelta(days=(7 - current_weekday))
+    if not calendar.is_business_day(today):
+        holiday = calendar.holiday_name(today)
+        closed_for = f"on {holiday}" if holiday else "during the weekend"
+        reopen_day = reopens.strftime('%A')
         return f"""🌙 **After Hours Notice**
 
-You're calling during the weekend. Our Driver Desk reopens on Monday at 9:00 AM GMT.
+You're calling {closed_for}. Our Driver Desk reopens on {reopen_day} at 9:00 AM GMT.
 
 **What I can help with now:**
 - Answer frequently asked questions
-- Capture your inquiry for priority callback on Monday
+- Capture your inquiry for priority callback on {reopen_day}
 - Provide 24/7 emergency roadside assistance contact
 
-**Next Business Day:** {next_monday.strftime('%A, %B %d, %Y')}
+**Next Business Day:** {reopens.strftime('%A, %B %d, %Y')}
 
-Would you like me to schedule a callback for Monday, or is this an emergency requiring roadside assistance?"""
+Would you like me to schedule a callback for {reopen_day}, or is this an emergency requiring roadside assistance?"""
     
-    elif is_before_hours or is_after_hours:
-        time_status = "before" if is_before_hours else "after"
-        next_open = "9:00 AM today" if is_before_hours else "9:00 AM tomorrow"
-        
-        if current_weekday == 4 and is_after_hours:  # Friday after hours
-            next_open = "9:00 AM on Monday"
+    elif not calendar.is_open(now):
+        time_status = "before" if now.time() < business_days.OPENING_TIME else "after"
+        if reopens.date() == today:
+            next_open = "9:00 AM today"
+        elif reopens.date() == today + timedelta(days=1):
+            next_open = "9:00 AM tomorrow"
+        else:
+            next_open = f"9:00 AM on {reopens.strftime('%A')}"
         
         return f"""🌙 **After Hours Notice**
 
@@ -328,19 +556,11 @@ def schedule_callback(
     """
     now = datetime.now(UK_TZ)
     
-    # Determine next business day if after hours
-    next_business_day = now
-    if now.weekday() >= 5:  # Weekend
-        days_until_monday = 7 - now.weekday()
-        next_business_day = now + timedelta(days=days_until_monday)
-    elif now.hour >= 17:  # After 5 PM
-        if now.weekday() == 4:  # Friday
-            next_business_day = now + timedelta(days=3)
-        else:
-            next_business_day = now + timedelta(days=1)
+    # Today if the desk is open or opens later today, else the next business day
+    next_business_day = business_days.default_calendar().next_open_after(now)
     
     callback = {
-        "id": f"CB-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "id": ids.new_id("CB"),
         "customer_name": customer_name,
         "contact_phone": contact_phone,
         "preferred_time": preferred_time,
@@ -352,9 +572,7 @@ def schedule_callback(
     }
     
     # Save callback request
-    callbacks = _load_json(CALLBACKS_FILE)
-    callbacks.append(callback)
-    _save_json(CALLBACKS_FILE, callbacks)
+    _append_json(CALLBACKS_FILE, callback)
     
     priority_text = "🔴 PRIORITY" if is_urgent else "📞"
     
@@ -671,7 +889,9 @@ Arval Driver Desk"""
         from twilio.rest import Client
         client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
         
-        message = client.messages.create(
+        # The Twilio client blocks on HTTP; keep it off the event loop
+        message = await asyncio.to_thread(
+            client.messages.create,
             body=message_body,
             from_=TWILIO_PHONE_NUMBER,
             to=phone_number
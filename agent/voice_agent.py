@@ -4,14 +4,18 @@ Core agent implementation using OpenAI SDK with function calling.
 """
 
 import os
+import asyncio
+import inspect
 import json
 import logging
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from openai import AsyncOpenAI
 
 from .tools import (
     book_appointment,
+    find_next_available,
     capture_lead,
     get_business_hours,
     check_after_hours,
@@ -23,8 +27,9 @@ from .tools import (
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
 def load_system_context() -> str:
-    """Load the system context from the markdown file."""
+    """Load the system context from the markdown file (read once per process)."""
     context_path = Path(__file__).parent.parent / "SYSTEM_CONTEXT.md"
     
     if context_path.exists():
@@ -82,12 +87,31 @@ TOOLS = [
                     "preferred_date": {"type": "string", "description": "Preferred date in YYYY-MM-DD format"},
                     "preferred_time": {"type": "string", "enum": ["Morning (9-12)", "Afternoon (12-3)", "Late Afternoon (3-5)"], "description": "Preferred time slot"},
                     "vehicle_registration": {"type": "string", "description": "Vehicle registration number (optional)"},
-                    "additional_notes": {"type": "string", "description": "Any additional notes (optional)"}
+                    "additional_notes": {"type": "string", "description": "Any additional notes (optional)"},
+                    "postcode": {"type": "string", "description": "Customer's postcode, to book the nearest workshop for an MOT, Service or Inspection (optional)"}
                 },
                 "required": ["customer_name", "contact_phone", "contact_email", "appointment_type", "preferred_date", "preferred_time"]
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_next_available",
+            "description": "Find the next appointment slots with space, to offer the customer real options before booking or when their preferred slot is full",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "appointment_type": {"type": "string", "enum": ["MOT", "Service", "Inspection", "Fleet Consultation", "Sales Demo"], "description": "Type of appointment"},
+                    "from_date": {"type": "string", "description": "Earliest date to offer in YYYY-MM-DD format (optional, default today)"},
+                    "preferred_time": {"type": "string", "enum": ["Morning (9-12)", "Afternoon (12-3)", "Late Afternoon (3-5)"], "description": "Only offer this time slot (optional)"},
+                    "count": {"type": "integer", "description": "How many options to offer (default 3)"},
+                    "postcode": {"type": "string", "description": "Customer's postcode, to only offer slots with a workshop bay nearby (optional)"}
+                },
+                "required": ["appointment_type"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -174,6 +198,7 @@ TOOLS = [
 # Map function names to actual functions
 FUNCTION_MAP = {
     "book_appointment": book_appointment,
+    "find_next_available": find_next_available,
     "capture_lead": capture_lead,
     "get_business_hours": get_business_hours,
     "check_after_hours": check_after_hours,
@@ -183,27 +208,39 @@ FUNCTION_MAP = {
 }
 
 
+def create_openrouter_client(api_key: str) -> AsyncOpenAI:
+    """Create an OpenRouter client; its connection pool can be shared by many agents."""
+    return AsyncOpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key,
+        default_headers={
+            "HTTP-Referer": "https://arval.co.uk",
+            "X-Title": "Arval Voice Agent"
+        }
+    )
+
+
 class ArvalVoiceAgent:
     """Voice agent for Arval BNP Paribas customer service."""
     
-    def __init__(self, api_key: str, model_id: str = "openai/gpt-4o-mini"):
+    def __init__(
+        self,
+        api_key: str,
+        model_id: str = "openai/gpt-4o-mini",
+        client: Optional[AsyncOpenAI] = None,
+    ):
         """
         Initialize the Arval Voice Agent.
         
         Args:
             api_key: OpenRouter API key for model access
             model_id: The model ID to use (default: openai/gpt-4o-mini)
+            client: Existing OpenRouter client to share, e.g. between the
+                sessions of a server (one is created if omitted)
         """
         self.api_key = api_key
         self.model_id = model_id
-        self.client = AsyncOpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-            default_headers={
-                "HTTP-Referer": "https://arval.co.uk",
-                "X-Title": "Arval Voice Agent"
-            }
-        )
+        self.client = client or create_openrouter_client(api_key)
         self.conversation_history = []
         self.system_context = load_system_context()
         
@@ -223,8 +260,10 @@ class ArvalVoiceAgent:
         
         try:
             func = FUNCTION_MAP[function_name]
-            result = func(**arguments)
-            return result
+            if inspect.iscoroutinefunction(func):
+                return await func(**arguments)
+            # Tools write to disk; keep them off the event loop other sessions share
+            return await asyncio.to_thread(func, **arguments)
         except Exception as e:
             logger.error(f"Error executing function {function_name}: {e}")
             return f"Error executing {function_name}: {str(e)}"
@@ -262,36 +301,17 @@ class ArvalVoiceAgent:
             
             # Handle tool calls if any
             if assistant_message.tool_calls:
-                # Add assistant message with tool calls to history
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": assistant_message.content,
-                    "tool_calls": [
-                        {
-                            "id": tc.id,
-                            "type": "function",
-                            "function": {
-                                "name": tc.function.name,
-                                "arguments": tc.function.arguments
-                            }
+                await self._run_tool_calls(assistant_message.content, [
+                    {
+                        "id": tc.id,
+                        "type": "function",
+                        "function": {
+                            "name": tc.function.name,
+                            "arguments": tc.function.arguments
                         }
-                        for tc in assistant_message.tool_calls
-                    ]
-                })
-                
-                # Execute each tool call
-                for tool_call in assistant_message.tool_calls:
-                    function_name = tool_call.function.name
-                    arguments = json.loads(tool_call.function.arguments)
-                    
-                    result = await self._execute_function(function_name, arguments)
-                    
-                    # Add tool result to history
-                    self.conversation_history.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": result
-                    })
+                    }
+                    for tc in assistant_message.tool_calls
+                ])
                 
                 # Get final response after tool execution
                 messages = [self._get_system_message()] + self.conversation_history
@@ -320,6 +340,109 @@ class ArvalVoiceAgent:
             logger.error(f"Error processing message: {e}")
             return f"I apologize, but I'm experiencing a technical issue. Please try again or call our Driver Desk directly."
     
+    async def _run_tool_calls(self, content: Optional[str], tool_calls: List[Dict[str, Any]]):
+        """Record the model's tool calls, execute them and record their results."""
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": content,
+            "tool_calls": tool_calls
+        })
+        
+        for tool_call in tool_calls:
+            function_name = tool_call["function"]["name"]
+            arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+            
+            result = await self._execute_function(function_name, arguments)
+            
+            self.conversation_history.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": result if isinstance(result, str) else json.dumps(result)
+            })
+    
+    async def stream_message(self, user_input: str) -> AsyncIterator[str]:
+        """
+        Process a user message, yielding the response text as the model produces it.
+        
+        Behaves like `process_message`, but text is yielded as it streams in
+        so speech synthesis can start on the first words. If the model calls
+        tools, they run before the follow-up response is streamed.
+        
+        Args:
+            user_input: The user's message
+            
+        Yields:
+            Fragments of the agent's response text
+        """
+        self.conversation_history.append({
+            "role": "user",
+            "content": user_input
+        })
+        
+        try:
+            messages = [self._get_system_message()] + self.conversation_history
+            stream = await self.client.chat.completions.create(
+                model=self.model_id,
+                messages=messages,
+                tools=TOOLS,
+                tool_choice="auto",
+                max_tokens=2048,
+                stream=True,
+            )
+            
+            content_parts = []
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield delta.content
+                # Tool calls arrive in fragments keyed by their index
+                for tc in delta.tool_calls or []:
+                    call = tool_calls.setdefault(tc.index, {
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""}
+                    })
+                    if tc.id:
+                        call["id"] = tc.id
+                    if tc.function and tc.function.name:
+                        call["function"]["name"] += tc.function.name
+                    if tc.function and tc.function.arguments:
+                        call["function"]["arguments"] += tc.function.arguments
+            
+            content = "".join(content_parts)
+            if tool_calls:
+                await self._run_tool_calls(
+                    content or None,
+                    [tool_calls[index] for index in sorted(tool_calls)],
+                )
+                
+                messages = [self._get_system_message()] + self.conversation_history
+                stream = await self.client.chat.completions.create(
+                    model=self.model_id,
+                    messages=messages,
+                    max_tokens=2048,
+                    stream=True,
+                )
+                content_parts = []
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content_parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                content = "".join(content_parts)
+            
+            self.conversation_history.append({
+                "role": "assistant",
+                "content": content
+            })
+            
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            yield "I apologize, but I'm experiencing a technical issue. Please try again or call our Driver Desk directly."
+    
     async def run_conversation(self):
         """Run an interactive conversation loop."""
         # Initial greeting
@@ -0,0 +1,365 @@
+"""
+Workshop bay allocation for MOT, Service and Inspection appointments.
+
+Each site (Swindon, Solihull, Manchester; see `get_office_locations`) has
+a number of bays and its own job durations. A bay holds one vehicle at a
+time, so its bookings are disjoint intervals. `BayCalendar` keeps them as
+sorted start and end arrays: finding the first gap that fits a job is a
+binary search followed by a short scan, whether a bay holds a week of
+bookings or a year.
+
+`WorkshopSchedule.find` picks a site and bay for a caller's postcode and
+preferred `TimeSlot`:
+
+- sites are ranked by distance from the caller's postcode area
+- a site with no bay free in the slot overflows to the next nearest
+  (within MAX_TRAVEL_KM)
+- between sites that both have room, the cost is distance plus a penalty
+  for how busy each site already is that day, so bookings even out across
+  nearby sites instead of filling the closest one first
+"""
+
+import math
+import os
+import re
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from models.appointment import AppointmentType, TimeSlot
+
+from .business_days import BusinessCalendar, default_calendar
+from .slots import ACTIVE_STATUSES, SLOT_END_HOURS, SLOT_START_HOURS
+
+# Furthest a caller is offered a workshop, by straight-line distance
+MAX_TRAVEL_KM = float(os.getenv("WORKSHOP_MAX_TRAVEL_KM", "150"))
+# Extra distance a fully booked day counts as when choosing between sites
+LOAD_PENALTY_KM = float(os.getenv("WORKSHOP_LOAD_PENALTY_KM", "40"))
+
+# Workshop day, in minutes after midnight
+OPENING_MINUTE = 9 * 60
+CLOSING_MINUTE = 17 * 60
+MINUTES_PER_DAY = 24 * 60
+
+# Approximate centre of each UK postcode area (latitude, longitude)
+POSTCODE_AREAS: Dict[str, Tuple[float, float]] = {
+    "AB": (57.15, -2.11), "AL": (51.75, -0.34), "B": (52.48, -1.89), "BA": (51.38, -2.36),
+    "BB": (53.75, -2.48), "BD": (53.79, -1.75), "BH": (50.72, -1.88), "BL": (53.58, -2.43),
+    "BN": (50.82, -0.14), "BR": (51.40, 0.02), "BS": (51.45, -2.59), "BT": (54.60, -5.93),
+    "CA": (54.89, -2.93), "CB": (52.21, 0.12), "CF": (51.48, -3.18), "CH": (53.19, -2.89),
+    "CM": (51.74, 0.47), "CO": (51.89, 0.90), "CR": (51.37, -0.10), "CT": (51.28, 1.08),
+    "CV": (52.41, -1.51), "CW": (53.10, -2.44), "DA": (51.45, 0.21), "DD": (56.46, -2.97),
+    "DE": (52.92, -1.48), "DG": (55.07, -3.61), "DH": (54.78, -1.57), "DL": (54.52, -1.55),
+    "DN": (53.52, -1.13), "DT": (50.71, -2.44), "DY": (52.51, -2.09), "E": (51.53, -0.03),
+    "EC": (51.52, -0.09), "EH": (55.95, -3.19), "EN": (51.65, -0.08), "EX": (50.72, -3.53),
+    "FK": (56.00, -3.78), "FY": (53.82, -3.05), "G": (55.86, -4.25), "GL": (51.86, -2.24),
+    "GU": (51.24, -0.57), "GY": (49.45, -2.54), "HA": (51.58, -0.34), "HD": (53.65, -1.78),
+    "HG": (53.99, -1.54), "HP": (51.75, -0.47), "HR": (52.06, -2.72), "HS": (58.21, -6.39),
+    "HU": (53.74, -0.33), "HX": (53.72, -1.86), "IG": (51.56, 0.07), "IM": (54.15, -4.48),
+    "IP": (52.06, 1.16), "IV": (57.48, -4.22), "JE": (49.21, -2.13), "KA": (55.61, -4.50),
+    "KT": (51.41, -0.30), "KW": (58.98, -2.96), "KY": (56.11, -3.16), "L": (53.41, -2.98),
+    "LA": (54.05, -2.80), "LD": (52.24, -3.38), "LE": (52.64, -1.13), "LL": (53.32, -3.83),
+    "LN": (53.23, -0.54), "LS": (53.80, -1.55), "LU": (51.88, -0.42), "M": (53.48, -2.24),
+    "ME": (51.39, 0.50), "MK": (52.04, -0.76), "ML": (55.79, -3.99), "N": (51.57, -0.11),
+    "NE": (54.98, -1.61), "NG": (52.95, -1.15), "NN": (52.24, -0.90), "NP": (51.59, -2.99),
+    "NR": (52.63, 1.30), "NW": (51.55, -0.19), "OL": (53.54, -2.12), "OX": (51.75, -1.26),
+    "PA": (55.85, -4.42), "PE": (52.57, -0.24), "PH": (56.40, -3.43), "PL": (50.38, -4.14),
+    "PO": (50.82, -1.09), "PR": (53.76, -2.70), "RG": (51.45, -0.97), "RH": (51.24, -0.17),
+    "RM": (51.58, 0.18), "S": (53.38, -1.47), "SA": (51.62, -3.94), "SE": (51.47, -0.06),
+    "SG": (51.90, -0.20), "SK": (53.41, -2.16), "SL": (51.51, -0.59), "SM": (51.36, -0.19),
+    "SN": (51.56, -1.78), "SO": (50.90, -1.40), "SP": (51.07, -1.79), "SR": (54.91, -1.38),
+    "SS": (51.54, 0.71), "ST": (53.00, -2.18), "SW": (51.46, -0.17), "SY": (52.71, -2.75),
+    "TA": (51.02, -3.10), "TD": (55.61, -2.81), "TF": (52.68, -2.45), "TN": (51.20, 0.27),
+    "TQ": (50.46, -3.53), "TR": (50.26, -5.05), "TS": (54.57, -1.23), "TW": (51.45, -0.34),
+    "UB": (51.53, -0.42), "W": (51.51, -0.20), "WA": (53.39, -2.59), "WC": (51.52, -0.12),
+    "WD": (51.66, -0.40), "WF": (53.68, -1.50), "WN": (53.55, -2.63), "WR": (52.19, -2.22),
+    "WS": (52.59, -1.98), "WV": (52.59, -2.13), "YO": (53.96, -1.08), "ZE": (60.15, -1.15),
+}
+
+_POSTCODE_AREA = re.compile(r"^\s*([A-Za-z]{1,2})\d")
+
+
+@dataclass(frozen=True)
+class Site:
+    """A workshop site and what it can take."""
+    key: str
+    name: str
+    postcode: str
+    location: Tuple[float, float]
+    bays: int
+    # Minutes each appointment type occupies a bay
+    durations: Mapping[AppointmentType, int]
+
+
+SITES: Tuple[Site, ...] = (
+    Site("swindon", "Swindon Headquarters", "SN5 6PE", (51.57, -1.84), bays=6, durations={
+        AppointmentType.MOT: 45, AppointmentType.SERVICE: 90, AppointmentType.INSPECTION: 30,
+    }),
+    Site("solihull", "Solihull Office", "B91 3QJ", (52.41, -1.78), bays=4, durations={
+        AppointmentType.MOT: 60, AppointmentType.SERVICE: 120, AppointmentType.INSPECTION: 45,
+    }),
+    Site("manchester", "Manchester Office", "M17 1FQ", (53.47, -2.32), bays=5, durations={
+        AppointmentType.MOT: 60, AppointmentType.SERVICE: 105, AppointmentType.INSPECTION: 45,
+    }),
+)
+
+# Appointment types that need a workshop bay
+WORKSHOP_TYPES = frozenset(
+    appointment_type for site in SITES for appointment_type in site.durations
+)
+
+
+def postcode_area(postcode: Optional[str]) -> Optional[str]:
+    """The area letters of a UK postcode ("sn5 6pe" -> "SN"), if it is a known area."""
+    match = _POSTCODE_AREA.match(postcode or "")
+    area = match.group(1).upper() if match else None
+    return area if area in POSTCODE_AREAS else None
+
+
+def distance_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Great-circle distance between two (latitude, longitude) points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * 6371 * math.asin(math.sqrt(h))
+
+
+def _minute(day: date, minute_of_day: int) -> int:
+    """An absolute minute: days since 0001-01-01 plus the time of day."""
+    return day.toordinal() * MINUTES_PER_DAY + minute_of_day
+
+
+class BayCalendar:
+    """One bay's bookings, as sorted disjoint [start, end) minute intervals."""
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def first_fit(self, earliest: int, latest: int, duration: int) -> Optional[int]:
+        """The earliest start in [earliest, latest] where `duration` minutes are free."""
+        starts, ends = self.starts, self.ends
+        # Skip bookings that end before the window opens
+        i = bisect_right(ends, earliest)
+        start = earliest
+        while i < len(starts) and starts[i] < start + duration:
+            start = max(start, ends[i])
+            if start > latest:
+                return None
+            i += 1
+        return start if start <= latest else None
+
+    def add(self, start: int, end: int) -> None:
+        """Book [start, end); the caller has checked it is free."""
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+    def remove(self, start: int) -> bool:
+        """Remove the booking starting at `start`; returns whether there was one."""
+        i = bisect_right(self.starts, start) - 1
+        if i < 0 or self.starts[i] != start:
+            return False
+        del self.starts[i]
+        del self.ends[i]
+        return True
+
+
+@dataclass(frozen=True)
+class Allocation:
+    """A bay booked (or bookable) for an appointment."""
+    site: Site
+    bay: int  # 1-based, as told to the customer
+    day: date
+    start_minute: int  # minutes after midnight
+    end_minute: int
+    distance_km: Optional[float] = None
+
+    @property
+    def start_time(self) -> str:
+        return f"{self.start_minute // 60:02d}:{self.start_minute % 60:02d}"
+
+    @property
+    def end_time(self) -> str:
+        return f"{self.end_minute // 60:02d}:{self.end_minute % 60:02d}"
+
+    def to_record(self) -> Dict[str, Any]:
+        """The fields `book_appointment` stores for the allocation."""
+        return {"site": self.site.key, "bay": self.bay,
+                "start_time": self.start_time, "end_time": self.end_time}
+
+
+class WorkshopSchedule:
+    """Bay occupancy across every site."""
+
+    def __init__(
+        self,
+        sites: Tuple[Site, ...] = SITES,
+        max_travel_km: float = MAX_TRAVEL_KM,
+        load_penalty_km: float = LOAD_PENALTY_KM,
+        calendar: Optional[BusinessCalendar] = None,
+    ):
+        """
+        Args:
+            sites: Workshop sites to book
+            max_travel_km: Furthest site to offer a caller with a known postcode
+            load_penalty_km: Distance a fully booked day adds when comparing sites
+            calendar: Days the workshops open (default: the shared UK calendar)
+        """
+        self.sites = sites
+        self.calendar = calendar or default_calendar()
+        self.max_travel_km = max_travel_km
+        self.load_penalty_km = load_penalty_km
+        self._by_key = {site.key: site for site in sites}
+        self._bays = {site.key: [BayCalendar() for _ in range(site.bays)] for site in sites}
+        # Booked bay minutes by (site, day ordinal)
+        self._booked_minutes: Dict[Tuple[str, int], int] = {}
+        # Sites by distance, per postcode area
+        self._ranking: Dict[Optional[str], List[Tuple[float, Site]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_appointments(
+        cls, appointments: Iterable[Mapping[str, Any]], **options: Any
+    ) -> "WorkshopSchedule":
+        """Load the bay bookings of stored appointments that hold a slot."""
+        schedule = cls(**options)
+        for appointment in appointments:
+            if appointment.get("status", "Confirmed") not in ACTIVE_STATUSES:
+                continue
+            site = schedule._by_key.get(appointment.get("site"))
+            try:
+                day = date.fromisoformat(appointment["date"])
+                start = time.fromisoformat(appointment["start_time"])
+                end = time.fromisoformat(appointment["end_time"])
+                bay = int(appointment["bay"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if site is None or not 1 <= bay <= site.bays:
+                continue
+            schedule._book(site, bay, day, start.hour * 60 + start.minute,
+                           end.hour * 60 + end.minute)
+        return schedule
+
+    def ranked_sites(self, postcode: Optional[str]) -> List[Tuple[float, Site]]:
+        """Sites nearest first, with their distance (0 for an unknown postcode)."""
+        area = postcode_area(postcode)
+        ranking = self._ranking.get(area)
+        if ranking is None:
+            origin = POSTCODE_AREAS.get(area)
+            ranking = sorted(
+                ((distance_km(origin, site.location) if origin else 0.0, site)
+                 for site in self.sites),
+                key=lambda pair: pair[0],
+            )
+            self._ranking[area] = ranking
+        return ranking
+
+    def in_reach(self, appointment_type: AppointmentType, postcode: Optional[str]) -> bool:
+        """Whether any site within MAX_TRAVEL_KM of a postcode does this type of job."""
+        return any(
+            distance <= self.max_travel_km and appointment_type in site.durations
+            for distance, site in self.ranked_sites(postcode)
+        )
+
+    def utilisation(self, site: Site, day: date) -> float:
+        """Share of a site's bay time booked on a day."""
+        booked = self._booked_minutes.get((site.key, day.toordinal()), 0)
+        return booked / (site.bays * (CLOSING_MINUTE - OPENING_MINUTE))
+
+    def _fit(
+        self, site: Site, duration: int, day: date, time_slot: TimeSlot
+    ) -> Optional[Tuple[int, int]]:
+        """The earliest (absolute start minute, bay) at a site within a slot."""
+        earliest = _minute(day, max(SLOT_START_HOURS[time_slot] * 60, OPENING_MINUTE))
+        latest = min(
+            _minute(day, SLOT_END_HOURS[time_slot] * 60) - 1,
+            _minute(day, CLOSING_MINUTE) - duration,
+        )
+        best = None
+        for number, bay in enumerate(self._bays[site.key], 1):
+            start = bay.first_fit(earliest, latest, duration)
+            if start is not None and (best is None or start < best[0]):
+                best = (start, number)
+                if start == earliest:
+                    break
+        return best
+
+    def find(
+        self,
+        appointment_type: AppointmentType,
+        postcode: Optional[str],
+        day: date,
+        time_slot: TimeSlot,
+    ) -> Optional[Allocation]:
+        """
+        The best site, bay and start time for an appointment, without booking it.
+
+        Returns:
+            None if no site within reach has a bay free in the slot, or the
+            workshops are closed that day
+        """
+        try:
+            if not self.calendar.is_business_day(day):
+                return None
+        except ValueError:
+            return None
+        best, best_cost = None, math.inf
+        for distance, site in self.ranked_sites(postcode):
+            if distance > self.max_travel_km or distance >= best_cost:
+                break
+            duration = site.durations.get(appointment_type)
+            if duration is None:
+                continue
+            fit = self._fit(site, duration, day, time_slot)
+            if fit is None:
+                continue
+            cost = distance + self.load_penalty_km * self.utilisation(site, day)
+            if cost < best_cost:
+                start, bay = fit
+                minute = start - _minute(day, 0)
+                best = Allocation(site, bay, day, minute, minute + duration, distance)
+                best_cost = cost
+        return best
+
+    def _book(self, site: Site, bay: int, day: date, start_minute: int, end_minute: int) -> None:
+        self._bays[site.key][bay - 1].add(_minute(day, start_minute), _minute(day, end_minute))
+        key = (site.key, day.toordinal())
+        self._booked_minutes[key] = self._booked_minutes.get(key, 0) + end_minute - start_minute
+
+    def allocate(
+        self,
+        appointment_type: AppointmentType,
+        postcode: Optional[str],
+        day: date,
+        time_slot: TimeSlot,
+    ) -> Optional[Allocation]:
+        """Find and book the best bay for an appointment, atomically."""
+        with self._lock:
+            allocation = self.find(appointment_type, postcode, day, time_slot)
+            if allocation is not None:
+                self._book(allocation.site, allocation.bay, day,
+                           allocation.start_minute, allocation.end_minute)
+            return allocation
+
+    def release(self, allocation: Allocation) -> bool:
+        """Free a booked bay, e.g. when the appointment is cancelled."""
+        with self._lock:
+            bays = self._bays[allocation.site.key]
+            start = _minute(allocation.day, allocation.start_minute)
+            if not bays[allocation.bay - 1].remove(start):
+                return False
+            key = (allocation.site.key, allocation.day.toordinal())
+            self._booked_minutes[key] -= allocation.end_minute - allocation.start_minute
+            return True
+
+
+def describe(allocation: Allocation) -> str:
+    """How an allocation is read back to the customer."""
+    return (f"{allocation.site.name} ({allocation.site.postcode}), bay {allocation.bay}, "
+            f"arriving at {allocation.start_time}")
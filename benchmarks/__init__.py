@@ -0,0 +1 @@
+"""Performance benchmarks for Arval BNP Voice Agent."""
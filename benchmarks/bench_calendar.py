@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: business-day calendar queries.
+
+Times `BusinessCalendar` lookups against the datetime arithmetic the tools
+used before it: `timedelta` steps that skip weekends and, to be
+comparable, check a set of bank holidays on every step. Single-moment
+checks cost about the same either way; stepping over many days is where
+the precomputed rank table pays. Also counts how often the old
+weekend-only rule picked the wrong reopening day.
+
+Usage:
+    python -m benchmarks.bench_calendar [--queries 200000] [--max-days 60]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from agent.business_days import OPENING_TIME, UK_TZ, BusinessCalendar
+
+
+def next_open_weekend_rule(now: datetime) -> date:
+    """The day `schedule_callback` used to pick: weekends and evenings only."""
+    if now.weekday() >= 5:
+        return (now + timedelta(days=7 - now.weekday())).date()
+    if now.hour >= 17:
+        return (now + timedelta(days=3 if now.weekday() == 4 else 1)).date()
+    return now.date()
+
+
+def is_open_arithmetic(now: datetime, holidays: set) -> bool:
+    return now.weekday() < 5 and now.date() not in holidays and 9 <= now.hour < 17
+
+
+def next_open_arithmetic(now: datetime, holidays: set) -> datetime:
+    if is_open_arithmetic(now, holidays):
+        return now
+    day = now.date() if now.hour < 9 else now.date() + timedelta(days=1)
+    while day.weekday() >= 5 or day in holidays:
+        day += timedelta(days=1)
+    return datetime.combine(day, OPENING_TIME, tzinfo=UK_TZ)
+
+
+def add_business_days_arithmetic(day: date, n: int, holidays: set) -> date:
+    while n > 0:
+        day += timedelta(days=1)
+        if day.weekday() < 5 and day not in holidays:
+            n -= 1
+    return day
+
+
+def timed(label: str, count: int, run) -> float:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {count / elapsed:>12,.0f} queries/s  ({elapsed:6.3f} s)")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark business-day calendar queries")
+    parser.add_argument("--queries", type=int, default=200_000, help="Queries per method")
+    parser.add_argument("--max-days", type=int, default=60,
+                        help="Largest number of business days to add")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    start = time.perf_counter()
+    calendar = BusinessCalendar()
+    print(f"\nBuilt calendar {calendar.first_day} to {calendar.last_day} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    holidays = set(calendar.holidays)
+
+    first = datetime(2026, 1, 1, tzinfo=UK_TZ)
+    moments = [first + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+               for _ in range(args.queries)]
+    offsets = [(moment.date(), rng.randint(1, args.max_days)) for moment in moments]
+    count = len(moments)
+    print(f"{count:,} queries over 2026-2030\n")
+
+    old = timed("is_open (arithmetic)", count,
+                lambda: [is_open_arithmetic(moment, holidays) for moment in moments])
+    new = timed("is_open (calendar)", count, lambda: [calendar.is_open(m) for m in moments])
+    print(f"  {'':<32} {old / new:>12.1f}x\n")
+
+    old = timed("next_open_after (arithmetic)", count,
+                lambda: [next_open_arithmetic(moment, holidays) for moment in moments])
+    new = timed("next_open_after (calendar)", count,
+                lambda: [calendar.next_open_after(m) for m in moments])
+    print(f"  {'':<32} {old / new:>12.1f}x\n")
+
+    old = timed("add_business_days (arithmetic)", count,
+                lambda: [add_business_days_arithmetic(d, n, holidays) for d, n in offsets])
+    new = timed("add_business_days (calendar)", count,
+                lambda: [calendar.add_business_days(d, n) for d, n in offsets])
+    print(f"  {'':<32} {old / new:>12.1f}x\n")
+
+    wrong = sum(next_open_weekend_rule(moment) != calendar.next_open_after(moment).date()
+                for moment in moments)
+    print(f"  Weekend-only rule picked the wrong reopening day for {wrong:,} "
+          f"({wrong / count:.2%}) of moments")
+
+
+if __name__ == "__main__":
+    main()
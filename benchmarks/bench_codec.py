@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: record encode/decode throughput.
+
+Compares today's path (`to_dict`/`from_dict` with the standard `json`
+module) with the generated codecs in `models.codec`: the same JSON shape
+through orjson, and the binary msgpack format. Throughput is records per
+second over a batch, for both leads and appointments.
+
+Usage:
+    python -m benchmarks.bench_codec [--records 100000]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from models.appointment import Appointment, AppointmentStatus, AppointmentType, TimeSlot
+from models.codec import codec_for
+from models.compact import CompactLead
+from models.lead import Lead, LeadStatus
+
+from .bench_models import synthetic_leads
+
+
+def synthetic_appointments(count: int, rng: random.Random):
+    """Generate appointments with a mix of types, slots and statuses."""
+    origin = datetime(2026, 1, 1)
+    for i in range(count):
+        created = origin + timedelta(seconds=rng.randrange(365 * 86400))
+        yield Appointment(
+            id=f"APT-{i:08d}", customer_name=f"Customer {i}",
+            contact_phone=f"+4477009{i:05d}", contact_email=f"driver{i}@example.com",
+            appointment_type=rng.choice(list(AppointmentType)),
+            date=(created + timedelta(days=rng.randrange(1, 30))).date().isoformat(),
+            time_slot=rng.choice(list(TimeSlot)), status=rng.choice(list(AppointmentStatus)),
+            vehicle_registration="AB12 CDE", created_at=created,
+            confirmed_at=created + timedelta(hours=1) if i % 2 else None,
+        )
+
+
+def rate(count: int, run) -> float:
+    """Records per second for one call of `run` over `count` records (best of 3)."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def compare(label: str, model, records) -> None:
+    codec = codec_for(model)
+    count = len(records)
+    json_text = json.dumps([record.to_dict() for record in records])
+    orjson_bytes = codec.dumps(records)
+    packed = codec.pack(records)
+    assert codec.loads(orjson_bytes) == [model.from_dict(d) for d in json.loads(json_text)]
+    assert codec.unpack(packed) == codec.loads(orjson_bytes)
+
+    results = [
+        ("to_dict + json.dumps", "encode",
+         lambda: json.dumps([record.to_dict() for record in records])),
+        ("codec.dumps (orjson)", "encode", lambda: codec.dumps(records)),
+        ("codec.pack (msgpack)", "encode", lambda: codec.pack(records)),
+        ("json.loads + from_dict", "decode",
+         lambda: [model.from_dict(d) for d in json.loads(json_text)]),
+        ("codec.loads (orjson)", "decode", lambda: codec.loads(orjson_bytes)),
+        ("codec.unpack (msgpack)", "decode", lambda: codec.unpack(packed)),
+    ]
+    print(f"\n{label}: {count:,} records; JSON {len(json_text) / count:.0f} B/record, "
+          f"msgpack {len(packed) / count:.0f} B/record")
+    baseline = {}
+    for name, direction, run in results:
+        per_second = rate(count, run)
+        baseline.setdefault(direction, per_second)
+        print(f"  {name:<24} {per_second:>11,.0f} records/s  "
+              f"({per_second / baseline[direction]:4.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark record encode/decode throughput")
+    parser.add_argument("--records", type=int, default=100_000, help="Records per batch")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    leads = [Lead.from_dict(d) for d in json.loads(synthetic_leads(args.records, rng))]
+    for i, lead in enumerate(leads):
+        if lead.status is not LeadStatus.NEW:
+            lead.qualified_at = lead.created_at + timedelta(days=i % 14)
+    compare("Lead", Lead, leads)
+    compare("CompactLead", CompactLead, [CompactLead.from_model(lead) for lead in leads])
+    compare("Appointment", Appointment, list(synthetic_appointments(args.records, rng)))
+
+
+if __name__ == "__main__":
+    main()
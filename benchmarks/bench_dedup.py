@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: lead deduplication.
+
+Builds synthetic leads where a share are repeat contacts of earlier ones,
+written with different phone and email formatting, then times the bulk
+pass (`dedupe_leads`), building the capture-time `LeadIndex` and single
+lookups against it. For contrast, a pairwise comparison of every lead
+against every other is timed on a small sample.
+
+Usage:
+    python -m benchmarks.bench_dedup [--records 1000000] [--duplicates 0.2]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from agent.dedup import LeadIndex, contact_keys, dedupe_leads, normalize_company
+
+from .bench_models import synthetic_leads
+
+
+def with_duplicates(count: int, share: float, rng: random.Random) -> list:
+    """Synthetic leads where `share` of them repeat an earlier lead's phone or email."""
+    leads = json.loads(synthetic_leads(count, rng))
+    for i in range(1, count):
+        if rng.random() >= share:
+            continue
+        lead, earlier = leads[i], leads[rng.randrange(i)]
+        lead["company_name"] = rng.choice([earlier["company_name"], None])
+        if rng.random() < 0.5:
+            # The same mobile in national format
+            lead["contact_phone"] = "0" + earlier["contact_phone"][3:]
+        else:
+            lead["contact_email"] = earlier["contact_email"].upper()
+    return leads
+
+
+def pairwise(leads: list) -> int:
+    """Count duplicate pairs by comparing every lead with every other."""
+    keys = [(set(contact_keys(lead)), normalize_company(lead.get("company_name")))
+            for lead in leads]
+    pairs = 0
+    for i, (contacts, company) in enumerate(keys):
+        for other_contacts, other_company in keys[i + 1:]:
+            if contacts & other_contacts and (
+                company is None or other_company is None or company == other_company
+            ):
+                pairs += 1
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark lead deduplication")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Leads to deduplicate")
+    parser.add_argument("--duplicates", type=float, default=0.2,
+                        help="Share of leads that repeat an earlier contact")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    leads = with_duplicates(args.records, args.duplicates, rng)
+    count = len(leads)
+    print(f"\nDeduplicating {count:,} leads ({args.duplicates:.0%} repeat contacts)")
+
+    start = time.perf_counter()
+    result = dedupe_leads(leads)
+    bulk = time.perf_counter() - start
+    merged = sum(len(ids) for ids in result.merged.values())
+    print(f"  {'dedupe_leads':<22} {count / bulk:>11,.0f} leads/s  ({bulk:6.2f} s), "
+          f"{merged:,} merged into {len(result.merged):,}")
+
+    start = time.perf_counter()
+    index = LeadIndex(result.leads)
+    build = time.perf_counter() - start
+    print(f"  {'LeadIndex build':<22} {count / build:>11,.0f} leads/s  ({build:6.2f} s)")
+
+    probes = [rng.choice(leads) for _ in range(10_000)]
+    start = time.perf_counter()
+    for probe in probes:
+        index.find(probe)
+    lookup = (time.perf_counter() - start) / len(probes)
+    print(f"  {'LeadIndex.find':<22} {lookup * 1e6:>11.1f} µs/lookup")
+
+    sample = leads[:2000]
+    start = time.perf_counter()
+    pairwise(sample)
+    elapsed = time.perf_counter() - start
+    projected = elapsed * (count / len(sample)) ** 2
+    print(f"  {'pairwise (2,000)':<22} {len(sample) / elapsed:>11,.0f} leads/s  "
+          f"({elapsed:6.2f} s; ~{projected / 3600:,.0f} h at {count:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark live call event fan-out.
+
+Subscribes an increasing number of dashboards to one assistant, writes
+batches of call state changes through the mirror and measures what each
+event costs to publish and deliver. Subscribers drain concurrently, as
+real SSE connections would.
+
+Usage:
+    python -m benchmarks.bench_events [--events 2000]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from customer_portal.events import EventBroker
+from customer_portal.mirror import CallMirror, format_vapi_timestamp
+
+from .bench_export import ASSISTANT_ID
+
+BATCH_SIZE = 50
+
+
+def live_calls(start: int, count: int):
+    """Calls that just went in progress."""
+    started = format_vapi_timestamp(datetime.now(timezone.utc) - timedelta(seconds=30))
+    return [
+        {"id": f"live-{i}", "assistantId": ASSISTANT_ID, "status": "in-progress",
+         "createdAt": started, "startedAt": started}
+        for i in range(start, start + count)
+    ]
+
+
+async def run(subscribers: int, events: int) -> None:
+    """Publish `events` call-started events to `subscribers` dashboards."""
+    call_mirror = CallMirror(":memory:")
+    broker = EventBroker(call_mirror, max_queue=events + 1)
+    streams = [broker.stream(ASSISTANT_ID) for _ in range(subscribers)]
+    for stream in streams:
+        await stream.__anext__()
+
+    received = 0
+
+    async def drain(stream) -> None:
+        nonlocal received
+        for _ in range(events):
+            await stream.__anext__()
+            received += 1
+
+    # Baseline: the same mirror writes with no subscribers listening
+    baseline_mirror = CallMirror(":memory:")
+    start = time.perf_counter()
+    for offset in range(0, events, BATCH_SIZE):
+        baseline_mirror.upsert_calls(ASSISTANT_ID, live_calls(offset, BATCH_SIZE))
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, events, BATCH_SIZE):
+        call_mirror.upsert_calls(ASSISTANT_ID, live_calls(offset, BATCH_SIZE))
+    publish = time.perf_counter() - start
+    await asyncio.gather(*(drain(stream) for stream in streams))
+    total = time.perf_counter() - start
+
+    deliveries = subscribers * events
+    assert received == deliveries and broker.stats.dropped == 0
+    print(f"{subscribers:>6,} subscribers: writes {baseline * 1e6 / events:6.1f} µs/event alone, "
+          f"{publish * 1e6 / events:6.1f} µs/event with publishing; "
+          f"delivery {total * 1e9 / deliveries:7.0f} ns per event per subscriber")
+
+    broker.close()
+    for stream in streams:
+        await stream.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark live call event fan-out")
+    parser.add_argument("--events", type=int, default=2000, help="Events published per run")
+    args = parser.parse_args()
+    for subscribers in (1, 10, 100, 1000):
+        asyncio.run(run(subscribers, args.events))
+
+
+if __name__ == "__main__":
+    main()
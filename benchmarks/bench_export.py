@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming call export vs. the old in-memory export.
+
+Loads synthetic calls into a temporary call mirror, then measures peak
+Python heap and throughput while consuming `/export/calls` output chunks.
+The legacy path (load every call, build one CSV string) is run on a
+smaller sample for comparison, since its memory grows with row count.
+
+Usage:
+    python -m benchmarks.bench_export [--rows 1000000] [--legacy-rows 100000]
+"""
+
+import argparse
+import csv
+import io
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from customer_portal.export import stream_calls_export
+from customer_portal.mirror import CallMirror, format_vapi_timestamp
+
+ASSISTANT_ID = "bench-assistant"
+STATUSES = ["ended", "ended", "ended", "failed", "no-answer"]
+
+
+def synthetic_calls(count: int):
+    """Generate realistic-looking Vapi call objects."""
+    origin = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        started = origin + timedelta(seconds=i * 37)
+        ended = started + timedelta(seconds=30 + i % 600)
+        yield {
+            "id": f"call-{i:08d}",
+            "assistantId": ASSISTANT_ID,
+            "createdAt": format_vapi_timestamp(started),
+            "updatedAt": format_vapi_timestamp(ended),
+            "startedAt": format_vapi_timestamp(started),
+            "endedAt": format_vapi_timestamp(ended),
+            "status": STATUSES[i % len(STATUSES)],
+            "customer": {"number": f"+4477009{i % 100000:05d}"},
+            "summary": "Caller asked to book an MOT for their lease vehicle.",
+        }
+
+
+def load_mirror(mirror: CallMirror, rows: int) -> None:
+    """Fill the mirror in batches."""
+    batch = []
+    for call in synthetic_calls(rows):
+        batch.append(call)
+        if len(batch) == 5000:
+            mirror.upsert_calls(ASSISTANT_ID, batch)
+            batch = []
+    mirror.upsert_calls(ASSISTANT_ID, batch)
+
+
+def measure(label: str, produce) -> None:
+    """Run an export, reporting bytes, rows/sec and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    total_bytes = produce()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {total_bytes / 1e6:9.1f} MB out  {elapsed:7.2f}s  "
+          f"peak heap {peak / 1e6:8.1f} MB")
+
+
+def streaming_export(mirror: CallMirror, format: str, compress: bool = False) -> int:
+    """Consume a streaming export chunk by chunk."""
+    return sum(len(chunk) for chunk in stream_calls_export(mirror, ASSISTANT_ID, format,
+                                                           compress=compress))
+
+
+def legacy_csv_export(mirror: CallMirror, rows: int) -> int:
+    """Reproduce the old export: every call in memory, then one CSV string."""
+    calls = [
+        json.loads(row["raw"])
+        for page in mirror.iter_call_pages(ASSISTANT_ID, ("raw",), page_size=rows)
+        for row in page
+    ]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["ID", "Started", "Ended", "Duration", "Caller", "Status"])
+    for call in calls:
+        writer.writerow([
+            call.get("id"),
+            call.get("startedAt"),
+            call.get("endedAt"),
+            call.get("duration"),
+            call.get("customer", {}).get("number"),
+            call.get("status"),
+        ])
+    return len(json.dumps({"content": output.getvalue(), "format": "csv"}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming call exports")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Calls in the mirror")
+    parser.add_argument("--legacy-rows", type=int, default=100_000,
+                        help="Calls used for the legacy comparison (0 to skip)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.legacy_rows:
+            legacy = CallMirror(str(Path(tmp) / "legacy.db"))
+            load_mirror(legacy, args.legacy_rows)
+            print(f"\nLegacy vs streaming at {args.legacy_rows:,} calls:")
+            measure("legacy csv (in memory)", lambda: legacy_csv_export(legacy, args.legacy_rows))
+            measure("streaming csv", lambda: streaming_export(legacy, "csv"))
+            legacy.close()
+
+        mirror = CallMirror(str(Path(tmp) / "mirror.db"))
+        print(f"\nLoading {args.rows:,} calls into the mirror...")
+        start = time.perf_counter()
+        load_mirror(mirror, args.rows)
+        print(f"  loaded in {time.perf_counter() - start:.1f}s")
+
+        print(f"\nStreaming exports at {args.rows:,} calls:")
+        measure("csv", lambda: streaming_export(mirror, "csv"))
+        measure("ndjson", lambda: streaming_export(mirror, "ndjson"))
+        measure("json", lambda: streaming_export(mirror, "json"))
+        measure("csv + gzip", lambda: streaming_export(mirror, "csv", compress=True))
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
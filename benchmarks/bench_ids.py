@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: reference ID generation.
+
+Generates IDs from several processes at once, as concurrent tool servers
+would, and checks that none repeat. Also reports single-process
+throughput for raw ID values and formatted references, next to the
+`strftime` references the tools used before.
+
+Usage:
+    python -m benchmarks.bench_ids [--ids 4000000] [--processes 4]
+"""
+
+import argparse
+import multiprocessing
+import time
+from datetime import datetime
+
+from agent import ids
+
+
+def generate(count: int) -> list:
+    """Formatted references from this process's default generator."""
+    return [ids.new_id("LEAD") for _ in range(count)]
+
+
+def rate(label: str, count: int, run) -> None:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {count / elapsed:>12,.0f} IDs/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark reference ID generation")
+    parser.add_argument("--ids", type=int, default=4_000_000, help="IDs to generate in total")
+    parser.add_argument("--processes", type=int, default=4, help="Generating processes")
+    args = parser.parse_args()
+
+    per_batch = 100_000
+    batches = max(1, args.ids // per_batch)
+    print(f"\nGenerating {batches * per_batch:,} IDs across {args.processes} processes")
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        seen = set()
+        total = 0
+        for batch in pool.imap_unordered(generate, [per_batch] * batches):
+            seen.update(batch)
+            total += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f"  {total:,} IDs, {total - len(seen):,} duplicates, "
+          f"{total / elapsed:,.0f} IDs/s including collection")
+    assert len(seen) == total
+
+    count = 1_000_000
+    generator = ids.IdGenerator(worker_id=0)
+    print(f"\nSingle process, {count:,} IDs")
+    rate("IdGenerator.next_value", count, lambda: [generator.next_value() for _ in range(count)])
+    rate("IdGenerator.next", count, lambda: [generator.next("LEAD") for _ in range(count)])
+    rate("strftime (before)", count,
+         lambda: [f"LEAD-{datetime.now().strftime('%Y%m%d%H%M%S')}" for _ in range(count)])
+
+
+if __name__ == "__main__":
+    main()
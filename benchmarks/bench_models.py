@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory per loaded lead, dataclass vs. slotted record.
+
+Builds synthetic leads in the `Lead.to_dict` format, decodes them from
+JSON as a file load would, then measures the Python heap retained by
+`Lead.from_dict` and `CompactLead.from_dict` over the decoded dicts. The
+decoded dicts are freed before measuring, so the figures are what a
+year of leads costs to hold for scoring or export.
+
+Usage:
+    python -m benchmarks.bench_models [--records 1000000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from models.compact import CompactLead
+from models.lead import Lead
+
+COMPANY_SIZES = ["1-10", "11-50", "51-250", "250+"]
+INDUSTRIES = ["Construction", "Logistics", "Healthcare", "Retail", "Utilities"]
+PROVIDERS = [None, "Lex Autolease", "LeasePlan", "Alphabet", "Zenith"]
+TIMELINES = [None, "ASAP", "1-3 months", "3-6 months", "6-12 months"]
+BUDGETS = [None, "£300-£400/month", "£400-£600/month", "£600+/month"]
+STATUSES = ["New", "Contacted", "Qualified", "Nurturing"]
+
+
+def synthetic_leads(count: int, rng: random.Random):
+    """Generate a JSON array of leads as `Lead.to_dict` writes them."""
+    origin = datetime(2026, 1, 1)
+    leads = []
+    for i in range(count):
+        created = origin + timedelta(seconds=rng.randrange(365 * 86400))
+        contacted = created + timedelta(hours=rng.randrange(1, 72)) if i % 2 else None
+        leads.append({
+            "id": f"LEAD-{i:08d}", "contact_name": f"Contact {i}",
+            "contact_email": f"contact{i}@fleet{i % 5000}.co.uk",
+            "contact_phone": f"+4477009{i:05d}", "source": "Voice Agent",
+            "status": rng.choice(STATUSES), "priority": "Standard", "score": rng.randrange(100),
+            "company_name": f"Fleet Company {i % 5000}",
+            "company_size": rng.choice(COMPANY_SIZES), "industry": rng.choice(INDUSTRIES),
+            "current_fleet_size": rng.randrange(1, 300), "projected_fleet_size": None,
+            "current_provider": rng.choice(PROVIDERS), "vehicle_interests": "Electric vans",
+            "ev_interest": rng.random() < 0.4, "timeline": rng.choice(TIMELINES),
+            "budget_range": rng.choice(BUDGETS), "specific_requirements": None,
+            "preferred_contact_method": "Either", "best_time_to_call": "Mornings",
+            "inquiry_notes": None, "follow_up_notes": None,
+            "created_at": created.isoformat(),
+            "updated_at": contacted.isoformat() if contacted else None,
+            "contacted_at": contacted.isoformat() if contacted else None,
+            "qualified_at": None, "closed_at": None, "assigned_to": None,
+        })
+    return json.dumps(leads)
+
+
+def measure(label: str, payload: str, load) -> None:
+    """Decode the payload, load it with `load` and report what the result retains."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    decoded = json.loads(payload)
+    records = load(decoded)
+    elapsed = time.perf_counter() - start
+    del decoded
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} {retained / len(records):7.0f} bytes/lead retained, "
+          f"peak {peak / 2**20:7.0f} MiB, load {elapsed:5.1f}s (traced)")
+    del records
+    gc.collect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark memory per loaded lead")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Leads to load")
+    args = parser.parse_args()
+
+    payload = synthetic_leads(args.records, random.Random(42))
+    print(f"\nLoading {args.records:,} leads ({len(payload) / 2**20:,.0f} MiB of JSON)")
+    measure("Lead (dataclass)", payload, lambda rows: [Lead.from_dict(row) for row in rows])
+    measure("CompactLead (slots)", payload, CompactLead.from_dicts)
+
+
+if __name__ == "__main__":
+    main()
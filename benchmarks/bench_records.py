@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: appointment and lead listings.
+
+Writes a year of synthetic bookings and leads in the agent's JSON format,
+then times building the portal's record indexes and serving filtered
+pages from them, against rescanning and validating the file per request
+as the listing endpoints otherwise would.
+
+Usage:
+    python -m benchmarks.bench_records [--appointments 100000] [--leads 50000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from customer_portal.api import agent_records
+from customer_portal.records import AgentRecords, RecordQuery
+
+TYPES = ["MOT", "Service", "Repair", "Tyre Change", "Vehicle Inspection", "Test Drive"]
+SLOTS = ["Morning (9-12)", "Afternoon (12-3)", "Late Afternoon (3-5)"]
+
+QUERIES = {
+    "appointments": [
+        ("newest page", RecordQuery()),
+        ("type=MOT", RecordQuery(equals={"appointment_type": "MOT"})),
+        ("status=Cancelled, March", RecordQuery(
+            equals={"status": "Cancelled"}, start_date="2026-03-01", end_date="2026-03-31"
+        )),
+        ("type=Test Drive, one week", RecordQuery(
+            equals={"appointment_type": "Test Drive"},
+            start_date="2026-06-01", end_date="2026-06-07",
+        )),
+    ],
+    "leads": [
+        ("priority=High", RecordQuery(equals={"priority": "High"})),
+        ("score 70-80", RecordQuery(ranges={"score": (70, 80)})),
+        ("status=New, Q1", RecordQuery(
+            equals={"status": "New"}, start_date="2026-01-01", end_date="2026-03-31"
+        )),
+    ],
+}
+
+
+def synthetic_records(appointments: int, leads: int, rng: random.Random):
+    """Generate a year of appointments and leads as the agent's tools store them."""
+    origin = date(2026, 1, 1)
+    bookings = []
+    for i in range(appointments):
+        day = (origin + timedelta(days=rng.randrange(365))).isoformat()
+        bookings.append({
+            "id": f"APT-{i:08d}", "customer_name": "Jane Smith",
+            "contact_phone": "+447700900123", "contact_email": "jane@example.com",
+            "type": rng.choice(TYPES), "date": day, "time_slot": rng.choice(SLOTS),
+            "vehicle_registration": "AB12 CDE", "notes": None,
+            "status": "Cancelled" if rng.random() < 0.05 else "Confirmed",
+            "created_at": f"{day}T08:00:00",
+        })
+    captured = []
+    for i in range(leads):
+        score = rng.randrange(0, 101)
+        day = (origin + timedelta(days=rng.randrange(365))).isoformat()
+        captured.append({
+            "id": f"LEAD-{i:08d}", "contact_name": "Sam Jones",
+            "contact_email": "sam@example.com", "contact_phone": "+447700900456",
+            "company_name": "Acme Fleet", "fleet_size": "10-50",
+            "vehicle_interests": "EVs", "status": rng.choice(["New", "Contacted", "Qualified"]),
+            "score": score,
+            "priority": "High" if score >= 50 else "Medium" if score >= 25 else "Standard",
+            "source": "Voice Agent", "created_at": f"{day}T{rng.randrange(24):02d}:00:00",
+        })
+    return bookings, captured
+
+
+def rescan(path: Path, kind: str, query: RecordQuery, limit: int):
+    """The per-request path: load, validate, filter and sort the whole file."""
+    spec = agent_records.specs[kind]
+    with open(path) as f:
+        rows = [spec.project(record) for record in json.load(f)]
+    rows = [
+        row for row in rows
+        if all(str(row.get(name) or "").lower() == value.lower()
+               for name, value in query.equals.items())
+        and all(row.get(name) is not None and lo <= row[name] <= hi
+                for name, (lo, hi) in query.ranges.items())
+        and (not query.start_date or row[spec.sort_field] >= query.start_date)
+        and (not query.end_date or row[spec.sort_field][:10] <= query.end_date)
+    ]
+    rows.sort(key=lambda row: (row[spec.sort_field], row["id"]), reverse=True)
+    return rows[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark appointment and lead listings")
+    parser.add_argument("--appointments", type=int, default=100_000, help="Bookings written")
+    parser.add_argument("--leads", type=int, default=50_000, help="Leads written")
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per indexed query")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bookings, captured = synthetic_records(args.appointments, args.leads, rng)
+        (Path(tmp) / "appointments.json").write_text(json.dumps(bookings))
+        (Path(tmp) / "leads.json").write_text(json.dumps(captured))
+        records = AgentRecords(agent_records.specs, tmp)
+
+        for kind, queries in QUERIES.items():
+            start = time.perf_counter()
+            index = records.index(kind, {"data_dir": tmp})
+            print(f"\n{kind}: indexed {len(index):,} records in "
+                  f"{time.perf_counter() - start:.2f}s")
+            path = Path(tmp) / agent_records.specs[kind].filename
+            for label, query in queries:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    page, _ = records.index(kind, {"data_dir": tmp}).page(query, args.limit)
+                    timings.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                expected = rescan(path, kind, query, args.limit)
+                scan = time.perf_counter() - start
+                assert page == expected, label
+                print(f"  {label:<28} indexed {statistics.median(timings) * 1e3:7.3f} ms   "
+                      f"rescan {scan * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
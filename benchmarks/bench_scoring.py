@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scoring the whole lead book.
+
+Scores synthetic leads with the batch engine in `models.scoring` and with
+the per-lead branching that `Lead.calculate_score` used before, reporting
+leads per second for column extraction, scoring and the two combined.
+
+Usage:
+    python -m benchmarks.bench_scoring [--records 1000000]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from models.compact import CompactLead
+from models.scoring import LeadColumns, prioritize, score_columns, score_records
+
+from .bench_models import synthetic_leads
+
+
+def legacy_score(lead) -> int:
+    """The per-lead scoring `Lead.calculate_score` used before the batch engine."""
+    score = 0
+    if lead.company_name:
+        score += 10
+    if lead.current_fleet_size:
+        if lead.current_fleet_size >= 100:
+            score += 25
+        elif lead.current_fleet_size >= 50:
+            score += 20
+        elif lead.current_fleet_size >= 20:
+            score += 15
+        elif lead.current_fleet_size >= 10:
+            score += 10
+        else:
+            score += 5
+    if lead.projected_fleet_size and lead.projected_fleet_size > (lead.current_fleet_size or 0):
+        score += 10
+    if lead.timeline:
+        timeline = lead.timeline.lower()
+        if "immediate" in timeline or "asap" in timeline or "within 1 month" in timeline:
+            score += 25
+        elif "1-3 month" in timeline:
+            score += 20
+        elif "3-6 month" in timeline:
+            score += 15
+        elif "6-12 month" in timeline:
+            score += 10
+        else:
+            score += 5
+    if lead.budget_range:
+        score += 15
+    if lead.ev_interest:
+        score += 10
+    if lead.current_provider:
+        score += 5
+    return score
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark scoring the whole lead book")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Leads to score")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    leads = CompactLead.from_dicts(json.loads(synthetic_leads(args.records, rng)))
+    for lead in leads:
+        lead.projected_fleet_size = rng.choice([None, (lead.current_fleet_size or 0) + 10])
+    count = len(leads)
+    print(f"\nScoring {count:,} leads")
+
+    start = time.perf_counter()
+    expected = [legacy_score(lead) for lead in leads]
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = LeadColumns.from_records(leads)
+    extract = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = score_columns(columns)
+    prioritize(scores)
+    vectorized = time.perf_counter() - start
+    assert scores.tolist() == expected
+
+    start = time.perf_counter()
+    score_records(leads)
+    end_to_end = time.perf_counter() - start
+
+    for label, elapsed in [
+        ("per-lead branches", legacy),
+        ("column extraction", extract),
+        ("batch score + priority", vectorized),
+        ("score_records (all)", end_to_end),
+    ]:
+        print(f"  {label:<24} {count / elapsed:>13,.0f} leads/s  ({elapsed * 1e3:8.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: transcript search latency.
+
+Loads synthetic calls with multi-utterance transcripts into a temporary
+call mirror with the FTS5 transcript index attached, then times term,
+phrase and prefix queries.
+
+Usage:
+    python -m benchmarks.bench_search [--rows 200000] [--repeat 20]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_export import ASSISTANT_ID, synthetic_calls
+from customer_portal.mirror import CallMirror
+from customer_portal.search import TranscriptIndex
+
+# Every call has the greeting and sign-off; the topics are what callers search for
+GREETING = "AI: Thanks for calling Arval, how can I help?"
+SIGN_OFF = "AI: Is there anything else I can help with today?"
+TOPICS = [
+    "User: I need to book an MOT for my lease car.",
+    "User: my windscreen has a chip in it after a stone hit it.",
+    "User: the tyre pressure warning light is on.",
+    "User: when does my lease agreement end?",
+    "User: the engine management light came on this morning.",
+    "User: I'd like to add a second named driver.",
+    "User: my fuel card was declined at the pump.",
+    "User: can I extend my contract by six months?",
+    "User: the car needs its annual service soon.",
+    "User: I was in a minor accident in a car park.",
+    "User: the air conditioning is blowing warm air.",
+    "User: I need a courtesy car while mine is repaired.",
+    "User: there's a recall notice on my vehicle.",
+    "User: how do I pay a parking fine on the company car?",
+    "User: the battery keeps going flat overnight.",
+    "User: I want to return the vehicle early.",
+]
+
+QUERIES = ["windscreen", '"tyre pressure"', "lease agreement", "regist*", '"AB12 CDE"']
+
+
+def transcript(rng: random.Random) -> str:
+    """Build a transcript with a couple of topics and a registration plate."""
+    plate = f"{rng.choice('ABCDEFG')}{rng.choice('ABCDEFG')}{rng.randint(10, 99)} " \
+            f"{rng.choice(['CDE', 'XYZ', 'KLM'])}"
+    lines = [GREETING, *rng.sample(TOPICS, k=2),
+             "AI: Could you give me the vehicle registration please?",
+             f"User: it's {plate}.", SIGN_OFF]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark transcript search latency")
+    parser.add_argument("--rows", type=int, default=200_000, help="Calls in the mirror")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per query")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = CallMirror(str(Path(tmp) / "mirror.db"))
+        index = TranscriptIndex(mirror)
+
+        print(f"\nIndexing {args.rows:,} calls ({args.rows * 6:,} utterances)...")
+        start = time.perf_counter()
+        batch = []
+        for call in synthetic_calls(args.rows):
+            call["transcript"] = transcript(rng)
+            batch.append(call)
+            if len(batch) == 5000:
+                mirror.upsert_calls(ASSISTANT_ID, batch)
+                batch = []
+        mirror.upsert_calls(ASSISTANT_ID, batch)
+        print(f"  indexed in {time.perf_counter() - start:.1f}s")
+
+        print("\nFirst page (20 hits) latency:")
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                index.search(ASSISTANT_ID, query)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"  {query:<20} median {statistics.median(timings):8.1f} ms  "
+                  f"max {max(timings):8.1f} ms")
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
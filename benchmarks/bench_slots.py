@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: finding free appointment slots.
+
+Fills two years of slots to a given occupancy and times
+`SlotIndex.find_next_available` against walking the calendar day by day
+and checking each slot's bookings, as well as reserve/release pairs.
+
+Usage:
+    python -m benchmarks.bench_slots [--occupancy 0.9] [--queries 10000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from agent.slots import SLOTS, SlotIndex
+from models.appointment import AppointmentType
+
+
+def walk(index: SlotIndex, n: int, appointment_type: AppointmentType, start: date) -> list:
+    """Find free slots the straightforward way, one day and slot at a time."""
+    found = []
+    day = start
+    end = index.origin + timedelta(days=index.days)
+    while day < end and len(found) < n:
+        for slot in SLOTS:
+            if index.is_available(day, slot, appointment_type):
+                found.append((day, slot))
+                if len(found) == n:
+                    break
+        day += timedelta(days=1)
+    return found
+
+
+def per_call(run, queries: list) -> float:
+    """Microseconds per call of `run` over the queries."""
+    start = time.perf_counter()
+    for query in queries:
+        run(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark finding free appointment slots")
+    parser.add_argument("--occupancy", type=float, default=0.9, help="Share of slots full")
+    parser.add_argument("--queries", type=int, default=10_000, help="Searches to time")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    origin = date(2026, 1, 5)
+    index = SlotIndex(origin)
+    start = time.perf_counter()
+    bookings = 0
+    for offset in range(index.days):
+        day = origin + timedelta(days=offset)
+        for slot in SLOTS:
+            for appointment_type in AppointmentType:
+                if rng.random() < args.occupancy:
+                    while index.reserve(day, slot, appointment_type):
+                        bookings += 1
+    print(f"\n{index.days} days, {bookings:,} bookings, {args.occupancy:.0%} of slots full "
+          f"(filled in {time.perf_counter() - start:.2f} s)")
+
+    queries = [
+        (rng.choice(list(AppointmentType)), origin + timedelta(days=rng.randrange(index.days - 60)))
+        for _ in range(args.queries)
+    ]
+    for appointment_type, day in queries[:100]:
+        assert index.find_next_available(3, appointment_type, day) == walk(
+            index, 3, appointment_type, day
+        )
+
+    indexed = per_call(lambda q: index.find_next_available(3, q[0], q[1]), queries)
+    walked = per_call(lambda q: walk(index, 3, q[0], q[1]), queries)
+    print(f"  {'find_next_available(3)':<24} {indexed:8.1f} µs/query")
+    print(f"  {'day-by-day walk':<24} {walked:8.1f} µs/query  ({walked / indexed:.0f}x slower)")
+
+    def reserve_release(query):
+        appointment_type, day = query
+        if index.reserve(day, SLOTS[0], appointment_type):
+            index.release(day, SLOTS[0], appointment_type)
+
+    print(f"  {'reserve + release':<24} {per_call(reserve_release, queries):8.1f} µs/pair")
+
+
+if __name__ == "__main__":
+    main()
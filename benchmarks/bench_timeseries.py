@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark: columnar timeseries analytics vs. a per-call Python loop.
+
+Loads synthetic calls into a temporary call mirror, then compares building
+daily buckets, an hour-of-day heatmap and duration percentiles with the
+NumPy CallTable against the equivalent loop over decoded call dicts.
+
+Usage:
+    python -m benchmarks.bench_timeseries [--rows 500000]
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.bench_export import ASSISTANT_ID, load_mirror
+from customer_portal.columnar import CallTable
+from customer_portal.mirror import CallMirror
+
+
+def timed(label: str, run) -> None:
+    """Run a callable and report its wall time."""
+    start = time.perf_counter()
+    run()
+    print(f"  {label:<32} {time.perf_counter() - start:7.3f}s")
+
+
+def python_loop(mirror: CallMirror) -> None:
+    """Aggregate the way the portal used to: decode every call and loop."""
+    days, heatmap, durations = Counter(), Counter(), []
+    for page in mirror.iter_call_pages(ASSISTANT_ID, ("raw",), page_size=50000):
+        for row in page:
+            call = json.loads(row["raw"])
+            started = datetime.fromisoformat(call["startedAt"].replace("Z", "+00:00"))
+            ended = datetime.fromisoformat(call["endedAt"].replace("Z", "+00:00"))
+            days[started.date()] += 1
+            heatmap[(started.weekday(), started.hour)] += 1
+            durations.append((ended - started).total_seconds())
+    statistics.quantiles(durations, n=100)
+
+
+def vectorized(table: CallTable) -> None:
+    """Aggregate with the columnar table."""
+    table.group_by_time("day")
+    table.busiest_hours_heatmap()
+    table.duration_percentiles()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark columnar timeseries analytics")
+    parser.add_argument("--rows", type=int, default=500_000, help="Calls in the mirror")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = CallMirror(str(Path(tmp) / "mirror.db"))
+        print(f"\nLoading {args.rows:,} calls into the mirror...")
+        load_mirror(mirror, args.rows)
+
+        print(f"\nTimeseries analytics at {args.rows:,} calls:")
+        timed("python loop over raw calls", lambda: python_loop(mirror))
+        table = None
+
+        def load():
+            nonlocal table
+            table = CallTable.from_mirror(mirror, ASSISTANT_ID)
+
+        timed("columnar table load", load)
+        timed("columnar aggregates (cached)", lambda: vectorized(table))
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Load-test the Vapi tool-call server.
+
+Keeps a fixed number of `tool-calls` requests in flight against a running
+tool server for a set duration, cycling through a mix of the assistant's
+tools, and reports sustained throughput and latency percentiles. Booking
+calls append to the server's appointment store, so they are only included
+when asked for.
+
+Usage:
+    python -m vapi_ai.tool_server
+    python -m benchmarks.bench_tool_server [--duration 15] [--concurrency 64] [--bookings]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+import aiohttp
+
+READ_ONLY_CALLS = [
+    ("get_faq_answer", {"topic": "ev"}),
+    ("transfer_call", {"department": "roadside_assistance", "reason": "Breakdown on the M4"}),
+    ("check_after_hours", {}),
+    ("get_business_hours", {}),
+    ("get_office_locations", {}),
+]
+
+
+def booking_call():
+    """A booking for the next weekday."""
+    day = date.today() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return ("book_appointment", {
+        "customer_name": "Load Test",
+        "contact_phone": "+447700900000",
+        "contact_email": "load.test@example.com",
+        "appointment_type": "Service",
+        "preferred_date": day.isoformat(),
+        "preferred_time": "Afternoon (12-3)",
+    })
+
+
+def tool_calls_payload(name: str, arguments: dict) -> dict:
+    """Wrap one tool call in a Vapi `tool-calls` server message."""
+    return {
+        "message": {
+            "type": "tool-calls",
+            "toolCallList": [{
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": name, "arguments": arguments},
+            }],
+        }
+    }
+
+
+async def load_test(args: argparse.Namespace) -> None:
+    """Drive the server at a fixed concurrency until the duration elapses."""
+    url = f"{args.url.rstrip('/')}/tools"
+    headers = {"X-Vapi-Secret": args.secret} if args.secret else {}
+    mix = READ_ONLY_CALLS + ([booking_call()] if args.bookings else [])
+    calls = itertools.cycle(mix)
+    latencies = []
+    statuses = {}
+    tool_errors = 0
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        nonlocal tool_errors
+        while time.perf_counter() < deadline:
+            payload = tool_calls_payload(*next(calls))
+            start = time.perf_counter()
+            async with session.post(url, json=payload, headers=headers) as resp:
+                body = await resp.json() if resp.status == 200 else await resp.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            if resp.status == 200:
+                tool_errors += sum("error" in result for result in body["results"])
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def warm_up() -> None:
+            async with session.post(url, json=tool_calls_payload(*mix[0]), headers=headers) as resp:
+                await resp.read()
+
+        # Open every connection and warm the worker pool before measuring
+        await asyncio.gather(*(warm_up() for _ in range(args.concurrency)))
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"\n{len(latencies):,} tool-call requests in {elapsed:.1f}s at concurrency "
+          f"{args.concurrency} ({len(latencies) / elapsed:,.0f} req/s sustained)")
+    print(f"  tools: {', '.join(name for name, _ in mix)}")
+    print(f"  responses: {dict(sorted(statuses.items()))}, tool errors: {tool_errors}")
+    print(f"  latency: median {statistics.median(latencies):.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the Vapi tool-call server")
+    parser.add_argument("--url", default="http://localhost:8100", help="Tool server base URL")
+    parser.add_argument("--secret", default=os.getenv("VAPI_TOOL_SECRET", ""),
+                        help="Server secret (default: $VAPI_TOOL_SECRET)")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of sustained load")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at once")
+    parser.add_argument("--bookings", action="store_true",
+                        help="Include book_appointment calls (writes to the server's data dir)")
+    asyncio.run(load_test(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: workshop bay booking decisions.
+
+Loads months of bookings across every workshop site, then times
+`WorkshopSchedule.find` and `allocate` for callers from random postcode
+areas, days and time slots. Booking decisions should stay well under a
+millisecond however much of the schedule is loaded.
+
+Usage:
+    python -m benchmarks.bench_workshops [--days 180] [--decisions 20000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from agent.slots import SLOTS
+from agent.workshops import POSTCODE_AREAS, WORKSHOP_TYPES, WorkshopSchedule
+
+ORIGIN = date(2026, 1, 5)
+
+
+def weekdays(days: int) -> list:
+    return [ORIGIN + timedelta(days=offset) for offset in range(days)
+            if (ORIGIN + timedelta(days=offset)).weekday() < 5]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark workshop bay booking decisions")
+    parser.add_argument("--days", type=int, default=180, help="Days of schedule to load")
+    parser.add_argument("--decisions", type=int, default=20_000, help="Decisions to time")
+    args = parser.parse_args()
+    rng = random.Random(42)
+    areas = [f"{area}1 1AA" for area in POSTCODE_AREAS]
+    types = sorted(WORKSHOP_TYPES, key=lambda t: t.value)
+    days = weekdays(args.days)
+
+    schedule = WorkshopSchedule()
+    start = time.perf_counter()
+    bookings = 0
+    for day in days:
+        for slot in SLOTS:
+            # Fill most of each slot, leaving the odd gap to search past
+            for _ in range(rng.randrange(20, 40)):
+                if schedule.allocate(rng.choice(types), rng.choice(areas), day, slot):
+                    bookings += 1
+    print(f"\nLoaded {bookings:,} bookings over {len(days)} working days "
+          f"in {time.perf_counter() - start:.2f} s")
+
+    queries = [(rng.choice(types), rng.choice(areas), rng.choice(days), rng.choice(SLOTS))
+               for _ in range(args.decisions)]
+    for label, decide in [("find", schedule.find), ("allocate", schedule.allocate)]:
+        timings = []
+        for query in queries:
+            begin = time.perf_counter()
+            decide(*query)
+            timings.append(time.perf_counter() - begin)
+        timings.sort()
+        mean = sum(timings) / len(timings)
+        p99 = timings[len(timings) * 99 // 100]
+        print(f"  {label:<10} mean {mean * 1e6:6.1f} µs, p99 {p99 * 1e6:6.1f} µs, "
+              f"max {timings[-1] * 1e6:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Replay synthetic Vapi webhook bursts against a running portal.
+
+Each synthetic call sends a `status-update` (in-progress) followed by an
+`end-of-call-report` to `/webhooks/vapi`, with many calls in flight at
+once. Reports acknowledgement latency and throughput, so ingestion can be
+load-tested locally without placing real calls.
+
+Usage:
+    VAPI_WEBHOOK_SECRET=... python -m customer_portal.api
+    VAPI_WEBHOOK_SECRET=... python -m benchmarks.replay_webhooks [--calls 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import aiohttp
+
+from customer_portal.mirror import format_vapi_timestamp
+
+DEFAULT_ASSISTANT_ID = os.getenv("VAPI_ASSISTANT_ID", "b543468c-e12e-481f-abb6-d0e129c7e5bb")
+
+TRANSCRIPTS = [
+    "AI: Welcome to Arval Driver Desk!\nUser: my windscreen has a chip in it.",
+    "AI: Welcome to Arval Driver Desk!\nUser: I need to book an MOT for AB12 CDE.",
+    "AI: Welcome to Arval Driver Desk!\nUser: the tyre pressure warning light is on.",
+]
+
+
+def synthetic_events(index: int, assistant_id: str):
+    """Build the status update and end-of-call report for one synthetic call."""
+    started = datetime.now(timezone.utc) - timedelta(seconds=120)
+    ended = started + timedelta(seconds=30 + index % 300)
+    call = {
+        "id": f"replay-{uuid.uuid4()}",
+        "assistantId": assistant_id,
+        "createdAt": format_vapi_timestamp(started),
+        "customer": {"number": f"+4477009{index % 100000:05d}"},
+    }
+    status_update = {
+        "type": "status-update",
+        "status": "in-progress",
+        "timestamp": int(started.timestamp() * 1000),
+        "call": call,
+    }
+    report = {
+        "type": "end-of-call-report",
+        "timestamp": int(ended.timestamp() * 1000),
+        "startedAt": format_vapi_timestamp(started),
+        "endedAt": format_vapi_timestamp(ended),
+        "endedReason": "customer-ended-call",
+        "artifact": {"transcript": TRANSCRIPTS[index % len(TRANSCRIPTS)]},
+        "analysis": {"summary": "Synthetic replayed call"},
+        "call": call,
+    }
+    return status_update, report
+
+
+async def replay(args: argparse.Namespace) -> None:
+    """Send every synthetic call's events, bounded by the concurrency limit."""
+    url = f"{args.url.rstrip('/')}/webhooks/vapi"
+    headers = {"X-Vapi-Secret": args.secret}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    statuses = {}
+
+    async def send(session: aiohttp.ClientSession, index: int) -> None:
+        async with semaphore:
+            for message in synthetic_events(index, args.assistant_id):
+                start = time.perf_counter()
+                async with session.post(url, json={"message": message}, headers=headers) as resp:
+                    await resp.read()
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+    start = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(send(session, i) for i in range(args.calls)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"\nSent {len(latencies):,} events for {args.calls:,} calls in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:,.0f} events/s)")
+    print(f"  responses: {dict(sorted(statuses.items()))}")
+    print(f"  ack latency: median {statistics.median(latencies):.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay synthetic Vapi webhook bursts")
+    parser.add_argument("--url", default="http://localhost:8000", help="Portal base URL")
+    parser.add_argument("--secret", default=os.getenv("VAPI_WEBHOOK_SECRET", ""),
+                        help="Webhook secret (default: $VAPI_WEBHOOK_SECRET)")
+    parser.add_argument("--assistant-id", default=DEFAULT_ASSISTANT_ID,
+                        help="Assistant the synthetic calls belong to")
+    parser.add_argument("--calls", type=int, default=2000, help="Synthetic calls to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="Calls in flight at once")
+    asyncio.run(replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
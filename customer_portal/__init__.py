@@ -0,0 +1 @@
+"""Customer portal package for Arval BNP Voice Agent."""
@@ -14,21 +14,56 @@ Features:
 
 import os
 import asyncio
-import aiohttp
-from datetime import datetime, timedelta
+import hmac
+import json
+import math
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import jwt
 from dotenv import load_dotenv
 
+from models import codec
+
+from .auth import CustomerRegistry, TokenAuthority
+from .cache import ResponseCache
+from .columnar import BUCKET_SECONDS, CallTableCache, epoch_to_iso
+from .details import MAX_BATCH_SIZE, CallDetailFetcher
+from .events import EventBroker
+from .export import EXPORT_FORMATS, stream_calls_export
+from .mirror import CallFilter, CallMirror, MirrorSyncer, SyncState, decode_cursor, encode_cursor
+from .ratelimit import BATCH_CALLS_PER_TOKEN, ENDPOINT_COSTS, RateLimiter
+from .records import AgentRecords, RecordQuery, RecordSpec
+from .rollups import RollupEngine
+from .search import SearchQueryError, TranscriptIndex
+from .vapi_source import MAX_PAGE_SIZE, VapiSourceError, iter_vapi_calls
+from .webhooks import WebhookIngester
+
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the call mirror syncer for the lifetime of the app."""
+    if VAPI_API_KEY:
+        mirror_syncer.start()
+    webhook_ingester.start()
+    yield
+    call_events.close()
+    await mirror_syncer.stop()
+    await webhook_ingester.stop()
+    await call_details.close()
+
+
 app = FastAPI(
     title="Voice Agent Customer Portal",
     description="Access call transcripts, appointments, and analytics for your voice agent",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS for web dashboard
@@ -38,11 +73,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Data-Synced-At", "X-Data-Age-Seconds"],
 )
 
 # Configuration
 VAPI_API_KEY = os.getenv("VAPI_API_KEY")
-JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
+JWT_SECRET = os.getenv("JWT_SECRET")
+VAPI_WEBHOOK_SECRET = os.getenv("VAPI_WEBHOOK_SECRET")
 
 # Customer database (in production, use a real database)
 CUSTOMERS = {
@@ -51,10 +88,41 @@ CUSTOMERS = {
         "assistant_id": "b543468c-e12e-481f-abb6-d0e129c7e5bb",
         "company_name": "Arval BNP Paribas",
         "phone_numbers": ["+14087312213"]
+        # "data_dir": where this customer's agent writes appointments.json and
+        # leads.json (default: PORTAL_AGENT_DATA_DIR, for PORTAL_AGENT_DATA_OWNER
+        # only; other customers without one see no appointments or leads)
     }
     # Add more customers here
 }
 
+# Call customer_registry.refresh() after changing CUSTOMERS at runtime
+customer_registry = CustomerRegistry(CUSTOMERS)
+token_authority = TokenAuthority(JWT_SECRET, customer_registry)
+
+# Per-customer request budget; see ENDPOINT_COSTS for what each endpoint draws
+rate_limiter = RateLimiter()
+
+# Local call mirror, kept fresh in the background for every customer's assistant
+call_mirror = CallMirror()
+call_rollups = RollupEngine(call_mirror)
+call_tables = CallTableCache(call_mirror)
+call_search = TranscriptIndex(call_mirror)
+response_cache = ResponseCache(call_mirror)
+call_events = EventBroker(call_mirror)
+
+# Live call details from Vapi, shared across requests
+call_details = CallDetailFetcher()
+mirror_syncer = MirrorSyncer(
+    call_mirror,
+    lambda: [config["assistant_id"] for config in CUSTOMERS.values()],
+)
+
+# Calls pushed by Vapi webhooks, written to the same mirror
+webhook_ingester = WebhookIngester(
+    call_mirror,
+    lambda: [config["assistant_id"] for config in CUSTOMERS.values()],
+)
+
 
 # Models
 class CallRecord(BaseModel):
@@ -68,6 +136,48 @@ class CallRecord(BaseModel):
     status: str
 
 
+# CallRecord field -> mirror column, in response order
+CALL_RECORD_COLUMNS = {
+    "id": "id",
+    "started_at": "started_at",
+    "ended_at": "ended_at",
+    "duration_seconds": "duration_seconds",
+    "caller_phone": "caller",
+    "transcript": "transcript",
+    "summary": "summary",
+    "status": "status",
+}
+MAX_CALLS_PAGE_SIZE = 500
+
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    assistant_id: str
+
+
+class CallBatchRequest(BaseModel):
+    call_ids: List[str]
+
+
+class CallSearchHit(BaseModel):
+    id: str
+    started_at: Optional[str]
+    caller_phone: Optional[str]
+    status: Optional[str]
+    summary: Optional[str]
+    snippet: str
+    score: float
+
+
+class CallSearchResults(BaseModel):
+    query: str
+    results: List[CallSearchHit]
+    offset: int
+    next_offset: Optional[int]
+
+
 class Appointment(BaseModel):
     id: str
     customer_name: str
@@ -88,9 +198,38 @@ class Lead(BaseModel):
     contact_phone: str
     company_name: Optional[str]
     vehicle_interests: Optional[str]
+    status: str
+    priority: Optional[str]
+    score: Optional[int]
     created_at: str
 
 
+# Appointments and leads written by the agent's tools, indexed for listing
+agent_records = AgentRecords({
+    "appointments": RecordSpec(
+        filename="appointments.json",
+        model=Appointment,
+        renames={
+            "appointment_type": "type",
+            "preferred_date": "date",
+            "preferred_time": "time_slot",
+        },
+        sort_field="preferred_date",
+        equality_fields=("status", "appointment_type"),
+    ),
+    "leads": RecordSpec(
+        filename="leads.json",
+        model=Lead,
+        renames={},
+        sort_field="created_at",
+        equality_fields=("status", "priority"),
+        range_fields=("score",),
+        defaults={"company_name": None, "vehicle_interests": None, "status": "New",
+                  "priority": None, "score": None},
+    ),
+})
+
+
 class Analytics(BaseModel):
     total_calls: int
     total_duration_minutes: int
@@ -100,31 +239,140 @@ class Analytics(BaseModel):
     calls_this_month: int
     appointments_booked: int
     leads_captured: int
+    status_breakdown: Dict[str, int] = {}
+
+
+class TimeseriesBucket(BaseModel):
+    start: str
+    calls: int
+    total_duration_seconds: int
+
+
+class DurationHistogram(BaseModel):
+    bin_edges_seconds: List[float]
+    counts: List[int]
+
+
+class TimeseriesAnalytics(BaseModel):
+    granularity: str
+    total_calls: int
+    unique_callers: int
+    buckets: List[TimeseriesBucket]
+    calls_by_hour_of_day: List[int]
+    busiest_hours_heatmap: List[List[int]]  # 7 weekdays (Monday first) x 24 hours, UTC
+    duration_percentiles_seconds: Dict[str, float]
+    duration_histogram: DurationHistogram
+    status_breakdown: Dict[str, int]
 
 
 # Authentication
-async def verify_customer(x_api_key: str = Header(...)) -> Dict:
-    """Verify customer API key and return their config."""
-    for customer_id, config in CUSTOMERS.items():
-        if config["api_key"] == x_api_key:
-            return {"customer_id": customer_id, **config}
-    raise HTTPException(status_code=401, detail="Invalid API key")
+async def verify_customer(
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+) -> Dict:
+    """Verify the customer's API key or bearer token and return their config."""
+    if x_api_key:
+        customer = customer_registry.authenticate(x_api_key)
+        if customer is None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return customer
+    
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        require_token_secret()
+        customer = token_authority.verify(token.strip())
+        if customer is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        return customer
+    
+    raise HTTPException(
+        status_code=401,
+        detail="Missing credentials: send X-API-Key or Authorization: Bearer <token>"
+    )
+
+
+def require_token_secret() -> None:
+    """Refuse session tokens while no signing secret is configured."""
+    if not token_authority.secret:
+        raise HTTPException(status_code=503, detail="Token signing secret not configured")
+
+
+async def verify_api_key(x_api_key: str = Header(...)) -> Dict:
+    """Verify a customer API key; session tokens cannot be used to mint new tokens."""
+    customer = customer_registry.authenticate(x_api_key)
+    if customer is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return customer
+
+
+def enforce_rate_limit(customer: Dict, cost: float) -> None:
+    """Charge a request to the customer's rate limit, rejecting it with 429 if exhausted."""
+    retry_after = rate_limiter.acquire(customer["customer_id"], cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+
+def rate_limited(endpoint: str):
+    """Build a dependency that authenticates the customer and charges the endpoint's cost."""
+    cost = ENDPOINT_COSTS[endpoint]
+    
+    async def dependency(customer: Dict = Depends(verify_customer)) -> Dict:
+        enforce_rate_limit(customer, cost)
+        return customer
+    
+    return dependency
+
+
+def upstream_busy() -> HTTPException:
+    """Error for requests refused because Vapi already has too many requests in flight."""
+    return HTTPException(
+        status_code=429,
+        detail="Too many upstream requests in progress, retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+
+# Call mirror helpers
+def freshness_headers(state: SyncState) -> Dict[str, str]:
+    """Build headers describing how fresh the mirrored data is."""
+    headers = {"X-Data-Synced-At": state.synced_at.isoformat() if state.synced_at else "never"}
+    if state.age_seconds is not None:
+        headers["X-Data-Age-Seconds"] = str(int(state.age_seconds))
+    return headers
+
+
+async def mirror_state(customer: Dict, response: Response) -> SyncState:
+    """Ensure the customer's mirror has been synced and report its freshness."""
+    state = await mirror_syncer.ensure_synced(customer["assistant_id"])
+    response.headers.update(freshness_headers(state))
+    return state
+
+
+def parse_date_param(name: str, value: Optional[str]) -> Optional[str]:
+    """Validate an optional YYYY-MM-DD query parameter."""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be in YYYY-MM-DD format")
 
 
 # Vapi API Helper
 async def fetch_vapi_calls(assistant_id: str, limit: int = 100) -> List[Dict]:
-    """Fetch calls from Vapi for a specific assistant."""
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.vapi.ai/call?assistantId={assistant_id}&limit={limit}"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                return await response.json()
-            return []
+    """Fetch up to `limit` calls from Vapi for a specific assistant."""
+    page_size = min(limit, MAX_PAGE_SIZE)
+    try:
+        return [
+            call
+            async for call in iter_vapi_calls(assistant_id, page_size=page_size, max_calls=limit)
+        ]
+    except VapiSourceError:
+        return []
 
 
 # Endpoints
@@ -134,199 +382,549 @@ async def root():
         "service": "Voice Agent Customer Portal",
         "version": "1.0.0",
         "endpoints": [
+            "/auth/token",
             "/calls",
+            "/calls/search",
+            "/calls/batch",
             "/calls/{call_id}",
             "/appointments",
             "/leads",
-            "/analytics"
+            "/analytics",
+            "/analytics/timeseries",
+            "/export/calls",
+            "/sync/status",
+            "/cache/stats",
+            "/webhooks/vapi"
         ]
     }
 
 
+@app.post("/auth/token", response_model=TokenResponse)
+async def issue_token(customer: Dict = Depends(verify_api_key)):
+    """
+    Exchange an API key for a short-lived session token.
+    
+    Send the token as `Authorization: Bearer <token>` instead of `X-API-Key`.
+    Returns 503 while `JWT_SECRET` is not set.
+    """
+    require_token_secret()
+    return TokenResponse(
+        access_token=token_authority.issue(customer),
+        expires_in=token_authority.ttl_seconds,
+        assistant_id=customer["assistant_id"],
+    )
+
+
 @app.get("/calls", response_model=List[CallRecord])
 async def get_calls(
-    customer: Dict = Depends(verify_customer),
+    request: Request,
+    customer: Dict = Depends(rate_limited("list")),
     limit: int = 50,
+    cursor: Optional[str] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    status: Optional[str] = None,
+    caller: Optional[str] = None,
+    min_duration: Optional[int] = None,
+    fields: Optional[str] = None
 ):
     """
-    Get all calls for the customer's assistant.
+    Get calls for the customer's assistant, newest first, served from the local mirror.
     
-    - **limit**: Maximum number of calls to return (default: 50)
-    - **start_date**: Filter calls after this date (YYYY-MM-DD)
-    - **end_date**: Filter calls before this date (YYYY-MM-DD)
+    - **limit**: Maximum number of calls per page (1-500, default: 50)
+    - **cursor**: Continue from the `X-Next-Cursor` header of the previous page
+    - **start_date**: Only calls on or after this date (YYYY-MM-DD)
+    - **end_date**: Only calls on or before this date (YYYY-MM-DD)
+    - **status**: Only calls with this status
+    - **caller**: Only calls from this phone number
+    - **min_duration**: Only calls lasting at least this many seconds
+    - **fields**: Comma-separated fields to return, e.g. `id,started_at,status` (default: all)
     """
-    calls = await fetch_vapi_calls(customer["assistant_id"], limit)
+    if not 1 <= limit <= MAX_CALLS_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"limit must be between 1 and {MAX_CALLS_PAGE_SIZE}"
+        )
+    if min_duration is not None and min_duration < 0:
+        raise HTTPException(status_code=400, detail="min_duration must not be negative")
+    
+    selected = list(CALL_RECORD_COLUMNS)
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(CALL_RECORD_COLUMNS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}. "
+                       f"Choose from: {', '.join(CALL_RECORD_COLUMNS)}"
+            )
+        # The id is always returned so rows can be linked to /calls/{call_id}
+        selected = [field for field in CALL_RECORD_COLUMNS if field == "id" or field in requested]
+    
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    filters = CallFilter(
+        start_date=parse_date_param("start_date", start_date),
+        end_date=parse_date_param("end_date", end_date),
+        status=status,
+        caller=caller,
+        min_duration_seconds=min_duration,
+    )
     
-    results = []
-    for call in calls:
-        # Calculate duration
-        duration = None
-        if call.get("startedAt") and call.get("endedAt"):
-            start = datetime.fromisoformat(call["startedAt"].replace("Z", "+00:00"))
-            end = datetime.fromisoformat(call["endedAt"].replace("Z", "+00:00"))
-            duration = int((end - start).total_seconds())
+    async def render() -> Response:
+        state = await mirror_syncer.ensure_synced(customer["assistant_id"])
+        rows, next_key = call_mirror.list_call_page(
+            customer["assistant_id"],
+            [CALL_RECORD_COLUMNS[field] for field in selected],
+            filters,
+            limit,
+            after,
+        )
         
-        results.append(CallRecord(
-            id=call.get("id", ""),
-            started_at=call.get("startedAt", ""),
-            ended_at=call.get("endedAt"),
-            duration_seconds=duration,
-            caller_phone=call.get("customer", {}).get("number"),
-            transcript=call.get("transcript"),
-            summary=call.get("summary"),
-            status=call.get("status", "unknown")
-        ))
+        # Rows are already plain dicts in CallRecord shape, so skip per-row model validation
+        calls = [
+            {field: row[CALL_RECORD_COLUMNS[field]] for field in selected}
+            for row in rows
+        ]
+        for call in calls:
+            if "started_at" in call and call["started_at"] is None:
+                call["started_at"] = ""
+            if "status" in call and call["status"] is None:
+                call["status"] = "unknown"
+        
+        headers = freshness_headers(state)
+        if next_key is not None:
+            headers["X-Next-Cursor"] = encode_cursor(next_key)
+        return JSONResponse(calls, headers=headers)
     
-    return results
+    return await response_cache.respond(
+        request, customer["customer_id"], customer["assistant_id"], render
+    )
+
+
+@app.get("/calls/search", response_model=CallSearchResults)
+async def search_calls(
+    q: str,
+    response: Response,
+    customer: Dict = Depends(rate_limited("search")),
+    limit: int = 20,
+    offset: int = 0
+):
+    """
+    Search call transcripts and summaries, best matches first.
+    
+    - **q**: Words that must all appear; use "quotes" for phrases and a trailing * for prefixes
+    - **limit**: Maximum number of results (1-100, default: 20)
+    - **offset**: Results to skip, for pagination (use `next_offset` from the previous page)
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    
+    await mirror_state(customer, response)
+    try:
+        hits, has_more = await asyncio.to_thread(
+            call_search.search, customer["assistant_id"], q, limit, offset
+        )
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return CallSearchResults(
+        query=q,
+        results=[
+            CallSearchHit(
+                id=hit.id,
+                started_at=hit.started_at,
+                caller_phone=hit.caller,
+                status=hit.status,
+                summary=hit.summary,
+                snippet=hit.snippet,
+                score=hit.score
+            )
+            for hit in hits
+        ],
+        offset=offset,
+        next_offset=offset + len(hits) if has_more else None
+    )
+
+
+@app.get("/calls/stream")
+async def stream_call_events(customer: Dict = Depends(rate_limited("stream"))):
+    """
+    Stream live call events as server-sent events.
+    
+    Sends `call-started`, `call-ended` and `tool-invoked` events for the
+    customer's assistant as they happen, so dashboards don't need to poll
+    `/calls`. A `dropped` event means the client fell behind and missed events.
+    """
+    if not call_events.has_capacity:
+        raise HTTPException(
+            status_code=503, detail="Too many live subscribers", headers={"Retry-After": "5"}
+        )
+    return StreamingResponse(
+        call_events.stream(customer["assistant_id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/calls/batch")
+async def get_call_details_batch(
+    batch: CallBatchRequest,
+    customer: Dict = Depends(verify_customer)
+):
+    """
+    Get full details for many calls at once, streamed as NDJSON.
+    
+    Calls are fetched concurrently and each line is written as soon as its call
+    arrives, so lines are in completion order rather than request order. Each
+    line is `{"id": ..., "call": {...}}` or `{"id": ..., "error": ...}`, where the
+    error is `not_found`, `access_denied`, `upstream_busy` or `upstream_error`.
+    """
+    if not batch.call_ids:
+        raise HTTPException(status_code=400, detail="call_ids must not be empty")
+    if len(batch.call_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_SIZE} call_ids per batch"
+        )
+    enforce_rate_limit(customer, math.ceil(len(batch.call_ids) / BATCH_CALLS_PER_TOKEN))
+    
+    async def lines():
+        async for result in call_details.iter_owned(batch.call_ids, customer["assistant_id"]):
+            yield json.dumps(result, separators=(",", ":")) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.get("/calls/{call_id}")
 async def get_call_detail(
     call_id: str,
-    customer: Dict = Depends(verify_customer)
+    customer: Dict = Depends(rate_limited("detail"))
 ):
     """Get detailed information about a specific call including full transcript."""
-    headers = {
-        "Authorization": f"Bearer {VAPI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.vapi.ai/call/{call_id}"
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                call = await response.json()
-                # Verify this call belongs to the customer's assistant
-                if call.get("assistantId") != customer["assistant_id"]:
-                    raise HTTPException(status_code=403, detail="Access denied")
-                return call
-            raise HTTPException(status_code=404, detail="Call not found")
+    result = await call_details.get_owned(call_id, customer["assistant_id"])
+    if result.get("error") == "access_denied":
+        # This call belongs to another customer's assistant
+        raise HTTPException(status_code=403, detail="Access denied")
+    if result.get("error") == "upstream_busy":
+        raise upstream_busy()
+    if result.get("error") == "upstream_error":
+        raise HTTPException(status_code=502, detail="Call lookup failed upstream")
+    if "call" not in result:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return result["call"]
+
+
+def record_page(
+    kind: str,
+    customer: Dict,
+    query: RecordQuery,
+    limit: int,
+    cursor: Optional[str]
+) -> JSONResponse:
+    """Serve one cursor-paginated page of the customer's agent records."""
+    if not 1 <= limit <= MAX_CALLS_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"limit must be between 1 and {MAX_CALLS_PAGE_SIZE}"
+        )
+    try:
+        after = decode_cursor(cursor, size=2) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Rows are projected into the response model when the index is built
+    rows, next_key = agent_records.index(kind, customer).page(query, limit, after)
+    headers = {"X-Next-Cursor": encode_cursor(next_key)} if next_key is not None else {}
+    return Response(codec.dumps(rows), media_type="application/json", headers=headers)
 
 
 @app.get("/appointments", response_model=List[Appointment])
 async def get_appointments(
-    customer: Dict = Depends(verify_customer),
-    status: Optional[str] = None
+    customer: Dict = Depends(rate_limited("list")),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
 ):
     """
-    Get all appointments booked through the voice agent.
+    Get appointments booked through the voice agent, latest appointment date first.
     
-    In production, this would query your appointments database.
-    For now, this extracts appointments from call tool calls.
+    - **limit**: Maximum number of appointments per page (1-500, default: 50)
+    - **cursor**: Continue from the `X-Next-Cursor` header of the previous page
+    - **status**: Only appointments with this status, e.g. `Confirmed`
+    - **type**: Only appointments of this type, e.g. `MOT`
+    - **start_date**: Only appointments on or after this date (YYYY-MM-DD)
+    - **end_date**: Only appointments on or before this date (YYYY-MM-DD)
     """
-    # In production: query your database
-    # For demo: return sample data
-    return [
-        Appointment(
-            id="apt_001",
-            customer_name="John Smith",
-            contact_phone="+44 7700 900000",
-            contact_email="john@example.com",
-            appointment_type="MOT",
-            preferred_date="2026-01-15",
-            preferred_time="Morning (9-12)",
-            vehicle_registration="AB12 CDE",
-            status="confirmed",
-            created_at="2026-01-07T10:30:00Z"
-        )
-    ]
+    equals = {"status": status, "appointment_type": type}
+    query = RecordQuery(
+        equals={name: value for name, value in equals.items() if value},
+        start_date=parse_date_param("start_date", start_date),
+        end_date=parse_date_param("end_date", end_date),
+    )
+    # The store reloads the file from disk when it changes, so keep that off the event loop
+    return await asyncio.to_thread(record_page, "appointments", customer, query, limit, cursor)
 
 
 @app.get("/leads", response_model=List[Lead])
 async def get_leads(
-    customer: Dict = Depends(verify_customer)
+    customer: Dict = Depends(rate_limited("list")),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
 ):
     """
-    Get all leads captured through the voice agent.
+    Get leads captured through the voice agent, newest first.
     
-    In production, this would query your leads database.
+    - **limit**: Maximum number of leads per page (1-500, default: 50)
+    - **cursor**: Continue from the `X-Next-Cursor` header of the previous page
+    - **status**: Only leads with this status, e.g. `New`
+    - **priority**: Only leads with this priority: `High`, `Medium`, `Standard` or `Low`
+      (case-insensitive)
+    - **min_score** / **max_score**: Only leads scored within this range (inclusive)
+    - **start_date**: Only leads captured on or after this date (YYYY-MM-DD)
+    - **end_date**: Only leads captured on or before this date (YYYY-MM-DD)
     """
-    # In production: query your database
-    return []
+    equals = {"status": status, "priority": priority}
+    ranges = {}
+    if min_score is not None or max_score is not None:
+        ranges["score"] = (min_score, max_score)
+    query = RecordQuery(
+        equals={name: value for name, value in equals.items() if value},
+        ranges=ranges,
+        start_date=parse_date_param("start_date", start_date),
+        end_date=parse_date_param("end_date", end_date),
+    )
+    return await asyncio.to_thread(record_page, "leads", customer, query, limit, cursor)
 
 
 @app.get("/analytics", response_model=Analytics)
 async def get_analytics(
-    customer: Dict = Depends(verify_customer),
+    request: Request,
+    customer: Dict = Depends(rate_limited("analytics")),
     period: str = "month"  # day, week, month, year
 ):
     """
     Get analytics for the voice agent.
     
-    - **period**: Time period for analytics (day, week, month, year)
+    - **period**: Time period for the status breakdown (day, week, month, year)
     """
-    calls = await fetch_vapi_calls(customer["assistant_id"], 1000)
+    async def render() -> Response:
+        state = await mirror_syncer.ensure_synced(customer["assistant_id"])
+        
+        # Each figure is summed from per-day rollups rather than raw calls
+        today = datetime.now(timezone.utc).date()
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        period_starts = {
+            "day": today,
+            "week": week_start,
+            "month": month_start,
+            "year": today.replace(month=1, day=1),
+        }
+        
+        assistant_id = customer["assistant_id"]
+        totals = call_rollups.summary(assistant_id)
+        total_calls = totals.calls
+        total_duration = totals.total_duration_seconds
+        period_start = period_starts.get(period, month_start)
+        period_summary = call_rollups.summary(assistant_id, start=period_start)
+        appointments, leads = await asyncio.gather(
+            asyncio.to_thread(agent_records.index, "appointments", customer),
+            asyncio.to_thread(agent_records.index, "leads", customer),
+        )
+        
+        analytics = Analytics(
+            total_calls=total_calls,
+            total_duration_minutes=total_duration // 60,
+            average_call_duration_seconds=totals.average_duration_seconds,
+            calls_today=call_rollups.summary(assistant_id, start=today).calls,
+            calls_this_week=call_rollups.summary(assistant_id, start=week_start).calls,
+            calls_this_month=call_rollups.summary(assistant_id, start=month_start).calls,
+            appointments_booked=len(appointments),
+            leads_captured=len(leads),
+            status_breakdown=period_summary.status_counts
+        )
+        return JSONResponse(jsonable_encoder(analytics), headers=freshness_headers(state))
     
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=now.weekday())
-    month_start = today_start.replace(day=1)
+    return await response_cache.respond(
+        request, customer["customer_id"], customer["assistant_id"], render
+    )
+
+
+@app.get("/analytics/timeseries", response_model=TimeseriesAnalytics)
+async def get_analytics_timeseries(
+    request: Request,
+    customer: Dict = Depends(rate_limited("analytics")),
+    granularity: str = "day",  # hour, day or week
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    histogram_bins: int = 20
+):
+    """
+    Get vectorized call analytics over time.
     
-    total_duration = 0
-    calls_today = 0
-    calls_this_week = 0
-    calls_this_month = 0
+    - **granularity**: Bucket size for the time series (hour, day or week)
+    - **start_date**: Only calls on or after this date (YYYY-MM-DD)
+    - **end_date**: Only calls on or before this date (YYYY-MM-DD)
+    - **histogram_bins**: Number of bins in the duration histogram
+    """
+    if granularity not in BUCKET_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported granularity. Choose from: {', '.join(BUCKET_SECONDS)}"
+        )
+    if not 1 <= histogram_bins <= 200:
+        raise HTTPException(status_code=400, detail="histogram_bins must be between 1 and 200")
+    start = parse_date_param("start_date", start_date)
+    end = parse_date_param("end_date", end_date)
     
-    for call in calls:
-        started_at = call.get("startedAt")
-        if started_at:
-            call_time = datetime.fromisoformat(started_at.replace("Z", "+00:00")).replace(tzinfo=None)
-            
-            if call_time >= today_start:
-                calls_today += 1
-            if call_time >= week_start:
-                calls_this_week += 1
-            if call_time >= month_start:
-                calls_this_month += 1
+    async def render() -> Response:
+        state = await mirror_syncer.ensure_synced(customer["assistant_id"])
+        # A rebuild reads every call from SQLite; keep it off the event loop
+        table = await asyncio.to_thread(call_tables.get, customer["assistant_id"])
+        if start or end:
+            table = table.between(
+                datetime.fromisoformat(start).replace(tzinfo=timezone.utc) if start else None,
+                datetime.fromisoformat(end).replace(tzinfo=timezone.utc) + timedelta(days=1)
+                if end else None,
+            )
         
-        # Calculate duration
-        if call.get("startedAt") and call.get("endedAt"):
-            start = datetime.fromisoformat(call["startedAt"].replace("Z", "+00:00"))
-            end = datetime.fromisoformat(call["endedAt"].replace("Z", "+00:00"))
-            total_duration += int((end - start).total_seconds())
-    
-    avg_duration = total_duration // len(calls) if calls else 0
+        series = table.group_by_time(granularity)
+        counts, edges = table.duration_histogram(histogram_bins)
+        
+        timeseries = TimeseriesAnalytics(
+            granularity=granularity,
+            total_calls=len(table),
+            unique_callers=table.unique_callers(),
+            buckets=[
+                TimeseriesBucket(
+                    start=epoch_to_iso(bucket_start), calls=calls, total_duration_seconds=total
+                )
+                for bucket_start, calls, total in zip(
+                    series["bucket_start"].tolist(),
+                    series["calls"].tolist(),
+                    series["total_duration"].tolist(),
+                )
+            ],
+            calls_by_hour_of_day=table.hour_of_day_counts().tolist(),
+            busiest_hours_heatmap=table.busiest_hours_heatmap().tolist(),
+            duration_percentiles_seconds=table.duration_percentiles(),
+            duration_histogram=DurationHistogram(
+                bin_edges_seconds=edges.tolist(),
+                counts=counts.tolist(),
+            ),
+            status_breakdown=table.status_counts(),
+        )
+        return JSONResponse(jsonable_encoder(timeseries), headers=freshness_headers(state))
     
-    return Analytics(
-        total_calls=len(calls),
-        total_duration_minutes=total_duration // 60,
-        average_call_duration_seconds=avg_duration,
-        calls_today=calls_today,
-        calls_this_week=calls_this_week,
-        calls_this_month=calls_this_month,
-        appointments_booked=0,  # Query from database
-        leads_captured=0  # Query from database
+    return await response_cache.respond(
+        request, customer["customer_id"], customer["assistant_id"], render
     )
 
 
 @app.get("/export/calls")
 async def export_calls(
-    customer: Dict = Depends(verify_customer),
-    format: str = "json"  # json or csv
+    customer: Dict = Depends(rate_limited("export")),
+    format: str = "json",  # json, csv, ndjson or msgpack
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status: Optional[str] = None,
+    compress: bool = False
 ):
-    """Export all calls as JSON or CSV for compliance/archival."""
-    calls = await fetch_vapi_calls(customer["assistant_id"], 10000)
+    """
+    Export all calls for compliance/archival, streamed as it is generated.
     
-    if format == "csv":
-        import csv
-        import io
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["ID", "Started", "Ended", "Duration", "Caller", "Status"])
-        for call in calls:
-            writer.writerow([
-                call.get("id"),
-                call.get("startedAt"),
-                call.get("endedAt"),
-                call.get("duration"),
-                call.get("customer", {}).get("number"),
-                call.get("status")
-            ])
-        return {"content": output.getvalue(), "format": "csv"}
+    - **format**: Output format (json, csv, ndjson or msgpack)
+    - **start_date**: Only calls on or after this date (YYYY-MM-DD)
+    - **end_date**: Only calls on or before this date (YYYY-MM-DD)
+    - **status**: Only calls with this status
+    - **compress**: Gzip the output
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format. Choose from: {', '.join(EXPORT_FORMATS)}"
+        )
+    filters = CallFilter(
+        start_date=parse_date_param("start_date", start_date),
+        end_date=parse_date_param("end_date", end_date),
+        status=status,
+    )
+    
+    state = await mirror_syncer.ensure_synced(customer["assistant_id"])
+    headers = freshness_headers(state)
+    filename = f"calls-export.{format}{'.gz' if compress else ''}"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    
+    return StreamingResponse(
+        stream_calls_export(call_mirror, customer["assistant_id"], format, filters, compress),
+        media_type="application/gzip" if compress else EXPORT_FORMATS[format],
+        headers=headers,
+    )
+
+
+@app.post("/webhooks/vapi", status_code=202)
+async def receive_vapi_webhook(
+    request: Request,
+    x_vapi_secret: Optional[str] = Header(None)
+):
+    """
+    Receive Vapi server messages (status updates and end-of-call reports).
     
-    return {"calls": calls, "format": "json"}
+    Set the assistant's server URL to this endpoint and its server secret to
+    `VAPI_WEBHOOK_SECRET`. Events are queued and written to the call mirror
+    in the background, so the response doesn't wait for the database.
+    Tool-call messages are relayed to `/calls/stream` subscribers.
+    """
+    if not VAPI_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+    if not x_vapi_secret or not hmac.compare_digest(x_vapi_secret, VAPI_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    message = payload.get("message") if isinstance(payload, dict) else None
+    if not isinstance(message, dict):
+        raise HTTPException(status_code=400, detail="Body must contain a message object")
+    
+    if message.get("type") == "tool-calls":
+        call_events.publish_tool_calls(message)
+    if not webhook_ingester.submit(message):
+        raise HTTPException(
+            status_code=503, detail="Ingestion queue full", headers={"Retry-After": "1"}
+        )
+    return {"received": True}
+
+
+@app.get("/sync/status")
+async def get_sync_status(customer: Dict = Depends(rate_limited("status"))):
+    """Get the freshness of the customer's local call mirror."""
+    state = call_mirror.get_sync_state(customer["assistant_id"])
+    return {
+        "assistant_id": customer["assistant_id"],
+        "synced_at": state.synced_at.isoformat() if state.synced_at else None,
+        "age_seconds": int(state.age_seconds) if state.age_seconds is not None else None,
+        "sync_interval_seconds": mirror_syncer.interval_seconds,
+        "calls_mirrored": call_mirror.count_calls(customer["assistant_id"]),
+    }
+
+
+@app.get("/cache/stats")
+async def get_cache_stats(customer: Dict = Depends(rate_limited("status"))):
+    """Get response cache hit/miss counters."""
+    return response_cache.snapshot()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+"""
+Customer authentication for the Customer Portal.
+
+API keys are looked up through an index of their SHA-256 digests, so
+authentication costs one hash and one dict lookup however many tenants
+there are, and the final comparison is constant-time. Customers can trade
+their API key for a short-lived JWT; verified tokens are cached with
+their resolved customer until they expire, so hot requests skip both the
+registry and the signature check.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+
+TOKEN_TTL_SECONDS = int(os.getenv("PORTAL_TOKEN_TTL_SECONDS", "900"))
+TOKEN_CACHE_SIZE = 10000
+TOKEN_ALGORITHM = "HS256"
+TOKEN_ISSUER = "customer-portal"
+
+
+def hash_api_key(api_key: str) -> str:
+    """Digest an API key for indexing."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class CustomerRegistry:
+    """Customers indexed by id and by API key digest."""
+
+    def __init__(self, customers: Dict[str, Dict[str, Any]]):
+        """
+        Initialize the registry.
+
+        Args:
+            customers: Customer configs keyed by customer id, each with an `api_key`
+        """
+        self.customers = customers
+        self._by_key_hash: Dict[str, str] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Rebuild the key index after customers are added, removed or rotated."""
+        self._by_key_hash = {
+            hash_api_key(config["api_key"]): customer_id
+            for customer_id, config in self.customers.items()
+        }
+
+    def get(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """Get a customer's config, including its `customer_id`."""
+        config = self.customers.get(customer_id)
+        return {"customer_id": customer_id, **config} if config is not None else None
+
+    def authenticate(self, api_key: str) -> Optional[Dict[str, Any]]:
+        """Get the customer owning an API key, or None if the key is unknown."""
+        digest = hash_api_key(api_key)
+        customer_id = self._by_key_hash.get(digest)
+        if customer_id is None:
+            return None
+        customer = self.get(customer_id)
+        # Confirm against the stored key so a stale index can't authenticate a rotated key
+        if customer is None or not hmac.compare_digest(hash_api_key(customer["api_key"]), digest):
+            return None
+        return customer
+
+
+class TokenAuthority:
+    """Issues and verifies short-lived customer session tokens."""
+
+    def __init__(
+        self,
+        secret: Optional[str],
+        registry: CustomerRegistry,
+        ttl_seconds: int = TOKEN_TTL_SECONDS,
+        cache_size: int = TOKEN_CACHE_SIZE,
+    ):
+        """
+        Initialize the authority.
+
+        Args:
+            secret: HMAC signing secret, or None if not configured
+            registry: Registry tokens are resolved against
+            ttl_seconds: Lifetime of issued tokens
+            cache_size: Number of verified tokens kept in memory
+        """
+        self.secret = secret
+        self.registry = registry
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._verified: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, customer: Dict[str, Any]) -> str:
+        """Issue a token for an authenticated customer."""
+        now = int(time.time())
+        claims = {
+            "sub": customer["customer_id"],
+            "assistant_id": customer["assistant_id"],
+            "iss": TOKEN_ISSUER,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+        }
+        return jwt.encode(claims, self.secret, algorithm=TOKEN_ALGORITHM)
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a token to its customer, or None if it is invalid or expired.
+
+        Tokens whose customer has since been removed or moved to another
+        assistant are rejected.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._verified.get(token)
+            if cached is not None:
+                customer, expires_at = cached
+                if now < expires_at:
+                    self._verified.move_to_end(token)
+                    return customer
+                del self._verified[token]
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret,
+                algorithms=[TOKEN_ALGORITHM],
+                issuer=TOKEN_ISSUER,
+                options={"require": ["exp", "sub", "assistant_id"]},
+            )
+        except jwt.InvalidTokenError:
+            return None
+
+        customer = self.registry.get(claims["sub"])
+        if customer is None or customer["assistant_id"] != claims["assistant_id"]:
+            return None
+
+        with self._lock:
+            self._verified[token] = (customer, float(claims["exp"]))
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return customer
+
+    def clear(self) -> None:
+        """Forget every verified token, e.g. after revoking a customer."""
+        with self._lock:
+            self._verified.clear()
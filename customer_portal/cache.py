@@ -0,0 +1,238 @@
+"""
+Response cache for polled Customer Portal endpoints.
+
+Dashboards poll `/calls` and `/analytics` every few seconds. Rendered
+responses are cached per customer and per query with a short TTL, served
+stale for a grace period while a single background task refreshes them,
+and tagged with strong ETags so unchanged polls are answered with 304.
+Mirror writes mark an assistant's entries stale so new calls show up on
+the next poll.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from .mirror import CallMirror
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_TTL_SECONDS = float(os.getenv("PORTAL_CACHE_TTL_SECONDS", "5"))
+CACHE_STALE_SECONDS = float(os.getenv("PORTAL_CACHE_STALE_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("PORTAL_CACHE_MAX_ENTRIES", "1024"))
+
+# Headers recomputed when a cached body is served
+_UNCACHED_HEADERS = {"content-length", "content-type", "etag", "cache-control", "x-cache"}
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass
+class CachedResponse:
+    """A rendered response body and the headers it was produced with."""
+    body: bytes
+    status_code: int
+    media_type: Optional[str]
+    headers: Dict[str, str]
+    etag: str
+    created_at: float
+    generation: int
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how requests were answered."""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    not_modified: int = 0
+    refreshes: int = 0
+    evictions: int = 0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+class ResponseCache:
+    """TTL response cache with stale-while-revalidate and ETags."""
+
+    SCHEMA = ""
+
+    def __init__(
+        self,
+        mirror: Optional[CallMirror] = None,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        stale_seconds: float = CACHE_STALE_SECONDS,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            mirror: Call mirror whose writes mark cached responses stale
+            ttl_seconds: How long a response is served without recomputation
+            stale_seconds: How long after the TTL a stale response may still be
+                served while it is refreshed in the background
+            max_entries: Least recently used entries are evicted beyond this
+        """
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mirror is not None:
+            mirror.add_listener(self)
+
+    def on_calls_upserted(self, conn: Any, changes: List[Tuple[Optional[Dict], Dict]]) -> None:
+        """Mark cached responses for assistants whose calls changed as stale."""
+        with self._lock:
+            for assistant_id in {new["assistant_id"] for _, new in changes}:
+                self._generations[assistant_id] = self._generations.get(assistant_id, 0) + 1
+
+    def _generation(self, assistant_id: str) -> int:
+        with self._lock:
+            return self._generations.get(assistant_id, 0)
+
+    async def respond(
+        self,
+        request: Request,
+        customer_id: str,
+        assistant_id: str,
+        render: Callable[[], Awaitable[Response]],
+    ) -> Response:
+        """
+        Answer a request from the cache, rendering it only when needed.
+
+        Args:
+            request: Incoming request; its path and query form the cache key
+            customer_id: Customer the response belongs to
+            assistant_id: Assistant whose mirrored data the response reflects
+            render: Produces the response; only 200 responses are cached
+
+        Returns:
+            The cached or freshly rendered response, or an empty 304 when the
+            client's If-None-Match already matches it
+        """
+        key = (customer_id, request.url.path, tuple(sorted(request.query_params.multi_items())))
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.created_at
+            current = entry.generation == self._generation(assistant_id)
+            if age < self.ttl_seconds and current:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return self._serve(entry, request, "HIT")
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stats.stale_hits += 1
+                self._refresh(key, assistant_id, render)
+                return self._serve(entry, request, "STALE")
+
+        self.stats.misses += 1
+        result = await asyncio.shield(self._refresh(key, assistant_id, render))
+        if isinstance(result, CachedResponse):
+            return self._serve(result, request, "MISS")
+        return result
+
+    def _refresh(
+        self,
+        key: CacheKey,
+        assistant_id: str,
+        render: Callable[[], Awaitable[Response]],
+    ) -> asyncio.Future:
+        """Render a key at most once at a time, sharing the result with concurrent callers."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, assistant_id, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_refresh(key, done))
+        return task
+
+    def _finish_refresh(self, key: CacheKey, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # Background refreshes have no awaiting request to surface errors to
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Cached response refresh failed for %s: %s", key[1], task.exception())
+
+    async def _render(
+        self,
+        key: CacheKey,
+        assistant_id: str,
+        render: Callable[[], Awaitable[Response]],
+    ) -> Any:
+        # Read the generation first, so a write during rendering leaves the entry stale
+        generation = self._generation(assistant_id)
+        response = await render()
+        self.stats.refreshes += 1
+        if response.status_code != 200 or not hasattr(response, "body"):
+            return response
+
+        entry = CachedResponse(
+            body=response.body,
+            status_code=response.status_code,
+            media_type=response.media_type,
+            headers={
+                name: value for name, value in response.headers.items()
+                if name.lower() not in _UNCACHED_HEADERS
+            },
+            etag=f'"{hashlib.sha256(response.body).hexdigest()[:32]}"',
+            created_at=time.monotonic(),
+            generation=generation,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        return entry
+
+    def _serve(self, entry: CachedResponse, request: Request, state: str) -> Response:
+        headers = {
+            **entry.headers,
+            "ETag": entry.etag,
+            "Cache-Control": f"private, max-age={int(self.ttl_seconds)}, "
+                             f"stale-while-revalidate={int(self.stale_seconds)}",
+            "X-Cache": state,
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.stats.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(
+            entry.body,
+            status_code=entry.status_code,
+            media_type=entry.media_type,
+            headers=headers,
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get cache counters, size and hit ratio."""
+        served = self.stats.hits + self.stats.stale_hits + self.stats.misses
+        return {
+            **asdict(self.stats),
+            "entries": len(self._entries),
+            "hit_ratio": round((self.stats.hits + self.stats.stale_hits) / served, 4)
+            if served else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+        }
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._entries.clear()
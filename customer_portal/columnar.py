@@ -0,0 +1,243 @@
+"""
+Columnar call table for vectorized portal analytics.
+
+Holds an assistant's calls as parallel NumPy arrays (start epoch, duration,
+status code, caller hash) instead of a list of dicts, so group-bys,
+percentiles, histograms and heatmaps over hundreds of thousands of calls
+run as a handful of array operations.
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .mirror import CallFilter, CallMirror
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+
+# The Unix epoch fell on a Thursday; shifting by 3 days aligns weeks to Monday
+WEEK_OFFSET_SECONDS = 3 * SECONDS_PER_DAY
+
+BUCKET_SECONDS = {
+    "hour": SECONDS_PER_HOUR,
+    "day": SECONDS_PER_DAY,
+    "week": SECONDS_PER_WEEK,
+}
+
+UNKNOWN_DURATION = -1
+TABLE_COLUMNS = ("started_ts", "duration_seconds", "status", "caller")
+
+
+@lru_cache(maxsize=65536)
+def hash_caller(number: Optional[str]) -> int:
+    """Hash a caller number to a stable 64-bit value (0 for unknown callers)."""
+    if not number:
+        return 0
+    return int.from_bytes(hashlib.blake2b(number.encode(), digest_size=8).digest(), "little")
+
+
+@dataclass
+class CallTable:
+    """Calls for one assistant stored as NumPy columns."""
+    start_epoch: np.ndarray  # int64 seconds since the Unix epoch (UTC)
+    duration: np.ndarray  # int32 seconds, UNKNOWN_DURATION when not ended
+    status_code: np.ndarray  # uint8 index into `statuses`
+    caller_hash: np.ndarray  # uint64, 0 when the caller is unknown
+    statuses: Tuple[str, ...]
+
+    @classmethod
+    def empty(cls) -> "CallTable":
+        """Create a table with no calls."""
+        return cls(
+            start_epoch=np.empty(0, dtype=np.int64),
+            duration=np.empty(0, dtype=np.int32),
+            status_code=np.empty(0, dtype=np.uint8),
+            caller_hash=np.empty(0, dtype=np.uint64),
+            statuses=(),
+        )
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Sequence[Any]]) -> "CallTable":
+        """
+        Build a table from pages of mirror rows with TABLE_COLUMNS.
+
+        Each page is converted to arrays as it arrives, so only one page of
+        rows is alive at a time. Calls that never started are skipped, since
+        they have no position in time.
+        """
+        vocabulary: Dict[str, int] = {}
+        parts = []
+        for rows in pages:
+            started = [row for row in rows if row["started_ts"] is not None]
+            count = len(started)
+            if not count:
+                continue
+            parts.append((
+                np.fromiter((row["started_ts"] for row in started), dtype=np.float64,
+                            count=count).astype(np.int64),
+                np.fromiter(
+                    (UNKNOWN_DURATION if row["duration_seconds"] is None
+                     else row["duration_seconds"] for row in started),
+                    dtype=np.int32, count=count,
+                ),
+                np.fromiter(
+                    (vocabulary.setdefault(row["status"] or "unknown", len(vocabulary))
+                     for row in started),
+                    dtype=np.uint8, count=count,
+                ),
+                np.fromiter((hash_caller(row["caller"]) for row in started),
+                            dtype=np.uint64, count=count),
+            ))
+
+        if not parts:
+            return cls.empty()
+        start_epoch, duration, status_code, caller_hash = (
+            np.concatenate(column) for column in zip(*parts)
+        )
+        return cls(start_epoch, duration, status_code, caller_hash, tuple(vocabulary))
+
+    @classmethod
+    def from_mirror(
+        cls,
+        mirror: CallMirror,
+        assistant_id: str,
+        filters: Optional[CallFilter] = None,
+    ) -> "CallTable":
+        """Load an assistant's mirrored calls into a table."""
+        return cls.from_pages(
+            mirror.iter_call_pages(assistant_id, TABLE_COLUMNS, filters, page_size=50000)
+        )
+
+    def __len__(self) -> int:
+        return len(self.start_epoch)
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> "CallTable":
+        """Select calls started in [start, end)."""
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.start_epoch >= int(start.timestamp())
+        if end is not None:
+            mask &= self.start_epoch < int(end.timestamp())
+        return CallTable(
+            start_epoch=self.start_epoch[mask],
+            duration=self.duration[mask],
+            status_code=self.status_code[mask],
+            caller_hash=self.caller_hash[mask],
+            statuses=self.statuses,
+        )
+
+    def group_by_time(self, granularity: str = "day") -> Dict[str, np.ndarray]:
+        """
+        Count calls and sum durations per hour, day or week (UTC, Monday weeks).
+
+        Returns:
+            `bucket_start` epochs with matching `calls` and `total_duration` arrays
+        """
+        if granularity not in BUCKET_SECONDS:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        size = BUCKET_SECONDS[granularity]
+        offset = WEEK_OFFSET_SECONDS if granularity == "week" else 0
+
+        buckets = (self.start_epoch + offset) // size
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        known = np.where(self.duration >= 0, self.duration, 0)
+        total_duration = np.bincount(inverse, weights=known, minlength=len(keys))
+        return {
+            "bucket_start": keys * size - offset,
+            "calls": np.bincount(inverse, minlength=len(keys)),
+            "total_duration": total_duration.astype(np.int64),
+        }
+
+    def hour_of_day_counts(self) -> np.ndarray:
+        """Count calls per UTC hour of day (24 values)."""
+        hours = (self.start_epoch % SECONDS_PER_DAY) // SECONDS_PER_HOUR
+        return np.bincount(hours, minlength=24)
+
+    def busiest_hours_heatmap(self) -> np.ndarray:
+        """Count calls per weekday (Monday first) and UTC hour as a 7x24 grid."""
+        days = (self.start_epoch // SECONDS_PER_DAY + 3) % 7
+        hours = (self.start_epoch % SECONDS_PER_DAY) // SECONDS_PER_HOUR
+        return np.bincount(days * 24 + hours, minlength=7 * 24).reshape(7, 24)
+
+    def duration_percentiles(
+        self,
+        percentiles: Sequence[float] = (50, 90, 95, 99),
+    ) -> Dict[str, float]:
+        """Duration percentiles over calls with a known duration."""
+        known = self.duration[self.duration >= 0]
+        if not len(known):
+            return {f"p{p:g}": 0.0 for p in percentiles}
+        values = np.percentile(known, percentiles)
+        return {f"p{p:g}": float(value) for p, value in zip(percentiles, values)}
+
+    def duration_histogram(self, bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Histogram of known call durations, returning (counts, bin edges)."""
+        known = self.duration[self.duration >= 0]
+        if not len(known):
+            return np.zeros(bins, dtype=np.int64), np.zeros(bins + 1)
+        return np.histogram(known, bins=bins)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Count calls per status."""
+        counts = np.bincount(self.status_code, minlength=len(self.statuses))
+        return {status: int(count) for status, count in zip(self.statuses, counts) if count}
+
+    def unique_callers(self) -> int:
+        """Count distinct known callers."""
+        hashes = self.caller_hash[self.caller_hash != 0]
+        return int(len(np.unique(hashes)))
+
+
+class CallTableCache:
+    """
+    Per-assistant CallTable cache, invalidated whenever the mirror changes.
+
+    Registered as a mirror listener so a table is rebuilt at most once per
+    batch of synced changes rather than once per request.
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, mirror: CallMirror):
+        self.mirror = mirror
+        self._tables: Dict[str, CallTable] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        mirror.add_listener(self)
+
+    def on_calls_upserted(self, conn: Any, changes: List[Tuple[Optional[Dict], Dict]]) -> None:
+        """Drop cached tables for assistants whose calls changed."""
+        changed = {new["assistant_id"] for _, new in changes}
+        with self._lock:
+            for assistant_id in changed:
+                self._tables.pop(assistant_id, None)
+                self._generations[assistant_id] = self._generations.get(assistant_id, 0) + 1
+
+    def get(self, assistant_id: str) -> CallTable:
+        """Get the assistant's table, loading it from the mirror if needed."""
+        with self._lock:
+            table = self._tables.get(assistant_id)
+            generation = self._generations.get(assistant_id, 0)
+        if table is None:
+            table = CallTable.from_mirror(self.mirror, assistant_id)
+            with self._lock:
+                # Don't cache a table that was invalidated while it was loading
+                if self._generations.get(assistant_id, 0) == generation:
+                    self._tables[assistant_id] = table
+        return table
+
+
+def epoch_to_iso(epoch: int) -> str:
+    """Format a bucket start epoch as an ISO-8601 UTC timestamp."""
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).isoformat()
@@ -0,0 +1,155 @@
+"""
+Call detail retrieval for the Customer Portal.
+
+Fetches full call records from Vapi with bounded concurrency, sharing a
+single HTTP session, an LRU cache of finished calls and in-flight request
+deduplication between every request the portal is serving. Batches are
+yielded in completion order so clients can render transcripts as they land.
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+import aiohttp
+
+from . import vapi_source
+from .vapi_source import UpstreamBusyError, VapiSourceError
+
+logger = logging.getLogger(__name__)
+
+# Detail fetch configuration
+DETAIL_CONCURRENCY = int(os.getenv("PORTAL_DETAIL_CONCURRENCY", "16"))
+DETAIL_CACHE_SIZE = int(os.getenv("PORTAL_DETAIL_CACHE_SIZE", "2048"))
+MAX_BATCH_SIZE = 500
+
+# Only calls in a final state are cached; live calls keep changing
+FINAL_STATUSES = {"ended"}
+
+
+class CallDetailFetcher:
+    """Concurrent, deduplicated, cached Vapi call detail lookups."""
+
+    def __init__(
+        self,
+        max_concurrency: int = DETAIL_CONCURRENCY,
+        cache_size: int = DETAIL_CACHE_SIZE,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
+        """
+        Initialize the fetcher.
+
+        Args:
+            max_concurrency: Maximum Vapi detail requests in flight at once,
+                across every batch being served
+            cache_size: Number of finished calls kept in the LRU cache
+            session: HTTP session to use (one is created and owned if omitted)
+        """
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session = session
+        self._owns_session = session is None
+
+    async def close(self) -> None:
+        """Close the HTTP session if the fetcher created it."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._owns_session and (self._session is None or self._session.closed):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            )
+        return self._session
+
+    async def get(self, call_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a call's details from the cache or Vapi.
+
+        Concurrent lookups of the same call share one upstream request.
+
+        Returns:
+            The call, or None if Vapi has no such call
+
+        Raises:
+            VapiSourceError: If Vapi returns an error response
+        """
+        call = self._cache.get(call_id)
+        if call is not None:
+            self._cache.move_to_end(call_id)
+            return call
+
+        task = self._inflight.get(call_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(call_id))
+            self._inflight[call_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(call_id, None))
+        # Shielded so a disconnecting client doesn't cancel a fetch others are awaiting
+        return await asyncio.shield(task)
+
+    async def _fetch(self, call_id: str) -> Optional[Dict[str, Any]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            call = await vapi_source.fetch_call(self._get_session(), call_id)
+
+        if call is not None and call.get("status") in FINAL_STATUSES:
+            self._cache[call_id] = call
+            self._cache.move_to_end(call_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return call
+
+    async def get_owned(self, call_id: str, assistant_id: str) -> Dict[str, Any]:
+        """
+        Look up a call on behalf of an assistant's customer.
+
+        Returns:
+            `{"id", "call"}` on success, or `{"id", "error"}` where the error is
+            `not_found`, `access_denied`, `upstream_busy` or `upstream_error`
+        """
+        try:
+            call = await self.get(call_id)
+        except UpstreamBusyError:
+            return {"id": call_id, "error": "upstream_busy"}
+        except (VapiSourceError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Call detail lookup failed for %s: %s", call_id, e)
+            return {"id": call_id, "error": "upstream_error"}
+
+        if call is None:
+            return {"id": call_id, "error": "not_found"}
+        if call.get("assistantId") != assistant_id:
+            return {"id": call_id, "error": "access_denied"}
+        return {"id": call_id, "call": call}
+
+    async def iter_owned(
+        self,
+        call_ids: Iterable[str],
+        assistant_id: str,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Look up many calls concurrently, yielding each result as it completes.
+
+        Args:
+            call_ids: Calls to fetch; duplicates are fetched once
+            assistant_id: Assistant the calls must belong to
+
+        Yields:
+            Results in the shape returned by `get_owned`
+        """
+        tasks = [
+            asyncio.ensure_future(self.get_owned(call_id, assistant_id))
+            for call_id in dict.fromkeys(call_ids)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
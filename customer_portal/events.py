@@ -0,0 +1,246 @@
+"""
+Live call events for the Customer Portal.
+
+Call changes reach the portal once, through the mirror (from webhooks or
+the syncer) and the webhook endpoint (tool calls). The broker turns them
+into `call-started`, `call-ended` and `tool-invoked` events, encodes each
+event as a server-sent event exactly once and hands the same bytes to
+every subscriber of the call's assistant, so an extra dashboard costs one
+queue slot per event. Each subscriber has a bounded queue; a subscriber
+that falls behind has events dropped and is told how many, instead of
+slowing down ingestion or other dashboards.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .mirror import CallMirror, format_vapi_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Event stream configuration
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("PORTAL_STREAM_QUEUE_SIZE", "256"))
+MAX_SUBSCRIBERS = int(os.getenv("PORTAL_STREAM_MAX_SUBSCRIBERS", "1000"))
+HEARTBEAT_SECONDS = 15.0
+RETRY_MILLISECONDS = 3000
+
+# Calls that ended longer ago than this are history, not live traffic; this
+# keeps a first sync backfilling old calls from flooding every dashboard.
+LIVE_WINDOW = timedelta(minutes=10)
+
+LIVE_STATUSES = {"in-progress"}
+FINAL_STATUSES = {"ended"}
+
+_HEARTBEAT = b": keep-alive\n\n"
+_CLOSED = object()
+
+
+@dataclass
+class EventStats:
+    """Counters describing event fan-out."""
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    subscribers: int = 0
+
+
+def encode_event(event_id: int, event_type: str, data: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event."""
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode("utf-8")
+
+
+def _call_event(event_type: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": event_type,
+        "call_id": row["id"],
+        "status": row["status"],
+        "started_at": row["started_at"],
+        "ended_at": row["ended_at"],
+        "duration_seconds": row["duration_seconds"],
+        "caller_phone": row["caller"],
+    }
+
+
+class Subscription:
+    """One dashboard's stream of events for an assistant."""
+
+    def __init__(self, assistant_id: str, max_queue: int):
+        self.assistant_id = assistant_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.reported_dropped = 0
+
+
+class EventBroker:
+    """Fans call events out to per-assistant subscribers."""
+
+    SCHEMA = ""
+
+    def __init__(
+        self,
+        mirror: Optional[CallMirror] = None,
+        max_queue: int = SUBSCRIBER_QUEUE_SIZE,
+        max_subscribers: int = MAX_SUBSCRIBERS,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS,
+    ):
+        """
+        Initialize the broker.
+
+        Args:
+            mirror: Mirror whose call changes become events (registers as a listener)
+            max_queue: Events buffered per subscriber before its events are dropped
+            max_subscribers: Concurrent subscriptions allowed across all customers
+            heartbeat_seconds: Idle time after which a keep-alive comment is sent
+        """
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stats = EventStats()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+        if mirror is not None:
+            mirror.add_listener(self)
+
+    def on_calls_upserted(self, conn, changes: List[Tuple[Optional[Dict], Dict]]) -> None:
+        """Publish call-started and call-ended events for a batch of mirror writes."""
+        if not self._subscribers:
+            return
+        live_since = format_vapi_timestamp(datetime.now(timezone.utc) - LIVE_WINDOW)
+        events = []
+        for old, new in changes:
+            old_status = old["status"] if old else None
+            if new["status"] == old_status:
+                continue
+            if new["status"] in LIVE_STATUSES:
+                events.append((new["assistant_id"], _call_event("call-started", new)))
+            elif new["status"] in FINAL_STATUSES:
+                ended_at = new["ended_at"] or new["updated_at"] or ""
+                if ended_at >= live_since:
+                    events.append((new["assistant_id"], _call_event("call-ended", new)))
+        self.publish(events)
+
+    def publish_tool_calls(self, message: Dict[str, Any]) -> None:
+        """Publish a tool-invoked event for each call in a Vapi `tool-calls` message."""
+        call = message.get("call") or {}
+        assistant_id = call.get("assistantId") or (message.get("assistant") or {}).get("id")
+        if not assistant_id or assistant_id not in self._subscribers:
+            return
+        tool_calls = message.get("toolCallList") or message.get("toolCalls") or []
+        self.publish([
+            (assistant_id, {
+                "type": "tool-invoked",
+                "call_id": call.get("id"),
+                "tool_call_id": tool_call.get("id"),
+                "tool": (tool_call.get("function") or {}).get("name"),
+            })
+            for tool_call in tool_calls
+            if isinstance(tool_call, dict)
+        ])
+
+    def publish(self, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Publish `(assistant_id, event)` pairs to their assistants' subscribers.
+
+        Safe to call from any thread; each event is encoded here, once, and
+        delivered on the event loop the subscribers are served from.
+        """
+        if not events or self._loop is None:
+            return
+        with self._lock:
+            encoded = []
+            for assistant_id, event in events:
+                self._next_id += 1
+                encoded.append((assistant_id, encode_event(self._next_id, event["type"], event)))
+            self.stats.published += len(encoded)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(encoded)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, encoded)
+
+    def _fan_out(self, encoded: List[Tuple[str, bytes]]) -> None:
+        for assistant_id, event in encoded:
+            for subscription in self._subscribers.get(assistant_id, ()):
+                try:
+                    subscription.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    subscription.dropped += 1
+                    self.stats.dropped += 1
+                else:
+                    self.stats.delivered += 1
+
+    @property
+    def has_capacity(self) -> bool:
+        """Whether another subscriber can be admitted."""
+        return self.stats.subscribers < self.max_subscribers
+
+    def _subscribe(self, assistant_id: str) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(assistant_id, self.max_queue)
+        self._subscribers.setdefault(assistant_id, set()).add(subscription)
+        self.stats.subscribers += 1
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.assistant_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.stats.subscribers -= 1
+            if not subscribers:
+                del self._subscribers[subscription.assistant_id]
+
+    async def stream(self, assistant_id: str) -> AsyncIterator[bytes]:
+        """
+        Subscribe to an assistant's events, yielding them as server-sent event bytes.
+
+        The subscription starts when iteration does and ends when the client
+        disconnects or the broker closes. A `dropped` event reports how many
+        events a slow subscriber missed, so the dashboard knows to reload
+        `/calls`.
+        """
+        subscription = self._subscribe(assistant_id)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n".encode("utf-8")
+            while True:
+                if not subscription.queue.empty():
+                    # Skip the timeout machinery while there is a backlog to send
+                    event = subscription.queue.get_nowait()
+                else:
+                    try:
+                        event = await asyncio.wait_for(
+                            subscription.queue.get(), self.heartbeat_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        yield _HEARTBEAT
+                        continue
+                if event is _CLOSED:
+                    return
+                yield event
+                if subscription.dropped > subscription.reported_dropped:
+                    missed = subscription.dropped - subscription.reported_dropped
+                    subscription.reported_dropped = subscription.dropped
+                    payload = json.dumps({"type": "dropped", "count": missed})
+                    yield f"event: dropped\ndata: {payload}\n\n".encode("utf-8")
+        finally:
+            self._unsubscribe(subscription)
+
+    def close(self) -> None:
+        """End every subscription, e.g. when the server shuts down."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                # Make room so the close marker always fits
+                while subscription.queue.full():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(_CLOSED)
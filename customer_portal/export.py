@@ -0,0 +1,114 @@
+"""
+Streaming call exports for the Customer Portal.
+
+Exports are generated page by page from the call mirror and yielded as
+byte chunks, so memory stays flat regardless of how many calls a tenant
+has and clients start receiving data immediately.
+"""
+
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from models.codec import loads, pack
+
+from .mirror import CallFilter, CallMirror
+
+EXPORT_PAGE_SIZE = 1000
+
+# Media type for each supported export format
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/x-msgpack",
+}
+
+CSV_HEADER = ["ID", "Started", "Ended", "Duration", "Caller", "Status"]
+CSV_COLUMNS = ("id", "started_at", "ended_at", "duration_seconds", "caller", "status")
+
+
+def _csv_chunks(pages: Iterable[List]) -> Iterator[bytes]:
+    """Render pages of call rows as CSV."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for rows in pages:
+        writer.writerows(tuple(row[column] for column in CSV_COLUMNS) for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(pages: Iterable[List]) -> Iterator[bytes]:
+    """Render pages of raw calls as newline-delimited JSON."""
+    for rows in pages:
+        yield "".join(f"{row['raw']}\n" for row in rows).encode("utf-8")
+
+
+def _msgpack_chunks(pages: Iterable[List]) -> Iterator[bytes]:
+    """Render pages of raw calls as a stream of msgpack maps, one per call."""
+    for rows in pages:
+        yield b"".join(pack(loads(row["raw"])) for row in rows)
+
+
+def _json_chunks(pages: Iterable[List]) -> Iterator[bytes]:
+    """Render pages of raw calls as a single JSON document."""
+    yield b'{"calls": ['
+    separator = ""
+    for rows in pages:
+        yield (separator + ",".join(row["raw"] for row in rows)).encode("utf-8")
+        separator = ","
+    yield b'], "format": "json"}'
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a stream of byte chunks incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_calls_export(
+    mirror: CallMirror,
+    assistant_id: str,
+    format: str = "json",
+    filters: Optional[CallFilter] = None,
+    compress: bool = False,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> Iterator[bytes]:
+    """
+    Stream an assistant's mirrored calls in the requested format.
+
+    Args:
+        mirror: Call mirror to read from
+        assistant_id: Assistant whose calls are exported
+        format: One of EXPORT_FORMATS
+        filters: Date-range and status filters applied inside the mirror query
+        compress: Gzip the output stream
+        page_size: Rows read from the mirror per chunk
+
+    Returns:
+        Iterator of encoded output chunks
+    """
+    if format == "csv":
+        pages = mirror.iter_call_pages(assistant_id, CSV_COLUMNS, filters, page_size)
+        chunks = _csv_chunks(pages)
+    elif format in EXPORT_FORMATS:
+        pages = mirror.iter_call_pages(assistant_id, ("raw",), filters, page_size)
+        if format == "ndjson":
+            chunks = _ndjson_chunks(pages)
+        elif format == "msgpack":
+            chunks = _msgpack_chunks(pages)
+        else:
+            chunks = _json_chunks(pages)
+    else:
+        raise ValueError(f"Unsupported export format: {format}")
+
+    return _gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,529 @@
+"""
+Local call mirror for the Customer Portal.
+
+Keeps a SQLite copy of each assistant's Vapi calls so dashboard reads are
+served from local disk. A background syncer pulls only the calls updated
+since the last cursor, so Vapi is hit once per sync interval instead of
+once per page view.
+"""
+
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .vapi_source import MAX_PAGE_SIZE, iter_vapi_calls
+
+logger = logging.getLogger(__name__)
+
+# Storage configuration
+DATA_DIR = Path(__file__).parent.parent / "data"
+MIRROR_PATH = os.getenv("PORTAL_MIRROR_PATH", str(DATA_DIR / "call_mirror.db"))
+SYNC_INTERVAL_SECONDS = float(os.getenv("PORTAL_SYNC_INTERVAL_SECONDS", "60"))
+SYNC_BATCH_SIZE = 500
+
+# Calls updated while a sync is paging can be missed by an updatedAt cursor,
+# so each sync re-reads a short window; upserts make the overlap harmless.
+SYNC_OVERLAP = timedelta(minutes=2)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id TEXT PRIMARY KEY,
+    assistant_id TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    started_at TEXT,
+    ended_at TEXT,
+    started_ts REAL,
+    day TEXT,
+    status TEXT,
+    caller TEXT,
+    duration_seconds INTEGER,
+    transcript TEXT,
+    summary TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calls_assistant_day
+    ON calls (assistant_id, day DESC, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS sync_state (
+    assistant_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    synced_at TEXT
+);
+"""
+
+CALL_COLUMNS = (
+    "id", "assistant_id", "created_at", "updated_at", "started_at", "ended_at",
+    "started_ts", "day", "status", "caller", "duration_seconds", "transcript", "summary", "raw",
+)
+
+# Listings are ordered newest first on this key, which doubles as the keyset cursor
+LISTING_ORDER = ("day", "created_at", "id")
+
+
+def parse_vapi_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Vapi ISO-8601 timestamp into an aware UTC datetime."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def format_vapi_timestamp(value: datetime) -> str:
+    """Format a datetime the way Vapi does (UTC, millisecond precision)."""
+    value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def call_to_row(assistant_id: str, call: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a raw Vapi call into mirror columns, parsing timestamps once."""
+    started = parse_vapi_timestamp(call.get("startedAt"))
+    ended = parse_vapi_timestamp(call.get("endedAt"))
+    duration = int((ended - started).total_seconds()) if started and ended else None
+
+    # Calls are bucketed by UTC start day; calls that never started use their creation day
+    if started:
+        day = started.astimezone(timezone.utc).date().isoformat()
+    else:
+        day = (call.get("createdAt") or "")[:10]
+
+    return {
+        "id": call["id"],
+        "assistant_id": assistant_id,
+        "created_at": call.get("createdAt") or "",
+        "updated_at": call.get("updatedAt"),
+        "started_at": call.get("startedAt"),
+        "ended_at": call.get("endedAt"),
+        "started_ts": started.timestamp() if started else None,
+        "day": day,
+        "status": call.get("status", "unknown"),
+        "caller": (call.get("customer") or {}).get("number"),
+        "duration_seconds": duration,
+        "transcript": call.get("transcript") or (call.get("artifact") or {}).get("transcript"),
+        "summary": call.get("summary") or (call.get("analysis") or {}).get("summary"),
+        "raw": json.dumps(call, separators=(",", ":")),
+    }
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Encode a listing keyset position as an opaque, URL-safe cursor."""
+    payload = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = len(LISTING_ORDER)) -> Tuple[Any, ...]:
+    """
+    Decode a cursor produced by `encode_cursor` for a key of `size` values.
+
+    Every listing key is made of strings, so anything else is rejected here
+    rather than reaching SQLite as a bind parameter.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Malformed cursor")
+    if (
+        not isinstance(key, list)
+        or len(key) != size
+        or not all(isinstance(value, str) for value in key)
+    ):
+        raise ValueError("Malformed cursor")
+    return tuple(key)
+
+
+@dataclass
+class CallFilter:
+    """Call filters pushed down into mirror queries."""
+    start_date: Optional[str] = None  # YYYY-MM-DD, inclusive
+    end_date: Optional[str] = None  # YYYY-MM-DD, inclusive
+    status: Optional[str] = None
+    caller: Optional[str] = None  # exact caller number
+    min_duration_seconds: Optional[int] = None
+
+    def clauses(self) -> Tuple[List[str], List[Any]]:
+        """Build SQL conditions and parameters for the active filters."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if self.start_date:
+            clauses.append("day >= ?")
+            params.append(self.start_date)
+        if self.end_date:
+            clauses.append("day <= ?")
+            params.append(self.end_date)
+        if self.status:
+            clauses.append("status = ?")
+            params.append(self.status)
+        if self.caller:
+            clauses.append("caller = ?")
+            params.append(self.caller)
+        if self.min_duration_seconds is not None:
+            clauses.append("duration_seconds >= ?")
+            params.append(self.min_duration_seconds)
+        return clauses, params
+
+
+@dataclass
+class SyncState:
+    """Sync cursor and freshness for one assistant's mirror."""
+    cursor: Optional[str] = None
+    synced_at: Optional[datetime] = None
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the last completed sync, or None if never synced."""
+        if self.synced_at is None:
+            return None
+        return (datetime.now(timezone.utc) - self.synced_at).total_seconds()
+
+
+class CallMirror:
+    """
+    SQLite store of mirrored call records, partitioned by assistant_id.
+
+    Listeners registered with `add_listener` are handed every batch of
+    changes inside the same transaction as the write, so derived data such
+    as rollups can never drift from the raw calls.
+    """
+
+    def __init__(self, path: str = MIRROR_PATH):
+        """
+        Initialize the mirror.
+
+        Args:
+            path: SQLite database path, or ":memory:" for a throwaway store
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._listeners: List[Any] = []
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the database on first use."""
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    if self.path != ":memory:":
+                        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(_SCHEMA)
+                    for listener in self._listeners:
+                        conn.executescript(listener.SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    def add_listener(self, listener: Any) -> None:
+        """
+        Register a listener for call changes.
+
+        Listeners provide a `SCHEMA` script for their own tables and an
+        `on_calls_upserted(conn, changes)` method, where `changes` is a list of
+        `(old_row, new_row)` pairs and `old_row` is None for new calls.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._conn is not None:
+                self._conn.executescript(listener.SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the store lock for a unit of work, committing on success."""
+        with self._lock, self.conn:
+            yield self.conn
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def upsert_calls(self, assistant_id: str, calls: Iterable[Dict[str, Any]]) -> int:
+        """Insert or update raw Vapi calls. Returns the number of rows written."""
+        # Keep only the latest version of a call that appears twice in one batch
+        latest = {call["id"]: call for call in calls if call.get("id")}
+        rows = [call_to_row(assistant_id, call) for call in latest.values()]
+        if not rows:
+            return 0
+
+        placeholders = ", ".join(f":{column}" for column in CALL_COLUMNS)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in CALL_COLUMNS[1:])
+        with self._lock, self.conn:
+            previous = self._existing_rows([row["id"] for row in rows]) if self._listeners else {}
+            self.conn.executemany(
+                f"INSERT INTO calls ({', '.join(CALL_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                rows,
+            )
+            if self._listeners:
+                changes = [(previous.get(row["id"]), row) for row in rows]
+                for listener in self._listeners:
+                    listener.on_calls_upserted(self.conn, changes)
+        return len(rows)
+
+    def _existing_rows(self, call_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Load the current summary columns for calls about to be overwritten."""
+        existing: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(call_ids), 500):
+            chunk = call_ids[start:start + 500]
+            rows = self.conn.execute(
+                "SELECT id, assistant_id, day, status, duration_seconds FROM calls "
+                f"WHERE id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall()
+            existing.update((row["id"], dict(row)) for row in rows)
+        return existing
+
+    def list_calls(
+        self,
+        assistant_id: str,
+        limit: int = 50,
+        filters: Optional[CallFilter] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get the newest calls for an assistant as flattened rows."""
+        columns = ("id", "started_at", "ended_at", "duration_seconds", "caller",
+                   "transcript", "summary", "status")
+        return self.list_call_page(assistant_id, columns, filters, limit)[0]
+
+    def list_call_page(
+        self,
+        assistant_id: str,
+        columns: Sequence[str],
+        filters: Optional[CallFilter] = None,
+        limit: int = 50,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, ...]]]:
+        """
+        Get one page of an assistant's calls, newest first.
+
+        Args:
+            assistant_id: Assistant whose calls are read
+            columns: Mirror columns to return
+            filters: Conditions evaluated inside SQLite
+            limit: Maximum rows to return
+            after: Keyset position returned for the previous page
+
+        Returns:
+            The rows, and the keyset position to continue from (None on the last page)
+        """
+        pages = self.iter_call_pages(assistant_id, columns, filters, limit + 1, after)
+        rows = next(pages, [])
+        pages.close()
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = tuple(rows[-1][column] for column in LISTING_ORDER)
+        return [{column: row[column] for column in columns} for row in rows], next_key
+
+    def iter_call_pages(
+        self,
+        assistant_id: str,
+        columns: Sequence[str],
+        filters: Optional[CallFilter] = None,
+        page_size: int = 1000,
+        after: Optional[Sequence[Any]] = None,
+    ) -> Iterator[List[sqlite3.Row]]:
+        """
+        Iterate over an assistant's calls, newest first, one page at a time.
+
+        Each page is a separate keyset query, so memory stays bounded by
+        the page size and writers are never blocked for a whole export.
+
+        Args:
+            assistant_id: Assistant whose calls are read
+            columns: Mirror columns to select
+            filters: Conditions evaluated inside SQLite
+            page_size: Rows per page
+            after: Keyset position (LISTING_ORDER values) to start after
+
+        Yields:
+            Lists of rows with the requested columns
+        """
+        unknown = set(columns) - set(CALL_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown call columns: {', '.join(sorted(unknown))}")
+
+        clauses, params = (filters or CallFilter()).clauses()
+        selected = ", ".join(dict.fromkeys((*columns, *LISTING_ORDER)))
+        order = ", ".join(f"{column} DESC" for column in LISTING_ORDER)
+        cursor: Optional[Tuple[Any, ...]] = tuple(after) if after is not None else None
+
+        while True:
+            conditions = ["assistant_id = ?", *clauses]
+            args = [assistant_id, *params]
+            if cursor is not None:
+                conditions.append(f"({', '.join(LISTING_ORDER)}) < (?, ?, ?)")
+                args.extend(cursor)
+
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT {selected} FROM calls WHERE {' AND '.join(conditions)} "
+                    f"ORDER BY {order} LIMIT ?",
+                    (*args, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            cursor = tuple(rows[-1][column] for column in LISTING_ORDER)
+
+    def get_call(self, assistant_id: str, call_id: str) -> Optional[Dict[str, Any]]:
+        """Get a single raw mirrored call, or None if it is not mirrored."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT raw FROM calls WHERE assistant_id = ? AND id = ?",
+                (assistant_id, call_id),
+            ).fetchone()
+        return json.loads(row["raw"]) if row else None
+
+    def count_calls(self, assistant_id: str) -> int:
+        """Count mirrored calls for an assistant."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM calls WHERE assistant_id = ?", (assistant_id,)
+            ).fetchone()[0]
+
+    def get_sync_state(self, assistant_id: str) -> SyncState:
+        """Get the sync cursor and last sync time for an assistant."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cursor, synced_at FROM sync_state WHERE assistant_id = ?",
+                (assistant_id,),
+            ).fetchone()
+        if row is None:
+            return SyncState()
+        synced_at = datetime.fromisoformat(row["synced_at"]) if row["synced_at"] else None
+        return SyncState(cursor=row["cursor"], synced_at=synced_at)
+
+    def set_sync_state(self, assistant_id: str, state: SyncState) -> None:
+        """Record a completed sync for an assistant."""
+        synced_at = state.synced_at.isoformat() if state.synced_at else None
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO sync_state (assistant_id, cursor, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(assistant_id) DO UPDATE SET "
+                "cursor = excluded.cursor, synced_at = excluded.synced_at",
+                (assistant_id, state.cursor, synced_at),
+            )
+
+
+class MirrorSyncer:
+    """Background task that keeps the call mirror up to date with Vapi."""
+
+    def __init__(
+        self,
+        mirror: CallMirror,
+        assistant_ids: Callable[[], Iterable[str]],
+        interval_seconds: float = SYNC_INTERVAL_SECONDS,
+    ):
+        """
+        Initialize the syncer.
+
+        Args:
+            mirror: Mirror to write synced calls into
+            assistant_ids: Returns the assistants to sync on each pass
+            interval_seconds: Delay between sync passes
+        """
+        self.mirror = mirror
+        self.assistant_ids = assistant_ids
+        self.interval_seconds = interval_seconds
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync_assistant(self, assistant_id: str) -> int:
+        """
+        Pull calls updated since the last cursor into the mirror.
+
+        The cursor only advances after the full listing has been read, so an
+        interrupted sync is simply retried from the previous cursor.
+
+        Returns:
+            Number of calls written
+        """
+        lock = self._locks.setdefault(assistant_id, asyncio.Lock())
+        async with lock:
+            state = self.mirror.get_sync_state(assistant_id)
+            started = datetime.now(timezone.utc)
+            newest_update = state.cursor
+            written = 0
+            batch: List[Dict[str, Any]] = []
+
+            async for call in iter_vapi_calls(
+                assistant_id, page_size=MAX_PAGE_SIZE, updated_after=state.cursor
+            ):
+                batch.append(call)
+                updated_at = call.get("updatedAt")
+                if updated_at and (newest_update is None or updated_at > newest_update):
+                    newest_update = updated_at
+                if len(batch) >= SYNC_BATCH_SIZE:
+                    # Writing a batch blocks on SQLite; keep it off the event loop
+                    written += await asyncio.to_thread(
+                        self.mirror.upsert_calls, assistant_id, batch
+                    )
+                    batch = []
+            written += await asyncio.to_thread(self.mirror.upsert_calls, assistant_id, batch)
+
+            cursor = state.cursor
+            if newest_update is not None:
+                cursor = min(newest_update, format_vapi_timestamp(started - SYNC_OVERLAP))
+                if state.cursor is not None:
+                    cursor = max(cursor, state.cursor)
+            self.mirror.set_sync_state(assistant_id, SyncState(cursor=cursor, synced_at=started))
+
+            if written:
+                logger.info(f"Mirrored {written} updated calls for assistant {assistant_id}")
+            return written
+
+    async def ensure_synced(self, assistant_id: str) -> SyncState:
+        """Sync an assistant that has never been mirrored, then return its state."""
+        state = self.mirror.get_sync_state(assistant_id)
+        if state.synced_at is None:
+            try:
+                await self.sync_assistant(assistant_id)
+            except Exception as e:
+                logger.error(f"Initial mirror sync failed for {assistant_id}: {e}")
+            state = self.mirror.get_sync_state(assistant_id)
+        return state
+
+    async def run_forever(self) -> None:
+        """Sync every assistant, then sleep for the interval, until cancelled."""
+        while True:
+            for assistant_id in list(self.assistant_ids()):
+                try:
+                    await self.sync_assistant(assistant_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Mirror sync failed for {assistant_id}: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        """Start the background sync loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Stop the background sync loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
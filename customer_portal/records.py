@@ -0,0 +1,286 @@
+"""
+Appointment and lead records for the Customer Portal.
+
+The voice agent's tools append bookings and leads to JSON files in its data
+directory. Rather than rescanning a file per request, each file is loaded
+once into an in-memory index: records projected into the portal's response
+models, kept in listing order with per-field position lists for equality
+filters and a value-sorted position list for numeric ranges. Files are
+re-read only when their size or modification time changes, so a page of
+results costs a few bisects and a short walk, however many records exist.
+"""
+
+import bisect
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from models.codec import loads
+
+from .mirror import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Where the agent's tools write their records, unless a customer sets `data_dir`
+AGENT_DATA_DIR = os.getenv("PORTAL_AGENT_DATA_DIR", str(DATA_DIR))
+# The one customer whose records are in AGENT_DATA_DIR; others need their own `data_dir`
+AGENT_DATA_OWNER = os.getenv("PORTAL_AGENT_DATA_OWNER", "arval")
+
+Key = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class RecordSpec:
+    """How one kind of agent record is stored, projected and indexed."""
+    filename: str
+    model: Type[BaseModel]
+    # Model field -> key in the stored record, for fields whose names differ
+    renames: Dict[str, str]
+    # Listing order is this date-like field descending, then id descending
+    sort_field: str
+    # Fields with case-insensitive equality indexes
+    equality_fields: Tuple[str, ...] = ()
+    # Numeric fields with range indexes
+    range_fields: Tuple[str, ...] = ()
+    # Fields filled in when a stored record predates them
+    defaults: Dict[str, Any] = field(default_factory=dict)
+
+    def project(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a stored record into the model's shape."""
+        values = {**self.defaults, **record}
+        for model_field, stored_key in self.renames.items():
+            values[model_field] = record.get(stored_key)
+        return self.model.model_validate(values).model_dump()
+
+
+@dataclass
+class RecordQuery:
+    """Filters for a record listing. Unset fields don't filter."""
+    equals: Dict[str, str] = field(default_factory=dict)
+    ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = field(default_factory=dict)
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+
+def _sort_key(row: Dict[str, Any], sort_field: str) -> Key:
+    return (str(row.get(sort_field) or ""), str(row["id"]))
+
+
+class RecordIndex:
+    """Immutable, indexed snapshot of one record file."""
+
+    def __init__(self, spec: RecordSpec, records: Iterable[Dict[str, Any]]):
+        """
+        Project and index records.
+
+        Records that don't fit the model are skipped with a warning, so one
+        bad line in the file doesn't take the endpoint down.
+        """
+        self.spec = spec
+        rows = []
+        skipped = 0
+        for record in records:
+            try:
+                rows.append(spec.project(record))
+            except (ValidationError, TypeError):
+                skipped += 1
+        if skipped:
+            logger.warning(f"Skipped {skipped} malformed records in {spec.filename}")
+
+        # Ascending; listings walk it backwards so newest come first
+        rows.sort(key=lambda row: _sort_key(row, spec.sort_field))
+        self.rows = rows
+        self.keys = [_sort_key(row, spec.sort_field) for row in rows]
+
+        self.by_value: Dict[str, Dict[str, List[int]]] = {name: {} for name in spec.equality_fields}
+        for position, row in enumerate(rows):
+            for name in spec.equality_fields:
+                value = row.get(name)
+                if value is not None:
+                    self.by_value[name].setdefault(str(value).lower(), []).append(position)
+
+        # Per range field: values ascending, with the positions holding them
+        self.by_range: Dict[str, Tuple[List[float], List[int]]] = {}
+        for name in spec.range_fields:
+            pairs = sorted(
+                (row[name], position) for position, row in enumerate(rows)
+                if row.get(name) is not None
+            )
+            self.by_range[name] = ([value for value, _ in pairs], [pos for _, pos in pairs])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _bounds(self, query: RecordQuery, after: Optional[Key]) -> Tuple[int, int]:
+        """Positions [lo, hi) allowed by the date range and cursor."""
+        lo, hi = 0, len(self.keys)
+        if query.start_date:
+            lo = bisect.bisect_left(self.keys, (query.start_date,))
+        if query.end_date:
+            next_day = (date.fromisoformat(query.end_date) + timedelta(days=1)).isoformat()
+            hi = bisect.bisect_left(self.keys, (next_day,))
+        if after is not None:
+            hi = min(hi, bisect.bisect_left(self.keys, after))
+        return lo, hi
+
+    def _candidates(self, query: RecordQuery, lo: int, hi: int) -> Sequence[int]:
+        """The smallest ascending list of positions that can satisfy the query."""
+        best: Sequence[int] = range(lo, hi)
+        for name, value in query.equals.items():
+            positions = self.by_value[name].get(value.lower(), [])
+            start, end = bisect.bisect_left(positions, lo), bisect.bisect_left(positions, hi)
+            if end - start < len(best):
+                best = positions[start:end]
+        for name, (minimum, maximum) in query.ranges.items():
+            values, positions = self.by_range[name]
+            start = bisect.bisect_left(values, minimum) if minimum is not None else 0
+            end = bisect.bisect_right(values, maximum) if maximum is not None else len(values)
+            if end - start < len(best):
+                best = sorted(p for p in positions[start:end] if lo <= p < hi)
+        return best
+
+    def _matches(self, row: Dict[str, Any], query: RecordQuery) -> bool:
+        for name, value in query.equals.items():
+            if str(row.get(name) or "").lower() != value.lower():
+                return False
+        for name, (minimum, maximum) in query.ranges.items():
+            number = row.get(name)
+            if number is None:
+                return False
+            if (minimum is not None and number < minimum) or (
+                maximum is not None and number > maximum
+            ):
+                return False
+        return True
+
+    def page(
+        self,
+        query: RecordQuery,
+        limit: int,
+        after: Optional[Key] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Key]]:
+        """
+        Get one page of matching records, newest first.
+
+        Args:
+            query: Filters to apply
+            limit: Maximum records to return
+            after: Sort key of the last record on the previous page
+
+        Returns:
+            The records and the key to pass as `after` for the next page, or
+            None if this is the last page
+        """
+        lo, hi = self._bounds(query, after)
+        if lo >= hi:
+            return [], None
+        page: List[Dict[str, Any]] = []
+        for position in reversed(self._candidates(query, lo, hi)):
+            row = self.rows[position]
+            if not self._matches(row, query):
+                continue
+            if len(page) == limit:
+                return page, _sort_key(page[-1], self.spec.sort_field)
+            page.append(row)
+        return page, None
+
+    def count(self, query: Optional[RecordQuery] = None) -> int:
+        """Count matching records."""
+        if query is None:
+            return len(self.rows)
+        lo, hi = self._bounds(query, None)
+        return sum(
+            1 for position in self._candidates(query, lo, hi)
+            if self._matches(self.rows[position], query)
+        )
+
+
+class RecordFile:
+    """A record file's index, rebuilt when the file changes on disk."""
+
+    def __init__(self, spec: RecordSpec, path: Path):
+        self.spec = spec
+        self.path = path
+        self._index = RecordIndex(spec, [])
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def index(self) -> RecordIndex:
+        """Get the current index, reloading the file first if it changed."""
+        try:
+            stat = self.path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return self._index
+
+        with self._lock:
+            if signature != self._signature:
+                self._reload(signature)
+        return self._index
+
+    def _reload(self, signature: Optional[Tuple[int, int]]) -> None:
+        if signature is None:
+            records: List[Dict[str, Any]] = []
+        else:
+            try:
+                with open(self.path, "rb") as f:
+                    records = loads(f.read())
+            except (OSError, ValueError) as e:
+                # Keep serving the previous snapshot; the next change retries
+                logger.error(f"Could not load {self.path}: {e}")
+                return
+            if not isinstance(records, list):
+                logger.error(f"{self.path} does not contain a list of records")
+                return
+        self._index = RecordIndex(self.spec, (r for r in records if isinstance(r, dict)))
+        self._signature = signature
+
+
+class AgentRecords:
+    """Record files for every agent data directory in use, loaded on demand."""
+
+    def __init__(
+        self,
+        specs: Dict[str, RecordSpec],
+        default_dir: str = AGENT_DATA_DIR,
+        default_owner: Optional[str] = AGENT_DATA_OWNER,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            specs: Record kinds (e.g. "appointments") and how to index them
+            default_dir: Data directory of the customer without a `data_dir`
+            default_owner: Customer id whose records are in `default_dir`;
+                any other customer without a `data_dir` has no records
+        """
+        self.specs = specs
+        self.default_dir = default_dir
+        self.default_owner = default_owner
+        self._files: Dict[Tuple[str, str], RecordFile] = {}
+        self._lock = threading.Lock()
+
+    def index(self, kind: str, customer: Dict[str, Any]) -> RecordIndex:
+        """Get the current index of a customer's records of one kind."""
+        data_dir = customer.get("data_dir")
+        if not data_dir:
+            if customer.get("customer_id") != self.default_owner:
+                # Never fall back to another customer's records
+                return RecordIndex(self.specs[kind], ())
+            data_dir = self.default_dir
+        record_file = self._files.get((kind, data_dir))
+        if record_file is None:
+            with self._lock:
+                spec = self.specs[kind]
+                record_file = self._files.setdefault(
+                    (kind, data_dir), RecordFile(spec, Path(data_dir) / spec.filename)
+                )
+        return record_file.index()
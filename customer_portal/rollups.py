@@ -0,0 +1,185 @@
+"""
+Incremental analytics rollups for the Customer Portal.
+
+Maintains per-assistant, per-day call aggregates (count, duration totals
+and a status breakdown) as calls are written to the call mirror, so any
+period query is answered from at most one row per day instead of
+re-reading every raw call. Rollups can always be rebuilt from the mirror.
+"""
+
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from .mirror import CallMirror
+
+
+@dataclass
+class RollupSummary:
+    """Aggregated call activity over a range of days."""
+    calls: int = 0
+    total_duration_seconds: int = 0
+    timed_calls: int = 0
+    status_counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def average_duration_seconds(self) -> int:
+        """Average duration of calls that have both a start and end time."""
+        return self.total_duration_seconds // self.timed_calls if self.timed_calls else 0
+
+
+class RollupEngine:
+    """Keeps daily call aggregates in step with the call mirror."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS daily_rollups (
+        assistant_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        total_duration_seconds INTEGER NOT NULL DEFAULT 0,
+        timed_calls INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (assistant_id, day)
+    );
+    CREATE TABLE IF NOT EXISTS daily_status_rollups (
+        assistant_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        call_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (assistant_id, day, status)
+    );
+    """
+
+    def __init__(self, mirror: CallMirror):
+        """
+        Initialize the engine and subscribe it to mirror writes.
+
+        Args:
+            mirror: Call mirror whose writes drive the rollups
+        """
+        self.mirror = mirror
+        mirror.add_listener(self)
+
+    def on_calls_upserted(
+        self,
+        conn: sqlite3.Connection,
+        changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]],
+    ) -> None:
+        """Apply the difference between old and new call rows to the daily aggregates."""
+        day_deltas: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+        status_deltas: Dict[Tuple[str, str, str], int] = defaultdict(int)
+
+        def apply(row: Dict[str, Any], sign: int) -> None:
+            if not row.get("day"):
+                return
+            key = (row["assistant_id"], row["day"])
+            delta = day_deltas[key]
+            delta[0] += sign
+            if row.get("duration_seconds") is not None:
+                delta[1] += sign * row["duration_seconds"]
+                delta[2] += sign
+            status_deltas[(*key, row.get("status") or "unknown")] += sign
+
+        for old, new in changes:
+            if old is not None:
+                apply(old, -1)
+            apply(new, 1)
+
+        conn.executemany(
+            "INSERT INTO daily_rollups "
+            "(assistant_id, day, call_count, total_duration_seconds, timed_calls) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(assistant_id, day) DO UPDATE SET "
+            "call_count = call_count + excluded.call_count, "
+            "total_duration_seconds = total_duration_seconds + excluded.total_duration_seconds, "
+            "timed_calls = timed_calls + excluded.timed_calls",
+            [(*key, *delta) for key, delta in day_deltas.items() if any(delta)],
+        )
+        conn.executemany(
+            "INSERT INTO daily_status_rollups (assistant_id, day, status, call_count) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT(assistant_id, day, status) DO UPDATE SET "
+            "call_count = call_count + excluded.call_count",
+            [(*key, delta) for key, delta in status_deltas.items() if delta],
+        )
+
+    def summary(
+        self,
+        assistant_id: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> RollupSummary:
+        """
+        Summarize call activity between two days, inclusive.
+
+        Args:
+            assistant_id: Assistant whose calls are summarized
+            start: First day to include (None for the beginning of history)
+            end: Last day to include (None for today and beyond)
+
+        Returns:
+            Counts, durations and status breakdown for the range
+        """
+        low = start.isoformat() if start else ""
+        high = end.isoformat() if end else "9999-12-31"
+        params = (assistant_id, low, high)
+
+        with self.mirror.transaction() as conn:
+            totals = conn.execute(
+                "SELECT COALESCE(SUM(call_count), 0), COALESCE(SUM(total_duration_seconds), 0), "
+                "COALESCE(SUM(timed_calls), 0) FROM daily_rollups "
+                "WHERE assistant_id = ? AND day BETWEEN ? AND ?",
+                params,
+            ).fetchone()
+            statuses = conn.execute(
+                "SELECT status, SUM(call_count) FROM daily_status_rollups "
+                "WHERE assistant_id = ? AND day BETWEEN ? AND ? "
+                "GROUP BY status HAVING SUM(call_count) > 0",
+                params,
+            ).fetchall()
+
+        return RollupSummary(
+            calls=totals[0],
+            total_duration_seconds=totals[1],
+            timed_calls=totals[2],
+            status_counts={status: count for status, count in statuses},
+        )
+
+    def rebuild(self, assistant_id: Optional[str] = None) -> None:
+        """
+        Recompute rollups from the raw mirrored calls.
+
+        Args:
+            assistant_id: Rebuild only this assistant (None for every assistant)
+        """
+        where = "WHERE assistant_id = ?" if assistant_id else ""
+        params = (assistant_id,) if assistant_id else ()
+        scope = f"{where} {'AND' if where else 'WHERE'} day != ''"
+
+        with self.mirror.transaction() as conn:
+            conn.execute(f"DELETE FROM daily_rollups {where}", params)
+            conn.execute(f"DELETE FROM daily_status_rollups {where}", params)
+            conn.execute(
+                "INSERT INTO daily_rollups "
+                "(assistant_id, day, call_count, total_duration_seconds, timed_calls) "
+                "SELECT assistant_id, day, COUNT(*), COALESCE(SUM(duration_seconds), 0), "
+                f"COUNT(duration_seconds) FROM calls {scope} GROUP BY assistant_id, day",
+                params,
+            )
+            conn.execute(
+                "INSERT INTO daily_status_rollups (assistant_id, day, status, call_count) "
+                "SELECT assistant_id, day, COALESCE(status, 'unknown'), COUNT(*) "
+                f"FROM calls {scope} GROUP BY assistant_id, day, COALESCE(status, 'unknown')",
+                params,
+            )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild portal analytics rollups")
+    parser.add_argument("--assistant-id", help="Rebuild a single assistant's rollups")
+    args = parser.parse_args()
+
+    mirror = CallMirror()
+    RollupEngine(mirror).rebuild(args.assistant_id)
+    print(f"Rollups rebuilt from {mirror.path}")
@@ -0,0 +1,240 @@
+"""
+Full-text transcript search for the Customer Portal.
+
+Call transcripts and summaries are indexed in an SQLite FTS5 table (an
+inverted index with positional postings) that is updated in the same
+transaction as each mirror write. Queries support bare terms, quoted
+phrases such as a registration plate ("AB12 CDE") and trailing-`*` prefix
+terms, and results are ranked with BM25.
+"""
+
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .mirror import CallMirror
+
+# Summaries are short and specific, so a summary hit outranks a transcript hit
+TRANSCRIPT_WEIGHT = 1.0
+SUMMARY_WEIGHT = 2.0
+
+MAX_QUERY_TERMS = 16
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class SearchQueryError(ValueError):
+    """Raised when a search query has no searchable terms."""
+
+
+def build_match_expression(query: str) -> str:
+    """
+    Translate a user query into a safe FTS5 MATCH expression.
+
+    Bare words and "quoted phrases" are ANDed together. Every term is quoted,
+    so FTS5 operators and punctuation in user input are matched literally
+    rather than parsed; a trailing `*` on a bare word makes it a prefix term.
+
+    Raises:
+        SearchQueryError: If the query contains no searchable terms
+    """
+    terms: List[str] = []
+    for phrase, word in _QUERY_TOKEN.findall(query):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith("*")
+        text = text.rstrip("*") if prefix else text
+        # Drop characters the unicode61 tokenizer would discard anyway
+        if not re.search(r"\w", text):
+            continue
+        quoted = '"' + text.replace('"', '""') + '"'
+        terms.append(quoted + "*" if prefix else quoted)
+
+    if not terms:
+        raise SearchQueryError("Search query must contain at least one word")
+    if len(terms) > MAX_QUERY_TERMS:
+        raise SearchQueryError(f"Search query may contain at most {MAX_QUERY_TERMS} terms")
+    return " AND ".join(terms)
+
+
+@dataclass
+class SearchHit:
+    """A call matching a transcript search."""
+    id: str
+    started_at: Optional[str]
+    caller: Optional[str]
+    status: Optional[str]
+    summary: Optional[str]
+    snippet: str
+    score: float
+
+
+class TranscriptIndex:
+    """Keeps the FTS5 transcript index in step with the call mirror."""
+
+    # Documents get their own integer ids so the index survives VACUUM,
+    # which may renumber the implicit rowids of the calls table.
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS call_search_docs (
+        doc_id INTEGER PRIMARY KEY,
+        call_id TEXT NOT NULL UNIQUE,
+        assistant_id TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_call_search_docs_assistant
+        ON call_search_docs (assistant_id, doc_id);
+    CREATE VIRTUAL TABLE IF NOT EXISTS call_search USING fts5(
+        transcript, summary, tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """
+
+    def __init__(self, mirror: CallMirror):
+        """
+        Initialize the index and subscribe it to mirror writes.
+
+        Args:
+            mirror: Call mirror whose writes drive the index
+        """
+        self.mirror = mirror
+        mirror.add_listener(self)
+
+    def on_calls_upserted(
+        self,
+        conn: sqlite3.Connection,
+        changes: List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]],
+    ) -> None:
+        """Re-index the transcript and summary of every written call."""
+        rows = [new for _, new in changes]
+        conn.executemany(
+            "INSERT INTO call_search_docs (call_id, assistant_id) VALUES (?, ?) "
+            "ON CONFLICT(call_id) DO UPDATE SET assistant_id = excluded.assistant_id",
+            [(row["id"], row["assistant_id"]) for row in rows],
+        )
+
+        doc_ids: Dict[str, int] = {}
+        for start in range(0, len(rows), 500):
+            chunk = [row["id"] for row in rows[start:start + 500]]
+            doc_ids.update(conn.execute(
+                "SELECT call_id, doc_id FROM call_search_docs "
+                f"WHERE call_id IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ).fetchall())
+
+        conn.executemany(
+            "DELETE FROM call_search WHERE rowid = ?",
+            [(doc_ids[row["id"]],) for row in rows],
+        )
+        conn.executemany(
+            "INSERT INTO call_search (rowid, transcript, summary) VALUES (?, ?, ?)",
+            [
+                (doc_ids[row["id"]], row.get("transcript"), row.get("summary"))
+                for row in rows
+                if row.get("transcript") or row.get("summary")
+            ],
+        )
+
+    def search(
+        self,
+        assistant_id: str,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[List[SearchHit], bool]:
+        """
+        Search an assistant's call transcripts and summaries.
+
+        Args:
+            assistant_id: Assistant whose calls are searched
+            query: Words, "quoted phrases" and prefix* terms, all of which must match
+            limit: Maximum hits to return
+            offset: Hits to skip, for pagination
+
+        Returns:
+            The page of hits, best first, and whether more hits follow
+
+        Raises:
+            SearchQueryError: If the query contains no searchable terms
+        """
+        expression = build_match_expression(query)
+        with self.mirror.transaction() as conn:
+            # Rank every match first, then build snippets for the requested page only
+            rows = conn.execute(
+                "WITH page AS ("
+                "  SELECT call_search.rowid AS doc_id, d.call_id, "
+                "  bm25(call_search, ?, ?) AS score "
+                "  FROM call_search JOIN call_search_docs d ON d.doc_id = call_search.rowid "
+                "  WHERE call_search MATCH ? AND d.assistant_id = ? "
+                "  ORDER BY score, d.doc_id LIMIT ? OFFSET ?"
+                ") "
+                "SELECT c.id, c.started_at, c.caller, c.status, c.summary, page.score, "
+                "snippet(call_search, 0, '[', ']', '...', 16) AS transcript_snippet, "
+                "snippet(call_search, 1, '[', ']', '...', 16) AS summary_snippet "
+                "FROM page JOIN call_search ON call_search.rowid = page.doc_id "
+                "JOIN calls c ON c.id = page.call_id "
+                "WHERE call_search MATCH ? ORDER BY page.score, page.doc_id",
+                (TRANSCRIPT_WEIGHT, SUMMARY_WEIGHT, expression, assistant_id,
+                 limit + 1, offset, expression),
+            ).fetchall()
+
+        hits = [
+            SearchHit(
+                id=row["id"],
+                started_at=row["started_at"],
+                caller=row["caller"],
+                status=row["status"],
+                summary=row["summary"],
+                # snippet() returns the bare ellipsis when a column has no match
+                snippet=row["transcript_snippet"] if "[" in (row["transcript_snippet"] or "")
+                else row["summary_snippet"] or "",
+                # bm25() is lower-is-better; flip it so clients see higher-is-better
+                score=round(-row["score"], 4),
+            )
+            for row in rows[:limit]
+        ]
+        return hits, len(rows) > limit
+
+    def rebuild(self, assistant_id: Optional[str] = None) -> None:
+        """
+        Re-index transcripts from the raw mirrored calls.
+
+        Args:
+            assistant_id: Rebuild only this assistant (None for every assistant)
+        """
+        where = "WHERE assistant_id = ?" if assistant_id else ""
+        params = (assistant_id,) if assistant_id else ()
+
+        with self.mirror.transaction() as conn:
+            if assistant_id:
+                conn.execute(
+                    "DELETE FROM call_search WHERE rowid IN "
+                    "(SELECT doc_id FROM call_search_docs WHERE assistant_id = ?)",
+                    params,
+                )
+            else:
+                conn.execute("DELETE FROM call_search")
+            conn.execute(f"DELETE FROM call_search_docs {where}", params)
+            conn.execute(
+                "INSERT INTO call_search_docs (call_id, assistant_id) "
+                f"SELECT id, assistant_id FROM calls {where}",
+                params,
+            )
+            conn.execute(
+                "INSERT INTO call_search (rowid, transcript, summary) "
+                "SELECT d.doc_id, c.transcript, c.summary FROM call_search_docs d "
+                "JOIN calls c ON c.id = d.call_id "
+                "WHERE (c.transcript IS NOT NULL OR c.summary IS NOT NULL)"
+                f"{' AND d.assistant_id = ?' if assistant_id else ''}",
+                params,
+            )
+            conn.execute("INSERT INTO call_search (call_search) VALUES ('optimize')")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the portal transcript search index")
+    parser.add_argument("--assistant-id", help="Rebuild a single assistant's calls")
+    args = parser.parse_args()
+
+    mirror = CallMirror()
+    TranscriptIndex(mirror).rebuild(args.assistant_id)
+    print(f"Transcript index rebuilt in {mirror.path}")
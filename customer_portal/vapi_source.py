@@ -0,0 +1,248 @@
+"""
+Vapi call source for the Customer Portal.
+
+Streams the Vapi `/call` listing page by page instead of requesting one
+huge array. Pages are walked newest-first with a `createdAt` cursor and a
+background task keeps a small number of pages prefetched while the caller
+is still consuming the current one.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+import aiohttp
+
+VAPI_API_BASE_URL = "https://api.vapi.ai"
+
+# Vapi caps the page size at 1000; smaller pages keep memory flat and get
+# the first results back sooner.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+DEFAULT_PREFETCH_PAGES = 2
+
+# Global cap on Vapi requests across every tenant, sync and fetch
+UPSTREAM_MAX_IN_FLIGHT = int(os.getenv("PORTAL_UPSTREAM_MAX_IN_FLIGHT", "32"))
+UPSTREAM_MAX_WAITING = int(os.getenv("PORTAL_UPSTREAM_MAX_WAITING", "64"))
+
+_END = object()
+
+
+class VapiSourceError(Exception):
+    """Raised when the Vapi API returns an error response."""
+
+
+class UpstreamBusyError(VapiSourceError):
+    """Raised when too many Vapi requests are already in flight and queued."""
+
+
+class UpstreamLimiter:
+    """Caps in-flight Vapi requests, refusing rather than queuing without bound."""
+
+    def __init__(self, max_in_flight: int, max_waiting: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_in_flight: Requests allowed to run at once
+            max_waiting: Requests allowed to wait for a slot before new ones are refused
+        """
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one upstream request slot.
+
+        Raises:
+            UpstreamBusyError: If every slot is taken and the wait queue is full
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            raise UpstreamBusyError("Too many Vapi requests in flight")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+upstream_limiter = UpstreamLimiter(UPSTREAM_MAX_IN_FLIGHT, UPSTREAM_MAX_WAITING)
+
+
+def vapi_headers() -> Dict[str, str]:
+    """Build the authorization headers for Vapi API requests."""
+    return {
+        "Authorization": f"Bearer {os.getenv('VAPI_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+
+async def _fetch_page(
+    session: aiohttp.ClientSession,
+    params: Dict[str, Any],
+) -> List[Dict]:
+    """Fetch a single page of calls."""
+    url = f"{VAPI_API_BASE_URL}/call"
+    async with upstream_limiter.slot(), \
+            session.get(url, headers=vapi_headers(), params=params) as response:
+        if response.status == 200:
+            return await response.json()
+        raise VapiSourceError(f"Vapi call listing failed with status {response.status}")
+
+
+async def fetch_call(session: aiohttp.ClientSession, call_id: str) -> Optional[Dict]:
+    """Fetch a single call's details, or None if Vapi has no such call."""
+    url = f"{VAPI_API_BASE_URL}/call/{call_id}"
+    async with upstream_limiter.slot(), session.get(url, headers=vapi_headers()) as response:
+        if response.status == 200:
+            return await response.json()
+        if response.status in (400, 404):
+            return None
+        raise VapiSourceError(f"Vapi call lookup failed with status {response.status}")
+
+
+async def _produce_pages(
+    session: aiohttp.ClientSession,
+    queue: asyncio.Queue,
+    assistant_id: str,
+    page_size: int,
+    max_calls: Optional[int],
+    filters: Dict[str, str],
+) -> None:
+    """
+    Walk the call listing with a createdAt cursor and push pages onto the queue.
+
+    The cursor is inclusive (`createdAtLe`) so calls sharing the boundary
+    timestamp are not lost; ids already emitted at that timestamp are skipped.
+    """
+    remaining = max_calls
+    boundary: Optional[str] = None
+    seen_at_boundary: Set[str] = set()
+    inclusive = True
+
+    try:
+        while remaining is None or remaining > 0:
+            limit = min(page_size, MAX_PAGE_SIZE)
+            if remaining is not None:
+                limit = min(limit, remaining + len(seen_at_boundary))
+
+            params: Dict[str, Any] = {"assistantId": assistant_id, "limit": limit, **filters}
+            if boundary is not None:
+                params["createdAtLe" if inclusive else "createdAtLt"] = boundary
+
+            page = await _fetch_page(session, params)
+            if not page:
+                break
+
+            fresh = [call for call in page if call.get("id") not in seen_at_boundary]
+            if remaining is not None:
+                fresh = fresh[:remaining]
+                remaining -= len(fresh)
+            if fresh:
+                await queue.put(fresh)
+
+            if len(page) < limit:
+                break
+
+            last_created = page[-1].get("createdAt")
+            if last_created is None:
+                break
+
+            if not fresh:
+                # A whole page shared one timestamp; step past it rather than loop.
+                inclusive = False
+            else:
+                inclusive = True
+                if last_created != boundary:
+                    seen_at_boundary = set()
+                seen_at_boundary.update(
+                    call["id"] for call in page
+                    if call.get("createdAt") == last_created and call.get("id")
+                )
+            boundary = last_created
+        await queue.put(_END)
+    except Exception as e:
+        await queue.put(e)
+
+
+async def iter_vapi_calls(
+    assistant_id: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_calls: Optional[int] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    updated_after: Optional[str] = None,
+    prefetch: int = DEFAULT_PREFETCH_PAGES,
+    session: Optional[aiohttp.ClientSession] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Iterate over an assistant's calls, newest first, one page at a time.
+
+    Only `prefetch` pages are ever buffered, so callers can process any
+    number of calls in constant memory and start responding before the
+    last page has arrived.
+
+    Args:
+        assistant_id: Vapi assistant whose calls are listed
+        page_size: Calls requested per page (capped at 1000)
+        max_calls: Stop after this many calls (None for all)
+        created_after: Only calls created after this ISO timestamp
+        created_before: Only calls created before this ISO timestamp
+        updated_after: Only calls updated after this ISO timestamp
+        prefetch: Number of pages fetched ahead of the consumer
+        session: Optional shared aiohttp session
+
+    Yields:
+        Raw Vapi call objects
+
+    Raises:
+        VapiSourceError: If Vapi rejects a page request
+    """
+    filters: Dict[str, str] = {}
+    if created_after:
+        filters["createdAtGt"] = created_after
+    if created_before:
+        filters["createdAtLt"] = created_before
+    if updated_after:
+        filters["updatedAtGt"] = updated_after
+
+    owns_session = session is None
+    if owns_session:
+        session = aiohttp.ClientSession()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+    producer = asyncio.create_task(
+        _produce_pages(session, queue, assistant_id, max(1, page_size), max_calls, filters)
+    )
+
+    try:
+        while True:
+            page = await queue.get()
+            if page is _END:
+                break
+            if isinstance(page, Exception):
+                raise page
+            for call in page:
+                yield call
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except (asyncio.CancelledError, Exception):
+            pass
+        if owns_session:
+            await session.close()
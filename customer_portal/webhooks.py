@@ -0,0 +1,208 @@
+"""
+Vapi webhook ingestion for the Customer Portal.
+
+Vapi pushes `status-update` and `end-of-call-report` server messages as
+calls progress. The webhook endpoint only verifies and enqueues them; a
+background task drains the queue in batches and merges each event into the
+call mirror, whose listeners update the rollups, transcript index and
+caches in the same transaction. Dashboards see calls within moments of
+them ending, while the polling syncer remains as a backstop.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .mirror import CallMirror, format_vapi_timestamp
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_SIZE = int(os.getenv("PORTAL_WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_BATCH_SIZE = 200
+
+INGESTED_EVENT_TYPES = {"status-update", "end-of-call-report"}
+
+# Fields an end-of-call report adds to the call it describes
+_REPORT_FIELDS = ("startedAt", "endedAt", "endedReason", "cost", "recordingUrl", "analysis")
+
+
+@dataclass
+class WebhookStats:
+    """Counters describing webhook ingestion."""
+    received: int = 0
+    ignored: int = 0
+    rejected: int = 0
+    ingested: int = 0
+    failed: int = 0
+
+
+def call_from_event(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Build the call fields a webhook event carries.
+
+    Returns:
+        A partial Vapi call object, or None if the event doesn't identify a call
+    """
+    call = dict(message.get("call") or {})
+    if not call.get("id"):
+        return None
+    if not call.get("assistantId"):
+        call["assistantId"] = (message.get("assistant") or {}).get("id")
+
+    if message.get("type") == "status-update":
+        if message.get("status"):
+            call["status"] = message["status"]
+    else:
+        call["status"] = "ended"
+        for field in _REPORT_FIELDS:
+            if message.get(field) is not None:
+                call[field] = message[field]
+        artifact = message.get("artifact") or {}
+        call["transcript"] = artifact.get("transcript") or message.get("transcript")
+        call["summary"] = (message.get("analysis") or {}).get("summary") or message.get("summary")
+
+    # Vapi event timestamps are epoch milliseconds
+    if isinstance(message.get("timestamp"), (int, float)):
+        sent_at = datetime.fromtimestamp(message["timestamp"] / 1000, tz=timezone.utc)
+        call["updatedAt"] = format_vapi_timestamp(sent_at)
+    call.setdefault("createdAt", call.get("startedAt") or call.get("updatedAt"))
+    return {field: value for field, value in call.items() if value is not None}
+
+
+def merge_call(existing: Optional[Dict[str, Any]], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge event fields over the mirrored call.
+
+    Events can arrive out of order, so a late status update never moves an
+    ended call back to an earlier status.
+    """
+    if existing is None:
+        return update
+    merged = {**existing, **update}
+    if existing.get("status") == "ended":
+        merged["status"] = "ended"
+    return merged
+
+
+class WebhookIngester:
+    """Queues verified webhook events and writes them to the call mirror in batches."""
+
+    def __init__(
+        self,
+        mirror: CallMirror,
+        assistant_ids: Callable[[], Iterable[str]],
+        max_queue: int = WEBHOOK_QUEUE_SIZE,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+    ):
+        """
+        Initialize the ingester.
+
+        Args:
+            mirror: Mirror that events are written to
+            assistant_ids: Returns the assistants whose calls are accepted
+            max_queue: Events held before new ones are refused
+            batch_size: Events written per mirror transaction
+        """
+        self.mirror = mirror
+        self.assistant_ids = assistant_ids
+        self.batch_size = batch_size
+        self.stats = WebhookStats()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    def submit(self, message: Dict[str, Any]) -> bool:
+        """
+        Queue a server message for ingestion without waiting.
+
+        Message types other than status updates and end-of-call reports are
+        acknowledged and ignored.
+
+        Returns:
+            False if the queue is full and the event was refused
+        """
+        self.stats.received += 1
+        if message.get("type") not in INGESTED_EVENT_TYPES:
+            self.stats.ignored += 1
+            return True
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            return False
+        return True
+
+    @property
+    def pending(self) -> int:
+        """Events waiting to be written."""
+        return self._queue.qsize()
+
+    def _ingest(self, messages: List[Dict[str, Any]]) -> int:
+        """Merge a batch of events into the mirror, one transaction per assistant."""
+        accepted = set(self.assistant_ids())
+        by_assistant: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for message in messages:
+            update = call_from_event(message)
+            assistant_id = (update or {}).get("assistantId")
+            if update is None or assistant_id not in accepted:
+                self.stats.ignored += 1
+                continue
+            calls = by_assistant.setdefault(assistant_id, {})
+            existing = calls.get(update["id"]) or self.mirror.get_call(assistant_id, update["id"])
+            calls[update["id"]] = merge_call(existing, update)
+
+        written = 0
+        for assistant_id, calls in by_assistant.items():
+            written += self.mirror.upsert_calls(assistant_id, calls.values())
+        self.stats.ingested += written
+        return written
+
+    def _next_batch(self, first: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        try:
+            # SQLite writes run off the event loop so webhook acks stay fast
+            return await asyncio.to_thread(self._ingest, batch)
+        except Exception as e:
+            self.stats.failed += len(batch)
+            logger.error(f"Webhook ingestion failed for {len(batch)} events: {e}")
+            return 0
+
+    async def drain(self) -> int:
+        """Write every queued event now. Returns the number of calls written."""
+        written = 0
+        while batch := self._next_batch():
+            written += await self._write(batch)
+        return written
+
+    async def run_forever(self) -> None:
+        """Write events as they arrive, batching whatever queued up meanwhile."""
+        while True:
+            first = await self._queue.get()
+            await self._write(self._next_batch(first))
+
+    def start(self) -> None:
+        """Start the background ingestion loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Stop the ingestion loop, writing any events still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.drain()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get ingestion counters and queue depth."""
+        return {**asdict(self.stats), "pending": self.pending}
@@ -4,7 +4,7 @@ Deploy Arval Voice Agent V2 to Vapi
 - Female voice (Lily)
 - Updated welcome message
 - End call detection
-- All 10 tools including Calendly, SMS, and call transfer
+- All 11 tools including Calendly, SMS, and call transfer
 - Empathetic, professional personality
 """
 
@@ -95,7 +95,7 @@ When the conversation is complete:
 
 ## YOUR CAPABILITIES
 You can:
-1. Book appointments (MOT, service, sales, fleet reviews)
+1. Book appointments (MOT, service, sales, fleet reviews), offering the next free slots
 2. Capture leads from prospective customers
 3. Schedule callbacks
 4. Provide roadside assistance info
@@ -107,7 +107,7 @@ You can:
 Always be warm, professional, and solution-focused!
 """
 
-# All 10 tools
+# All 11 tools
 TOOLS = [
     {
         "type": "function",
@@ -124,12 +124,31 @@ TOOLS = [
                     "preferred_date": {"type": "string", "description": "Preferred date (YYYY-MM-DD format)"},
                     "preferred_time": {"type": "string", "enum": ["Morning (9-12)", "Afternoon (12-3)", "Late Afternoon (3-5)"], "description": "Time slot"},
                     "vehicle_registration": {"type": "string", "description": "Vehicle registration if applicable"},
-                    "additional_notes": {"type": "string", "description": "Special requirements"}
+                    "additional_notes": {"type": "string", "description": "Special requirements"},
+                    "postcode": {"type": "string", "description": "Customer's postcode, to book the nearest workshop for an MOT, Service or Inspection (optional)"}
                 },
                 "required": ["customer_name", "contact_phone", "contact_email", "appointment_type", "preferred_date", "preferred_time"]
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_next_available",
+            "description": "Find the next appointment slots with space. Use to offer the customer real options before booking, or when their preferred slot is full.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "appointment_type": {"type": "string", "enum": ["MOT", "Service", "Inspection", "Fleet Consultation", "Sales Demo"], "description": "Type of appointment"},
+                    "from_date": {"type": "string", "description": "Earliest date (YYYY-MM-DD), default today"},
+                    "preferred_time": {"type": "string", "enum": ["Morning (9-12)", "Afternoon (12-3)", "Late Afternoon (3-5)"], "description": "Only offer this time slot"},
+                    "count": {"type": "integer", "description": "How many options to offer (default 3)"},
+                    "postcode": {"type": "string", "description": "Customer's postcode, to only offer slots with a workshop bay nearby (optional)"}
+                },
+                "required": ["appointment_type"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -364,7 +383,7 @@ async def deploy():
         print("   • Female voice (Lily)")
         print("   • New greeting: 'Welcome to Arval Driver Desk! My name is Lily...'")
         print("   • Automatic call ending detection")
-        print("   • 10 tools including call transfer & SMS")
+        print("   • 11 tools including call transfer & SMS")
         print("   • Empathetic, professional personality")
         print("   • Complete UK office information")
         print()
@@ -2,6 +2,7 @@
 
 from .appointment import Appointment, AppointmentType, TimeSlot, AppointmentStatus
 from .lead import Lead, LeadPriority, ContactMethod
+from .compact import CompactAppointment, CompactLead
 
 __all__ = [
     "Appointment",
@@ -11,4 +12,6 @@ __all__ = [
     "Lead",
     "LeadPriority",
     "ContactMethod",
+    "CompactAppointment",
+    "CompactLead",
 ]
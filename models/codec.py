@@ -0,0 +1,381 @@
+"""
+Record codecs for Arval BNP Voice Agent.
+
+`to_dict`/`from_dict` on the models build every dictionary field by
+field, look enums up through `Enum.__call__` and parse timestamps
+eagerly, which dominates the cost of loading or writing many records.
+`ModelCodec` inspects a model once and generates an encoder and decoder
+specialised to its fields, with enum lookups through prebuilt tables.
+
+Two wire formats are offered:
+
+- JSON (`dumps`/`loads`), in the same shape as `to_dict`, via orjson
+- A compact binary format (`pack`/`unpack`) on msgpack: one header with
+  the field names and enum value tables, then each record as a positional
+  array with enums as ordinals and timestamps as integer microseconds
+  since the epoch (a `[microseconds, utc_offset_seconds]` pair when the
+  timestamp is timezone-aware)
+
+Because the header carries the field and enum layout it was written
+with, binary payloads stay readable after fields or enum members are
+added. The module-level `dumps`/`loads`/`pack`/`unpack` are the same
+encoders for plain JSON-compatible values, shared by the agent's data
+files and the Customer Portal.
+"""
+
+import dataclasses
+import sys
+import typing
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+import orjson
+
+from .compact import CompactRecord, _isoformat
+
+FORMAT_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_SECOND = timedelta(seconds=1)
+_OFFSETS: Dict[int, timezone] = {}
+
+
+def dumps(value: Any, indent: bool = False) -> bytes:
+    """Encode a JSON-compatible value as UTF-8 JSON; unknown types are stringified."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_INDENT_2 if indent else 0)
+
+
+def loads(data: Any) -> Any:
+    """Decode JSON from bytes or str."""
+    return orjson.loads(data)
+
+
+def pack(value: Any) -> bytes:
+    """Encode a msgpack-compatible value."""
+    return msgpack.packb(value, use_bin_type=True, default=str)
+
+
+def unpack(data: bytes) -> Any:
+    """Decode a msgpack payload produced by `pack`."""
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def to_epoch(value: Any) -> Any:
+    """Encode a timestamp (datetime or ISO string) for the binary format."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    offset = value.utcoffset()
+    if offset is None:
+        return (value - _EPOCH) // _MICROSECOND
+    return [(value - _EPOCH_UTC) // _MICROSECOND, offset // _SECOND]
+
+
+def from_epoch(value: Any) -> Optional[datetime]:
+    """Decode a timestamp written by `to_epoch`. Aware values get a fixed UTC offset."""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        micros, offset = value
+        tz = _OFFSETS.get(offset)
+        if tz is None:
+            tz = _OFFSETS.setdefault(offset, timezone(timedelta(seconds=offset)))
+        return (_EPOCH_UTC + timedelta(microseconds=micros)).astimezone(tz)
+    return _EPOCH + timedelta(microseconds=value)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Field:
+    """How one model field is encoded."""
+    name: str
+    kind: str  # "plain", "enum" or "timestamp"
+    enum: Optional[type] = None
+    required: bool = False
+    default: Any = None
+    default_factory: Optional[Callable[[], Any]] = None
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _describe(model: type) -> List[_Field]:
+    """Describe a model's fields from its dataclass (or a compact record's dataclass)."""
+    dataclass = model.MODEL if issubclass(model, CompactRecord) else model
+    hints = typing.get_type_hints(dataclass)
+    described = []
+    for spec in dataclasses.fields(dataclass):
+        annotation = _unwrap_optional(hints[spec.name])
+        if isinstance(annotation, type) and issubclass(annotation, Enum):
+            kind = "enum"
+        elif annotation is datetime:
+            kind = "timestamp"
+        else:
+            kind = "plain"
+        has_default = spec.default is not dataclasses.MISSING
+        has_factory = spec.default_factory is not dataclasses.MISSING
+        described.append(_Field(
+            name=spec.name,
+            kind=kind,
+            enum=annotation if kind == "enum" else None,
+            required=not (has_default or has_factory),
+            default=spec.default if has_default else None,
+            default_factory=spec.default_factory if has_factory else None,
+        ))
+    return described
+
+
+class ModelCodec:
+    """Generated encoders and decoders for one model class."""
+
+    def __init__(self, model: type):
+        """
+        Inspect a model and generate its encoders.
+
+        Args:
+            model: A model dataclass (e.g. `Lead`) or a compact record class
+                (e.g. `CompactLead`)
+        """
+        self.model = model
+        self.compact = issubclass(model, CompactRecord)
+        self.fields = _describe(model)
+        self.field_names = tuple(f.name for f in self.fields)
+        self.enum_tables = {
+            f.name: [member.value for member in f.enum] for f in self.fields if f.kind == "enum"
+        }
+        self._namespace = self._build_namespace()
+        # encode/decode convert one record to and from its `to_dict` form
+        self.encode: Callable[[Any], Dict[str, Any]] = self._compile(
+            "encode", self._encode_source()
+        )
+        self.decode: Callable[[Dict[str, Any]], Any] = self._compile(
+            "decode", self._decode_source()
+        )
+        self._encode_json = self._compile("encode_json", self._encode_json_source())
+        self._encode_row = self._compile("encode_row", self._encode_row_source())
+        self._decode_row = self._compile("decode_row", self._decode_row_source())
+
+    def _build_namespace(self) -> Dict[str, Any]:
+        namespace: Dict[str, Any] = {
+            "_cls": self.model,
+            "_new": object.__new__,
+            "_intern": sys.intern,
+            "_isoformat": _isoformat,
+            "_parse": datetime.fromisoformat,
+            "_to_epoch": to_epoch,
+            "_from_epoch": from_epoch,
+        }
+        for f in self.fields:
+            if f.kind == "enum":
+                by_value = {member.value: member for member in f.enum}
+                if not f.required:
+                    by_value[None] = f.default
+                namespace[f"_e_{f.name}"] = f.enum
+                namespace[f"_v_{f.name}"] = by_value
+                namespace[f"_o_{f.name}"] = {member: i for i, member in enumerate(f.enum)}
+                namespace[f"_m_{f.name}"] = list(f.enum)
+            if f.default_factory is not None:
+                namespace[f"_f_{f.name}"] = f.default_factory
+            if f.kind == "plain" and not f.required:
+                namespace[f"_d_{f.name}"] = f.default
+        return namespace
+
+    def _compile(self, name: str, source: str) -> Callable:
+        exec(compile(source, f"<{self.model.__name__} codec>", "exec"), self._namespace)
+        return self._namespace[name]
+
+    def _raw(self, f: _Field) -> str:
+        """Expression reading a field off `obj` without triggering lazy parsing."""
+        if self.compact and f.kind == "timestamp":
+            return f"obj._{f.name}"
+        return f"obj.{f.name}"
+
+    def _interned(self, f: _Field) -> bool:
+        return self.compact and f.name in self.model.INTERNED
+
+    def _encode_source(self) -> str:
+        items = []
+        for f in self.fields:
+            raw = self._raw(f)
+            if f.kind == "enum":
+                items.append(f"{f.name!r}: {raw}.value")
+            elif f.kind == "timestamp":
+                items.append(f"{f.name!r}: _isoformat({raw}) if {raw} else None")
+            else:
+                items.append(f"{f.name!r}: {raw}")
+        return "def encode(obj):\n    return {" + ", ".join(items) + "}\n"
+
+    def _encode_json_source(self) -> str:
+        """
+        An encoder for `dumps`, which leaves enums and datetimes to orjson.
+
+        orjson writes enums as their values and datetimes in the same ISO
+        format as `isoformat()`, and serializes dataclasses field by field in
+        declaration order, which is also `to_dict`'s order.
+        """
+        if not self.compact:
+            return "def encode_json(obj):\n    return obj\n"
+        items = ", ".join(f"{f.name!r}: {self._raw(f)}" for f in self.fields)
+        return "def encode_json(obj):\n    return {" + items + "}\n"
+
+    def _encode_row_source(self) -> str:
+        items = []
+        for f in self.fields:
+            raw = self._raw(f)
+            if f.kind == "enum":
+                items.append(f"_o_{f.name}[{raw}]")
+            elif f.kind == "timestamp":
+                items.append(f"_to_epoch({raw})")
+            else:
+                items.append(raw)
+        return "def encode_row(obj):\n    return [" + ", ".join(items) + "]\n"
+
+    def _value_source(self, f: _Field, value: str, fmt: str) -> List[str]:
+        """Statements that convert `value` into local variable `x_<name>`."""
+        target = f"x_{f.name}"
+        if f.kind == "enum":
+            if fmt == "row":
+                return [f"{target} = _m_{f.name}[{value}]"]
+            return [
+                f"v = {value}",
+                f"{target} = _v_{f.name}[v] if v in _v_{f.name} else _e_{f.name}(v)",
+            ]
+        if f.kind == "timestamp":
+            if fmt == "row":
+                parse = f"_from_epoch(v)"
+            else:
+                # Compact records keep the string and parse it on first read
+                parse = "v" if self.compact else "_parse(v)"
+            fallback = f"_f_{f.name}()" if f.default_factory is not None else "None"
+            return [f"v = {value}", f"{target} = {parse} if v else {fallback}"]
+        if self._interned(f):
+            return [f"v = {value}", f"{target} = _intern(v) if v.__class__ is str else v"]
+        return [f"{target} = {value}"]
+
+    def _construct_source(self) -> List[str]:
+        if not self.compact:
+            if hasattr(self.model, "__post_init__"):
+                args = ", ".join(f"{f.name}=x_{f.name}" for f in self.fields)
+                return [f"return _cls({args})"]
+            # Every field is set here, so skip the dataclass __init__ and its defaults
+            items = ", ".join(f"{f.name!r}: x_{f.name}" for f in self.fields)
+            return ["obj = _new(_cls)", f"obj.__dict__.update({{{items}}})", "return obj"]
+        lines = ["obj = _new(_cls)"]
+        for f in self.fields:
+            slot = f"_{f.name}" if f.kind == "timestamp" else f.name
+            lines.append(f"obj.{slot} = x_{f.name}")
+        if "score" in self.field_names:
+            lines.append("obj.score = obj.score or 0")
+        if "ev_interest" in self.field_names:
+            lines.append("obj.ev_interest = bool(obj.ev_interest)")
+        lines.append("return obj")
+        return lines
+
+    def _decode_source(self) -> str:
+        lines = []
+        for f in self.fields:
+            if f.required:
+                value = f"d[{f.name!r}]"
+            elif f.kind == "plain":
+                value = f"d.get({f.name!r}, _d_{f.name})"
+            else:
+                value = f"d.get({f.name!r})"
+            lines += self._value_source(f, value, "dict")
+        lines += self._construct_source()
+        return "def decode(d):\n" + "".join(f"    {line}\n" for line in lines)
+
+    def _decode_row_source(self) -> str:
+        lines = []
+        for i, f in enumerate(self.fields):
+            lines += self._value_source(f, f"r[{i}]", "row")
+        lines += self._construct_source()
+        return "def decode_row(r):\n" + "".join(f"    {line}\n" for line in lines)
+
+    def dumps(self, records: Iterable[Any], indent: bool = False) -> bytes:
+        """Encode records as a JSON array of `to_dict`-shaped objects."""
+        encode_json = self._encode_json
+        return dumps([encode_json(record) for record in records], indent)
+
+    def loads(self, data: Any) -> List[Any]:
+        """Decode a JSON array written by `dumps` (or by `to_dict` and `json.dump`)."""
+        decode = self.decode
+        return [decode(item) for item in loads(data)]
+
+    def pack(self, records: Iterable[Any]) -> bytes:
+        """Encode records in the binary format."""
+        encode_row = self._encode_row
+        return pack([
+            FORMAT_VERSION,
+            self.model.__name__,
+            list(self.field_names),
+            self.enum_tables,
+            [encode_row(record) for record in records],
+        ])
+
+    def unpack(self, data: bytes) -> List[Any]:
+        """
+        Decode a binary payload written by `pack` for this model or its dataclass.
+
+        Raises:
+            ValueError: If the payload isn't in a supported format
+        """
+        try:
+            version, _, field_names, enum_tables, rows = unpack(data)
+        except (ValueError, TypeError, msgpack.ExtraData) as e:
+            raise ValueError(f"Malformed payload: {e}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported format version: {version}")
+        if field_names != list(self.field_names) or enum_tables != self.enum_tables:
+            rows = self._realign(field_names, enum_tables, rows)
+        decode_row = self._decode_row
+        return [decode_row(row) for row in rows]
+
+    def _realign(self, field_names: List[str], enum_tables: Dict[str, List[Any]],
+                 rows: List[List[Any]]) -> List[List[Any]]:
+        """Rewrite rows from an older field and enum layout into the current one."""
+        positions = {name: i for i, name in enumerate(field_names)}
+        remaps: List[Tuple[Optional[int], Optional[Dict[int, int]], Any]] = []
+        for f in self.fields:
+            position = positions.get(f.name)
+            remap = None
+            if f.kind == "enum" and position is not None:
+                current = {value: i for i, value in enumerate(self.enum_tables[f.name])}
+                remap = {i: current[value] for i, value in enumerate(enum_tables[f.name])}
+            if position is None and f.required:
+                raise ValueError(f"Payload is missing required field {f.name!r}")
+            if f.kind == "enum":
+                missing = self.enum_tables[f.name].index(f.default.value) if f.default else None
+            elif f.kind == "timestamp":
+                missing = to_epoch(f.default_factory()) if f.default_factory else None
+            else:
+                missing = f.default
+            remaps.append((position, remap, missing))
+        return [
+            [
+                missing if position is None
+                else remap[row[position]] if remap is not None
+                else row[position]
+                for position, remap, missing in remaps
+            ]
+            for row in rows
+        ]
+
+
+_codecs: Dict[type, ModelCodec] = {}
+
+
+def codec_for(model: type) -> ModelCodec:
+    """Get the (cached) codec for a model class."""
+    codec = _codecs.get(model)
+    if codec is None:
+        codec = _codecs.setdefault(model, ModelCodec(model))
+    return codec
@@ -0,0 +1,201 @@
+"""
+Memory-compact record models for Arval BNP Voice Agent.
+
+`Lead` and `Appointment` are regular dataclasses, which is convenient for
+one record at a time but costly when a year of leads is loaded for
+scoring or export: every instance carries a `__dict__`, every timestamp
+is parsed into a `datetime` up front and every categorical string is a
+separate copy.
+
+`CompactLead` and `CompactAppointment` hold the same fields in
+`__slots__`, keep enum members and interned strings for categorical
+values, and store timestamps as the ISO strings they were loaded from,
+parsing one only when it is first read. Their `to_dict`/`from_dict` use
+the same dictionary format as the dataclasses, and `from_model` and
+`to_model` convert between the two.
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+from .appointment import Appointment, AppointmentStatus, AppointmentType, TimeSlot
+from .lead import ContactMethod, Lead, LeadPriority, LeadSource, LeadStatus
+
+Timestamp = Union[str, datetime, None]
+
+
+class LazyTimestamp:
+    """A timestamp attribute stored as an ISO string until it is first read."""
+
+    def __init__(self, slot: str):
+        self.slot = slot
+
+    def __get__(self, instance, owner=None) -> Optional[datetime]:
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value: Timestamp) -> None:
+        setattr(instance, self.slot, value or None)
+
+
+def _isoformat(value: Timestamp) -> Optional[str]:
+    """Serialize a stored timestamp without parsing it if it is still a string."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def _slots(fields: Tuple[str, ...], timestamps: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Slot names for a record's fields; timestamps live behind `LazyTimestamp`."""
+    return tuple(f"_{name}" if name in timestamps else name for name in fields)
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CompactRecord:
+    """
+    Base for slotted records.
+
+    Subclasses list their plain fields, their enum fields with the enum and
+    the default value, their timestamps and which string fields to intern.
+    """
+
+    __slots__ = ()
+
+    # Field order matches the dataclass's `to_dict`
+    FIELDS: Tuple[str, ...] = ()
+    ENUMS: Dict[str, Tuple[Type, str]] = {}
+    TIMESTAMPS: Tuple[str, ...] = ()
+    INTERNED: Tuple[str, ...] = ()
+    REQUIRED: Tuple[str, ...] = ()
+    MODEL: Type = object
+
+    def __init__(self, **values: Any):
+        for name in self.FIELDS:
+            value = values.get(name)
+            if name in self.ENUMS:
+                enum, default = self.ENUMS[name]
+                value = enum(value if value is not None else default)
+            elif name in self.INTERNED:
+                value = _intern(value)
+            setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        """Create a record from the dictionary format used by the dataclass."""
+        missing = [name for name in cls.REQUIRED if name not in data]
+        if missing:
+            raise KeyError(missing[0])
+        record = cls(**data)
+        if not data.get("created_at"):
+            record.created_at = datetime.now()
+        return record
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]]) -> List[Any]:
+        """Create records from an iterable of dictionaries, e.g. a loaded JSON file."""
+        return [cls.from_dict(data) for data in records]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the same dictionary the dataclass's `to_dict` produces."""
+        result = {}
+        for name in self.FIELDS:
+            if name in self.TIMESTAMPS:
+                result[name] = _isoformat(getattr(self, f"_{name}"))
+            elif name in self.ENUMS:
+                result[name] = getattr(self, name).value
+            else:
+                result[name] = getattr(self, name)
+        return result
+
+    @classmethod
+    def from_model(cls, model):
+        """Create a compact record from its dataclass."""
+        return cls(**{name: getattr(model, name) for name in cls.FIELDS})
+
+    def to_model(self):
+        """Convert to the full dataclass, e.g. to use its workflow methods."""
+        return self.MODEL(**{name: getattr(self, name) for name in self.FIELDS})
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class CompactLead(CompactRecord):
+    """Slotted, memory-compact variant of `Lead`."""
+
+    FIELDS = (
+        "id", "contact_name", "contact_email", "contact_phone", "source", "status",
+        "priority", "score", "company_name", "company_size", "industry",
+        "current_fleet_size", "projected_fleet_size", "current_provider",
+        "vehicle_interests", "ev_interest", "timeline", "budget_range",
+        "specific_requirements", "preferred_contact_method", "best_time_to_call",
+        "inquiry_notes", "follow_up_notes", "created_at", "updated_at",
+        "contacted_at", "qualified_at", "closed_at", "assigned_to",
+    )
+    ENUMS = {
+        "source": (LeadSource, "Voice Agent"),
+        "status": (LeadStatus, "New"),
+        "priority": (LeadPriority, "Standard"),
+        "preferred_contact_method": (ContactMethod, "Either"),
+    }
+    TIMESTAMPS = ("created_at", "updated_at", "contacted_at", "qualified_at", "closed_at")
+    INTERNED = (
+        "company_name", "company_size", "industry", "current_provider", "vehicle_interests",
+        "timeline", "budget_range", "best_time_to_call", "assigned_to",
+    )
+    REQUIRED = ("id", "contact_name", "contact_email", "contact_phone")
+    MODEL = Lead
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+
+    created_at = LazyTimestamp("_created_at")
+    updated_at = LazyTimestamp("_updated_at")
+    contacted_at = LazyTimestamp("_contacted_at")
+    qualified_at = LazyTimestamp("_qualified_at")
+    closed_at = LazyTimestamp("_closed_at")
+
+    def __init__(self, **values: Any):
+        super().__init__(**values)
+        self.score = self.score or 0
+        self.ev_interest = bool(self.ev_interest)
+
+
+class CompactAppointment(CompactRecord):
+    """Slotted, memory-compact variant of `Appointment`."""
+
+    FIELDS = (
+        "id", "customer_name", "contact_phone", "contact_email", "appointment_type",
+        "date", "time_slot", "status", "vehicle_registration", "additional_notes",
+        "created_at", "updated_at", "confirmed_at", "cancelled_at", "cancellation_reason",
+    )
+    ENUMS = {
+        "appointment_type": (AppointmentType, None),
+        "time_slot": (TimeSlot, None),
+        "status": (AppointmentStatus, "Pending"),
+    }
+    TIMESTAMPS = ("created_at", "updated_at", "confirmed_at", "cancelled_at")
+    INTERNED = ("date", "cancellation_reason")
+    REQUIRED = (
+        "id", "customer_name", "contact_phone", "contact_email",
+        "appointment_type", "date", "time_slot",
+    )
+    MODEL = Appointment
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+
+    created_at = LazyTimestamp("_created_at")
+    updated_at = LazyTimestamp("_updated_at")
+    confirmed_at = LazyTimestamp("_confirmed_at")
+    cancelled_at = LazyTimestamp("_cancelled_at")
@@ -7,6 +7,8 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
+from .scoring import priority_for, score_records
+
 
 class LeadPriority(Enum):
     """Priority levels for leads based on scoring."""
@@ -99,69 +101,18 @@ class Lead:
         """
         Calculate lead score based on various factors.
         Higher scores indicate more promising leads.
+
+        Scoring rules live in `models.scoring`, which scores whole batches;
+        this scores the lead as a batch of one.
         """
-        score = 0
-        
-        # Company information (10 points max)
-        if self.company_name:
-            score += 10
-        
-        # Fleet size scoring (35 points max)
-        if self.current_fleet_size:
-            if self.current_fleet_size >= 100:
-                score += 25
-            elif self.current_fleet_size >= 50:
-                score += 20
-            elif self.current_fleet_size >= 20:
-                score += 15
-            elif self.current_fleet_size >= 10:
-                score += 10
-            else:
-                score += 5
-        
-        if self.projected_fleet_size and self.projected_fleet_size > (self.current_fleet_size or 0):
-            score += 10  # Growth potential
-        
-        # Timeline scoring (25 points max)
-        if self.timeline:
-            timeline_lower = self.timeline.lower()
-            if "immediate" in timeline_lower or "asap" in timeline_lower or "within 1 month" in timeline_lower:
-                score += 25
-            elif "1-3 month" in timeline_lower:
-                score += 20
-            elif "3-6 month" in timeline_lower:
-                score += 15
-            elif "6-12 month" in timeline_lower:
-                score += 10
-            else:
-                score += 5
-        
-        # Budget indication (15 points max)
-        if self.budget_range:
-            score += 15
-        
-        # EV interest (10 points) - aligns with Arval sustainability focus
-        if self.ev_interest:
-            score += 10
-        
-        # Current provider (5 points) - switching potential
-        if self.current_provider:
-            score += 5
-        
-        self.score = score
-        self._update_priority()
-        return score
+        scores, priorities = score_records([self])
+        self.score = int(scores[0])
+        self.priority = LeadPriority(priorities[0])
+        return self.score
 
     def _update_priority(self) -> None:
         """Update priority based on current score."""
-        if self.score >= 70:
-            self.priority = LeadPriority.HIGH
-        elif self.score >= 45:
-            self.priority = LeadPriority.MEDIUM
-        elif self.score >= 20:
-            self.priority = LeadPriority.STANDARD
-        else:
-            self.priority = LeadPriority.LOW
+        self.priority = LeadPriority(priority_for(self.score))
 
     def to_dict(self) -> dict:
         """Convert lead to dictionary for JSON serialization."""
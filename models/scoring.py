@@ -0,0 +1,177 @@
+"""
+Lead scoring for Arval BNP Voice Agent.
+
+Leads are scored in batches over columns: each input (fleet size,
+projected size, timeline bucket, budget, EV interest, current provider)
+is a NumPy array with one entry per lead, and the score and priority of
+the whole lead book come out of a handful of array operations. A single
+lead is scored as a batch of one, so `Lead.calculate_score`,
+`capture_lead` and the nightly rescoring job all use the same rules.
+
+Points (100 max):
+
+- Company name given: 10
+- Current fleet size: 5 / 10 / 15 / 20 / 25 at 1+ / 10+ / 20+ / 50+ / 100+
+- Projected fleet larger than the current one: 10
+- Timeline: 25 immediate (ASAP, within a month), 20 for 1-3 months,
+  15 for 3-6 months, 10 for 6-12 months, 5 for anything else
+- Budget range given: 15
+- EV interest: 10
+- Current provider given (switching potential): 5
+
+Priority is High from 70, Medium from 45, Standard from 20, else Low.
+"""
+
+import re
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Timeline buckets, with the phrases that select them (checked in order)
+NO_TIMELINE, IMMEDIATE, WITHIN_3_MONTHS, WITHIN_6_MONTHS, WITHIN_12_MONTHS, LONGER = range(6)
+TIMELINE_PHRASES = (
+    (IMMEDIATE, ("immediate", "asap", "within 1 month")),
+    (WITHIN_3_MONTHS, ("1-3 month",)),
+    (WITHIN_6_MONTHS, ("3-6 month",)),
+    (WITHIN_12_MONTHS, ("6-12 month",)),
+)
+TIMELINE_POINTS = np.array([0, 25, 20, 15, 10, 5], dtype=np.int16)
+
+# Fleet size thresholds and the points at or above each (below the first: 5)
+FLEET_THRESHOLDS = np.array([10, 20, 50, 100])
+FLEET_POINTS = np.array([5, 10, 15, 20, 25], dtype=np.int16)
+
+COMPANY_POINTS = 10
+GROWTH_POINTS = 10
+BUDGET_POINTS = 15
+EV_POINTS = 10
+PROVIDER_POINTS = 5
+
+# Minimum score for each priority above the lowest
+PRIORITY_THRESHOLDS = np.array([20, 45, 70])
+PRIORITIES = ("Low", "Standard", "Medium", "High")
+
+_EV_PATTERN = re.compile(r"\b(?:evs?|electric|plug-in)\b", re.IGNORECASE)
+
+
+def timeline_bucket(timeline: Optional[str]) -> int:
+    """Classify a free-text decision timeline."""
+    if not timeline:
+        return NO_TIMELINE
+    lowered = timeline.lower()
+    for bucket, phrases in TIMELINE_PHRASES:
+        if any(phrase in lowered for phrase in phrases):
+            return bucket
+    return LONGER
+
+
+def mentions_ev(vehicle_interests: Optional[str]) -> bool:
+    """Whether stated vehicle interests include electric vehicles."""
+    return bool(vehicle_interests and _EV_PATTERN.search(vehicle_interests))
+
+
+def _values(records: Sequence[Any], name: str) -> List[Any]:
+    """One field of every record, from dictionaries or objects."""
+    if records and isinstance(records[0], dict):
+        return [record.get(name) for record in records]
+    return list(map(attrgetter(name), records))
+
+
+def _flags(values: List[Any]) -> np.ndarray:
+    return np.fromiter(map(bool, values), dtype=bool, count=len(values))
+
+
+def _counts(values: List[Any]) -> np.ndarray:
+    """Whole numbers, with 0 for missing (or, in stored leads, unparseable) values."""
+    try:
+        return np.array([value or 0 for value in values], dtype=np.int64)
+    except (TypeError, ValueError):
+        def parse(value: Any) -> int:
+            try:
+                return int(value or 0)
+            except (TypeError, ValueError):
+                return 0
+        return np.fromiter(map(parse, values), dtype=np.int64, count=len(values))
+
+
+@dataclass
+class LeadColumns:
+    """Scoring inputs for a batch of leads, one array entry per lead."""
+    has_company: np.ndarray
+    fleet_size: np.ndarray  # 0 when unknown
+    projected_fleet_size: np.ndarray  # 0 when unknown
+    timeline: np.ndarray  # timeline bucket
+    has_budget: np.ndarray
+    ev_interest: np.ndarray
+    has_provider: np.ndarray
+
+    @classmethod
+    def from_records(cls, records: Sequence[Any]) -> "LeadColumns":
+        """
+        Extract columns from leads.
+
+        Accepts a sequence of `Lead` or `CompactLead` objects, or of stored
+        lead dictionaries. Stored leads without an `ev_interest` flag, like
+        the ones `capture_lead` wrote before it recorded one, count EV
+        interest from their vehicle interests.
+        """
+        timelines = _values(records, "timeline")
+        # Few distinct timelines are ever given, so classify each one once
+        buckets = {timeline: timeline_bucket(timeline) for timeline in set(timelines)}
+        ev_flags = [
+            mentions_ev(interests) if flag is None else flag
+            for flag, interests in zip(
+                _values(records, "ev_interest"), _values(records, "vehicle_interests")
+            )
+        ]
+        return cls(
+            has_company=_flags(_values(records, "company_name")),
+            fleet_size=_counts(_values(records, "current_fleet_size")),
+            projected_fleet_size=_counts(_values(records, "projected_fleet_size")),
+            timeline=np.fromiter(
+                map(buckets.__getitem__, timelines), dtype=np.int8, count=len(timelines)
+            ),
+            has_budget=_flags(_values(records, "budget_range")),
+            ev_interest=_flags(ev_flags),
+            has_provider=_flags(_values(records, "current_provider")),
+        )
+
+
+def score_columns(columns: LeadColumns) -> np.ndarray:
+    """Score every lead in a batch."""
+    fleet = columns.fleet_size
+    fleet_points = FLEET_POINTS[np.searchsorted(FLEET_THRESHOLDS, fleet, side="right")]
+    fleet_points = np.where(fleet != 0, fleet_points, 0)
+    growth = (columns.projected_fleet_size != 0) & (columns.projected_fleet_size > fleet)
+    return (
+        fleet_points
+        + TIMELINE_POINTS[columns.timeline]
+        + COMPANY_POINTS * columns.has_company
+        + GROWTH_POINTS * growth
+        + BUDGET_POINTS * columns.has_budget
+        + EV_POINTS * columns.ev_interest
+        + PROVIDER_POINTS * columns.has_provider
+    ).astype(np.int16)
+
+
+def prioritize(scores: np.ndarray) -> np.ndarray:
+    """Priority of each score, as an index into PRIORITIES."""
+    return np.searchsorted(PRIORITY_THRESHOLDS, scores, side="right")
+
+
+def priority_for(score: int) -> str:
+    """Priority of a single score."""
+    return PRIORITIES[int(np.searchsorted(PRIORITY_THRESHOLDS, score, side="right"))]
+
+
+def score_records(records: Sequence[Any]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Score and prioritize a batch of leads.
+
+    Returns:
+        The scores, and each lead's priority as a `LeadPriority` value
+    """
+    scores = score_columns(LeadColumns.from_records(records))
+    return scores, [PRIORITIES[code] for code in prioritize(scores).tolist()]
@@ -2,12 +2,19 @@
 Unit tests for Arval BNP Voice Agent.
 """
 
+import asyncio
+import json
+import multiprocessing
 import pytest
-from datetime import datetime
+from datetime import date, datetime, time, timedelta, timezone
 from unittest.mock import AsyncMock, patch, MagicMock
 
 # Test the tools
+from agent import business_days, callbacks, dedup, ids, rescore, slots, tools, workshops
 from agent.tools import (
+    book_appointment,
+    capture_lead,
+    find_next_available,
     get_business_hours,
     check_after_hours,
     get_roadside_assistance,
@@ -17,6 +24,9 @@ from agent.tools import (
 # Test the models
 from models.appointment import Appointment, AppointmentType, TimeSlot, AppointmentStatus
 from models.lead import Lead, LeadPriority, LeadStatus, ContactMethod
+from models.compact import CompactAppointment, CompactLead
+from models.codec import codec_for, from_epoch, pack, to_epoch
+from models.scoring import LeadColumns, score_columns, score_records
 
 
 class TestTools:
@@ -274,5 +284,814 @@ class TestLeadPriority:
         assert ContactMethod.EITHER.value == "Either"
 
 
+class TestCompactModels:
+    """Tests for the slotted record variants."""
+    
+    def test_lead_round_trip_matches_dataclass(self):
+        """Test that compact leads read and write the dataclass's dictionary format."""
+        lead = Lead(
+            id="LEAD-TEST002",
+            contact_name="Jane Doe",
+            contact_email="jane.doe@company.com",
+            contact_phone="+44 9876 543210",
+            company_name="ABC Transport Ltd",
+            current_fleet_size=50,
+            timeline="1-3 months",
+        )
+        lead.calculate_score()
+        lead.mark_contacted("Called back")
+        data = lead.to_dict()
+        
+        compact = CompactLead.from_dict(data)
+        
+        assert compact.to_dict() == data
+        assert compact.to_model() == Lead.from_dict(data)
+        assert CompactLead.from_model(lead).to_dict() == data
+        assert not hasattr(compact, "__dict__")
+    
+    def test_timestamps_parse_lazily(self):
+        """Test that timestamps stay strings until read."""
+        compact = CompactLead.from_dict({
+            "id": "LEAD-TEST003", "contact_name": "A", "contact_email": "a@b.com",
+            "contact_phone": "+44 1", "created_at": "2026-01-05T09:30:00",
+        })
+        
+        assert compact._created_at == "2026-01-05T09:30:00"
+        assert compact.created_at == datetime(2026, 1, 5, 9, 30)
+        assert compact._created_at == datetime(2026, 1, 5, 9, 30)
+        assert compact.contacted_at is None
+    
+    def test_appointment_enums_and_interning(self):
+        """Test that categorical values share one object across records."""
+        appointment = Appointment(
+            id="APT-TEST002",
+            customer_name="John Smith",
+            contact_phone="+44 1234 567890",
+            contact_email="john@example.com",
+            appointment_type=AppointmentType.MOT,
+            date="2026-03-02",
+            time_slot=TimeSlot.MORNING,
+        )
+        first, second = (
+            # Decoded separately, as when loading a file, so the strings start out distinct
+            CompactAppointment.from_dict(json.loads(json.dumps(appointment.to_dict())))
+            for _ in range(2)
+        )
+        
+        assert first.appointment_type is AppointmentType.MOT
+        assert first.date is second.date
+        assert first.to_dict() == appointment.to_dict()
+        with pytest.raises(KeyError):
+            CompactAppointment.from_dict({"id": "APT-TEST003"})
+
+
+class TestCodec:
+    """Tests for the generated record codecs."""
+    
+    def create_test_lead(self) -> Lead:
+        """Create a contacted lead with an aware creation time."""
+        lead = Lead(
+            id="LEAD-CODEC001",
+            contact_name="Jane Doe",
+            contact_email="jane.doe@company.com",
+            contact_phone="+44 9876 543210",
+            company_name="ABC Transport Ltd",
+            current_fleet_size=50,
+            ev_interest=True,
+            created_at=datetime.fromisoformat("2026-07-01T10:15:30.250000+01:00"),
+        )
+        lead.mark_contacted("Called back")
+        return lead
+    
+    def test_json_matches_to_dict_and_from_dict(self):
+        """Test that the generated JSON path matches the models' own methods."""
+        lead = self.create_test_lead()
+        codec = codec_for(Lead)
+        
+        assert codec.encode(lead) == lead.to_dict()
+        assert json.loads(codec.dumps([lead])) == [lead.to_dict()]
+        assert codec.loads(json.dumps([lead.to_dict()])) == [Lead.from_dict(lead.to_dict())]
+        with pytest.raises(KeyError):
+            codec.decode({"id": "LEAD-CODEC002"})
+    
+    def test_binary_round_trip_across_model_variants(self):
+        """Test that packed records decode into either the dataclass or compact record."""
+        lead = self.create_test_lead()
+        packed = codec_for(Lead).pack([lead])
+        
+        assert codec_for(Lead).unpack(packed) == [lead]
+        compact = codec_for(CompactLead).unpack(packed)[0]
+        assert compact.to_dict() == lead.to_dict()
+        assert codec_for(Lead).unpack(codec_for(CompactLead).pack([compact])) == [lead]
+    
+    def test_binary_reads_older_layouts(self):
+        """Test that payloads written before fields or enum members changed still decode."""
+        appointment = Appointment(
+            id="APT-CODEC001",
+            customer_name="John Smith",
+            contact_phone="+44 1234 567890",
+            contact_email="john@example.com",
+            appointment_type=AppointmentType.SERVICE,
+            date="2026-03-02",
+            time_slot=TimeSlot.AFTERNOON,
+            status=AppointmentStatus.CONFIRMED,
+        )
+        codec = codec_for(Appointment)
+        fields = [name for name in codec.field_names if name != "cancellation_reason"]
+        tables = {**codec.enum_tables, "status": ["Confirmed", "Pending"]}
+        row = [
+            1 if name == "status" else value
+            for name, value in zip(codec.field_names, codec._encode_row(appointment))
+            if name != "cancellation_reason"
+        ]
+        
+        decoded = codec.unpack(pack([1, "Appointment", fields, tables, [row]]))[0]
+        
+        assert decoded.status == AppointmentStatus.PENDING
+        assert decoded.cancellation_reason is None
+        assert decoded.created_at == appointment.created_at
+        with pytest.raises(ValueError):
+            codec.unpack(pack([99, "Appointment", fields, tables, []]))
+    
+    def test_epoch_timestamps(self):
+        """Test integer timestamps for naive and aware datetimes."""
+        naive = datetime(2026, 1, 5, 9, 30, 0, 123456)
+        aware = datetime.fromisoformat("2026-07-01T10:15:30+01:00")
+        
+        assert isinstance(to_epoch(naive), int)
+        assert from_epoch(to_epoch(naive)) == naive
+        assert from_epoch(to_epoch(aware)).isoformat() == aware.isoformat()
+        assert from_epoch(to_epoch("2026-01-05T09:30:00")) == datetime(2026, 1, 5, 9, 30)
+
+
+class TestLeadScoring:
+    """Tests for batch lead scoring."""
+    
+    # (fields, expected score)
+    CASES = [
+        ({}, 0),
+        ({"company_name": "Acme", "current_fleet_size": 5}, 15),
+        ({"current_fleet_size": 10, "projected_fleet_size": 12}, 20),
+        ({"current_fleet_size": 150, "projected_fleet_size": 100, "timeline": "ASAP"}, 50),
+        ({"projected_fleet_size": 20, "timeline": "3-6 months", "ev_interest": True}, 35),
+        ({"current_fleet_size": 60, "timeline": "Next year", "budget_range": "£1m",
+          "current_provider": "Other Co"}, 45),
+        ({"company_name": "Big Corp", "current_fleet_size": 150, "projected_fleet_size": 200,
+          "timeline": "Within 1 month", "budget_range": "£500k+", "ev_interest": True,
+          "current_provider": "Other Co"}, 100),
+    ]
+    
+    def test_batch_scores_match_single_leads(self):
+        """Test that a batch scores each lead as scoring it alone does."""
+        leads = [
+            Lead(id=f"LEAD-{i}", contact_name="A", contact_email="a@b.com",
+                 contact_phone="+44 1", **fields)
+            for i, (fields, _) in enumerate(self.CASES)
+        ]
+        
+        scores, priorities = score_records(leads)
+        
+        assert scores.tolist() == [expected for _, expected in self.CASES]
+        assert priorities == ["Low", "Low", "Standard", "Medium", "Standard", "Medium", "High"]
+        for lead, score in zip(leads, scores.tolist()):
+            assert lead.calculate_score() == score
+        assert leads[-1].priority == LeadPriority.HIGH
+    
+    def test_columns_from_stored_leads(self):
+        """Test that stored leads without an EV flag score EV interest from their text."""
+        columns = LeadColumns.from_records([
+            {"vehicle_interests": "Electric vans", "current_fleet_size": None},
+            {"vehicle_interests": "Diesel estates", "timeline": "1-3 months"},
+        ])
+        
+        assert columns.ev_interest.tolist() == [True, False]
+        assert score_columns(columns).tolist() == [10, 20]
+    
+    def test_capture_lead_and_nightly_rescore(self, monkeypatch, tmp_path):
+        """Test that captured leads are scored and stale scores are fixed by the rescore."""
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "LEADS_FILE", tmp_path / "leads.json")
+        capture_lead(
+            contact_name="Sam Jones", contact_email="sam@example.com",
+            contact_phone="+44 7700 900456", company_name="Acme Fleet",
+            current_fleet_size=60, vehicle_interests="EVs", timeline="1-3 months",
+        )
+        stored = json.loads(tools.LEADS_FILE.read_text())
+        assert (stored[0]["score"], stored[0]["priority"]) == (60, "Medium")
+        assert stored[0]["ev_interest"] is True
+        
+        # A lead scored under the old inline formula
+        stored.append({"id": "LEAD-OLD", "company_name": "Old Co", "current_fleet_size": 12,
+                       "timeline": "Within 1 month", "score": 55, "priority": "High"})
+        tools.LEADS_FILE.write_text(json.dumps(stored))
+        
+        result = rescore.rescore_leads(tools.LEADS_FILE)
+        
+        assert (result.scored, result.changed) == (2, 1)
+        rescored = json.loads(tools.LEADS_FILE.read_text())[1]
+        assert (rescored["score"], rescored["priority"]) == (45, "Medium")
+        assert rescore.rescore_leads(tools.LEADS_FILE).changed == 0
+
+class TestLeadDedup:
+    """Tests for lead deduplication."""
+    
+    def test_normalization(self):
+        """Test that phones, emails and company names reduce to comparable keys."""
+        for phone in ["07700 900123", "+44 7700 900123", "0044 7700 900123", "447700900123",
+                      "(07700) 900-123", "7700 900123"]:
+            assert dedup.normalize_phone(phone) == "+447700900123"
+        assert dedup.normalize_phone("+1 415 555 0100") == "+14155550100"
+        assert dedup.normalize_phone("+44 (0)7700 900123") == "+447700900123"
+        assert dedup.normalize_phone("0044 (0) 7700 900123") == "+447700900123"
+        assert dedup.normalize_phone("14087312213") == "+14087312213"
+        assert dedup.normalize_phone("123") is None
+        assert dedup.normalize_email("  Sam@Example.COM ") == "sam@example.com"
+        assert dedup.normalize_email("not an email") is None
+        assert dedup.normalize_company("ABC Transport Ltd.") == "abc transport"
+        assert dedup.normalize_company("abc transport limited") == "abc transport"
+        assert dedup.normalize_company("Ltd") is None
+    
+    def test_merge_keeps_the_most_information(self):
+        """Test that a merge keeps the original's identity and the fuller values."""
+        original = {"id": "LEAD-1", "status": "Contacted", "company_name": "Acme Fleet Services",
+                    "current_fleet_size": 20, "timeline": None, "ev_interest": True,
+                    "inquiry_notes": "Wants vans", "created_at": "2026-03-01T10:00:00"}
+        update = {"id": "LEAD-2", "status": "New", "company_name": "Acme",
+                  "current_fleet_size": 25, "timeline": "ASAP", "ev_interest": False,
+                  "inquiry_notes": "Also cars", "created_at": "2026-03-05T10:00:00"}
+        
+        merged = dedup.merge_leads(original, update)
+        
+        assert (merged["id"], merged["status"]) == ("LEAD-1", "Contacted")
+        assert merged["company_name"] == "Acme Fleet Services"
+        assert (merged["current_fleet_size"], merged["timeline"]) == (25, "ASAP")
+        assert merged["ev_interest"] is True
+        assert merged["inquiry_notes"] == "Wants vans\nAlso cars"
+        assert merged["merged_ids"] == ["LEAD-2"]
+        assert merged["contact_count"] == 2
+        assert merged["updated_at"] == "2026-03-05T10:00:00"
+    
+    def test_capture_lead_merges_repeat_callers(self, monkeypatch, tmp_path):
+        """Test that a repeat caller updates their lead unless they name another company."""
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "LEADS_FILE", tmp_path / "leads.json")
+        capture_lead(contact_name="Sam Jones", contact_email="sam@example.com",
+                     contact_phone="07700 900456", company_name="Acme Fleet Ltd")
+        first = json.loads(tools.LEADS_FILE.read_text())[0]
+        
+        result = capture_lead(contact_name="Sam Jones", contact_email="SAM@example.com",
+                              contact_phone="+44 7700 900999", current_fleet_size=60,
+                              timeline="ASAP")
+        
+        assert "existing enquiry" in result and first["id"] in result
+        stored = json.loads(tools.LEADS_FILE.read_text())
+        assert len(stored) == 1
+        assert (stored[0]["company_name"], stored[0]["current_fleet_size"]) == ("Acme Fleet Ltd", 60)
+        assert (stored[0]["score"], stored[0]["priority"]) == (55, "Medium")
+        
+        # Same phone, different company: a separate enquiry
+        capture_lead(contact_name="Sam Jones", contact_email="sam@other.example",
+                     contact_phone="07700 900456", company_name="Other Haulage")
+        assert len(json.loads(tools.LEADS_FILE.read_text())) == 2
+    
+    def test_bulk_dedupe(self, tmp_path):
+        """Test that a bulk pass merges by shared contact, transitively, within a company."""
+        leads = [
+            {"id": "L1", "contact_phone": "07700 900001", "company_name": "Acme",
+             "created_at": "2026-01-01"},
+            {"id": "L2", "contact_phone": "+447700900002", "created_at": "2026-01-02"},
+            {"id": "L3", "contact_phone": "+44 7700 900001", "contact_email": "a@acme.example",
+             "company_name": "ACME Ltd", "created_at": "2026-01-03"},
+            {"id": "L4", "contact_email": "A@acme.example", "timeline": "ASAP",
+             "created_at": "2026-01-04"},
+            {"id": "L5", "contact_phone": "07700900001", "company_name": "Other Co",
+             "created_at": "2026-01-05"},
+        ]
+        path = tmp_path / "leads.json"
+        path.write_text(json.dumps(leads))
+        
+        result = rescore.dedupe_lead_file(path, dry_run=True)
+        assert result.merged == {"L1": ["L3", "L4"]}
+        assert json.loads(path.read_text()) == leads
+        
+        rescore.dedupe_lead_file(path)
+        stored = json.loads(path.read_text())
+        assert [lead["id"] for lead in stored] == ["L1", "L2", "L5"]
+        assert stored[0]["timeline"] == "ASAP" and stored[0]["score"] == 35
+        assert stored[0]["contact_email"] == "a@acme.example"
+    
+    def test_bulk_dedupe_never_joins_two_companies(self):
+        """Test that a lead without a company can't chain two companies' leads together."""
+        leads = [
+            {"id": "A", "contact_phone": "07700 900001", "company_name": "Xco"},
+            {"id": "B", "contact_phone": "07700 900001", "contact_email": "e@example.com"},
+            {"id": "C", "contact_email": "e@example.com", "company_name": "Yco"},
+        ]
+        
+        result = dedup.dedupe_leads(leads)
+        
+        assert result.merged == {"A": ["B"]}
+        assert [(lead["id"], lead["company_name"]) for lead in result.leads] == [
+            ("A", "Xco"), ("C", "Yco"),
+        ]
+
+def _generate_ids(count):
+    return [ids.new_id("LEAD") for _ in range(count)]
+
+
+class TestReferenceIds:
+    """Tests for reference ID generation."""
+    
+    def test_ids_are_readable_and_sortable(self):
+        """Test the ID format, its parts and that later IDs sort after earlier ones."""
+        generator = ids.IdGenerator(worker_id=7)
+        references = [generator.next("APT") for _ in range(5000)]
+        
+        assert len(set(references)) == len(references)
+        assert references == sorted(references)
+        assert len(references[0]) == len("APT-XXXX-XXXX-XXXX")
+        parsed = ids.parse_id(references[-1])
+        assert (parsed.prefix, parsed.worker_id) == ("APT", 7)
+        assert abs(parsed.created_at - datetime.now(timezone.utc)) < timedelta(minutes=1)
+        # Misheard characters and missing dashes read back the same
+        misheard = references[0].lower().replace("0", "o").replace("1", "l").replace("-", "")
+        assert ids.decode(misheard[3:]) == ids.decode(references[0][4:])
+        with pytest.raises(ValueError):
+            ids.parse_id("APT-20260115093000")
+    
+    def test_sequence_overflow_and_clock_going_back(self):
+        """Test that IDs stay increasing when a millisecond fills up or the clock steps back."""
+        now = [1000]
+        generator = ids.IdGenerator(worker_id=1, clock=lambda: now[0])
+        values = [generator.next_value() for _ in range(ids.SEQUENCE_LIMIT + 10)]
+        now[0] = 500
+        values += [generator.next_value() for _ in range(10)]
+        
+        assert values == sorted(set(values))
+        assert ids.parse_id("X-" + ids.encode(values[-1])).created_at > (
+            ids.parse_id("X-" + ids.encode(values[0])).created_at
+        )
+    
+    def test_processes_never_collide(self, monkeypatch, tmp_path):
+        """Test that forked tool processes claim separate workers and share no IDs."""
+        monkeypatch.delenv(ids.WORKER_ID_ENV, raising=False)
+        monkeypatch.setattr(ids, "WORKER_LOCK_DIR", tmp_path)
+        context = multiprocessing.get_context("fork")
+        with context.Pool(4) as pool:
+            batches = pool.map(_generate_ids, [50_000] * 8)
+        
+        references = [reference for batch in batches for reference in batch]
+        assert len(set(references)) == len(references)
+        assert list(tmp_path.glob("worker-*.lock"))
+
+class TestAppointmentSlots:
+    """Tests for appointment slot capacity."""
+    
+    FRIDAY = date(2026, 1, 2)
+    MONDAY = date(2026, 1, 5)
+    
+    def test_capacity_and_next_available(self):
+        """Test that full, closed and zero-capacity slots are skipped when searching."""
+        index = slots.SlotIndex(self.FRIDAY, days=30,
+                                capacity={AppointmentType.MOT: (1, 0, 2)})
+        
+        assert index.reserve(self.FRIDAY, TimeSlot.MORNING, AppointmentType.MOT)
+        assert not index.reserve(self.FRIDAY, TimeSlot.MORNING, AppointmentType.MOT)
+        assert index.reserve(self.FRIDAY, TimeSlot.MORNING, AppointmentType.SERVICE)
+        assert index.find_next_available(3, AppointmentType.MOT, self.FRIDAY) == [
+            (self.FRIDAY, TimeSlot.LATE_AFTERNOON),
+            (self.MONDAY, TimeSlot.MORNING),
+            (self.MONDAY, TimeSlot.LATE_AFTERNOON),
+        ]
+        assert index.find_next_available(
+            2, AppointmentType.SERVICE, self.FRIDAY, from_slot=TimeSlot.AFTERNOON,
+            time_slot=TimeSlot.MORNING,
+        ) == [(self.MONDAY, TimeSlot.MORNING), (date(2026, 1, 6), TimeSlot.MORNING)]
+        
+        index.release(self.FRIDAY, TimeSlot.MORNING, AppointmentType.MOT)
+        assert index.find_next_available(1, AppointmentType.MOT, self.FRIDAY) == [
+            (self.FRIDAY, TimeSlot.MORNING)
+        ]
+        # The search stops at the end of the horizon
+        assert len(index.find_next_available(100, AppointmentType.MOT, self.FRIDAY)) == 42
+    
+    def test_index_from_stored_appointments(self):
+        """Test that only appointments holding a slot count towards capacity."""
+        stored = [
+            {"type": "MOT", "date": "2026-01-05", "time_slot": "Morning (9-12)",
+             "status": status}
+            for status in ["Confirmed", "Pending", "Cancelled", "Completed"]
+        ] + [{"type": "MOT", "date": "not a date", "time_slot": "Morning (9-12)"}]
+        
+        index = slots.SlotIndex.from_appointments(stored, origin=self.FRIDAY, default_capacity=2)
+        
+        assert index.booked(self.MONDAY, TimeSlot.MORNING, AppointmentType.MOT) == 2
+        assert not index.is_available(self.MONDAY, TimeSlot.MORNING, AppointmentType.MOT)
+    
+    def test_configured_capacities(self, monkeypatch, tmp_path):
+        """Test that a type with a lower configured limit fills its slot first."""
+        capacities = slots.parse_capacities('{"MOT": 1, "Service": [2, 0, 3]}')
+        assert capacities == {AppointmentType.MOT: 1, AppointmentType.SERVICE: (2, 0, 3)}
+        for invalid in ['{"Oil change": 1}', '{"MOT": [1, 2]}', '[1]', '{"MOT": true}']:
+            with pytest.raises(ValueError):
+                slots.parse_capacities(invalid)
+        
+        monkeypatch.setattr(slots, "SLOT_CAPACITIES", capacities)
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "APPOINTMENTS_FILE", tmp_path / "appointments.json")
+        monkeypatch.setattr(tools, "_slot_index", None)
+        day = business_days.default_calendar().next_business_day(
+            datetime.now(tools.UK_TZ).date() + timedelta(days=6)
+        )
+        booking = dict(customer_name="Jane Smith", contact_phone="+447700900123",
+                       contact_email="jane@example.com", preferred_date=day.isoformat(),
+                       preferred_time="Morning (9-12)")
+        
+        assert "Successfully Booked" in book_appointment(appointment_type="MOT", **booking)
+        assert "fully booked" in book_appointment(appointment_type="MOT", **booking)
+        assert "Successfully Booked" in book_appointment(appointment_type="Inspection", **booking)
+        assert "Successfully Booked" in book_appointment(appointment_type="Inspection", **booking)
+        afternoon = dict(booking, preferred_time="Afternoon (12-3)")
+        assert "fully booked" in book_appointment(appointment_type="Service", **afternoon)
+    
+    def test_full_slot_offers_alternatives(self, monkeypatch, tmp_path):
+        """Test that booking a full slot offers the next free ones instead."""
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "APPOINTMENTS_FILE", tmp_path / "appointments.json")
+        day = business_days.default_calendar().next_business_day(
+            datetime.now(tools.UK_TZ).date() + timedelta(days=6)
+        )
+        booking = dict(customer_name="Jane Smith", contact_phone="+447700900123",
+                       contact_email="jane@example.com", appointment_type="MOT",
+                       preferred_date=day.isoformat(), preferred_time="Morning (9-12)")
+        
+        for _ in range(slots.DEFAULT_SLOT_CAPACITY):
+            assert "Successfully Booked" in book_appointment(**booking)
+        result = book_appointment(**booking)
+        
+        assert "fully booked" in result
+        assert f"({day.isoformat()}), Afternoon (12-3)" in result
+        assert len(json.loads(tools.APPOINTMENTS_FILE.read_text())) == slots.DEFAULT_SLOT_CAPACITY
+        offered = find_next_available("MOT", from_date=day.isoformat(),
+                                      preferred_time="Morning (9-12)", count=1)
+        assert day.isoformat() not in offered and "Morning (9-12)" in offered
+        assert "Invalid time slot" in book_appointment(**{**booking, "preferred_time": "Noon"})
+
+class TestWorkshopBays:
+    """Tests for workshop bay allocation."""
+    
+    MONDAY = date(2026, 1, 5)
+    
+    def sites(self, near_bays=1):
+        """A one-bay site in Swindon and another in Oxford, about 45 km away."""
+        durations = {AppointmentType.MOT: 60, AppointmentType.SERVICE: 120}
+        return (
+            workshops.Site("near", "Near Site", "SN1 1AA", workshops.POSTCODE_AREAS["SN"],
+                           bays=near_bays, durations=durations),
+            workshops.Site("far", "Far Site", "OX1 1AA", workshops.POSTCODE_AREAS["OX"],
+                           bays=1, durations=durations),
+        )
+    
+    def test_sites_ranked_by_postcode(self):
+        """Test that the nearest site comes first and unknown postcodes rank all equally."""
+        schedule = workshops.WorkshopSchedule()
+        
+        assert [site.key for _, site in schedule.ranked_sites("m17 1fq")] == [
+            "manchester", "solihull", "swindon"
+        ]
+        assert schedule.ranked_sites("SN5 6PE")[0][1].key == "swindon"
+        assert workshops.postcode_area("QQ1 1AA") is None
+        assert {distance for distance, _ in schedule.ranked_sites("QQ1 1AA")} == {0.0}
+    
+    def test_bay_first_fit(self):
+        """Test that a bay offers the earliest gap long enough for the job."""
+        bay = workshops.BayCalendar()
+        bay.add(540, 600)  # 09:00-10:00
+        bay.add(630, 660)  # 10:30-11:00
+        
+        assert bay.first_fit(540, 719, 30) == 600
+        assert bay.first_fit(540, 719, 60) == 660
+        assert bay.first_fit(540, 659, 60) is None
+        assert bay.remove(630) and not bay.remove(630)
+        assert bay.first_fit(540, 719, 60) == 600
+    
+    def test_overflow_and_load_balancing(self):
+        """Test that full sites overflow to the next nearest and busy ones shed load."""
+        schedule = workshops.WorkshopSchedule(self.sites(), load_penalty_km=0)
+        booked = [schedule.allocate(AppointmentType.MOT, "SN2 1AB", self.MONDAY, TimeSlot.MORNING)
+                  for _ in range(7)]
+        
+        assert [(a.site.key, a.start_time) for a in booked[:4]] == [
+            ("near", "09:00"), ("near", "10:00"), ("near", "11:00"), ("far", "09:00")
+        ]
+        assert booked[-1] is None
+        assert schedule.find(AppointmentType.MOT, "SN2 1AB", self.MONDAY,
+                             TimeSlot.AFTERNOON).site.key == "near"
+        nearby_only = workshops.WorkshopSchedule(self.sites(), max_travel_km=20)
+        for _ in range(3):
+            nearby_only.allocate(AppointmentType.MOT, "SN2 1AB", self.MONDAY, TimeSlot.MORNING)
+        assert nearby_only.find(AppointmentType.MOT, "SN2 1AB", self.MONDAY,
+                                TimeSlot.MORNING) is None
+        
+        # A busy day at the nearest site counts as extra distance
+        balanced = workshops.WorkshopSchedule(self.sites(near_bays=3), load_penalty_km=500)
+        first = balanced.allocate(AppointmentType.SERVICE, "SN2 1AB", self.MONDAY,
+                                  TimeSlot.MORNING)
+        second = balanced.allocate(AppointmentType.SERVICE, "SN2 1AB", self.MONDAY,
+                                   TimeSlot.MORNING)
+        assert (first.site.key, second.site.key) == ("near", "far")
+    
+    def test_schedule_from_stored_appointments(self):
+        """Test that stored allocations are reloaded and released ones free their bay."""
+        schedule = workshops.WorkshopSchedule(self.sites())
+        allocation = schedule.allocate(AppointmentType.SERVICE, "SN2 1AB", self.MONDAY,
+                                       TimeSlot.MORNING)
+        stored = [{"date": "2026-01-05", "status": "Confirmed", **allocation.to_record()},
+                  {"date": "2026-01-05", "status": "Cancelled", "site": "near", "bay": 1,
+                   "start_time": "11:00", "end_time": "12:00"}]
+        
+        reloaded = workshops.WorkshopSchedule.from_appointments(stored, sites=self.sites())
+        
+        assert allocation.to_record() == {"site": "near", "bay": 1,
+                                          "start_time": "09:00", "end_time": "11:00"}
+        assert reloaded.find(AppointmentType.MOT, "SN2 1AB", self.MONDAY,
+                             TimeSlot.MORNING).start_time == "11:00"
+        assert reloaded.release(allocation)
+        assert reloaded.find(AppointmentType.MOT, "SN2 1AB", self.MONDAY,
+                             TimeSlot.MORNING).start_time == "09:00"
+    
+    def test_book_appointment_at_nearest_workshop(self, monkeypatch, tmp_path):
+        """Test that a booking with a postcode records its site, bay and arrival time."""
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "APPOINTMENTS_FILE", tmp_path / "appointments.json")
+        day = business_days.default_calendar().next_business_day(
+            datetime.now(tools.UK_TZ).date() + timedelta(days=6)
+        )
+        
+        result = book_appointment(
+            customer_name="Jane Smith", contact_phone="+447700900123",
+            contact_email="jane@example.com", appointment_type="Service",
+            preferred_date=day.isoformat(), preferred_time="Afternoon (12-3)",
+            postcode="M1 1AE",
+        )
+        
+        assert "Manchester Office (M17 1FQ), bay 1, arriving at 12:00" in result
+        stored = json.loads(tools.APPOINTMENTS_FILE.read_text())[0]
+        assert (stored["site"], stored["bay"], stored["end_time"]) == ("manchester", 1, "13:45")
+    
+    def test_postcode_beyond_every_workshop(self, monkeypatch, tmp_path):
+        """Test that a caller out of reach of every site is told so, not that slots are full."""
+        monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(tools, "APPOINTMENTS_FILE", tmp_path / "appointments.json")
+        day = business_days.default_calendar().next_business_day(
+            datetime.now(tools.UK_TZ).date() + timedelta(days=6)
+        )
+        schedule = workshops.WorkshopSchedule()
+        
+        assert not schedule.in_reach(AppointmentType.MOT, "AB10 1XG")
+        assert schedule.in_reach(AppointmentType.MOT, "M1 1AE")
+        result = book_appointment(
+            customer_name="Jane Smith", contact_phone="+447700900123",
+            contact_email="jane@example.com", appointment_type="MOT",
+            preferred_date=day.isoformat(), preferred_time="Morning (9-12)",
+            postcode="ab10 1xg",
+        )
+        offered = find_next_available(appointment_type="MOT", postcode="AB10 1XG")
+        
+        for reply in (result, offered):
+            assert "none of our workshops" in reply and "AB10 1XG" in reply
+            assert "fully booked" not in reply and "no MOT slots" not in reply
+        assert not tools.APPOINTMENTS_FILE.exists()
+        assert "Next available" in find_next_available(appointment_type="Fleet Consultation",
+                                                       postcode="AB10 1XG")
+
+
+
+class TestBusinessCalendar:
+    """Tests for the UK business-day calendar."""
+    
+    def test_bank_holidays_match_published_dates(self):
+        """Test holiday rules, substitute days and one-off holidays against gov.uk."""
+        assert list(business_days.bank_holidays(2027)) == [
+            date(2027, 1, 1), date(2027, 3, 26), date(2027, 3, 29), date(2027, 5, 3),
+            date(2027, 5, 31), date(2027, 8, 30), date(2027, 12, 27), date(2027, 12, 28),
+        ]
+        holidays_2022 = business_days.bank_holidays(2022)
+        assert date(2022, 1, 3) in holidays_2022  # New Year's Day on a Saturday
+        assert date(2022, 5, 30) not in holidays_2022  # Spring moved to 2 June
+        assert holidays_2022[date(2022, 6, 3)] == "Platinum Jubilee bank holiday"
+        assert holidays_2022[date(2022, 12, 27)] == "Christmas Day (substitute day)"
+        assert business_days.easter_sunday(2026) == date(2026, 4, 5)
+    
+    def test_business_day_queries(self):
+        """Test stepping over weekends and Christmas in either direction."""
+        calendar = business_days.BusinessCalendar(2026, 2027)
+        
+        assert not calendar.is_business_day(date(2026, 12, 28))  # Boxing Day substitute
+        assert calendar.next_business_day(date(2026, 12, 24)) == date(2026, 12, 29)
+        assert calendar.next_business_day(date(2026, 12, 24), include=True) == date(2026, 12, 24)
+        assert calendar.add_business_days(date(2026, 12, 23), 2) == date(2026, 12, 29)
+        assert calendar.add_business_days(date(2026, 12, 26), 1) == date(2026, 12, 29)
+        assert calendar.add_business_days(date(2026, 12, 29), -2) == date(2026, 12, 23)
+        assert calendar.business_days_between(date(2026, 12, 21), date(2027, 1, 4)) == 7
+        assert list(calendar.holidays_between(date(2026, 12, 1), date(2027, 1, 2))) == [
+            date(2026, 12, 25), date(2026, 12, 28), date(2027, 1, 1),
+        ]
+        with pytest.raises(ValueError):
+            calendar.is_business_day(date(2028, 1, 4))
+    
+    def test_opening_hours(self):
+        """Test is_open and next_open_after around evenings, weekends and holidays."""
+        calendar = business_days.default_calendar()
+        uk = business_days.UK_TZ
+        friday_evening = datetime(2026, 8, 28, 17, 0, tzinfo=uk)
+        
+        assert calendar.is_open(datetime(2026, 8, 28, 16, 59, tzinfo=uk))
+        assert not calendar.is_open(friday_evening)
+        assert not calendar.is_open(datetime(2026, 8, 31, 10, 0))  # Summer bank holiday
+        # Monday is a bank holiday, so the desk reopens on Tuesday
+        assert calendar.next_open_after(friday_evening) == datetime(2026, 9, 1, 9, 0, tzinfo=uk)
+        assert calendar.next_open_after(datetime(2026, 9, 1, 8, 30, tzinfo=uk)).day == 1
+        # Aware times in other zones are read as UK time
+        utc_morning = datetime(2026, 9, 1, 8, 30, tzinfo=timezone.utc)  # 9:30 BST
+        assert calendar.next_open_after(utc_morning) == utc_morning
+    
+    def test_slot_index_closes_bank_holidays(self):
+        """Test that no slots are offered on bank holidays."""
+        index = slots.SlotIndex(date(2026, 12, 24), days=14)
+        
+        assert not index.is_open(date(2026, 12, 25), TimeSlot.MORNING)
+        offered = index.find_next_available(3, AppointmentType.MOT, date(2026, 12, 24),
+                                            from_slot=TimeSlot.LATE_AFTERNOON)
+        assert [day for day, _ in offered] == [date(2026, 12, 24)] + [date(2026, 12, 29)] * 2
+    
+    def test_book_appointment_rejects_bank_holiday(self):
+        """Test that booking on a bank holiday names the holiday."""
+        result = book_appointment(
+            customer_name="Jane Smith", contact_phone="+447700900123",
+            contact_email="jane@example.com", appointment_type="MOT",
+            preferred_date="2045-12-25", preferred_time="Morning (9-12)",
+        )
+        
+        assert "closed on Christmas Day" in result
+
+
+class FakeVapiClient:
+    """Records outbound calls and how many were in progress at once."""
+    
+    def __init__(self, fail_numbers=()):
+        self.calls = []
+        self.fail_numbers = set(fail_numbers)
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def make_call(self, phone_number, assistant_id, customer_number=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if customer_number in self.fail_numbers:
+                raise Exception("Vapi API error: {'message': 'busy'}")
+            self.calls.append((phone_number, assistant_id, customer_number, kwargs["name"]))
+            return {"id": f"call-{len(self.calls)}"}
+        finally:
+            self.in_flight -= 1
+
+
+class TestCallbackDispatch:
+    """Tests for the callback queue and dispatcher."""
+    
+    MONDAY_9AM = datetime(2026, 10, 19, 9, 0, tzinfo=business_days.UK_TZ)
+    
+    @staticmethod
+    def callback(callback_id, scheduled_date="2026-10-19", preferred_time="ASAP",
+                 is_urgent=False, phone="07700 900123", **fields):
+        return {"id": callback_id, "customer_name": "Jane Smith", "contact_phone": phone,
+                "preferred_time": preferred_time, "reason": "Query", "is_urgent": is_urgent,
+                "status": "Pending", "scheduled_date": scheduled_date, **fields}
+    
+    def test_preferred_time(self):
+        """Test reading named and clock-time callback preferences."""
+        assert callbacks.preferred_time("Afternoon") == time(12, 0)
+        assert callbacks.preferred_time("ASAP") == time(9, 0)
+        assert callbacks.preferred_time("around 2:30pm") == time(14, 30)
+        assert callbacks.preferred_time("3") == time(15, 0)
+        assert callbacks.preferred_time("whenever") == time(9, 0)
+    
+    def test_queue_releases_due_callbacks_by_priority(self):
+        """Test that due callbacks come out urgent first, then oldest, then earliest."""
+        queue = callbacks.CallbackQueue()
+        added = queue.extend([
+            self.callback("today-morning"),
+            self.callback("today-afternoon", preferred_time="Afternoon"),
+            self.callback("friday", scheduled_date="2026-10-16"),
+            self.callback("urgent", is_urgent=True),
+            self.callback("saturday", scheduled_date="2026-10-17"),  # due Monday 9:00
+            self.callback("tomorrow", scheduled_date="2026-10-20", is_urgent=True),
+            self.callback("done", status="Called"),
+        ])
+        
+        assert added == 6
+        assert queue.extend([self.callback("urgent")]) == 0
+        assert queue.release(self.MONDAY_9AM + timedelta(hours=1)) == 4
+        popped = [queue.pop()["id"] for _ in range(queue.ready)]
+        assert popped == ["urgent", "friday", "saturday", "today-morning"]
+        assert queue.next_due() == self.MONDAY_9AM.replace(hour=12)
+        assert queue.release(self.MONDAY_9AM.replace(hour=12)) == 1
+        assert queue.pop()["id"] == "today-afternoon"
+        assert len(queue) == 1 and queue.pop() is None
+    
+    async def test_dispatch_spreads_calls_and_records_outcomes(self, tmp_path):
+        """Test bounded, spread-out dispatch with outcomes written back to the file."""
+        path = tmp_path / "callbacks.json"
+        stored = [self.callback(f"CB-{i:03d}", phone=f"07700 900{i:03d}") for i in range(30)]
+        stored.append(self.callback("CB-BAD", phone="12"))
+        path.write_text(json.dumps(stored))
+        client = FakeVapiClient()
+        agents = [callbacks.CallAgent("phone-1", "assistant-1"),
+                  callbacks.CallAgent("phone-2", "assistant-2")]
+        dispatcher = callbacks.CallbackDispatcher(
+            client, agents, path, max_in_flight=4, calls_per_agent=3, calls_per_second=0,
+            clock=lambda: self.MONDAY_9AM,
+        )
+        
+        assert dispatcher.refresh() == 31
+        tools._append_json(path, self.callback("CB-NEW", scheduled_date="2026-10-20"))
+        result = await dispatcher.dispatch_due()
+        
+        assert (result.called, result.failed, result.retrying) == (30, 1, 0)
+        assert client.peak == result.peak_in_flight == 4
+        by_agent = [sum(1 for call in client.calls if call[0] == agent.phone_number_id)
+                    for agent in agents]
+        assert sum(by_agent) == 30 and max(by_agent) - min(by_agent) <= 2
+        saved = {callback["id"]: callback for callback in json.loads(path.read_text())}
+        assert saved["CB-000"]["status"] == "Called" and saved["CB-000"]["call_id"]
+        assert saved["CB-BAD"]["status"] == "Failed"
+        assert saved["CB-NEW"]["status"] == "Pending"
+        assert dispatcher.refresh() == 1
+    
+    async def test_failed_calls_back_off_then_fail(self, tmp_path):
+        """Test that a failing call is retried later and marked failed after the last attempt."""
+        path = tmp_path / "callbacks.json"
+        path.write_text(json.dumps([self.callback("CB-1")]))
+        now = [self.MONDAY_9AM]
+        dispatcher = callbacks.CallbackDispatcher(
+            FakeVapiClient(fail_numbers={"+447700900123"}),
+            [callbacks.CallAgent("phone-1", "assistant-1")], path,
+            calls_per_second=0, max_attempts=2, retry_delay=timedelta(minutes=10),
+            clock=lambda: now[0],
+        )
+        dispatcher.refresh()
+        
+        first = await dispatcher.dispatch_due()
+        retry_at = datetime.fromisoformat(json.loads(path.read_text())[0]["next_attempt_at"])
+        now[0] = self.MONDAY_9AM + timedelta(minutes=4)
+        early = await dispatcher.dispatch_due()
+        now[0] = retry_at
+        last = await dispatcher.dispatch_due()
+        
+        assert first.retrying == 1 and early.retrying == early.failed == 0
+        assert timedelta(minutes=5) <= retry_at - self.MONDAY_9AM <= timedelta(minutes=15)
+        assert last.failed == 1
+        assert json.loads(path.read_text())[0]["status"] == "Failed"
+        assert len(dispatcher.queue) == 0
+    
+    async def test_unschedulable_callbacks_fail_without_a_call(self, tmp_path):
+        """Test that callbacks with unreadable dates are marked failed, not dialled."""
+        path = tmp_path / "callbacks.json"
+        path.write_text(json.dumps([
+            self.callback("CB-1", scheduled_date="next week"),
+            self.callback("CB-2", scheduled_date=None),
+            self.callback("CB-3"),
+        ]))
+        client = FakeVapiClient()
+        dispatcher = callbacks.CallbackDispatcher(
+            client, [callbacks.CallAgent("phone-1", "assistant-1")], path,
+            calls_per_second=0, clock=lambda: self.MONDAY_9AM,
+        )
+        
+        assert dispatcher.refresh() == 1
+        saved = {callback["id"]: callback for callback in json.loads(path.read_text())}
+        assert saved["CB-1"]["status"] == saved["CB-2"]["status"] == "Failed"
+        assert saved["CB-1"]["last_error"] == "Invalid scheduled date"
+        result = await dispatcher.dispatch_due()
+        assert result.called == 1 and len(client.calls) == 1
+    
+    async def test_nothing_dispatched_while_closed(self, tmp_path):
+        """Test that due callbacks wait for the desk to open."""
+        path = tmp_path / "callbacks.json"
+        path.write_text(json.dumps([self.callback("CB-1", scheduled_date="2026-10-16")]))
+        client = FakeVapiClient()
+        dispatcher = callbacks.CallbackDispatcher(
+            client, [callbacks.CallAgent("phone-1", "assistant-1")], path,
+            calls_per_second=0, clock=lambda: self.MONDAY_9AM - timedelta(hours=1),
+        )
+        dispatcher.refresh()
+        
+        result = await dispatcher.dispatch_due()
+        
+        assert result.called == 0 and not client.calls
+        assert len(dispatcher.queue) == 1
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,198 @@
+"""
+Tests for the custom LLM server and streaming agent turns.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent.voice_agent import ArvalVoiceAgent
+from vapi_ai import llm_server
+from vapi_ai.llm_server import SessionStore, align_history
+
+
+def delta_chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def text_chunk(text):
+    return delta_chunk(content=text)
+
+
+def tool_chunk(index, id=None, name=None, arguments=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return delta_chunk(tool_calls=[SimpleNamespace(index=index, id=id, function=function)])
+
+
+class FakeStreamingClient:
+    """Model client that replays scripted chunk streams, one per completion request."""
+
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        chunks = self.streams.pop(0)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return stream()
+
+
+def make_agent(client):
+    return ArvalVoiceAgent(api_key="test-key", client=client)
+
+
+def read_sse(response):
+    lines = response.text.splitlines()
+    events = [line[len("data: "):] for line in lines if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    return [json.loads(event) for event in events[:-1]]
+
+
+class TestStreamingAgent:
+    """Tests for ArvalVoiceAgent.stream_message."""
+
+    async def test_streams_text_and_records_history(self):
+        """Test that text deltas are yielded and the reply is added to history."""
+        client = FakeStreamingClient([text_chunk("Hello, "), text_chunk("how can I help?")])
+        agent = make_agent(client)
+
+        parts = [part async for part in agent.stream_message("Hi")]
+
+        assert parts == ["Hello, ", "how can I help?"]
+        assert agent.conversation_history[-1] == {
+            "role": "assistant", "content": "Hello, how can I help?"
+        }
+
+    async def test_runs_fragmented_tool_calls_before_streaming_the_answer(self):
+        """Test that tool-call fragments are joined and run before the answer streams."""
+        client = FakeStreamingClient(
+            [
+                tool_chunk(0, id="call_1", name="get_faq_answer", arguments='{"to'),
+                tool_chunk(0, arguments='pic": "ev"}'),
+            ],
+            [text_chunk("We lease plenty of EVs.")],
+        )
+        agent = make_agent(client)
+
+        parts = [part async for part in agent.stream_message("Do you do electric cars?")]
+
+        assert parts == ["We lease plenty of EVs."]
+        roles = [message["role"] for message in agent.conversation_history]
+        assert roles == ["user", "assistant", "tool", "assistant"]
+        function = agent.conversation_history[1]["tool_calls"][0]["function"]
+        assert function == {"name": "get_faq_answer", "arguments": '{"topic": "ev"}'}
+        assert "Electric Vehicle" in agent.conversation_history[2]["content"]
+        assert client.requests[0]["stream"] is True
+        assert "tools" not in client.requests[1]
+
+
+class TestSessions:
+    """Tests for per-call session state."""
+
+    def test_evicts_least_recently_used_and_idle_sessions(self):
+        """Test that sessions are evicted when over capacity or idle too long."""
+        now = [0.0]
+        store = SessionStore(object, max_sessions=2, ttl_seconds=60, clock=lambda: now[0])
+        first = store.get("call-1")
+        store.get("call-2")
+        assert store.get("call-1") is first
+        store.get("call-3")
+        assert len(store) == 2 and store.get("call-1") is first
+
+        now[0] = 61
+        store.get("call-4")
+        assert len(store) == 1
+
+    def test_align_history_seeds_and_rewinds(self):
+        """Test that history is seeded from Vapi's transcript and rewound on a re-sent turn."""
+        agent = make_agent(FakeStreamingClient())
+        transcript = [
+            {"role": "system", "content": "Vapi prompt"},
+            {"role": "assistant", "content": "Welcome to Arval Driver Desk!"},
+            {"role": "user", "content": "I need an MOT"},
+            {"role": "assistant", "content": "What date suits you?"},
+            {"role": "user", "content": "Monday"},
+        ]
+        align_history(agent, transcript)
+        assert [m["content"] for m in agent.conversation_history] == [
+            "Welcome to Arval Driver Desk!", "I need an MOT", "What date suits you?"
+        ]
+
+        # The session answered "Monday", then Vapi re-sent the turn after an interruption
+        agent.conversation_history += [
+            {"role": "user", "content": "Monday"},
+            {"role": "assistant", "content": "Monday at"},
+        ]
+        align_history(agent, transcript[:-1] + [{"role": "user", "content": "Monday morning"}])
+        assert agent.conversation_history[-1]["content"] == "What date suits you?"
+
+
+class TestChatCompletionsEndpoint:
+    """Tests for POST /chat/completions."""
+
+    @pytest.fixture
+    def clients(self, monkeypatch):
+        model_clients = []
+
+        def factory():
+            client = FakeStreamingClient([text_chunk("Hi there")], [text_chunk("Sure")])
+            model_clients.append(client)
+            return make_agent(client)
+
+        monkeypatch.setattr(llm_server, "OPENROUTER_API_KEY", "test-key")
+        monkeypatch.setattr(llm_server, "VAPI_LLM_SECRET", "llm-secret")
+        monkeypatch.setattr(llm_server, "sessions", SessionStore(factory))
+        return TestClient(llm_server.app), model_clients
+
+    def test_streams_chunks_and_keeps_state_per_call(self, clients):
+        """Test that replies stream as SSE chunks and each call keeps one agent."""
+        client, model_clients = clients
+        headers = {"Authorization": "Bearer llm-secret"}
+        body = {"call": {"id": "call-1"}, "messages": [{"role": "user", "content": "Hello"}]}
+
+        response = client.post("/chat/completions", json=body, headers=headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        chunks = read_sse(response)
+        assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+        assert "".join(c["choices"][0]["delta"].get("content", "") for c in chunks) == "Hi there"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+        body["messages"] += [
+            {"role": "assistant", "content": "Hi there"},
+            {"role": "user", "content": "Book an MOT"},
+        ]
+        body["stream"] = False
+        response = client.post("/chat/completions", json=body, headers=headers)
+        assert response.json()["choices"][0]["message"]["content"] == "Sure"
+        # Both turns ran on the same session agent
+        assert len(model_clients) == 1
+
+    def test_rejects_bad_credentials_and_payloads(self, clients):
+        """Test that a missing bearer token gets 401 and a bad transcript gets 400."""
+        client, _ = clients
+        body = {"messages": [{"role": "user", "content": "Hello"}]}
+        assert client.post("/chat/completions", json=body).status_code == 401
+
+        headers = {"Authorization": "Bearer llm-secret"}
+        bad = {"messages": [{"role": "assistant", "content": "Hi"}]}
+        assert client.post("/chat/completions", json=bad, headers=headers).status_code == 400
+
+    def test_refuses_every_request_without_a_configured_secret(self, clients, monkeypatch):
+        """Test that the endpoint fails closed while VAPI_LLM_SECRET is unset."""
+        client, _ = clients
+        monkeypatch.setattr(llm_server, "VAPI_LLM_SECRET", None)
+        body = {"messages": [{"role": "user", "content": "Hello"}]}
+
+        assert client.post("/chat/completions", json=body).status_code == 503
+        headers = {"Authorization": "Bearer "}
+        assert client.post("/chat/completions", json=body, headers=headers).status_code == 503
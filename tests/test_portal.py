@@ -0,0 +1,1183 @@
+"""
+Unit tests for the Customer Portal.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+
+import msgpack
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+from customer_portal import api, auth, mirror, vapi_source
+from customer_portal.auth import CustomerRegistry, TokenAuthority
+from customer_portal.cache import ResponseCache, etag_matches
+from customer_portal.columnar import CallTable, CallTableCache
+from customer_portal.details import CallDetailFetcher
+from customer_portal.events import EventBroker
+from customer_portal.mirror import CallMirror, MirrorSyncer
+from customer_portal.ratelimit import RateLimiter
+from customer_portal.records import AgentRecords, RecordQuery
+from customer_portal.rollups import RollupEngine
+from customer_portal.search import SearchQueryError, TranscriptIndex, build_match_expression
+from customer_portal.vapi_source import iter_vapi_calls
+from customer_portal.webhooks import WebhookIngester
+
+ASSISTANT_ID = api.CUSTOMERS["arval"]["assistant_id"]
+API_KEY = api.CUSTOMERS["arval"]["api_key"]
+TOKEN_SECRET = "test-signing-secret-of-at-least-32-bytes"
+WEBHOOK_SECRET = "test-webhook-secret"
+
+
+def make_call(call_id: str, created_at: str) -> dict:
+    """Create a minimal Vapi call object."""
+    return {"id": call_id, "createdAt": created_at, "status": "ended"}
+
+
+class FakeCallListing:
+    """Serves a newest-first call listing honouring Vapi's cursor params."""
+
+    def __init__(self, calls: list):
+        self.calls = sorted(calls, key=lambda c: c["createdAt"], reverse=True)
+        self.requests = []
+
+    async def __call__(self, session, params: dict):
+        self.requests.append(dict(params))
+        page = self.calls
+        if "createdAtLe" in params:
+            page = [c for c in page if c["createdAt"] <= params["createdAtLe"]]
+        if "createdAtLt" in params:
+            page = [c for c in page if c["createdAt"] < params["createdAtLt"]]
+        return page[:params["limit"]]
+
+
+class TestVapiSource:
+    """Tests for paginated Vapi call streaming."""
+
+    @pytest.fixture
+    def listing(self, monkeypatch):
+        calls = [make_call(f"call-{i:03d}", f"2026-01-01T00:{i // 2:02d}:00Z") for i in range(25)]
+        fake = FakeCallListing(calls)
+        monkeypatch.setattr(vapi_source, "_fetch_page", fake)
+        return fake
+
+    async def test_iterates_all_pages(self, listing):
+        """Test that every call is yielded exactly once across pages."""
+        ids = [call["id"] async for call in iter_vapi_calls("asst", page_size=4, session=object())]
+
+        assert len(ids) == 25
+        assert len(set(ids)) == 25
+        assert len(listing.requests) > 1
+        assert all(r["limit"] <= 4 for r in listing.requests)
+
+    async def test_max_calls_stops_early(self, listing):
+        """Test that max_calls bounds both results and upstream pages."""
+        ids = [
+            call["id"]
+            async for call in iter_vapi_calls("asst", page_size=5, max_calls=7, session=object())
+        ]
+
+        assert len(ids) == 7
+        assert len(listing.requests) == 2
+
+    async def test_consumer_can_stop_early(self, listing):
+        """Test that breaking out of the iterator does not raise."""
+        seen = []
+        async for call in iter_vapi_calls("asst", page_size=3, session=object()):
+            seen.append(call)
+            if len(seen) == 2:
+                break
+
+        assert len(seen) == 2
+
+
+def make_ended_call(call_id: str, started_at: str, seconds: int, **extra) -> dict:
+    """Create a completed Vapi call object."""
+    minutes, secs = divmod(seconds, 60)
+    start_minute = int(started_at[14:16])
+    ended_at = f"{started_at[:14]}{start_minute + minutes:02d}:{secs:02d}.000Z"
+    return {
+        "id": call_id,
+        "assistantId": ASSISTANT_ID,
+        "createdAt": started_at,
+        "updatedAt": ended_at,
+        "startedAt": started_at,
+        "endedAt": ended_at,
+        "status": "ended",
+        "customer": {"number": "+447700900000"},
+        "transcript": f"Transcript for {call_id}",
+        **extra,
+    }
+
+
+@pytest.fixture
+def call_mirror():
+    """An in-memory call mirror."""
+    store = CallMirror(":memory:")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def rollups(call_mirror):
+    """Rollups attached to the in-memory mirror."""
+    return RollupEngine(call_mirror)
+
+
+@pytest.fixture
+def client(call_mirror, rollups, monkeypatch, tmp_path):
+    """A portal test client backed by an in-memory, pre-synced mirror."""
+    syncer = MirrorSyncer(call_mirror, lambda: [ASSISTANT_ID])
+    monkeypatch.setattr(api, "call_mirror", call_mirror)
+    monkeypatch.setattr(api, "call_rollups", rollups)
+    monkeypatch.setattr(api, "call_tables", CallTableCache(call_mirror))
+    monkeypatch.setattr(api, "call_search", TranscriptIndex(call_mirror))
+    monkeypatch.setattr(api, "response_cache", ResponseCache(call_mirror))
+    monkeypatch.setattr(api, "call_events", EventBroker(call_mirror))
+    monkeypatch.setattr(api, "rate_limiter", RateLimiter())
+    monkeypatch.setattr(
+        api, "webhook_ingester", WebhookIngester(call_mirror, lambda: [ASSISTANT_ID])
+    )
+    monkeypatch.setattr(api, "VAPI_WEBHOOK_SECRET", WEBHOOK_SECRET)
+    monkeypatch.setattr(api, "token_authority", TokenAuthority(TOKEN_SECRET, api.customer_registry))
+    monkeypatch.setattr(api, "call_details", CallDetailFetcher(max_concurrency=4, session=object()))
+    monkeypatch.setattr(api, "mirror_syncer", syncer)
+    monkeypatch.setattr(api, "agent_records", AgentRecords(api.agent_records.specs, str(tmp_path)))
+    call_mirror.set_sync_state(ASSISTANT_ID, mirror.SyncState(synced_at=datetime.now(timezone.utc)))
+    return TestClient(api.app, headers={"X-API-Key": API_KEY})
+
+
+class TestAuth:
+    """Tests for API key lookup and session tokens."""
+
+    @pytest.fixture
+    def registry(self):
+        customers = {
+            f"tenant-{i}": {"api_key": f"key-{i}", "assistant_id": f"asst-{i}"}
+            for i in range(5000)
+        }
+        return CustomerRegistry(customers)
+
+    def test_api_key_lookup(self, registry):
+        """Test indexed key lookup across many tenants, and key rotation."""
+        assert registry.authenticate("key-4321")["customer_id"] == "tenant-4321"
+        assert registry.authenticate("key-unknown") is None
+
+        registry.customers["tenant-7"]["api_key"] = "rotated"
+        assert registry.authenticate("key-7") is None
+        registry.refresh()
+        assert registry.authenticate("rotated")["customer_id"] == "tenant-7"
+
+    def test_token_round_trip_is_cached(self, registry, monkeypatch):
+        """Test that a verified token skips signature checks on later requests."""
+        authority = TokenAuthority(TOKEN_SECRET, registry)
+        token = authority.issue(registry.get("tenant-1"))
+        decodes = []
+        real_decode = auth.jwt.decode
+        monkeypatch.setattr(
+            auth.jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw)
+        )
+
+        assert authority.verify(token)["assistant_id"] == "asst-1"
+        assert authority.verify(token)["assistant_id"] == "asst-1"
+        assert len(decodes) == 1
+
+    def test_invalid_tokens_rejected(self, registry):
+        """Test expired, forged and reassigned tokens."""
+        authority = TokenAuthority(TOKEN_SECRET, registry)
+        customer = registry.get("tenant-2")
+
+        expired = TokenAuthority(TOKEN_SECRET, registry, ttl_seconds=-60).issue(customer)
+        forged = TokenAuthority(TOKEN_SECRET[::-1], registry).issue(customer)
+        reassigned = authority.issue(customer)
+        registry.customers["tenant-2"]["assistant_id"] = "asst-moved"
+
+        assert authority.verify(expired) is None
+        assert authority.verify(forged) is None
+        assert authority.verify(reassigned) is None
+        assert authority.verify("not.a.token") is None
+
+
+class TestRateLimiting:
+    """Tests for per-tenant token buckets and the upstream request cap."""
+
+    def test_bucket_refills_over_time(self):
+        """Test burst capacity, refill rate and the retry-after estimate."""
+        now = [0.0]
+        limiter = RateLimiter(rate_per_second=2, burst=10, clock=lambda: now[0])
+
+        assert limiter.acquire("a", 8) == 0
+        assert limiter.acquire("a", 5) == pytest.approx(1.5)
+        assert limiter.acquire("b", 10) == 0  # buckets are per key
+
+        now[0] = 1.5
+        assert limiter.acquire("a", 5) == 0
+
+    def test_cost_is_capped_at_burst(self):
+        """Test that a request costing more than the burst needs a full bucket."""
+        limiter = RateLimiter(rate_per_second=1, burst=10, clock=lambda: 0.0)
+
+        assert limiter.acquire("a", 50) == 0
+        assert limiter.acquire("a", 50) == pytest.approx(10)
+
+    async def test_upstream_limiter_refuses_when_queue_is_full(self):
+        """Test that excess upstream requests fail fast instead of queuing."""
+        limiter = vapi_source.UpstreamLimiter(max_in_flight=1, max_waiting=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        with pytest.raises(vapi_source.UpstreamBusyError):
+            async with limiter.slot():
+                pass
+
+        release.set()
+        await asyncio.gather(holder, waiter)
+        assert limiter.in_flight == 0
+
+
+class TestCallMirror:
+    """Tests for the local call mirror and its syncer."""
+
+    def test_upsert_is_idempotent(self, call_mirror):
+        """Test that re-syncing a call updates it in place."""
+        call = make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 90)
+        call_mirror.upsert_calls(ASSISTANT_ID, [call])
+        call_mirror.upsert_calls(ASSISTANT_ID, [{**call, "status": "archived"}])
+
+        calls = call_mirror.list_calls(ASSISTANT_ID)
+        assert len(calls) == 1
+        assert calls[0]["status"] == "archived"
+        assert calls[0]["duration_seconds"] == 90
+
+    def test_calls_are_partitioned_by_assistant(self, call_mirror):
+        """Test that one assistant never sees another's calls."""
+        call = make_ended_call("call-x", "2026-01-05T10:00:00.000Z", 30)
+        call_mirror.upsert_calls("other", [call])
+
+        assert call_mirror.list_calls(ASSISTANT_ID) == []
+        assert call_mirror.get_call(ASSISTANT_ID, "call-x") is None
+
+    async def test_sync_advances_cursor(self, call_mirror, monkeypatch):
+        """Test that a sync requests only calls updated since the last cursor."""
+        requested = []
+
+        async def fake_iter(assistant_id, page_size, updated_after):
+            requested.append(updated_after)
+            for call in [make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60)]:
+                yield call
+
+        monkeypatch.setattr(mirror, "iter_vapi_calls", fake_iter)
+        syncer = MirrorSyncer(call_mirror, lambda: [ASSISTANT_ID])
+
+        assert await syncer.sync_assistant(ASSISTANT_ID) == 1
+        await syncer.sync_assistant(ASSISTANT_ID)
+
+        assert requested == [None, "2026-01-05T10:01:00.000Z"]
+        assert call_mirror.get_sync_state(ASSISTANT_ID).synced_at is not None
+
+
+    def test_filters_are_pushed_down(self, call_mirror):
+        """Test caller and minimum-duration filters."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 30),
+            make_ended_call("call-2", "2026-01-05T10:00:00.000Z", 300),
+            make_ended_call("call-3", "2026-01-05T11:00:00.000Z", 300,
+                            customer={"number": "+447700900111"}),
+        ])
+
+        long_calls = call_mirror.list_calls(
+            ASSISTANT_ID, filters=mirror.CallFilter(min_duration_seconds=60)
+        )
+        from_caller = call_mirror.list_calls(
+            ASSISTANT_ID, filters=mirror.CallFilter(caller="+447700900111")
+        )
+
+        assert [call["id"] for call in long_calls] == ["call-3", "call-2"]
+        assert [call["id"] for call in from_caller] == ["call-3"]
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode to the key they encode and reject garbage."""
+        key = ("2026-01-05", "2026-01-05T09:00:00.000Z", "call-1")
+
+        assert mirror.decode_cursor(mirror.encode_cursor(key)) == key
+        with pytest.raises(ValueError):
+            mirror.decode_cursor("not-a-cursor")
+        with pytest.raises(ValueError):
+            mirror.decode_cursor(mirror.encode_cursor([{}, [], {}]))
+
+
+class TestRollups:
+    """Tests for incremental analytics rollups."""
+
+    def test_updates_replace_previous_contribution(self, call_mirror, rollups):
+        """Test that a re-synced call moves between statuses without double counting."""
+        call = make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60)
+        call_mirror.upsert_calls(ASSISTANT_ID, [{**call, "status": "in-progress", "endedAt": None}])
+        call_mirror.upsert_calls(ASSISTANT_ID, [call])
+
+        summary = rollups.summary(ASSISTANT_ID)
+        assert summary.calls == 1
+        assert summary.total_duration_seconds == 60
+        assert summary.status_counts == {"ended": 1}
+
+    def test_period_query(self, call_mirror, rollups):
+        """Test that summaries only include days within the range."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60),
+            make_ended_call("call-2", "2026-01-06T10:00:00.000Z", 30),
+            make_ended_call("call-3", "2026-01-07T10:00:00.000Z", 90),
+        ])
+
+        summary = rollups.summary(ASSISTANT_ID, start=date(2026, 1, 6), end=date(2026, 1, 6))
+        assert summary.calls == 1
+        assert summary.average_duration_seconds == 30
+
+    def test_rebuild_matches_incremental(self, call_mirror, rollups):
+        """Test that rebuilding from the mirror reproduces the incremental rollups."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", f"2026-01-0{1 + i % 5}T10:00:00.000Z", 10 * i)
+            for i in range(20)
+        ])
+        before = rollups.summary(ASSISTANT_ID)
+
+        rollups.rebuild(ASSISTANT_ID)
+
+        assert rollups.summary(ASSISTANT_ID) == before
+
+
+class TestCallTable:
+    """Tests for the columnar call table."""
+
+    def load(self, call_mirror, calls) -> CallTable:
+        call_mirror.upsert_calls(ASSISTANT_ID, calls)
+        return CallTable.from_mirror(call_mirror, ASSISTANT_ID)
+
+    def test_group_by_day_and_week(self, call_mirror):
+        """Test day and Monday-aligned week buckets."""
+        table = self.load(call_mirror, [
+            make_ended_call("call-1", "2026-01-04T10:00:00.000Z", 60),  # Sunday
+            make_ended_call("call-2", "2026-01-05T09:00:00.000Z", 30),  # Monday
+            make_ended_call("call-3", "2026-01-05T23:00:00.000Z", 90),
+        ])
+
+        days = table.group_by_time("day")
+        assert days["calls"].tolist() == [1, 2]
+        assert days["total_duration"].tolist() == [60, 120]
+
+        weeks = table.group_by_time("week")
+        starts = [datetime.fromtimestamp(t, tz=timezone.utc).date() for t in weeks["bucket_start"]]
+        assert starts == [date(2025, 12, 29), date(2026, 1, 5)]
+        assert weeks["calls"].tolist() == [1, 2]
+
+    def test_heatmap_percentiles_and_callers(self, call_mirror):
+        """Test hour-of-day heatmap, duration stats and caller counting."""
+        table = self.load(call_mirror, [
+            make_ended_call(f"call-{i}", "2026-01-05T09:00:00.000Z", 10 * (i + 1),
+                            customer={"number": f"+4477009000{i % 2}"})
+            for i in range(10)
+        ])
+
+        heatmap = table.busiest_hours_heatmap()
+        assert heatmap.shape == (7, 24)
+        assert heatmap[0, 9] == 10  # Monday, 09:00 UTC
+        assert table.duration_percentiles((50,))["p50"] == 55.0
+        assert table.duration_histogram(5)[0].sum() == 10
+        assert table.unique_callers() == 2
+
+    def test_cache_invalidated_on_write(self, call_mirror):
+        """Test that cached tables are rebuilt after the mirror changes."""
+        cache = CallTableCache(call_mirror)
+        call_mirror.upsert_calls(
+            ASSISTANT_ID, [make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 5)]
+        )
+        assert len(cache.get(ASSISTANT_ID)) == 1
+
+        call_mirror.upsert_calls(
+            ASSISTANT_ID, [make_ended_call("call-2", "2026-01-05T09:00:00.000Z", 5)]
+        )
+        assert len(cache.get(ASSISTANT_ID)) == 2
+
+
+class TestTranscriptSearch:
+    """Tests for the full-text transcript index."""
+
+    @pytest.fixture
+    def index(self, call_mirror):
+        index = TranscriptIndex(call_mirror)
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 60,
+                            transcript="User: my windscreen is cracked, reg AB12 CDE."),
+            make_ended_call("call-2", "2026-01-05T10:00:00.000Z", 60,
+                            transcript="User: I need an MOT for CDE AB12.",
+                            summary="MOT booking"),
+            make_ended_call("call-3", "2026-01-05T11:00:00.000Z", 60,
+                            transcript="User: windscreen wipers and windscreen chip repair."),
+        ])
+        call_mirror.upsert_calls("other-assistant", [
+            make_ended_call("call-4", "2026-01-05T09:00:00.000Z", 60,
+                            transcript="User: windscreen replacement"),
+        ])
+        return index
+
+    def test_terms_are_ranked_and_scoped(self, index):
+        """Test BM25 ranking and that other assistants' calls are excluded."""
+        hits, has_more = index.search(ASSISTANT_ID, "windscreen")
+
+        assert [hit.id for hit in hits] == ["call-3", "call-1"]
+        assert not has_more
+        assert "[windscreen]" in hits[0].snippet
+
+    def test_phrase_query(self, index):
+        """Test that quoted phrases respect word order."""
+        hits, _ = index.search(ASSISTANT_ID, '"ab12 cde"')
+
+        assert [hit.id for hit in hits] == ["call-1"]
+
+    def test_prefix_and_pagination(self, index):
+        """Test prefix terms and offset pagination."""
+        first, has_more = index.search(ASSISTANT_ID, "wind*", limit=1)
+        second, _ = index.search(ASSISTANT_ID, "wind*", limit=1, offset=1)
+
+        assert has_more
+        assert {first[0].id, second[0].id} == {"call-1", "call-3"}
+
+    def test_updates_replace_indexed_text(self, call_mirror, index):
+        """Test that re-synced calls are re-indexed rather than duplicated."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 60, transcript="Tyre puncture"),
+        ])
+
+        assert [hit.id for hit in index.search(ASSISTANT_ID, "windscreen")[0]] == ["call-3"]
+        assert [hit.id for hit in index.search(ASSISTANT_ID, "tyre")[0]] == ["call-1"]
+
+    def test_rebuild_matches_incremental(self, index):
+        """Test that a rebuild produces the same results."""
+        before = index.search(ASSISTANT_ID, "windscreen")[0]
+        index.rebuild()
+
+        assert index.search(ASSISTANT_ID, "windscreen")[0] == before
+
+    def test_user_input_is_escaped(self):
+        """Test that FTS5 syntax in queries is matched literally."""
+        assert build_match_expression('NEAR(a b) OR "x"') == '"NEAR(a" AND "b)" AND "OR" AND "x"'
+        with pytest.raises(SearchQueryError):
+            build_match_expression(" -- ")
+
+
+class FakeCallDetails:
+    """Serves call details by id, tracking upstream concurrency."""
+
+    def __init__(self, calls: dict):
+        self.calls = calls
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, session, call_id: str):
+        self.requests.append(call_id)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if call_id == "broken":
+                raise vapi_source.VapiSourceError("boom")
+            return self.calls.get(call_id)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def call_details(monkeypatch):
+    """Fake Vapi call detail lookups for owned, foreign and live calls."""
+    calls = {
+        f"call-{i}": make_ended_call(f"call-{i}", "2026-01-05T09:00:00.000Z", 60)
+        for i in range(20)
+    }
+    calls["foreign"] = {**calls["call-0"], "id": "foreign", "assistantId": "someone-else"}
+    calls["live"] = {**calls["call-0"], "id": "live", "status": "in-progress"}
+    fake = FakeCallDetails(calls)
+    monkeypatch.setattr(vapi_source, "fetch_call", fake)
+    return fake
+
+
+class TestCallDetailFetcher:
+    """Tests for concurrent call detail retrieval."""
+
+    async def test_batch_is_bounded_and_deduplicated(self, call_details):
+        """Test the concurrency limit, per-batch dedup and result shapes."""
+        fetcher = CallDetailFetcher(max_concurrency=4, session=object())
+        ids = [f"call-{i}" for i in range(20)] + ["call-3", "foreign", "missing", "broken"]
+
+        results = {r["id"]: r async for r in fetcher.iter_owned(ids, ASSISTANT_ID)}
+
+        assert call_details.peak == 4
+        assert len(call_details.requests) == 23
+        assert results["call-3"]["call"]["id"] == "call-3"
+        assert results["foreign"] == {"id": "foreign", "error": "access_denied"}
+        assert results["missing"] == {"id": "missing", "error": "not_found"}
+        assert results["broken"] == {"id": "broken", "error": "upstream_error"}
+
+    async def test_finished_calls_are_cached(self, call_details):
+        """Test that ended calls are cached and live calls are refetched."""
+        fetcher = CallDetailFetcher(session=object())
+
+        for _ in range(2):
+            await fetcher.get("call-1")
+            await fetcher.get("live")
+
+        assert call_details.requests == ["call-1", "live", "live"]
+
+    async def test_concurrent_lookups_share_a_request(self, call_details):
+        """Test in-flight dedup across concurrent callers."""
+        fetcher = CallDetailFetcher(session=object())
+
+        first, second = await asyncio.gather(fetcher.get("live"), fetcher.get("live"))
+
+        assert first is second
+        assert call_details.requests == ["live"]
+
+
+def status_update(call_id: str, status: str, assistant_id: str = ASSISTANT_ID) -> dict:
+    """Create a Vapi status-update server message."""
+    return {
+        "type": "status-update",
+        "status": status,
+        "timestamp": 1767603600000,
+        "call": {
+            "id": call_id, "assistantId": assistant_id, "createdAt": "2026-01-05T09:00:00.000Z",
+        },
+    }
+
+
+def end_of_call_report(call_id: str, transcript: str) -> dict:
+    """Create a Vapi end-of-call-report server message."""
+    return {
+        "type": "end-of-call-report",
+        "timestamp": 1767603660000,
+        "startedAt": "2026-01-05T09:00:00.000Z",
+        "endedAt": "2026-01-05T09:01:30.000Z",
+        "endedReason": "customer-ended-call",
+        "artifact": {"transcript": transcript},
+        "analysis": {"summary": "Windscreen repair booked"},
+        "call": {
+            "id": call_id, "assistantId": ASSISTANT_ID, "createdAt": "2026-01-05T09:00:00.000Z",
+        },
+    }
+
+
+class TestWebhookIngestion:
+    """Tests for pushing Vapi server messages into the mirror."""
+
+    @pytest.fixture
+    def ingester(self, call_mirror):
+        return WebhookIngester(call_mirror, lambda: [ASSISTANT_ID])
+
+    async def test_report_updates_mirror_and_listeners(self, call_mirror, rollups, ingester):
+        """Test that a report lands in the mirror, rollups and search index in one write."""
+        index = TranscriptIndex(call_mirror)
+        ingester.submit(status_update("call-1", "in-progress"))
+        ingester.submit(end_of_call_report("call-1", "User: my windscreen is cracked"))
+
+        assert await ingester.drain() == 1
+
+        call = call_mirror.get_call(ASSISTANT_ID, "call-1")
+        assert call["status"] == "ended"
+        assert call["endedReason"] == "customer-ended-call"
+        summary = rollups.summary(ASSISTANT_ID)
+        assert (summary.calls, summary.total_duration_seconds) == (1, 90)
+        assert [hit.id for hit in index.search(ASSISTANT_ID, "windscreen")[0]] == ["call-1"]
+
+    async def test_late_status_update_does_not_regress(self, call_mirror, ingester):
+        """Test that out-of-order events keep an ended call ended."""
+        ingester.submit(end_of_call_report("call-1", "Transcript"))
+        await ingester.drain()
+        ingester.submit(status_update("call-1", "in-progress"))
+        await ingester.drain()
+
+        call = call_mirror.get_call(ASSISTANT_ID, "call-1")
+        assert call["status"] == "ended"
+        assert call["transcript"] == "Transcript"
+
+    async def test_unknown_assistants_and_types_ignored(self, call_mirror, ingester):
+        """Test that foreign tenants and other message types are dropped."""
+        ingester.submit(status_update("call-1", "ringing", assistant_id="someone-else"))
+        ingester.submit({"type": "tool-calls", "call": {"id": "call-2"}})
+
+        assert await ingester.drain() == 0
+        assert call_mirror.count_calls("someone-else") == 0
+        assert ingester.stats.ignored == 2
+
+    def test_full_queue_refuses(self, call_mirror):
+        """Test that a full queue refuses events instead of growing."""
+        ingester = WebhookIngester(call_mirror, lambda: [ASSISTANT_ID], max_queue=1)
+
+        assert ingester.submit(status_update("call-1", "ringing"))
+        assert not ingester.submit(status_update("call-2", "ringing"))
+
+
+def make_appointment(apt_id: str, day: str, apt_type: str = "MOT", status: str = "Confirmed"):
+    """Create an appointment as book_appointment stores it."""
+    return {
+        "id": apt_id, "customer_name": "Jane Smith", "contact_phone": "+447700900123",
+        "contact_email": "jane@example.com", "type": apt_type, "date": day,
+        "time_slot": "Morning (9-12)", "vehicle_registration": None, "notes": None,
+        "status": status, "created_at": f"{day}T08:00:00+00:00",
+    }
+
+
+def make_lead(lead_id: str, created_at: str, score: int, **extra):
+    """Create a lead as capture_lead stores it."""
+    priority = "High" if score >= 50 else "Medium" if score >= 25 else "Standard"
+    return {
+        "id": lead_id, "contact_name": "Sam Jones", "contact_email": "sam@example.com",
+        "contact_phone": "+447700900456", "company_name": "Acme Fleet",
+        "vehicle_interests": "EVs", "status": "New", "source": "Voice Agent",
+        "score": score, "priority": priority, "created_at": created_at, **extra,
+    }
+
+
+def write_records(data_dir, filename: str, records: list) -> None:
+    (data_dir / filename).write_text(json.dumps(records))
+
+
+class TestAgentRecords:
+    """Tests for the indexed appointment and lead store."""
+
+    OWNER = {"customer_id": "arval"}
+
+    @pytest.fixture
+    def records(self, tmp_path):
+        return AgentRecords(api.agent_records.specs, str(tmp_path), default_owner="arval")
+
+    def test_filters_and_pages_appointments(self, records, tmp_path):
+        """Test that indexed filters and cursors walk matching appointments newest first."""
+        write_records(tmp_path, "appointments.json", [
+            make_appointment(f"APT-{i:03d}", f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}",
+                             apt_type="MOT" if i % 3 else "Service",
+                             status="Cancelled" if i % 5 == 0 else "Confirmed")
+            for i in range(120)
+        ] + [{"id": "broken"}])
+        query = RecordQuery(
+            equals={"appointment_type": "mot", "status": "Confirmed"},
+            start_date="2026-03-01", end_date="2026-08-31",
+        )
+
+        index = records.index("appointments", self.OWNER)
+        collected, after = [], None
+        while True:
+            page, after = index.page(query, 7, after)
+            collected += page
+            if after is None:
+                break
+
+        expected = sorted(
+            (row for row in index.rows
+             if row["appointment_type"] == "MOT" and row["status"] == "Confirmed"
+             and "2026-03-01" <= row["preferred_date"] <= "2026-08-31"),
+            key=lambda row: (row["preferred_date"], row["id"]), reverse=True,
+        )
+        assert collected == expected and len(collected) > 7
+        assert len(index) == 120  # the malformed record is skipped
+        assert collected[0]["preferred_time"] == "Morning (9-12)"
+
+    def test_leads_by_priority_and_score(self, records, tmp_path):
+        """Test priority and score-range filters over leads."""
+        write_records(tmp_path, "leads.json", [
+            make_lead(f"LEAD-{i}", f"2026-01-{1 + i:02d}T09:00:00+00:00", score=i * 5)
+            for i in range(20)
+        ])
+        index = records.index("leads", self.OWNER)
+
+        high, _ = index.page(RecordQuery(equals={"priority": "high"}), 50)
+        banded, _ = index.page(RecordQuery(ranges={"score": (20, 35)}), 50)
+
+        assert [lead["score"] for lead in high] == list(range(95, 45, -5))
+        assert [lead["id"] for lead in banded] == ["LEAD-7", "LEAD-6", "LEAD-5", "LEAD-4"]
+
+    def test_reloads_only_when_the_file_changes(self, records, tmp_path):
+        """Test that the index is reused until the agent writes the file again."""
+        write_records(tmp_path, "leads.json", [make_lead("LEAD-1", "2026-01-01T09:00:00", 10)])
+        first = records.index("leads", self.OWNER)
+        assert records.index("leads", self.OWNER) is first
+
+        write_records(tmp_path, "leads.json", [
+            make_lead("LEAD-1", "2026-01-01T09:00:00", 10),
+            make_lead("LEAD-2", "2026-01-02T09:00:00", 60),
+        ])
+        assert len(records.index("leads", self.OWNER)) == 2
+        assert len(records.index("leads", {"data_dir": str(tmp_path / "missing")})) == 0
+
+    def test_default_directory_belongs_to_its_owner(self, records, tmp_path):
+        """Test that only the owning customer falls back to the default directory."""
+        write_records(tmp_path, "leads.json", [make_lead("LEAD-1", "2026-01-01T09:00:00", 10)])
+
+        assert len(records.index("leads", self.OWNER)) == 1
+        assert len(records.index("leads", {"customer_id": "other"})) == 0
+        assert len(records.index("leads", {})) == 0
+        assert len(records.index("leads", {"customer_id": "other", "data_dir": str(tmp_path)})) == 1
+
+
+def live_call(call_id: str, status: str, ended_ago: timedelta = timedelta(0)) -> dict:
+    """Create a call that started a few minutes ago and, if ended, ended `ended_ago` ago."""
+    now = datetime.now(timezone.utc)
+    call = make_call(call_id, mirror.format_vapi_timestamp(now - ended_ago - timedelta(minutes=3)))
+    call.update(status=status, startedAt=call["createdAt"])
+    if status == "ended":
+        call["endedAt"] = mirror.format_vapi_timestamp(now - ended_ago)
+    return call
+
+
+async def next_event(stream) -> dict:
+    """Read the next non-comment server-sent event from a stream as {field: value}."""
+    while True:
+        chunk = (await asyncio.wait_for(stream.__anext__(), 1)).decode()
+        if not chunk.startswith((":", "retry:")):
+            fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+            fields["data"] = json.loads(fields["data"])
+            return fields
+
+
+class TestCallEvents:
+    """Tests for the live call event feed."""
+
+    async def test_fan_out_per_assistant(self, call_mirror):
+        """Test that each subscriber of an assistant gets its call events, and no one else's."""
+        broker = EventBroker(call_mirror)
+        first, second = broker.stream(ASSISTANT_ID), broker.stream(ASSISTANT_ID)
+        other = broker.stream("someone-else")
+        for stream in (first, second, other):
+            await stream.__anext__()  # retry hint; the subscription is now live
+
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            live_call("call-1", "in-progress"),
+            live_call("call-old", "ended", ended_ago=timedelta(days=2)),
+        ])
+        call_mirror.upsert_calls(ASSISTANT_ID, [live_call("call-1", "ended")])
+        broker.publish_tool_calls({
+            "type": "tool-calls",
+            "call": {"id": "call-1", "assistantId": ASSISTANT_ID},
+            "toolCallList": [{"id": "tc-1", "function": {"name": "book_appointment"}}],
+        })
+
+        for stream in (first, second):
+            events = [await next_event(stream) for _ in range(3)]
+            assert [e["event"] for e in events] == ["call-started", "call-ended", "tool-invoked"]
+            assert events[2]["data"]["tool"] == "book_appointment"
+        # Delivered twice each: the other assistant's subscriber got nothing
+        assert broker.stats.published == 3 and broker.stats.delivered == 6
+
+        broker.close()
+        for stream in (first, second, other):
+            with pytest.raises(StopAsyncIteration):
+                await stream.__anext__()
+        assert broker.stats.subscribers == 0
+
+    async def test_slow_subscriber_drops_events(self, call_mirror):
+        """Test that a full subscriber queue drops events and reports how many."""
+        broker = EventBroker(call_mirror, max_queue=2)
+        stream = broker.stream(ASSISTANT_ID)
+        await stream.__anext__()
+
+        for i in range(5):
+            call_mirror.upsert_calls(ASSISTANT_ID, [live_call(f"call-{i}", "in-progress")])
+
+        assert broker.stats.dropped == 3
+        assert (await next_event(stream))["data"]["call_id"] == "call-0"
+        assert (await next_event(stream))["data"] == {"type": "dropped", "count": 3}
+        assert (await next_event(stream))["data"]["call_id"] == "call-1"
+        await stream.aclose()
+
+    async def test_events_from_writer_threads(self, call_mirror):
+        """Test that mirror writes made off the event loop reach subscribers."""
+        broker = EventBroker(call_mirror)
+        stream = broker.stream(ASSISTANT_ID)
+        await stream.__anext__()
+
+        await asyncio.to_thread(
+            call_mirror.upsert_calls, ASSISTANT_ID, [live_call("call-1", "in-progress")]
+        )
+
+        assert (await next_event(stream))["data"]["call_id"] == "call-1"
+        await stream.aclose()
+
+
+class TestPortalEndpoints:
+    """Tests for portal endpoints served from the mirror."""
+
+    def test_calls_served_from_mirror(self, client, call_mirror):
+        """Test that /calls reads the mirror and reports freshness."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 120),
+            make_ended_call("call-2", "2026-01-06T10:00:00.000Z", 60),
+        ])
+
+        response = client.get("/calls")
+
+        assert response.status_code == 200
+        assert [c["id"] for c in response.json()] == ["call-2", "call-1"]
+        assert response.json()[1]["duration_seconds"] == 120
+        assert "X-Data-Synced-At" in response.headers
+
+    def test_calls_cursor_pagination(self, client, call_mirror):
+        """Test that following X-Next-Cursor visits every call exactly once."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", f"2026-01-05T09:{i:02d}:00.000Z", 60) for i in range(7)
+        ])
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/calls", params=params)
+            assert response.status_code == 200
+            seen.extend(call["id"] for call in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert seen == [f"call-{i}" for i in reversed(range(7))]
+
+    def test_calls_filters_and_projection(self, client, call_mirror):
+        """Test pushed-down filters and field projection."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-04T09:00:00.000Z", 300),
+            make_ended_call("call-2", "2026-01-05T09:00:00.000Z", 30),
+            make_ended_call("call-3", "2026-01-05T10:00:00.000Z", 300),
+        ])
+
+        response = client.get("/calls", params={
+            "start_date": "2026-01-05", "min_duration": 60, "fields": "status,duration_seconds",
+        })
+
+        assert response.status_code == 200
+        assert response.json() == [{"id": "call-3", "duration_seconds": 300, "status": "ended"}]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_calls_rejects_bad_parameters(self, client):
+        """Test validation of fields, cursor and limit."""
+        assert client.get("/calls", params={"fields": "raw"}).status_code == 400
+        assert client.get("/calls", params={"cursor": "garbage"}).status_code == 400
+        wrong_types = mirror.encode_cursor([{}, [], {}])
+        assert client.get("/calls", params={"cursor": wrong_types}).status_code == 400
+        assert client.get("/calls", params={"limit": 0}).status_code == 400
+
+    def test_call_batch_streams_ndjson(self, client, call_details):
+        """Test the batch endpoint's streamed results and validation."""
+        response = client.post(
+            "/calls/batch", json={"call_ids": ["call-1", "call-2", "foreign", "call-1"]}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        results = {r["id"]: r for r in map(json.loads, response.text.splitlines())}
+        assert set(results) == {"call-1", "call-2", "foreign"}
+        assert results["foreign"]["error"] == "access_denied"
+        assert client.post("/calls/batch", json={"call_ids": []}).status_code == 400
+
+    def test_call_detail_checks_ownership(self, client, call_details):
+        """Test the single-call endpoint's status codes."""
+        assert client.get("/calls/call-1").json()["id"] == "call-1"
+        assert client.get("/calls/foreign").status_code == 403
+        assert client.get("/calls/missing").status_code == 404
+
+    def test_bearer_token_auth(self, client):
+        """Test exchanging an API key for a token and using it."""
+        response = client.post("/auth/token")
+        assert response.status_code == 200
+        token = response.json()["access_token"]
+        assert response.json()["assistant_id"] == ASSISTANT_ID
+
+        bearer = {"X-API-Key": "", "Authorization": f"Bearer {token}"}
+        assert client.get("/sync/status", headers=bearer).status_code == 200
+        assert client.post("/auth/token", headers=bearer).status_code == 401
+
+        bad = {"X-API-Key": "", "Authorization": "Bearer nope"}
+        assert client.get("/sync/status", headers=bad).status_code == 401
+
+    def test_tokens_refused_without_secret(self, client, monkeypatch):
+        """Test that tokens are neither issued nor accepted while no secret is set."""
+        token = client.post("/auth/token").json()["access_token"]
+        monkeypatch.setattr(api, "token_authority", TokenAuthority(None, api.customer_registry))
+
+        assert client.post("/auth/token").status_code == 503
+        bearer = {"X-API-Key": "", "Authorization": f"Bearer {token}"}
+        assert client.get("/sync/status", headers=bearer).status_code == 503
+        assert client.get("/sync/status").status_code == 200
+
+    def test_rate_limit_returns_429(self, client, monkeypatch):
+        """Test that endpoints draw their cost and over-limit requests get Retry-After."""
+        monkeypatch.setattr(api, "rate_limiter", RateLimiter(rate_per_second=1, burst=55))
+
+        assert client.get("/export/calls").status_code == 200
+        assert client.get("/calls").status_code == 200
+        response = client.get("/calls")
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+    async def test_webhook_endpoint(self, client, call_mirror):
+        """Test webhook verification, acknowledgement and ingestion."""
+        message = {"message": end_of_call_report("call-9", "User: hello")}
+
+        assert client.post("/webhooks/vapi", json=message).status_code == 401
+        bad = client.post("/webhooks/vapi", json=message, headers={"X-Vapi-Secret": "wrong"})
+        assert bad.status_code == 401
+
+        response = client.post(
+            "/webhooks/vapi", json=message, headers={"X-Vapi-Secret": WEBHOOK_SECRET}
+        )
+        assert response.status_code == 202
+        assert api.webhook_ingester.pending == 1
+
+        await api.webhook_ingester.drain()
+        assert call_mirror.get_call(ASSISTANT_ID, "call-9")["status"] == "ended"
+
+    async def test_call_stream_endpoint(self, client, call_mirror, monkeypatch):
+        """Test that /calls/stream serves the customer's events and sheds excess subscribers."""
+        customer = api.customer_registry.authenticate(API_KEY)
+        response = await api.stream_call_events(customer)
+        assert response.media_type == "text/event-stream"
+        stream = response.body_iterator
+        await stream.__anext__()
+
+        call_mirror.upsert_calls(ASSISTANT_ID, [live_call("call-1", "in-progress")])
+        assert (await next_event(stream))["event"] == "call-started"
+        await stream.aclose()
+
+        monkeypatch.setattr(api.call_events, "max_subscribers", 0)
+        assert client.get("/calls/stream").status_code == 503
+
+    def test_invalid_api_key_rejected(self, client):
+        """Test that an unknown API key is rejected."""
+        response = client.get("/calls", headers={"X-API-Key": "wrong"})
+
+        assert response.status_code == 401
+
+    def test_analytics_from_rollups(self, client, call_mirror):
+        """Test that /analytics totals come from the rollups."""
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", f"{today}T00:00:00.000Z", 120),
+            make_ended_call("call-2", "2020-01-06T10:00:00.000Z", 60),
+            make_call("call-3", "2020-01-07T10:00:00.000Z"),
+        ])
+
+        data = client.get("/analytics").json()
+
+        assert data["total_calls"] == 3
+        # The call without start and end times doesn't count toward the average
+        assert data["average_call_duration_seconds"] == 90
+        assert data["calls_today"] == 1
+        assert data["status_breakdown"] == {"ended": 1}
+
+    def test_appointments_and_leads_endpoints(self, client, tmp_path):
+        """Test listing agent records with filters, cursors and analytics counts."""
+        write_records(tmp_path, "appointments.json", [
+            make_appointment("APT-1", "2026-02-02"),
+            make_appointment("APT-2", "2026-02-03", apt_type="Service"),
+            make_appointment("APT-3", "2026-02-04"),
+            make_appointment("APT-4", "2026-02-05"),
+        ])
+        write_records(tmp_path, "leads.json", [
+            make_lead("LEAD-1", "2026-01-05T09:00:00+00:00", 60),
+            make_lead("LEAD-2", "2026-01-06T09:00:00+00:00", 10),
+        ])
+
+        first = client.get("/appointments", params={"type": "MOT", "limit": 2})
+        assert [a["id"] for a in first.json()] == ["APT-4", "APT-3"]
+        rest = client.get("/appointments", params={
+            "type": "MOT", "limit": 2, "cursor": first.headers["X-Next-Cursor"]
+        })
+        assert [a["id"] for a in rest.json()] == ["APT-1"]
+        assert "X-Next-Cursor" not in rest.headers
+
+        leads = client.get("/leads", params={"min_score": 50}).json()
+        assert [(lead["id"], lead["priority"]) for lead in leads] == [("LEAD-1", "High")]
+        assert client.get("/leads", params={"start_date": "05-01-2026"}).status_code == 400
+
+        data = client.get("/analytics").json()
+        assert (data["appointments_booked"], data["leads_captured"]) == (4, 2)
+
+    def test_export_csv_streams_with_filters(self, client, call_mirror):
+        """Test that CSV exports stream only rows matching pushed-down filters."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60),
+            make_ended_call("call-2", "2026-01-06T10:00:00.000Z", 30, status="failed"),
+            make_ended_call("call-3", "2026-01-07T10:00:00.000Z", 90),
+        ])
+
+        response = client.get("/export/calls", params={
+            "format": "csv", "start_date": "2026-01-05", "end_date": "2026-01-06",
+            "status": "ended",
+        })
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.strip().splitlines()
+        assert lines[0] == "ID,Started,Ended,Duration,Caller,Status"
+        assert [line.split(",")[0] for line in lines[1:]] == ["call-1"]
+
+    def test_export_json_and_ndjson(self, client, call_mirror):
+        """Test that JSON keeps its legacy shape and NDJSON emits one call per line."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", "2026-01-05T10:00:00.000Z", 60) for i in range(3)
+        ])
+
+        exported = client.get("/export/calls").json()
+        assert exported["format"] == "json"
+        assert len(exported["calls"]) == 3
+
+        lines = client.get("/export/calls", params={"format": "ndjson"}).text.splitlines()
+        assert {json.loads(line)["id"] for line in lines} == {"call-0", "call-1", "call-2"}
+
+    def test_export_msgpack(self, client, call_mirror):
+        """Test that msgpack exports are a stream of one map per call."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", "2026-01-05T10:00:00.000Z", 60) for i in range(3)
+        ])
+
+        response = client.get("/export/calls", params={"format": "msgpack"})
+        assert response.headers["content-type"] == "application/x-msgpack"
+        calls = list(msgpack.Unpacker(io.BytesIO(response.content), raw=False))
+        assert {call["id"] for call in calls} == {"call-0", "call-1", "call-2"}
+
+    def test_export_gzip(self, client, call_mirror):
+        """Test that compressed exports decompress to the plain export."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60),
+        ])
+
+        response = client.get("/export/calls", params={"format": "ndjson", "compress": "true"})
+
+        assert response.headers["content-type"] == "application/gzip"
+        assert json.loads(gzip.decompress(response.content))["id"] == "call-1"
+
+    def test_export_rejects_unknown_format(self, client):
+        """Test that unsupported export formats are rejected."""
+        assert client.get("/export/calls", params={"format": "xml"}).status_code == 400
+
+    def test_analytics_timeseries(self, client, call_mirror):
+        """Test the vectorized timeseries endpoint."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T10:00:00.000Z", 60),
+            make_ended_call("call-2", "2026-01-06T10:00:00.000Z", 30),
+            make_ended_call("call-3", "2026-01-07T10:00:00.000Z", 90),
+        ])
+
+        response = client.get("/analytics/timeseries", params={
+            "granularity": "day", "start_date": "2026-01-06", "end_date": "2026-01-07",
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_calls"] == 2
+        assert [b["start"][:10] for b in data["buckets"]] == ["2026-01-06", "2026-01-07"]
+        assert data["calls_by_hour_of_day"][10] == 2
+        assert len(data["busiest_hours_heatmap"]) == 7
+
+    def test_analytics_timeseries_rejects_bad_granularity(self, client):
+        """Test that unknown granularities are rejected."""
+        response = client.get("/analytics/timeseries", params={"granularity": "minute"})
+
+        assert response.status_code == 400
+
+    def test_search_calls(self, client, call_mirror):
+        """Test transcript search with pagination."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", "2026-01-05T09:00:00.000Z", 60,
+                            transcript="Caller reported a chipped windscreen.")
+            for i in range(3)
+        ])
+
+        response = client.get("/calls/search", params={"q": "windscreen", "limit": 2})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["results"]) == 2
+        assert data["next_offset"] == 2
+        assert "X-Data-Synced-At" in response.headers
+
+        response = client.get("/calls/search", params={"q": "windscreen", "offset": 2})
+        assert len(response.json()["results"]) == 1
+        assert response.json()["next_offset"] is None
+
+    def test_search_rejects_empty_query(self, client):
+        """Test that queries without words are rejected."""
+        assert client.get("/calls/search", params={"q": "***"}).status_code == 400
+
+
+class TestResponseCache:
+    """Tests for cached, conditional portal responses."""
+
+    def test_hit_and_conditional_get(self, client, call_mirror):
+        """Test that repeat polls hit the cache and matching ETags get 304."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 60),
+        ])
+
+        first = client.get("/analytics")
+        second = client.get("/analytics")
+        unchanged = client.get("/analytics", headers={"If-None-Match": first.headers["ETag"]})
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+        assert api.response_cache.stats.misses == 1
+        assert api.response_cache.stats.not_modified == 1
+
+    def test_cache_is_keyed_by_query(self, client, call_mirror):
+        """Test that different query strings are cached separately."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call(f"call-{i}", f"2026-01-05T09:0{i}:00.000Z", 60) for i in range(3)
+        ])
+
+        assert len(client.get("/calls", params={"limit": 1}).json()) == 1
+        assert len(client.get("/calls", params={"limit": 2}).json()) == 2
+        assert client.get("/calls", params={"limit": 1}).headers["X-Cache"] == "HIT"
+
+    def test_mirror_write_serves_stale_then_refreshes(self, client, call_mirror):
+        """Test stale-while-revalidate after new calls are synced."""
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-1", "2026-01-05T09:00:00.000Z", 60),
+        ])
+        etag = client.get("/calls").headers["ETag"]
+        call_mirror.upsert_calls(ASSISTANT_ID, [
+            make_ended_call("call-2", "2026-01-05T10:00:00.000Z", 60),
+        ])
+
+        stale = client.get("/calls")
+        refreshed = client.get("/calls")
+
+        assert stale.headers["X-Cache"] == "STALE"
+        assert len(stale.json()) == 1
+        assert refreshed.headers["X-Cache"] == "HIT"
+        assert len(refreshed.json()) == 2
+        assert refreshed.headers["ETag"] != etag
+
+    def test_expired_entries_are_recomputed(self, client, monkeypatch):
+        """Test that entries past the stale window are rendered again."""
+        monkeypatch.setattr(api, "response_cache", ResponseCache(ttl_seconds=0, stale_seconds=0))
+
+        client.get("/analytics")
+
+        assert client.get("/analytics").headers["X-Cache"] == "MISS"
+        assert client.get("/cache/stats").json()["misses"] == 2
+
+    def test_etag_matching(self):
+        """Test If-None-Match parsing."""
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc", "def"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches('"abd"', '"abc"')
+        assert not etag_matches(None, '"abc"')
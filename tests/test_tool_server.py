@@ -0,0 +1,187 @@
+"""
+Tests for the Vapi tool-call server.
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from agent import business_days, tools
+from vapi_ai import tool_server
+from vapi_ai.tool_server import ToolCall, ToolDispatcher, parse_tool_calls
+
+TOOL_SECRET = "tool-secret"
+
+
+def tool_calls_message(*calls):
+    """Build a Vapi `tool-calls` server message for (id, name, arguments) tuples."""
+    return {
+        "message": {
+            "type": "tool-calls",
+            "toolCallList": [
+                {"id": call_id, "type": "function", "function": {"name": name, "arguments": args}}
+                for call_id, name, args in calls
+            ],
+        }
+    }
+
+
+def next_weekday() -> str:
+    today = datetime.now(tools.UK_TZ).date()
+    return business_days.default_calendar().next_business_day(today).isoformat()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """Tool server client writing tool data to a temporary directory."""
+    monkeypatch.setattr(tools, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(tools, "APPOINTMENTS_FILE", tmp_path / "appointments.json")
+    monkeypatch.setattr(tool_server, "VAPI_TOOL_SECRET", TOOL_SECRET)
+    dispatcher = ToolDispatcher(max_workers=4)
+    monkeypatch.setattr(tool_server, "dispatcher", dispatcher)
+    yield TestClient(tool_server.app, headers={"X-Vapi-Secret": TOOL_SECRET})
+    dispatcher.shutdown()
+
+
+class TestParseToolCalls:
+    """Tests for decoding Vapi tool-call payloads."""
+
+    def test_parses_object_and_string_arguments(self):
+        """Test that arguments arrive as objects, JSON strings or empty strings."""
+        message = tool_calls_message(
+            ("call_1", "get_faq_answer", {"topic": "ev"}),
+            ("call_2", "transfer_call", json.dumps({"department": "driver_desk", "reason": "x"})),
+            ("call_3", "get_business_hours", ""),
+        )["message"]
+
+        calls = parse_tool_calls(message)
+
+        assert [call.name for call in calls] == [
+            "get_faq_answer", "transfer_call", "get_business_hours"
+        ]
+        assert calls[1].arguments == {"department": "driver_desk", "reason": "x"}
+        assert calls[2].arguments == {}
+
+    def test_rejects_malformed_calls(self):
+        """Test that unparseable arguments and calls without an id are rejected."""
+        with pytest.raises(ValueError):
+            parse_tool_calls(tool_calls_message(("call_1", "get_faq_answer", "{oops"))["message"])
+        with pytest.raises(ValueError):
+            parse_tool_calls({"toolCallList": [{"function": {"name": "get_faq_answer"}}]})
+
+
+class TestToolDispatcher:
+    """Tests for running tool calls."""
+
+    async def test_sync_tools_run_concurrently_on_the_pool(self):
+        """Test that blocking tools run side by side on the worker pool."""
+        def slow_tool():
+            time.sleep(0.2)
+            return "done"
+
+        dispatcher = ToolDispatcher(tools={"slow_tool": slow_tool}, max_workers=4)
+        try:
+            start = time.perf_counter()
+            results = await dispatcher.run_all([ToolCall(f"c{i}", "slow_tool", {}) for i in range(4)])
+            elapsed = time.perf_counter() - start
+        finally:
+            dispatcher.shutdown()
+
+        assert [r["result"] for r in results] == ["done"] * 4
+        assert elapsed < 0.6
+
+    async def test_timeouts_and_failures_become_errors(self):
+        """Test that hung, failing and unknown tools each return an error result."""
+        async def hangs():
+            await asyncio.sleep(5)
+
+        def fails():
+            raise RuntimeError("boom")
+
+        dispatcher = ToolDispatcher(tools={"hangs": hangs, "fails": fails}, timeout_seconds=0.05)
+        try:
+            results = await dispatcher.run_all([
+                ToolCall("a", "hangs", {}),
+                ToolCall("b", "fails", {}),
+                ToolCall("c", "missing", {}),
+            ])
+        finally:
+            dispatcher.shutdown()
+
+        assert [r["toolCallId"] for r in results] == ["a", "b", "c"]
+        assert all("error" in r and "result" not in r for r in results)
+        assert "timed out" in results[0]["error"]
+
+    async def test_only_unbindable_arguments_are_invalid(self, caplog):
+        """Test that a bug inside a tool is not reported as invalid arguments."""
+        def greet(name: str) -> str:
+            return "Hello " + len(name)  # A bug inside the tool, not bad arguments
+
+        dispatcher = ToolDispatcher(tools={"greet": greet})
+        try:
+            missing, buggy = await dispatcher.run_all([
+                ToolCall("a", "greet", {"extra": 1}),
+                ToolCall("b", "greet", {"name": "Sam"}),
+            ])
+        finally:
+            dispatcher.shutdown()
+
+        assert missing["error"].startswith("Invalid arguments for greet")
+        assert buggy["error"] == "Error executing greet"
+        assert "Error executing tool greet" in caplog.text
+
+
+class TestToolServerEndpoint:
+    """Tests for POST /tools."""
+
+    def test_dispatches_every_call_in_order(self, client):
+        """Test that every call in a message runs and results keep their order."""
+        response = client.post("/tools", json=tool_calls_message(
+            ("call_1", "transfer_call", {"department": "new_business", "reason": "quote"}),
+            ("call_2", "get_faq_answer", {"topic": "mot", "unexpected": "dropped"}),
+            ("call_3", "book_appointment", {
+                "customer_name": "Jane Smith",
+                "contact_phone": "+447700900123",
+                "contact_email": "jane@example.com",
+                "appointment_type": "MOT",
+                "preferred_date": next_weekday(),
+                "preferred_time": "Morning (9-12)",
+            }),
+        ))
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["toolCallId"] for r in results] == ["call_1", "call_2", "call_3"]
+        assert json.loads(results[0]["result"])["destination"] == "03706004499"
+        assert "MOT" in results[1]["result"]
+        assert "Successfully Booked" in results[2]["result"]
+        assert len(json.loads((tools.DATA_DIR / "appointments.json").read_text())) == 1
+
+    def test_missing_arguments_are_reported_to_the_assistant(self, client):
+        """Test that missing arguments come back as an error result, not a 4xx."""
+        response = client.post("/tools", json=tool_calls_message(("call_1", "get_faq_answer", {})))
+
+        assert response.status_code == 200
+        assert "Invalid arguments" in response.json()["results"][0]["error"]
+
+    def test_rejects_bad_secret_and_bad_payload(self, client):
+        """Test that a wrong secret gets 401 and a non-JSON body gets 400."""
+        assert client.post("/tools", content=b"not json").status_code == 400
+
+        message = tool_calls_message(("call_1", "get_business_hours", {}))
+        assert client.post("/tools", json=message, headers={"X-Vapi-Secret": ""}).status_code == 401
+        response = client.post("/tools", json=message, headers={"X-Vapi-Secret": "wrong"})
+        assert response.status_code == 401
+        assert client.post("/tools", json=message).status_code == 200
+
+    def test_refuses_every_call_without_a_configured_secret(self, client, monkeypatch):
+        """Test that the endpoint fails closed while VAPI_TOOL_SECRET is unset."""
+        monkeypatch.setattr(tool_server, "VAPI_TOOL_SECRET", None)
+        message = tool_calls_message(("call_1", "get_business_hours", {}))
+
+        assert client.post("/tools", json=message).status_code == 503
+        assert client.post("/tools", json=message, headers={"X-Vapi-Secret": ""}).status_code == 503
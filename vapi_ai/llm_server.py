@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible custom LLM server for the Arval voice agent.
+
+Vapi can send each conversational turn to a custom LLM URL instead of
+calling a model provider itself. This server answers those
+`/chat/completions` requests with `ArvalVoiceAgent`, so phone calls get the
+same tools and prompt as the agent, and streams the reply back as
+server-sent events so speech can start on the first words.
+
+Each call gets its own agent session, held in memory and keyed by the Vapi
+call ID. Sessions are evicted least recently used first and after sitting
+idle, and every session shares one model client and connection pool, so a
+single worker can serve many concurrent calls. An evicted session is
+rebuilt from the transcript Vapi sends with every request.
+
+Usage:
+    OPENROUTER_API_KEY=... python -m vapi_ai.llm_server
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from agent.voice_agent import ArvalVoiceAgent, create_openrouter_client
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Custom LLM server configuration
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
+MODEL_ID = os.getenv("MODEL_ID", "openai/gpt-4o-mini")
+VAPI_LLM_SECRET = os.getenv("VAPI_LLM_SECRET")
+MAX_SESSIONS = int(os.getenv("VAPI_LLM_MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("VAPI_LLM_SESSION_TTL_SECONDS", "900"))
+
+
+@dataclass
+class CallSession:
+    """Agent state for one phone call."""
+    agent: ArvalVoiceAgent
+    # Serializes turns so an overlapping request can't interleave with the history
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used: float = 0.0
+
+
+class SessionStore:
+    """In-memory call sessions with LRU and idle-time eviction."""
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], ArvalVoiceAgent],
+        max_sessions: int = MAX_SESSIONS,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            agent_factory: Creates the agent for a new session
+            max_sessions: Least recently used sessions are evicted beyond this
+            ttl_seconds: Sessions idle for longer than this are evicted
+            clock: Monotonic time source
+        """
+        self.agent_factory = agent_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float) -> None:
+        # Sessions are kept in last-used order, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def get(self, call_id: str) -> CallSession:
+        """Get a call's session, creating it if the call is new or was evicted."""
+        now = self.clock()
+        self._evict_expired(now)
+        session = self._sessions.get(call_id)
+        if session is None:
+            session = CallSession(agent=self.agent_factory())
+            self._sessions[call_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(call_id)
+        session.last_used = now
+        return session
+
+    def discard(self, call_id: str) -> None:
+        """Forget a call's session, e.g. once the call has ended."""
+        self._sessions.pop(call_id, None)
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """Flatten OpenAI message content, which may be a list of parts, to text."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def align_history(agent: ArvalVoiceAgent, messages: List[Dict[str, Any]]) -> None:
+    """
+    Bring a session's history in line with the transcript Vapi sent.
+
+    A new (or evicted) session is seeded with the earlier user and assistant
+    turns. If the request repeats a user turn the session has already seen,
+    which happens when the caller interrupts and Vapi re-sends the turn, the
+    session is rewound to just before it.
+    """
+    user_turns = sum(1 for message in messages if message.get("role") == "user")
+    history = agent.conversation_history
+    if not history:
+        history.extend(
+            {"role": message["role"], "content": _message_text(message)}
+            for message in messages[:-1]
+            if message.get("role") in ("user", "assistant")
+        )
+        return
+
+    user_positions = [i for i, message in enumerate(history) if message["role"] == "user"]
+    if len(user_positions) >= user_turns:
+        del history[user_positions[user_turns - 1]:]
+
+
+def _chunk(completion_id: str, created: int, delta: Dict[str, Any],
+           finish_reason: Optional[str] = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": MODEL_ID,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def stream_completion(session: CallSession, messages: List[Dict[str, Any]],
+                            user_input: str) -> AsyncIterator[str]:
+    """Run one turn on a session, yielding OpenAI chat completion chunks as SSE."""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    async with session.lock:
+        align_history(session.agent, messages)
+        yield _chunk(completion_id, created, {"role": "assistant", "content": ""})
+        async for text in session.agent.stream_message(user_input):
+            yield _chunk(completion_id, created, {"content": text})
+    yield _chunk(completion_id, created, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+_shared_client = None
+
+
+def new_agent() -> ArvalVoiceAgent:
+    """Create a session agent on the server-wide model client."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = create_openrouter_client(OPENROUTER_API_KEY)
+    return ArvalVoiceAgent(api_key=OPENROUTER_API_KEY, model_id=MODEL_ID, client=_shared_client)
+
+
+sessions = SessionStore(new_agent)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the shared model client when the server stops."""
+    yield
+    if _shared_client is not None:
+        await _shared_client.close()
+
+
+app = FastAPI(
+    title="Arval Custom LLM",
+    description="OpenAI-compatible chat completions backed by the Arval voice agent",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+
+@app.post("/chat/completions")
+async def chat_completions(
+    request: Request,
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Answer the latest user turn of a call.
+
+    Streams `chat.completion.chunk` events unless the request sets
+    `"stream": false`. Requests must carry `VAPI_LLM_SECRET` as a bearer
+    token; while it is not set, every request gets 503.
+    """
+    if not VAPI_LLM_SECRET:
+        raise HTTPException(status_code=503, detail="VAPI_LLM_SECRET not configured")
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token, VAPI_LLM_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if not OPENROUTER_API_KEY:
+        raise HTTPException(status_code=503, detail="OPENROUTER_API_KEY not configured")
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be JSON")
+    messages = body.get("messages") if isinstance(body, dict) else None
+    if (
+        not isinstance(messages, list)
+        or not all(isinstance(message, dict) for message in messages)
+        or not messages
+        or messages[-1].get("role") != "user"
+    ):
+        raise HTTPException(status_code=400, detail="The last message must be from the user")
+
+    # Requests without a call ID get a one-off session seeded from the messages
+    call_id = (body.get("call") or {}).get("id")
+    if call_id:
+        session = sessions.get(call_id)
+    else:
+        session = CallSession(agent=sessions.agent_factory())
+    user_input = _message_text(messages[-1])
+
+    if body.get("stream", True):
+        return StreamingResponse(
+            stream_completion(session, messages, user_input),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async with session.lock:
+        align_history(session.agent, messages)
+        content = "".join([text async for text in session.agent.stream_message(user_input)])
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": MODEL_ID,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+    }
+
+
+@app.get("/health")
+async def health():
+    """Liveness check."""
+    return {"status": "healthy", "sessions": len(sessions)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("VAPI_LLM_PORT", "8200")))
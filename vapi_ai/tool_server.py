@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Vapi tool-call server for the Arval voice agent.
+
+Serves the function tools registered by `deploy_v2.py`. Vapi posts a
+`tool-calls` server message listing one or more calls; each is dispatched
+to its implementation in `agent/tools.py` and the results are returned in
+a single response. Async tools run on the event loop, sync tools on a
+shared worker pool so slow file writes never stall other requests, and
+every call is bounded by a timeout that keeps replies inside Vapi's
+latency budget.
+
+Usage:
+    VAPI_TOOL_SECRET=... python -m vapi_ai.tool_server
+"""
+
+import asyncio
+import hmac
+import inspect
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException, Request
+
+from agent.tools import (
+    book_appointment,
+    capture_lead,
+    check_after_hours,
+    find_next_available,
+    get_business_hours,
+    get_faq_answer,
+    get_office_locations,
+    get_roadside_assistance,
+    schedule_callback,
+    send_appointment_sms,
+    transfer_call,
+)
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Tool server configuration
+VAPI_TOOL_SECRET = os.getenv("VAPI_TOOL_SECRET")
+TOOL_WORKERS = int(os.getenv("VAPI_TOOL_WORKERS", "16"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("VAPI_TOOL_TIMEOUT_SECONDS", "8"))
+
+# The tools registered with the assistant in deploy_v2.py
+TOOL_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "book_appointment": book_appointment,
+    "find_next_available": find_next_available,
+    "capture_lead": capture_lead,
+    "schedule_callback": schedule_callback,
+    "get_roadside_assistance": get_roadside_assistance,
+    "get_business_hours": get_business_hours,
+    "check_after_hours": check_after_hours,
+    "get_faq_answer": get_faq_answer,
+    "transfer_call": transfer_call,
+    "send_appointment_sms": send_appointment_sms,
+    "get_office_locations": get_office_locations,
+}
+
+
+@dataclass
+class ToolCall:
+    """One function call requested by the assistant."""
+    id: str
+    name: str
+    arguments: Dict[str, Any]
+
+
+def parse_tool_calls(message: Dict[str, Any]) -> List[ToolCall]:
+    """
+    Decode the tool calls in a Vapi `tool-calls` server message.
+
+    Arguments may arrive as an object or as a JSON-encoded string, as in
+    OpenAI function calls.
+
+    Raises:
+        ValueError: If a tool call is malformed
+    """
+    items = message.get("toolCallList")
+    if items is None:
+        items = message.get("toolCalls") or []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValueError("Expected a list of tool calls")
+
+    calls = []
+    for item in items:
+        function = item.get("function") or {}
+        arguments = function.get("arguments") or {}
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments) if arguments.strip() else {}
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Tool call {item.get('id')} has invalid arguments: {e}")
+        if not item.get("id") or not function.get("name") or not isinstance(arguments, dict):
+            raise ValueError("Tool calls need an id, a function name and object arguments")
+        calls.append(ToolCall(id=item["id"], name=function["name"], arguments=arguments))
+    return calls
+
+
+class ToolDispatcher:
+    """Runs tool calls against their implementations with a shared worker pool."""
+
+    def __init__(
+        self,
+        tools: Dict[str, Callable[..., Any]] = TOOL_FUNCTIONS,
+        max_workers: int = TOOL_WORKERS,
+        timeout_seconds: float = TOOL_TIMEOUT_SECONDS,
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            tools: Tool implementations keyed by function name
+            max_workers: Threads available to sync tools
+            timeout_seconds: Longest a single tool call may take
+        """
+        self.tools = tools
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        # Signatures are resolved once so calls skip inspecting the function
+        self._signatures = {name: inspect.signature(func) for name, func in tools.items()}
+
+    def _arguments(self, call: ToolCall) -> Dict[str, Any]:
+        """
+        The call's arguments that its tool takes.
+
+        Raises:
+            TypeError: If a required argument is missing
+        """
+        signature = self._signatures[call.name]
+        # The model occasionally sends fields a tool doesn't take; drop them
+        arguments = {k: v for k, v in call.arguments.items() if k in signature.parameters}
+        signature.bind(**arguments)
+        return arguments
+
+    async def _invoke(self, call: ToolCall, arguments: Dict[str, Any]) -> Any:
+        func = self.tools[call.name]
+        if inspect.iscoroutinefunction(func):
+            return await func(**arguments)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(**arguments))
+
+    async def run(self, call: ToolCall) -> Dict[str, str]:
+        """
+        Run one tool call.
+
+        Returns:
+            A Vapi result entry: `{"toolCallId", "result"}` on success or
+            `{"toolCallId", "error"}` if the tool is unknown, rejects its
+            arguments, fails or times out
+        """
+        if call.name not in self.tools:
+            return {"toolCallId": call.id, "error": f"Unknown tool: {call.name}"}
+        try:
+            arguments = self._arguments(call)
+        except TypeError as e:
+            return {"toolCallId": call.id, "error": f"Invalid arguments for {call.name}: {e}"}
+        try:
+            result = await asyncio.wait_for(self._invoke(call, arguments), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            # A sync tool keeps its worker until it returns; the caller just stops waiting
+            logger.warning("Tool %s timed out after %ss", call.name, self.timeout_seconds)
+            return {"toolCallId": call.id, "error": f"{call.name} timed out"}
+        except Exception as e:
+            logger.error(f"Error executing tool {call.name}: {e}")
+            return {"toolCallId": call.id, "error": f"Error executing {call.name}"}
+
+        if not isinstance(result, str):
+            result = json.dumps(result, default=str)
+        return {"toolCallId": call.id, "result": result}
+
+    async def run_all(self, calls: List[ToolCall]) -> List[Dict[str, str]]:
+        """Run a message's tool calls concurrently, keeping their order."""
+        return list(await asyncio.gather(*(self.run(call) for call in calls)))
+
+    def shutdown(self) -> None:
+        """Stop the worker pool once running tools finish."""
+        self._executor.shutdown(wait=True)
+
+
+dispatcher = ToolDispatcher()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release the worker pool when the server stops."""
+    yield
+    dispatcher.shutdown()
+
+
+app = FastAPI(
+    title="Arval Vapi Tool Server",
+    description="Executes the voice agent's function tools for Vapi",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+
+@app.post("/tools")
+async def handle_tool_calls(
+    request: Request,
+    x_vapi_secret: Optional[str] = Header(None, alias="X-Vapi-Secret"),
+):
+    """
+    Execute the tool calls in a Vapi `tool-calls` server message.
+
+    Requests must carry `VAPI_TOOL_SECRET` in `X-Vapi-Secret`; while it is
+    not set, every request gets 503.
+    """
+    if not VAPI_TOOL_SECRET:
+        raise HTTPException(status_code=503, detail="Server secret not configured")
+    if not x_vapi_secret or not hmac.compare_digest(x_vapi_secret, VAPI_TOOL_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid server secret")
+
+    try:
+        body = await request.json()
+        message = body.get("message", body) if isinstance(body, dict) else None
+        if not isinstance(message, dict):
+            raise ValueError("Expected a JSON object")
+        calls = parse_tool_calls(message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid tool-call payload: {e}")
+
+    return {"results": await dispatcher.run_all(calls)}
+
+
+@app.get("/health")
+async def health():
+    """Liveness check."""
+    return {"status": "healthy", "tools": sorted(dispatcher.tools)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("VAPI_TOOL_PORT", "8100")))